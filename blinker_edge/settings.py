@@ -128,9 +128,135 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 # Cache (for Collection Summary and other heavy pages)
+# Two-tier cache (dashboard_app/cache_backends.py): a per-process LRU bounded by bytes in
+# front of a SQLite file shared by all workers. NAMESPACE_TTLS (namespace = key prefix before
+# the first ':') is the default TTL for that namespace and caps longer ones.
+# SNAPSHOT_*: hot entries are copied to SNAPSHOT_PATH periodically and at exit, and loaded at
+# startup, so a new container starts warm (mount DASHBOARD_CACHE_SNAPSHOT on a volume).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'OPTIONS': {'MAX_ENTRIES': 100},
+        'BACKEND': 'dashboard_app.cache_backends.TieredCache',
+        'LOCATION': str(BASE_DIR / 'dashboard_cache.sqlite3'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'L1_MAX_BYTES': 64 * 1024 * 1024,
+            'L1_MAX_AGE': 30,
+            'L2_MAX_BYTES': 512 * 1024 * 1024,
+            'NAMESPACE_TTLS': {
+                'page_context': 86400,
+                'collection_summary': 86400,
+                'disbursal': 86400,
+                'disbursal_day': 86400,
+                'disbursal_collection': 86400,
+                'disbursal_data': 600,
+                'upstream': 3600,
+            },
+            'SNAPSHOT_PATH': os.environ.get('DASHBOARD_CACHE_SNAPSHOT', str(BASE_DIR / 'dashboard_cache.snapshot')),
+            'SNAPSHOT_INTERVAL': 300,
+            'SNAPSHOT_MAX_BYTES': 256 * 1024 * 1024,
+            'SNAPSHOT_NAMESPACES': ['collection_summary', 'disbursal', 'disbursal_day', 'disbursal_collection', 'page_context', 'upstream'],
+        },
+    },
+}
+
+# Stale-while-revalidate page caches (dashboard_app/caching.py): entries are fresh for
+# FRESH_SECONDS, then served stale for up to STALE_SECONDS more while WORKERS background
+# threads recompute them. Ranges that end before today (IST) no longer change much and use
+# the CLOSED_RANGE_* windows instead.
+DASHBOARD_SWR = {
+    'FRESH_SECONDS': 300,
+    'STALE_SECONDS': 1800,
+    'CLOSED_RANGE_FRESH_SECONDS': 6 * 3600,
+    'CLOSED_RANGE_STALE_SECONDS': 18 * 3600,
+    'WORKERS': 2,
+    'REFRESH_LOCK_SECONDS': 120,
+    # Forced recomputes (?refresh / ?nocache) allowed per non-staff user per window
+    'USER_REFRESH_LIMIT': 5,
+    'USER_REFRESH_WINDOW': 300,
+}
+
+# Distinct loan counting (dashboard_app/distinct.py): exact sorted int64 ids by default; above
+# HLL_ABOVE ids (0 = never) a HyperLogLog with 2^HLL_PRECISION registers is used instead.
+DASHBOARD_DISTINCT = {
+    'HLL_ABOVE': 0,
+    'HLL_PRECISION': 14,
+}
+
+# Process-pool row parsing for very large Collection Summary ranges (dashboard_app/parallel.py):
+# off by default; when enabled, responses of MIN_ROWS rows or more are parsed by WORKERS
+# processes in CHUNK_ROWS chunks (benchmark with `manage.py benchmark_parallel`).
+DASHBOARD_PARALLEL = {
+    'ENABLED': False,
+    'MIN_ROWS': 200_000,
+    'WORKERS': 4,
+    'CHUNK_ROWS': 25_000,
+}
+
+# Daily chart series (dashboard_app/series.py): ranges longer than MAX_POINTS days are sent as
+# week / month sums ('bucket') or MAX_POINTS LTTB-selected days ('lttb'); zooming loads the days.
+DASHBOARD_SERIES = {
+    'MAX_POINTS': 92,
+    'MODE': 'bucket',
+}
+
+# Quantile sketches (dashboard_app/sketches.py): values held exactly up to COMPRESSION per
+# sketch, then t-digest centroids (~COMPRESSION / 2) for p50 / p90 / p99 and histograms.
+DASHBOARD_SKETCHES = {
+    'COMPRESSION': 1000,
+}
+
+# Cache warmer (manage.py warm_caches [--loop]): which pages/presets to precompute, how often
+# and how many at once. Presets: today, yesterday, month_to_date, last_month, collection_default.
+# Entries are warmed for the upstream tokens of up to MAX_SCOPES live sessions.
+DASHBOARD_WARMER = {
+    'INTERVAL_SECONDS': 240,
+    'CONCURRENCY': 2,
+    'MAX_SCOPES': 5,
+    'PAGES': {
+        'disbursal_summary': ['today', 'yesterday', 'month_to_date', 'last_month'],
+        'collection_summary': ['today', 'yesterday', 'month_to_date', 'last_month', 'collection_default'],
+        'gst_summary': ['today', 'yesterday', 'month_to_date', 'last_month'],
+        'sale_performance': ['today', 'yesterday', 'month_to_date', 'last_month'],
+        'aum_report': ['today', 'yesterday', 'month_to_date', 'last_month'],
+    },
+}
+
+# Upstream (backend.blinkrloan.com) client - dashboard_app/upstream.py.
+# BREAKER: per-endpoint circuit breaker; opens after FAILURE_THRESHOLD timeouts/5xx within
+# WINDOW_SECONDS, serves the last good response (kept LAST_GOOD_SECONDS) for OPEN_SECONDS,
+# then lets one half-open probe through.
+# HEDGING: for the listed (idempotent GET) endpoints, a second request is sent when the first
+# is slower than the endpoint's PERCENTILE latency; at most MAX_RATIO of calls are hedged.
+# Hedged attempts run on a pool with one thread per bulkhead slot of these endpoints.
+# BULKHEADS: per-endpoint concurrency limit (per process) and how long a call may queue for
+# a slot before it is rejected; DEFAULT applies to endpoints not listed.
+DASHBOARD_UPSTREAM = {
+    'BREAKER': {
+        'FAILURE_THRESHOLD': 5,
+        'WINDOW_SECONDS': 60,
+        'OPEN_SECONDS': 30,
+        'LAST_GOOD_SECONDS': 3600,
+    },
+    'HEDGING': {
+        'ENDPOINTS': ['/insights/v2/collection_summary', '/insights/v2/disbursal'],
+        'PERCENTILE': 95,
+        'MIN_SAMPLES': 20,
+        'MAX_RATIO': 0.1,
+    },
+    'BULKHEADS': {
+        'DEFAULT': {'MAX_CONCURRENT': 8, 'QUEUE_TIMEOUT_SECONDS': 5},
+        '/insights/v2/getGSTdata': {'MAX_CONCURRENT': 2, 'QUEUE_TIMEOUT_SECONDS': 2},
+        '/api/collection/aum_dpd_report': {'MAX_CONCURRENT': 2, 'QUEUE_TIMEOUT_SECONDS': 2},
+        '/api/collection/aum_static_data': {'MAX_CONCURRENT': 2, 'QUEUE_TIMEOUT_SECONDS': 2},
+        '/insights/v2/sales': {'MAX_CONCURRENT': 3, 'QUEUE_TIMEOUT_SECONDS': 3},
+    },
+    # Per-request time budget (seconds) shared by all upstream calls of a view; keyed by
+    # view function name, DEFAULT for the rest. Past it, views fall back to cached/partial data.
+    'DEADLINES': {
+        'DEFAULT': 25,
+        'disbursal_data_api': 20,
+        'page_section_api': 20,
+        'disbursal_records_api': 15,
+        'dpd_bucket_details_api': 15,
     },
 }
@@ -0,0 +1,440 @@
+"""
+Two-tier Django cache backend for the dashboard.
+
+L1 is an in-process LRU bounded by the encoded size of its values (not by entry count),
+L2 is a SQLite file shared by every worker on the host, so a context computed by one
+gunicorn worker is a hit for the others. Reads go L1 -> L2 (and promote into L1); writes
+go to both. L1 copies are kept at most L1_MAX_AGE seconds, which bounds how long a worker
+can serve a value another worker has already deleted or replaced. Both tiers hold values
+encoded by dashboard_app.serialization (columnar row sets, compressed large frames).
+
+Per-namespace TTLs: the namespace is the key prefix before the first ':' (page_context,
+collection_summary, upstream, ...). NAMESPACE_TTLS[namespace] is used when no timeout is
+given and caps any longer timeout that is.
+
+Warm restarts: with SNAPSHOT_PATH set, live entries (SNAPSHOT_NAMESPACES first, then the
+longest-lived, up to SNAPSHOT_MAX_BYTES) are copied to that file every SNAPSHOT_INTERVAL
+seconds and at exit, and a starting process loads the snapshot into an empty or older L2.
+Point it at a volume that survives deploys.
+
+stats() and entries() report per-namespace hits/misses/evictions (this process) and byte
+usage (L1: this process, L2: shared) for the staff cache panel.
+
+    CACHES = {'default': {
+        'BACKEND': 'dashboard_app.cache_backends.TieredCache',
+        'LOCATION': '/path/to/dashboard_cache.sqlite3',
+        'OPTIONS': {'L1_MAX_BYTES': ..., 'L1_MAX_AGE': ..., 'L2_MAX_BYTES': ..., 'NAMESPACE_TTLS': {...},
+                    'SNAPSHOT_PATH': ..., 'SNAPSHOT_INTERVAL': ..., 'SNAPSHOT_MAX_BYTES': ...},
+    }}
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import serialization
+
+
+L1_MAX_BYTES = 64 * 1024 * 1024
+L1_MAX_AGE = 30
+L2_MAX_BYTES = 512 * 1024 * 1024
+L2_CULL_EVERY = 50  # writes between L2 size checks
+SNAPSHOT_INTERVAL = 300
+SNAPSHOT_MAX_BYTES = 256 * 1024 * 1024
+SNAPSHOT_MIN_REMAINING = 60  # not worth snapshotting entries about to expire
+SNAPSHOT_EXIT_LOCK_SECONDS = 30  # workers stopping together write one exit snapshot
+
+HOT_KEYS_TRACKED = 2000  # per-key hit counts kept per process (trimmed to the top half)
+
+TABLE_SQL = ('CREATE TABLE IF NOT EXISTS {schema}dashboard_cache ('
+             ' cache_key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, created REAL NOT NULL)')
+
+
+def stored_namespace(cache_key):
+    """Namespace of a stored (prefixed, versioned) key, e.g. ':1:page_context:...' -> page_context."""
+    return raw_key(cache_key).split(':', 1)[0]
+
+
+def raw_key(cache_key):
+    """The key as the caller passed it: ':1:page_context:...' -> 'page_context:...'."""
+    return cache_key.split(':', 2)[-1]
+
+
+class ByteLRU:
+    """Thread-safe LRU of encoded values, evicting least recently used entries past max_bytes."""
+
+    def __init__(self, max_bytes, on_evict=None):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.on_evict = on_evict
+        self._data = OrderedDict()  # key -> (blob, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, blob, expires_at):
+        with self._lock:
+            self._pop(key)
+            if len(blob) > self.max_bytes:
+                return  # would evict everything else; L2 still has it
+            self._data[key] = (blob, expires_at)
+            self.bytes += len(blob)
+            while self.bytes > self.max_bytes:
+                evicted = next(iter(self._data))
+                self._pop(evicted)
+                if self.on_evict:
+                    self.on_evict(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            return self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self.bytes -= len(item[0])
+        return True
+
+    def __len__(self):
+        return len(self._data)
+
+    def usage(self):
+        """{namespace: bytes} currently held."""
+        with self._lock:
+            items = [(key, len(item[0])) for key, item in self._data.items()]
+        usage = Counter()
+        for key, size in items:
+            usage[stored_namespace(key)] += size
+        return usage
+
+
+class _ProcessState:
+    """What all TieredCache instances for one LOCATION share within a process."""
+
+    def __init__(self, l1_max_bytes):
+        self.l1 = ByteLRU(l1_max_bytes, on_evict=self.record_eviction)
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.pid = None  # process that ran startup (restore + snapshot thread)
+        self.counters = defaultdict(Counter)  # namespace -> l1_hits, l2_hits, misses, sets, evictions
+        self.key_hits = Counter()  # stored key -> hits
+
+    def count(self, cache_key, counter, amount=1):
+        with self.lock:
+            self.counters[stored_namespace(cache_key)][counter] += amount
+
+    def record_hit(self, cache_key, tier):
+        with self.lock:
+            self.counters[stored_namespace(cache_key)][tier] += 1
+            self.key_hits[cache_key] += 1
+            if len(self.key_hits) > HOT_KEYS_TRACKED:
+                self.key_hits = Counter(dict(self.key_hits.most_common(HOT_KEYS_TRACKED // 2)))
+
+    def record_eviction(self, cache_key):
+        self.count(cache_key, 'evictions')
+
+
+# Django creates a cache instance per thread; L1 and counters must be per process.
+_states = {}
+_states_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.l1_max_age = options.get('L1_MAX_AGE', L1_MAX_AGE)
+        self.l2_max_bytes = options.get('L2_MAX_BYTES', L2_MAX_BYTES)
+        self.namespace_ttls = options.get('NAMESPACE_TTLS', {})
+        self.snapshot_path = options.get('SNAPSHOT_PATH')
+        self.snapshot_interval = options.get('SNAPSHOT_INTERVAL', SNAPSHOT_INTERVAL)
+        self.snapshot_max_bytes = options.get('SNAPSHOT_MAX_BYTES', SNAPSHOT_MAX_BYTES)
+        self.snapshot_namespaces = options.get('SNAPSHOT_NAMESPACES', [])
+        with _states_lock:
+            state = _states.get(location)
+            if state is None:
+                state = _states[location] = _ProcessState(options.get('L1_MAX_BYTES', L1_MAX_BYTES))
+        self._state = state
+        self.l1 = state.l1
+        self._local = threading.local()
+
+    # --- L2 (SQLite) ---
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():  # never share a connection across fork
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(TABLE_SQL.format(schema=''))
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._start_process()
+        return conn
+
+    def _start_process(self):
+        """Once per process: load the snapshot and start periodic snapshots."""
+        with self._state.lock:
+            if self._state.pid == os.getpid() or not self.snapshot_path:
+                return
+            self._state.pid = os.getpid()
+        try:
+            restored = self.restore()
+            if restored:
+                print(f"[Cache] Restored {restored} entries from {self.snapshot_path}")
+        except Exception as e:
+            print(f"[Cache] Could not restore snapshot: {e}")
+        threading.Thread(target=self._snapshot_loop, name='cache-snapshot', daemon=True).start()
+        atexit.register(self._snapshot_at_exit)
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            # All workers share L2, so one snapshot per interval is enough
+            self._snapshot_quietly('cache_snapshot:lock', max(self.snapshot_interval - 5, 1))
+
+    def _snapshot_at_exit(self):
+        # Not the periodic lock, which is held for most of every interval: the exit snapshot
+        # must be written, only workers stopping together need not each write one
+        self._snapshot_quietly('cache_snapshot:exit_lock', SNAPSHOT_EXIT_LOCK_SECONDS)
+
+    def _snapshot_quietly(self, lock, lock_seconds):
+        if not self.add(lock, os.getpid(), timeout=lock_seconds):
+            return
+        try:
+            self.snapshot()
+        except Exception as e:
+            print(f"[Cache] Snapshot failed: {e}")
+
+    # --- Snapshots ---
+    def snapshot(self, path=None):
+        """Copy the hottest live L2 entries into a SQLite file at path. Returns the entry count."""
+        path = path or self.snapshot_path
+        tmp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'  # periodic and exit snapshots may overlap
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        db = self._db()
+        candidates = db.execute(
+            'SELECT cache_key, LENGTH(value), expires FROM dashboard_cache'
+            ' WHERE (expires IS NULL OR expires > ?) AND cache_key NOT LIKE ? AND cache_key NOT LIKE ?',
+            (time.time() + SNAPSHOT_MIN_REMAINING, '%:refreshing', '%cache_snapshot:%lock')).fetchall()
+        priority = {namespace: i for i, namespace in enumerate(self.snapshot_namespaces)}
+        candidates.sort(key=lambda row: (
+            priority.get(stored_namespace(row[0]), len(priority)),
+            -(row[2] if row[2] is not None else float('inf')),
+        ))
+        chosen, total = [], 0
+        for key, size, _ in candidates:
+            if total + size > self.snapshot_max_bytes:
+                continue
+            chosen.append((key,))
+            total += size
+
+        db.execute('ATTACH DATABASE ? AS snap', (tmp_path,))
+        try:
+            db.execute(TABLE_SQL.format(schema='snap.'))
+            db.executemany('INSERT INTO snap.dashboard_cache SELECT * FROM main.dashboard_cache WHERE cache_key = ?', chosen)
+        finally:
+            db.execute('DETACH DATABASE snap')
+        os.replace(tmp_path, path)
+        print(f"[Cache] Snapshot of {len(chosen)} entries ({total} bytes) written to {path}")
+        return len(chosen)
+
+    def restore(self, path=None):
+        """Load unexpired entries from a snapshot file; entries already in L2 win. Returns the count."""
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return 0
+        db = self._db()
+        db.execute('ATTACH DATABASE ? AS snap', (path,))
+        try:
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO main.dashboard_cache SELECT * FROM snap.dashboard_cache'
+                ' WHERE expires IS NULL OR expires > ?', (time.time(),))
+            return cursor.rowcount
+        finally:
+            db.execute('DETACH DATABASE snap')
+
+    def _maybe_cull(self):
+        with self._state.lock:
+            self._state.writes += 1
+            if self._state.writes % L2_CULL_EVERY:
+                return
+        db = self._db()
+        db.execute('DELETE FROM dashboard_cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        total = db.execute('SELECT COALESCE(SUM(LENGTH(value)), 0) FROM dashboard_cache').fetchone()[0]
+        if total <= self.l2_max_bytes:
+            return
+        excess = total - self.l2_max_bytes
+        freed = 0
+        victims = []
+        for key, size in db.execute('SELECT cache_key, LENGTH(value) FROM dashboard_cache ORDER BY created'):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        db.executemany('DELETE FROM dashboard_cache WHERE cache_key = ?', victims)
+        for (key,) in victims:
+            self._state.count(key, 'l2_evictions')
+        print(f"[Cache] L2 over {self.l2_max_bytes} bytes, evicted {len(victims)} entries")
+
+    # --- helpers ---
+    def namespace(self, key):
+        return key.split(':', 1)[0]
+
+    def _expiry(self, key, timeout):
+        """Absolute expiry for a raw key, applying its namespace TTL; None = never."""
+        ttl = self.namespace_ttls.get(self.namespace(key))
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout if ttl is None else ttl
+        elif ttl is not None and (timeout is None or timeout > ttl):
+            timeout = ttl
+        return self.get_backend_timeout(timeout)
+
+    def _l1_set(self, key, blob, expires):
+        l1_expires = time.time() + self.l1_max_age
+        self.l1.set(key, blob, l1_expires if expires is None else min(expires, l1_expires))
+
+    # --- Observability ---
+    def stats(self):
+        """
+        {namespace: {'l1_hits', 'l2_hits', 'misses', 'sets', 'evictions', 'l2_evictions',
+        'hit_rate', 'l1_bytes', 'l2_bytes', 'l2_entries'}}. Counters and L1 are this process's.
+        """
+        with self._state.lock:
+            counters = {namespace: Counter(c) for namespace, c in self._state.counters.items()}
+        l1_usage = self.l1.usage()
+        l2_bytes, l2_entries = Counter(), Counter()
+        for key, size in self._db().execute(
+                'SELECT cache_key, LENGTH(value) FROM dashboard_cache WHERE expires IS NULL OR expires > ?',
+                (time.time(),)):
+            l2_bytes[stored_namespace(key)] += size
+            l2_entries[stored_namespace(key)] += 1
+        report = {}
+        for namespace in sorted(set(counters) | set(l1_usage) | set(l2_bytes)):
+            c = counters.get(namespace, Counter())
+            lookups = c['l1_hits'] + c['l2_hits'] + c['misses']
+            report[namespace] = {
+                **{name: c[name] for name in ('l1_hits', 'l2_hits', 'misses', 'sets', 'evictions', 'l2_evictions')},
+                'hit_rate': (c['l1_hits'] + c['l2_hits']) / lookups if lookups else None,
+                'l1_bytes': l1_usage[namespace],
+                'l2_bytes': l2_bytes[namespace],
+                'l2_entries': l2_entries[namespace],
+            }
+        return report
+
+    def entries(self, prefix='', limit=None):
+        """Live L2 entries whose raw key starts with prefix, hottest (this process) then largest first."""
+        now = time.time()
+        with self._state.lock:
+            key_hits = dict(self._state.key_hits)
+        rows = [
+            {
+                'key': raw_key(cache_key),
+                'namespace': stored_namespace(cache_key),
+                'size': size,
+                'age': now - created,
+                'expires_in': None if expires is None else expires - now,
+                'hits': key_hits.get(cache_key, 0),
+            }
+            for cache_key, size, created, expires in self._db().execute(
+                'SELECT cache_key, LENGTH(value), created, expires FROM dashboard_cache'
+                ' WHERE (expires IS NULL OR expires > ?) AND substr(cache_key, 1, ?) = ?',
+                (now, len(self.make_key(prefix)), self.make_key(prefix)))
+        ]
+        rows.sort(key=lambda row: (-row['hits'], -row['size']))
+        return rows[:limit] if limit else rows
+
+    # --- BaseCache API ---
+    def get(self, key, default=None, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        blob = self.l1.get(cache_key)
+        if blob is not None:
+            self._state.record_hit(cache_key, 'l1_hits')
+        else:
+            row = self._db().execute(
+                'SELECT value, expires FROM dashboard_cache WHERE cache_key = ?'
+                ' AND (expires IS NULL OR expires > ?)', (cache_key, time.time())).fetchone()
+            if row is None:
+                self._state.count(cache_key, 'misses')
+                return default
+            self._state.record_hit(cache_key, 'l2_hits')
+            blob = bytes(row[0])
+            self._l1_set(cache_key, blob, row[1])
+        return serialization.loads(blob)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        expires = self._expiry(key, timeout)
+        blob = serialization.dumps(value)
+        self._db().execute(
+            'INSERT OR REPLACE INTO dashboard_cache (cache_key, value, expires, created) VALUES (?, ?, ?, ?)',
+            (cache_key, blob, expires, time.time()))
+        self._l1_set(cache_key, blob, expires)
+        self._state.count(cache_key, 'sets')
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Atomic across workers: only stores if the key is missing or expired in L2."""
+        cache_key = self.make_and_validate_key(key, version=version)
+        expires = self._expiry(key, timeout)
+        blob = serialization.dumps(value)
+        now = time.time()
+        cursor = self._db().execute(
+            'INSERT INTO dashboard_cache (cache_key, value, expires, created) VALUES (?, ?, ?, ?)'
+            ' ON CONFLICT(cache_key) DO UPDATE SET value = excluded.value, expires = excluded.expires,'
+            ' created = excluded.created WHERE dashboard_cache.expires IS NOT NULL AND dashboard_cache.expires <= ?',
+            (cache_key, blob, expires, now, now))
+        if cursor.rowcount != 1:
+            return False
+        self._l1_set(cache_key, blob, expires)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        cursor = self._db().execute(
+            'UPDATE dashboard_cache SET expires = ? WHERE cache_key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(key, timeout), cache_key, time.time()))
+        self.l1.delete(cache_key)
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        self.l1.delete(cache_key)
+        cursor = self._db().execute('DELETE FROM dashboard_cache WHERE cache_key = ?', (cache_key,))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        if self.l1.get(cache_key) is not None:
+            return True
+        return self._db().execute(
+            'SELECT 1 FROM dashboard_cache WHERE cache_key = ? AND (expires IS NULL OR expires > ?)',
+            (cache_key, time.time())).fetchone() is not None
+
+    def clear(self):
+        self.l1.clear()
+        self._db().execute('DELETE FROM dashboard_cache')
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests; nothing to do per request.
+        pass
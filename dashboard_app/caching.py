@@ -0,0 +1,197 @@
+"""
+Caching helpers for heavy dashboard pages and data endpoints.
+
+Entries are served stale-while-revalidate: a value is fresh for FRESH_SECONDS, then it is
+still served (with its age) for up to STALE_SECONDS more while one background worker
+recomputes it. Only the very first request for a key (or ?refresh) waits for upstream.
+range_ttls() gives ranges that include today short windows and closed ranges long ones.
+swr_stats() counts fresh/stale/missed/forced reads per key namespace (this process).
+"""
+import hashlib
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+
+SWR_DEFAULTS = {
+    'FRESH_SECONDS': 300,
+    'STALE_SECONDS': 1800,
+    'CLOSED_RANGE_FRESH_SECONDS': 6 * 3600,  # ranges ending before today barely change
+    'CLOSED_RANGE_STALE_SECONDS': 18 * 3600,
+    'WORKERS': 2,
+    'REFRESH_LOCK_SECONDS': 120,  # cross-worker refresh lock; must outlive the slowest upstream call
+    'USER_REFRESH_LIMIT': 5,  # ?refresh / ?nocache a non-staff user may send ...
+    'USER_REFRESH_WINDOW': 300,  # ... per this many seconds
+}
+
+
+def swr_setting(name):
+    return getattr(settings, 'DASHBOARD_SWR', {}).get(name, SWR_DEFAULTS[name])
+
+
+_key_locks = {}  # key -> [lock, holders + waiters]; dropped when nobody uses it
+_key_locks_guard = threading.Lock()
+_refresh_executor = None
+_refresh_executor_guard = threading.Lock()
+_swr_counters = defaultdict(Counter)
+_swr_counters_guard = threading.Lock()
+
+
+def _count(key, outcome):
+    with _swr_counters_guard:
+        _swr_counters[key.split(':', 1)[0]][outcome] += 1
+
+
+def swr_stats():
+    """{namespace: {'fresh', 'stale', 'miss', 'forced', 'refresh_failed'}} since process start."""
+    with _swr_counters_guard:
+        return {
+            namespace: {name: c[name] for name in ('fresh', 'stale', 'miss', 'forced', 'refresh_failed')}
+            for namespace, c in _swr_counters.items()
+        }
+
+
+def range_ttls(date_to, today):
+    """(fresh_for, stale_for) for data covering a range ending at date_to."""
+    if date_to >= today:
+        return swr_setting('FRESH_SECONDS'), swr_setting('STALE_SECONDS')
+    return swr_setting('CLOSED_RANGE_FRESH_SECONDS'), swr_setting('CLOSED_RANGE_STALE_SECONDS')
+
+
+def auth_scope(token):
+    """Whose data a cached value is: an upstream token (hashed), or the service API key."""
+    if not token:
+        return 'service'
+    return 'token-' + hashlib.sha1(token.encode('utf-8')).hexdigest()[:16]
+
+
+def _acquire_key(key, blocking=True):
+    """Take the in-process lock guarding computation of a cache key; False if busy (non-blocking)."""
+    with _key_locks_guard:
+        entry = _key_locks.get(key)
+        if entry is None:
+            entry = _key_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    if entry[0].acquire(blocking):
+        return True
+    _drop_key(key)
+    return False
+
+
+def _release_key(key):
+    """Release a key lock taken with _acquire_key (from any thread)."""
+    with _key_locks_guard:
+        _key_locks[key][0].release()
+    _drop_key(key)
+
+
+def _drop_key(key):
+    with _key_locks_guard:
+        entry = _key_locks[key]
+        entry[1] -= 1
+        if not entry[1]:
+            del _key_locks[key]
+
+
+@contextmanager
+def _key_lock(key):
+    _acquire_key(key)
+    try:
+        yield
+    finally:
+        _release_key(key)
+
+
+def _executor():
+    global _refresh_executor
+    with _refresh_executor_guard:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=swr_setting('WORKERS'), thread_name_prefix='dashboard-swr')
+        return _refresh_executor
+
+
+def _store(key, value, fresh_for, stale_for, should_cache):
+    if value is None or (should_cache is not None and not should_cache(value)):
+        return
+    entry = {'value': value, 'created_at': time.time(), 'fresh_for': fresh_for}
+    try:
+        cache.set(key, entry, timeout=fresh_for + stale_for)
+    except Exception as e:
+        print(f"[Cache] Could not cache {key}: {e}")
+
+
+def _refresh_in_background(key, compute, fresh_for, stale_for, should_cache):
+    """Schedule one background recompute of key; no-op if a refresh is already running."""
+    if not _acquire_key(key, blocking=False):
+        return False  # this process is already refreshing it
+    refresh_flag = f'{key}:refreshing'
+    if not cache.add(refresh_flag, 1, timeout=swr_setting('REFRESH_LOCK_SECONDS')):
+        _release_key(key)
+        return False  # another worker is already refreshing it
+
+    def run():
+        started = time.time()
+        try:
+            _store(key, compute(), fresh_for, stale_for, should_cache)
+            print(f"[Cache] Background refresh of {key} took {time.time() - started:.1f}s")
+        except Exception as e:
+            _count(key, 'refresh_failed')
+            print(f"[Cache] Background refresh of {key} failed: {e}")
+        finally:
+            cache.delete(refresh_flag)
+            _release_key(key)
+            close_old_connections()
+
+    try:
+        _executor().submit(run)
+    except Exception:
+        cache.delete(refresh_flag)
+        _release_key(key)
+        raise
+    return True
+
+
+def get_or_refresh(key, compute, fresh_for=None, stale_for=None, force=False, should_cache=None):
+    """
+    Stale-while-revalidate read of key. Returns (value, age_seconds, is_stale).
+
+    - fresh entry: returned as is
+    - stale entry: returned immediately; compute() runs in a background worker (one per key)
+    - missing entry or force=True: compute() runs now; concurrent callers for the same key
+      wait for that single computation instead of repeating it
+    should_cache(value) can veto storing a result (e.g. contexts carrying an api_error).
+    """
+    fresh_for = swr_setting('FRESH_SECONDS') if fresh_for is None else fresh_for
+    stale_for = swr_setting('STALE_SECONDS') if stale_for is None else stale_for
+
+    if not force:
+        entry = cache.get(key)
+        if entry is not None:
+            age = time.time() - entry['created_at']
+            if age < entry.get('fresh_for', fresh_for):
+                _count(key, 'fresh')
+                return entry['value'], age, False
+            _count(key, 'stale')
+            _refresh_in_background(key, compute, fresh_for, stale_for, should_cache)
+            return entry['value'], age, True
+
+    requested_at = time.time()
+    with _key_lock(key):
+        # Another request may have filled it while we waited for the lock. A forced refresh
+        # only accepts an entry computed after it was requested (parallel ?refresh siblings).
+        entry = cache.get(key)
+        if entry is not None and (not force or entry['created_at'] >= requested_at):
+            age = time.time() - entry['created_at']
+            _count(key, 'fresh')
+            return entry['value'], age, age >= entry.get('fresh_for', fresh_for)
+        _count(key, 'forced' if force else 'miss')
+        value = compute()
+        _store(key, value, fresh_for, stale_for, should_cache)
+        return value, 0.0, False
@@ -0,0 +1,105 @@
+"""
+Per-process intern tables for the categorical columns of the upstream rows (state, city, lead
+source, DPD bucket, repayment bucket / status).
+
+A Vocabulary gives every normalized value (str(x).strip()) a stable integer code for the life
+of the process, and keeps one string object per value. Normalization runs once per distinct
+raw string, not once per row; rows are then filtered and grouped on NumPy code columns.
+Falsy raw values (None, '') get code -1, as the loops they replace skipped them.
+
+CITIES also carries a canonical code per city: every Delhi region (South Delhi, New Delhi, ...)
+folds into 'Delhi' for the city charts, computed once when the city is first seen.
+
+Codes are only meaningful inside one process: anything cached or shared across workers keeps
+the strings.
+"""
+import threading
+
+import numpy as np
+
+
+def normalize(value):
+    return str(value).strip()
+
+
+def fold_delhi(city):
+    """Chart label of a city: all Delhi regions are grouped as 'Delhi'."""
+    if city and 'delhi' in city.lower():
+        return 'Delhi'
+    return city
+
+
+class Vocabulary:
+    """Normalized value <-> int code, plus an optional canonical (folded) code per value."""
+
+    def __init__(self, name, canonical=None):
+        self.name = name
+        self.values = []  # code -> normalized value
+        self._canonicalize = canonical
+        self._canonical = []  # code -> canonical code
+        self._by_value = {}  # normalized value -> code
+        self._by_raw = {}  # raw str -> code
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def _intern(self, value):
+        code = self._by_value.get(value)
+        if code is not None:
+            return code
+        folded = self._canonicalize(value) if self._canonicalize is not None else value
+        # The folded value is a value of its own (and its own canonical)
+        folded_code = self._intern(folded) if folded != value else None
+        with self._lock:
+            code = self._by_value.get(value)
+            if code is None:
+                code = len(self.values)
+                self.values.append(value)
+                self._canonical.append(code if folded_code is None else folded_code)
+                self._by_value[value] = code
+        return code
+
+    def code(self, raw):
+        """Code of a raw row value (-1 when falsy)."""
+        if not raw:
+            return -1
+        if type(raw) is not str:
+            return self._intern(normalize(raw))  # 1 == True as dict keys, so only cache strings
+        code = self._by_raw.get(raw)
+        if code is None:
+            code = self._by_raw[raw] = self._intern(normalize(raw))
+        return code
+
+    def codes(self, column):
+        """int code column for a list of raw values."""
+        return np.fromiter(map(self.code, column), dtype=np.intp, count=len(column))
+
+    def value(self, raw):
+        """The interned normalized value of a raw value ('' when falsy)."""
+        code = self.code(raw)
+        return self.values[code] if code >= 0 else ''
+
+    def find(self, values):
+        """Codes of already-normalized values (filter selections); unseen values are skipped."""
+        return [self._by_value[v] for v in values if v in self._by_value]
+
+    def isin(self, codes, values):
+        """Mask of the codes whose value is one of values."""
+        return np.isin(codes, self.find(values))
+
+    def decode(self, codes):
+        return [self.values[code] for code in codes]
+
+    def canonical(self, codes):
+        """Canonical code column (-1 stays -1)."""
+        table = np.array(self._canonical + [-1], dtype=np.intp)  # index -1 -> -1
+        return table[codes]
+
+
+STATES = Vocabulary('state')
+CITIES = Vocabulary('city', canonical=fold_delhi)
+SOURCES = Vocabulary('source')
+DPD_BUCKETS = Vocabulary('dpd_bucket')
+REPAYMENT_BUCKETS = Vocabulary('actual_repayment_bucket')
+ONTIME_STATUSES = Vocabulary('loan_pre_post_ontime_status')
@@ -0,0 +1,243 @@
+"""
+Columnar extraction of upstream rows: one pass parses each row's numeric fields (alias
+chains, currency strings, reloan flags, chart dates) into a float64 matrix, one column per
+field, which the aggregations then reduce with NumPy.
+
+Everything here is plain module-level Python (no Django), so parallel.py can run extract()
+in worker processes on slices of the rows.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def to_float(v):
+    if v is None:
+        return 0.0
+    if isinstance(v, (int, float)):
+        try:
+            return float(v)
+        except Exception:
+            return 0.0
+    s = str(v).strip()
+    if s == '':
+        return 0.0
+    # Normalize common formatting: currency symbol, commas, spaces
+    s = s.replace('₹', '').replace(',', '').strip()
+    # Try direct float first
+    try:
+        return float(s)
+    except (ValueError, TypeError):
+        pass
+    # Fallback: extract first numeric token (handles "₹12,345.00", "12,345 INR", etc.)
+    try:
+        m = re.search(r'-?\d+(?:\.\d+)?', s)
+        if m:
+            return float(m.group(0))
+    except Exception:
+        pass
+    return 0.0
+
+
+def as_bool(v):
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        return float(v) != 0.0
+    s = str(v).strip().lower()
+    if s in ('true', '1', 'yes', 'y', 'reloan', 're-loan'):
+        return True
+    if s in ('false', '0', 'no', 'n', 'fresh', 'new'):
+        return False
+    return False
+
+
+def is_reloan_row(r):
+    if not isinstance(r, dict):
+        return False
+    # direct keys
+    for k in ('is_reloan_case', 'isReloanCase', 'is_reloan', 'isReloan', 'reloan_case', 'reloanCase'):
+        if k in r:
+            return as_bool(r.get(k))
+    # case-insensitive keys
+    lower_map = {str(k).lower(): k for k in r.keys()}
+    for lk in ('is_reloan_case', 'isreloancase', 'is_reloan', 'isreloan'):
+        if lk in lower_map:
+            return as_bool(r.get(lower_map[lk]))
+    # loan type strings
+    for k in ('loan_type', 'loanType', 'type'):
+        if k in r and r.get(k) is not None:
+            s = str(r.get(k)).strip().lower()
+            if 'reloan' in s:
+                return True
+            if 'fresh' in s or 'new' in s:
+                return False
+    return False
+
+
+def parse_date_any(v):
+    """Return date object or None."""
+    if v is None:
+        return None
+    # Epoch timestamps (seconds or milliseconds)
+    if isinstance(v, (int, float)):
+        try:
+            ts = float(v)
+            # Heuristic: milliseconds are usually >= 1e12 for current-era timestamps
+            if ts >= 1e12:
+                ts = ts / 1000.0
+            dt = datetime.fromtimestamp(ts, tz=pytz.UTC).astimezone(IST)
+            return dt.date()
+        except Exception:
+            return None
+    if hasattr(v, 'date'):
+        try:
+            return v.date()
+        except Exception:
+            pass
+    s = str(v).strip()
+    if not s:
+        return None
+    # Numeric string epoch timestamp
+    if s.isdigit():
+        try:
+            ts = float(s)
+            if ts >= 1e12:
+                ts = ts / 1000.0
+            dt = datetime.fromtimestamp(ts, tz=pytz.UTC).astimezone(IST)
+            return dt.date()
+        except Exception:
+            pass
+    # ISO-ish: 2025-12-01T00:00:00.000Z -> 2025-12-01
+    if len(s) >= 10 and s[4] == '-' and s[7] == '-':
+        try:
+            return datetime.strptime(s[:10], '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    # Fallback formats
+    for fmt in ('%d-%m-%Y', '%Y/%m/%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(s[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+# How the chart date of a row is found: the auto-detected best key, then the priority keys,
+# then the other date-like keys of the response. Single-day ranges bucket rows without a
+# usable in-range date into that day; longer ranges drop them from the daily series.
+DayContext = namedtuple('DayContext', 'date_from date_to best_key priority_keys candidate_keys')
+
+
+def chart_date(row, context):
+    """Return the best date for chart bucketing, or None."""
+    if context.best_key and context.best_key in row:
+        d0 = parse_date_any(row.get(context.best_key))
+        if d0:
+            return d0
+    for k in context.priority_keys:
+        if k in row:
+            d0 = parse_date_any(row.get(k))
+            if d0:
+                return d0
+    for k in context.candidate_keys:
+        if k in row:
+            try:
+                d0 = parse_date_any(row.get(k))
+                if d0:
+                    return d0
+            except Exception:
+                continue
+    return None
+
+
+def chart_day(row, context):
+    """Day offset of the row in the chart range, or -1 when it is not charted."""
+    d = chart_date(row, context)
+    if d is None or d < context.date_from or d > context.date_to:
+        if context.date_from != context.date_to:
+            return -1
+        d = context.date_from
+    return (d - context.date_from).days
+
+
+# Column specs: (name, kind, aliases)
+# - 'first': to_float of the first truthy alias (r.get(a) or r.get(b) or ...)
+# - 'present': to_float of the first alias present with a value other than None / ''
+# - 'reloan': 1.0 for reloan rows (is_reloan_row)
+# - 'day': chart day offset (chart_day; needs a DayContext)
+
+# Collection Summary columns besides its KPI metrics (metrics.COLLECTION_SUMMARY_KPIS)
+COLLECTION_COLUMNS = (
+    # Chart / detail variants of the KPI fields (historically slightly different alias lists)
+    ('chart_repayment', 'first', ('actual_repayment', 'repayment_amount', 'repaymentAmount')),
+    ('chart_pending', 'first', (
+        'pending_collection', 'pendingCollection', 'pending_collection_amount', 'pendingCollectionAmount',
+        'pendingCollectionAmt', 'pending_collection_amt',
+    )),
+    ('dpd_amount', 'present', ('total_collection_amount', 'received_amount', 'loan_amount')),
+    ('excl_90_collection', 'first', ('total_collection_amount', 'received_amount', 'collection_amount')),
+    ('is_reloan', 'reloan', ()),
+    ('chart_day', 'day', ()),
+)
+
+
+def _reader(kind, aliases, context):
+    if kind == 'first':
+        def read(r):
+            for alias in aliases:
+                v = r.get(alias)
+                if v:
+                    return to_float(v)
+            return 0.0
+    elif kind == 'present':
+        def read(r):
+            for alias in aliases:
+                if alias in r and r.get(alias) not in (None, ''):
+                    return to_float(r.get(alias))
+            return 0.0
+    elif kind == 'reloan':
+        def read(r):
+            return 1.0 if is_reloan_row(r) else 0.0
+    elif kind == 'day':
+        def read(r):
+            return float(chart_day(r, context))
+    else:
+        raise ValueError(f'Unknown column kind: {kind}')
+    return read
+
+
+def extract(rows, columns, context=None, out=None):
+    """(len(rows) x len(columns)) float64 matrix of the columns of dict rows (written into out if given)."""
+    readers = [_reader(kind, aliases, context) for _, kind, aliases in columns]
+    values = np.array([[read(r) for read in readers] for r in rows], dtype=np.float64).reshape(len(rows), len(columns))
+    if out is None:
+        return values
+    out[:] = values
+    return out
+
+
+class Columns:
+    """Named column views of an extracted matrix."""
+
+    def __init__(self, columns, matrix):
+        self.names = [name for name, _, _ in columns]
+        self.matrix = matrix
+
+    def __getitem__(self, name):
+        return self.matrix[:, self.names.index(name)]
+
+    def __len__(self):
+        return len(self.matrix)
+
+
+def ordered_sum(values):
+    """Sum in row order, exactly as a Python `total += v` loop would."""
+    values = np.asarray(values, dtype=np.float64)
+    return float(np.bincount(np.zeros(len(values), dtype=np.intp), weights=values, minlength=1)[0])
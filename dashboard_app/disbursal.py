@@ -0,0 +1,1151 @@
+"""
+Disbursal aggregation engine, shared by the Disbursal Summary page, its AJAX refresh
+(/api/disbursal-data/) and the records modal / Excel export (/api/disbursal-records/).
+
+compute(filters, token) aggregates one range into a DisbursalResult. The disbursals are kept
+as mergeable per-day Partials (measures summed per state/city/source/reloan cell), cached per
+closed day and auth scope: a range only fetches the days it has no partial for (one upstream call per contiguous gap, split by disbursal date), then merges
+the partials of its days and applies the state/city filters to the merged cells. KPIs,
+the state/city/source breakdowns (groupby.py) and the daily series all come from those cells;
+ticket size, disbursal and tenure distributions (p50 / p90 / p99, any histogram bins) come
+from per-cell quantile sketches (sketches.py) pooled the same way.
+
+records(filters, token) fetches the filtered records of the range for the records modal /
+export: the partials hold only aggregates, so the record-level views read them from upstream.
+
+collection_metrics(filters, token) fetches the collection metrics of the range separately
+and caches them on their own (they do not depend on the state/city filters), so only the
+callers that show them (the KPI cards, the 'collection' API section) pay for that call.
+
+compare(filters, token) reuses the same day partials for period-over-period KPIs (previous
+period, same dates last month) and moving averages (/api/compare/).
+
+The views cache the DisbursalResult per (range, filters, auth scope) and only present it, so
+a page load and the refreshes that follow reuse one computation.
+"""
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytz
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import categories, groupby, sketches, upstream
+from .caching import auth_scope, get_or_refresh, range_ttls
+
+logger = logging.getLogger(__name__)
+
+
+DISBURSAL_API_URL = 'https://backend.blinkrloan.com/insights/v2/disbursal'
+TOP_N = 20  # state / city / source chart bars
+# Record fields holding the disbursal date (first one present wins), for splitting a fetched span by day
+DATE_FIELDS = (
+    'disbursal_date', 'Disbursal_Date', 'DISBURSAL_DATE', 'disbursement_date', 'DisbursalDate',
+    'disbursalDate', 'disbursal_dt', 'disbursal_date_ist',
+)
+# Per-cell measures of a Partial (columns of Partial.measures)
+MEASURES = (
+    'count', 'loan_amount', 'disbursal_amount', 'processing_fee', 'interest_amount',
+    'repayment_amount', 'tenure_sum', 'tenure_count',
+)
+# Per-cell quantile sketches of a Partial (sketches.CellSketches): name -> (MEASURES column, only rows where)
+SKETCHED = {
+    'loan_amount': ('loan_amount', None),
+    'disbursal_amount': ('disbursal_amount', None),
+    'tenure': ('tenure_sum', 'tenure_count'),  # tenure of the records with one, as average_tenure
+}
+IST = pytz.timezone('Asia/Kolkata')
+
+
+@dataclass(frozen=True)
+class DisbursalFilters:
+    """The inputs of one computation: IST date range plus state/city selections."""
+    date_from: date
+    date_to: date
+    states: tuple = ()
+    cities: tuple = ()
+
+    @classmethod
+    def from_request(cls, request):
+        """Filters from the query string; the range defaults to today (IST)."""
+        today_date = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+        bounds = []
+        for name in ('date_from', 'date_to'):
+            try:
+                bounds.append(datetime.strptime(request.GET.get(name) or '', '%Y-%m-%d').date())
+            except ValueError:
+                bounds.append(today_date)
+        date_from, date_to = sorted(bounds)
+        return cls(
+            date_from=date_from,
+            date_to=date_to,
+            states=tuple(sorted({s for s in request.GET.getlist('state') if s})),
+            cities=tuple(sorted({c for c in request.GET.getlist('city') if c})),
+        )
+
+
+@dataclass
+class Split:
+    """One KPI as total / fresh / reloan."""
+    total: float = 0
+    fresh: float = 0
+    reloan: float = 0
+
+
+@dataclass
+class Breakdown:
+    """Chart series for one dimension (state, city or lead source): top TOP_N by disbursal."""
+    labels: list
+    disbursal: list
+    sanction: list
+    net_disbursal: list
+    counts: list
+    fresh_counts: list
+    reloan_counts: list
+
+    @classmethod
+    def top(cls, categories, codes, disbursal, sanction, count, is_reloan):
+        """Group the rows (records or cells of count records) by their encoded label and keep the TOP_N groups by disbursal."""
+        size = len(categories)
+        disbursal_sums = groupby.group_sums(codes, size, disbursal)
+        top = groupby.top_k(disbursal_sums, TOP_N)
+        values = disbursal_sums[top].tolist()
+        count = np.asarray(count, dtype=np.float64)
+        return cls(
+            labels=[categories[i] for i in top],
+            disbursal=values,
+            sanction=groupby.group_sums(codes, size, sanction)[top].tolist(),
+            net_disbursal=list(values),  # Disbursal_Amt is already net
+            counts=_ints(groupby.group_sums(codes, size, count)[top]),
+            fresh_counts=_ints(groupby.group_sums(codes, size, np.where(is_reloan, 0, count))[top]),
+            reloan_counts=_ints(groupby.group_sums(codes, size, np.where(is_reloan, count, 0))[top]),
+        )
+
+
+def _ints(values):
+    """Counts summed as floats back to a list of ints."""
+    return np.rint(values).astype(np.int64).tolist()
+
+
+@dataclass
+class Partial:
+    """
+    Mergeable aggregate of the disbursals of date_from..date_to (a single day when cached):
+    the MEASURES summed per (state, city, source, is_reloan) cell and a quantile sketch per
+    cell of the SKETCHED values. Partials of disjoint ranges merge by adding equal cells and
+    pooling their sketches.
+    """
+    date_from: date
+    date_to: date
+    cells: list
+    measures: np.ndarray  # len(cells) x len(MEASURES)
+    sketches: dict = None  # SKETCHED name -> sketches.CellSketches
+
+    @classmethod
+    def from_records(cls, date_from, date_to, records):
+        index = {}
+        codes = []
+        rows = []
+        for record in records:
+            is_reloan = bool(record.get('is_reloan_case', False))
+            cell = (
+                categories.STATES.value(record.get('state')),
+                categories.CITIES.value(record.get('city')),
+                categories.SOURCES.value(record.get('source', record.get('Source'))),  # Try both lowercase and capitalized
+                is_reloan,
+            )
+            codes.append(index.setdefault(cell, len(index)))
+            tenure_days = float(record.get('tenure', 0) or 0)  # Tenure in days
+            rows.append((
+                1.0,
+                float(record.get('loan_amount', 0) or 0),  # Sanction amount
+                float(record.get('Disbursal_Amt', 0) or 0),  # Net disbursal amount
+                float(record.get('processing_fee', 0) or 0),
+                float(record.get('interest_amount', 0) or 0),
+                float(record.get('repayment_amount', 0) or 0),
+                tenure_days if tenure_days > 0 else 0.0,
+                1.0 if tenure_days > 0 else 0.0,
+            ))
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(MEASURES))
+        codes = np.array(codes, dtype=np.intp)
+        return cls(
+            date_from=date_from,
+            date_to=date_to,
+            cells=list(index),
+            measures=_cell_sums(codes, len(index), values),
+            sketches=_cell_sketches(codes, len(index), values),
+        )
+
+    @classmethod
+    def merge(cls, partials):
+        """One Partial for the union of partials (of disjoint ranges)."""
+        cells, codes = groupby.encode([cell for p in partials for cell in p.cells])
+        stacked = np.vstack([p.measures for p in partials]) if partials else np.zeros((0, len(MEASURES)))
+        # Merged cell code of each partial's cells, to pool the sketches
+        offsets = np.cumsum([0] + [len(p.cells) for p in partials])
+        code_maps = [codes[offsets[i]:offsets[i + 1]] for i in range(len(partials))]
+        return cls(
+            date_from=min((p.date_from for p in partials), default=None),
+            date_to=max((p.date_to for p in partials), default=None),
+            cells=cells,
+            measures=_cell_sums(codes, len(cells), stacked),
+            sketches={
+                name: sketches.CellSketches.merge(
+                    [(p.sketches[name], code_map) for p, code_map in zip(partials, code_maps)], len(cells))
+                for name in SKETCHED
+            },
+        )
+
+    def keep(self, filters):
+        """Boolean mask of the cells that pass the state / city filters."""
+        return np.fromiter(
+            ((not filters.states or state in filters.states) and (not filters.cities or city in filters.cities)
+             for state, city, _, _ in self.cells),
+            dtype=bool,
+            count=len(self.cells),
+        )
+
+    def column(self, name):
+        return self.measures[:, MEASURES.index(name)]
+
+
+def _cell_sums(codes, size, values):
+    """Sum the rows of a (rows x MEASURES) matrix per cell code."""
+    return np.stack([groupby.group_sums(codes, size, values[:, i]) for i in range(len(MEASURES))], axis=1)
+
+
+def _cell_sketches(codes, size, values):
+    """SKETCHED name -> CellSketches of a (rows x MEASURES) matrix per cell code."""
+    out = {}
+    for name, (measure, where) in SKETCHED.items():
+        cell_codes = codes if where is None else np.where(values[:, MEASURES.index(where)] > 0, codes, -1)
+        out[name] = sketches.CellSketches.from_values(cell_codes, size, values[:, MEASURES.index(measure)])
+    return out
+
+
+@dataclass
+class DisbursalResult:
+    """Everything the disbursal views show for one DisbursalFilters."""
+    filters: DisbursalFilters
+    loans: Split  # record counts
+    loan_amount: Split  # sanction
+    disbursal_amount: Split  # net disbursal
+    processing_fee: Split
+    interest_amount: Split
+    repayment_amount: Split
+    average_tenure: Split
+    by_state: Breakdown
+    by_city: Breakdown
+    by_source: Breakdown
+    states: list  # filter dropdowns
+    cities: list  # cities of the selected states (all cities without a state filter)
+    cities_by_state: dict
+    computed_at: str
+    api_error: str = None
+    daily: dict = None  # {'dates', 'counts', 'disbursal', 'sanction'} for the filtered disbursals, one point per day
+    distributions: dict = None  # SKETCHED name -> sketches.QuantileSketch of the filtered disbursals
+
+    @property
+    def source_count(self):
+        """Records with a lead source among the top sources (Source card)."""
+        return sum(self.by_source.counts)
+
+
+def auth_headers(token):
+    """Upstream headers: the session's blinkr_token, else BLINKR_API_KEY."""
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+    }
+    token = token or os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    else:
+        print("WARNING: No authentication token found in session or settings")
+    return headers
+
+
+def _fetch_records(date_from, date_to, headers):
+    """(records, api_error) for the range. Failures return no records and an error message."""
+    params = {
+        'startDate': date_from.strftime('%Y-%m-%d'),
+        'endDate': date_to.strftime('%Y-%m-%d')
+    }
+    print(f"Disbursal API URL: {DISBURSAL_API_URL}")
+    print(f"Disbursal API Params: {params}")
+    try:
+        response = upstream.get(DISBURSAL_API_URL, params=params, headers=headers, timeout=30)
+    except requests.RequestException as e:
+        print(f"API Request Error: {e}")
+        if getattr(e, 'response', None) is not None:
+            print(f"Response Status: {e.response.status_code}")
+            print(f"Response Text: {e.response.text[:500]}")
+        return [], f'API request failed: {str(e)}'
+    print(f"Disbursal API Response Status: {response.status_code}")
+
+    if response.status_code != 200:
+        print(f"API Error Response: {response.text[:500]}")
+        try:
+            error_data = response.json()
+            return [], error_data.get('message') or error_data.get('error') or f'API returned status {response.status_code}'
+        except Exception:
+            return [], f'API returned status {response.status_code}'
+
+    try:
+        api_data = response.json()
+    except ValueError:
+        print(f"ERROR: Invalid JSON response: {response.text[:500]}")
+        return [], 'Invalid JSON response from API'
+
+    if isinstance(api_data, list):
+        records = api_data
+    elif isinstance(api_data, dict):
+        # Authorization and other errors come back as {'message': ...} / {'error': ...}
+        if 'message' in api_data or 'error' in api_data:
+            error_msg = api_data.get('message', api_data.get('error', 'Unknown error'))
+            print(f"API Error in response: {error_msg}")
+            return [], error_msg
+        # v2 API might have different structure: try the possible keys
+        records = api_data.get('result', api_data.get('data', api_data.get('records', api_data.get('disbursals', api_data.get('items', [])))))
+    else:
+        print(f"WARNING: Unexpected API response type: {type(api_data)}")
+        records = []
+
+    if not isinstance(records, list):
+        print(f"WARNING: Records is not a list, type: {type(records)}")
+        records = []
+    print(f"Final records count: {len(records)}")
+    return [r for r in records if isinstance(r, dict)], None
+
+
+def _record_day(record):
+    """IST disbursal date of a record, or None when it has no parseable date field."""
+    value = next((record[name] for name in DATE_FIELDS if record.get(name) not in (None, '')), None)
+    if value is None:
+        return None
+    s = str(value).strip()
+    if isinstance(value, (int, float)) or s.isdigit():
+        # Epoch timestamps (seconds or milliseconds)
+        try:
+            ts = float(value)
+            if ts >= 1e12:
+                ts = ts / 1000.0
+            return datetime.fromtimestamp(ts, tz=pytz.UTC).astimezone(IST).date()
+        except (ValueError, OverflowError, OSError):
+            return None
+    # ISO-ish: a timestamp with an offset (2025-11-30T20:00:00.000Z) is converted to IST like
+    # the epochs (-> 2025-12-01); a plain date or a naive timestamp is already an IST day
+    if len(s) > 10:
+        try:
+            # fromisoformat (3.10) wants no 'Z', 3 or 6 fraction digits and a colon in the offset
+            normalized = re.sub(r'([+-]\d{2})(\d{2})$', r'\1:\2', re.sub(r'\.\d+', '', s.replace('Z', '+00:00')))
+            moment = datetime.fromisoformat(normalized)
+            if moment.tzinfo is not None:
+                return moment.astimezone(IST).date()
+        except ValueError:
+            pass
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        return None
+
+
+def _split_by_day(records, date_from, date_to):
+    """
+    {day: records} for a span fetched in one call, or None if some record cannot be attributed
+    to a day of the span (then the span is aggregated as a whole and not cached per day).
+    """
+    if date_from == date_to:
+        return {date_from: records}
+    by_day = defaultdict(list)
+    for record in records:
+        day = _record_day(record)
+        if day is None or not date_from <= day <= date_to:
+            return None
+        by_day[day].append(record)
+    return by_day
+
+
+def _days(date_from, date_to):
+    return [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+
+def _spans(days):
+    """Contiguous (first, last) runs of a sorted list of days."""
+    spans = []
+    for day in days:
+        if spans and day - spans[-1][1] == timedelta(days=1):
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return [tuple(span) for span in spans]
+
+
+def _day_key(day, scope):
+    return f'disbursal_day:{day.isoformat()}:{scope}'
+
+
+def day_partials(date_from, date_to, headers, scope):
+    """
+    ([Partial], api_error) covering date_from..date_to, in date order. Closed days (before
+    today, IST) come from the per-day cache when present; the missing days are fetched with one
+    upstream call per contiguous gap and cached. Today is always fetched, it is still changing.
+    """
+    today = datetime.now(IST).date()
+    days = _days(date_from, date_to)
+    partials = {}
+    for day in days:
+        if day < today:
+            cached = cache.get(_day_key(day, scope))
+            # Partials cached before sketches, or still holding their records: refetch
+            if cached is not None and cached.sketches is not None and not hasattr(cached, 'records'):
+                partials[day] = cached
+    missing = [day for day in days if day not in partials]
+
+    for span_from, span_to in _spans(missing):
+        records, api_error = _fetch_records(span_from, span_to, headers)
+        if api_error:
+            return [], api_error
+        by_day = _split_by_day(records, span_from, span_to)
+        if by_day is None:
+            print(f"[Disbursal] Records of {span_from} - {span_to} have no usable disbursal date; not cached per day")
+            partials[span_from] = Partial.from_records(span_from, span_to, records)
+            continue
+        for day in _days(span_from, span_to):
+            partial = partials[day] = Partial.from_records(day, day, by_day.get(day, []))
+            if day < today:
+                try:
+                    cache.set(_day_key(day, scope), partial, timeout=sum(range_ttls(day, today)))
+                except Exception as e:
+                    print(f"[Cache] Could not cache {_day_key(day, scope)}: {e}")
+
+    print(f"[Disbursal] {date_from} - {date_to}: {len(days) - len(missing)} day(s) from day partials, {len(missing)} fetched")
+    return [partials[day] for day in sorted(partials)], None
+
+
+def _daily_series(partials, filters):
+    """Count / disbursal / sanction per day of the filtered cells, from the single-day partials."""
+    daily = {'dates': [], 'counts': [], 'disbursal': [], 'sanction': []}
+    for partial in partials:
+        if partial.date_from != partial.date_to:
+            continue
+        keep = partial.keep(filters)
+        daily['dates'].append(partial.date_from.isoformat())
+        daily['counts'].append(int(round(partial.column('count')[keep].sum())))
+        daily['disbursal'].append(float(partial.column('disbursal_amount')[keep].sum()))
+        daily['sanction'].append(float(partial.column('loan_amount')[keep].sum()))
+    return daily
+
+
+def compute(filters, token=None):
+    """Aggregate the disbursals of filters into a DisbursalResult (collection metrics: collection_metrics())."""
+    headers = auth_headers(token)
+    partials, api_error = day_partials(filters.date_from, filters.date_to, headers, auth_scope(token))
+    merged = Partial.merge(partials)
+
+    # City dropdown options come from all cells, before the state/city filters
+    cities_by_state = defaultdict(set)
+    for state, city, _, _ in merged.cells:
+        if state and city:
+            cities_by_state[state].add(city)
+
+    # Apply state and city filters (multiple selections) to the cells
+    keep = merged.keep(filters)
+    cells = [cell for cell, kept in zip(merged.cells, keep) if kept]
+    measures = merged.measures[keep]
+
+    is_reloan = np.fromiter((cell[3] for cell in cells), dtype=bool, count=len(cells))
+
+    def split(name, cast=float):
+        column = measures[:, MEASURES.index(name)]
+        return Split(total=cast(column.sum()), fresh=cast(column[~is_reloan].sum()), reloan=cast(column[is_reloan].sum()))
+
+    def count(name):
+        return split(name, cast=lambda value: int(round(value)))
+
+    tenure_sum = split('tenure_sum')
+    tenure_count = count('tenure_count')
+    average_tenure = Split(*(
+        round(total / n, 1) if n > 0 else 0
+        for total, n in (
+            (tenure_sum.total, tenure_count.total),
+            (tenure_sum.fresh, tenure_count.fresh),
+            (tenure_sum.reloan, tenure_count.reloan),
+        )
+    ))
+
+    # State, city and source charts: group-by on the encoded labels of the cells
+    disbursal = measures[:, MEASURES.index('disbursal_amount')]
+    sanction = measures[:, MEASURES.index('loan_amount')]
+    loans = measures[:, MEASURES.index('count')]
+    state_categories, state_codes = groupby.encode([cell[0] for cell in cells])
+    by_state = Breakdown.top(state_categories, state_codes, disbursal, sanction, loans, is_reloan)
+    by_city = Breakdown.top(*groupby.encode([cell[1] for cell in cells]), disbursal, sanction, loans, is_reloan)
+    by_source = Breakdown.top(*groupby.encode([cell[2] for cell in cells]), disbursal, sanction, loans, is_reloan)
+
+    # City dropdown: only cities from the selected states
+    if filters.states:
+        cities = sorted({city for state in filters.states for city in cities_by_state.get(state, ())})
+    else:
+        cities = sorted({city for state_cities in cities_by_state.values() for city in state_cities})
+
+    return DisbursalResult(
+        filters=filters,
+        loans=count('count'),
+        loan_amount=split('loan_amount'),
+        disbursal_amount=split('disbursal_amount'),
+        processing_fee=split('processing_fee'),
+        interest_amount=split('interest_amount'),
+        repayment_amount=split('repayment_amount'),
+        average_tenure=average_tenure,
+        by_state=by_state,
+        by_city=by_city,
+        by_source=by_source,
+        states=sorted(state_categories),
+        cities=cities,
+        cities_by_state={state: sorted(state_cities) for state, state_cities in cities_by_state.items()},
+        computed_at=timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+        api_error=api_error,
+        daily=_daily_series(partials, filters),
+        distributions={name: merged.sketches[name].select(keep) for name in SKETCHED},
+    )
+
+
+def records(filters, token=None):
+    """
+    (records, api_error): the disbursal records of filters, for the records modal / export.
+    One upstream call for the range; the day partials keep only the aggregates.
+    """
+    records, api_error = _fetch_records(filters.date_from, filters.date_to, auth_headers(token))
+    # Same normalized state / city as the cells compute() filters
+    if filters.states:
+        records = [r for r in records if categories.STATES.value(r.get('state')) in filters.states]
+    if filters.cities:
+        records = [r for r in records if categories.CITIES.value(r.get('city')) in filters.cities]
+    print(f"Final records count after filtering: {len(records)}")
+    return records, api_error
+
+
+# Trailing moving averages of the daily series returned by compare()
+MOVING_AVERAGE_DAYS = (7, 30)
+# Daily series of compare() (name, measure)
+COMPARE_SERIES = (('counts', 'count'), ('disbursal', 'disbursal_amount'), ('sanction', 'loan_amount'))
+
+
+def _month_before(day):
+    """Same day of the previous month (clamped to its last day: 31 Mar -> 28/29 Feb)."""
+    first = day.replace(day=1)
+    previous = first - timedelta(days=1)
+    return previous.replace(day=min(day.day, previous.day))
+
+
+def _period_kpis(sums):
+    """KPI values of one period from its summed MEASURES."""
+    value = dict(zip(MEASURES, sums.tolist()))
+    return {
+        'loans': int(round(value['count'])),
+        'loan_amount': value['loan_amount'],
+        'disbursal_amount': value['disbursal_amount'],
+        'processing_fee': value['processing_fee'],
+        'interest_amount': value['interest_amount'],
+        'repayment_amount': value['repayment_amount'],
+        'average_tenure': round(value['tenure_sum'] / value['tenure_count'], 1) if value['tenure_count'] > 0 else 0,
+    }
+
+
+def _change_pct(current, previous):
+    """% change of each KPI against a previous period (None when the previous value is 0)."""
+    return {
+        name: round((current[name] - previous[name]) / previous[name] * 100, 2) if previous[name] else None
+        for name in current
+    }
+
+
+def compare(filters, token=None):
+    """
+    KPIs of the range, the previous period of the same length and the same dates last month,
+    plus moving averages of the daily series, as a JSON-ready dict (api_error on failure).
+
+    One day_partials() call covers every window (mostly per-day cache reads); the filtered
+    MEASURES per day are summed once into prefix sums, so each period and each moving average
+    point is the difference of two prefix rows.
+    """
+    days = (filters.date_to - filters.date_from).days + 1
+    periods = {
+        'current': (filters.date_from, filters.date_to),
+        'previous_period': (filters.date_from - timedelta(days=days), filters.date_from - timedelta(days=1)),
+        'last_month': (_month_before(filters.date_from), _month_before(filters.date_to)),
+    }
+    start = min([first for first, _ in periods.values()] + [filters.date_from - timedelta(days=max(MOVING_AVERAGE_DAYS) - 1)])
+    partials, api_error = day_partials(start, filters.date_to, auth_headers(token), auth_scope(token))
+    if api_error:
+        return {'api_error': api_error}
+
+    # Every window needs per-day values: a span whose records could not be split by day would
+    # silently undercount the periods and moving averages it overlaps
+    unsplit = [f'{p.date_from} - {p.date_to}' for p in partials if p.date_from != p.date_to]
+    if unsplit:
+        print(f"[Disbursal] Compare: {', '.join(unsplit)} not split by day")
+        return {'api_error': f"Disbursal records of {', '.join(unsplit)} have no usable disbursal date; "
+                             "cannot compare periods by day"}
+
+    # Filtered MEASURES per day of start..date_to, then prefix sums (row i = sum of days before i)
+    daily = np.zeros(((filters.date_to - start).days + 1, len(MEASURES)))
+    for partial in partials:
+        daily[(partial.date_from - start).days] = partial.measures[partial.keep(filters)].sum(axis=0)
+    prefix = np.vstack([np.zeros((1, len(MEASURES))), np.cumsum(daily, axis=0)])
+
+    def window(first, last):
+        return prefix[(last - start).days + 1] - prefix[(first - start).days]
+
+    result = {'date_from': filters.date_from.isoformat(), 'date_to': filters.date_to.isoformat(), 'days': days}
+    current = _period_kpis(window(*periods['current']))
+    for name, (first, last) in periods.items():
+        kpis = current if name == 'current' else _period_kpis(window(first, last))
+        result[name] = {'date_from': first.isoformat(), 'date_to': last.isoformat(), 'kpis': kpis}
+        if name != 'current':
+            result[name]['change_pct'] = _change_pct(current, kpis)
+
+    # Trailing moving averages for each day of the range (the window ending on that day)
+    ends = np.arange((filters.date_from - start).days, (filters.date_to - start).days + 1) + 1
+    moving = {'dates': [day.isoformat() for day in _days(filters.date_from, filters.date_to)]}
+    for series, measure in COMPARE_SERIES:
+        column = prefix[:, MEASURES.index(measure)]
+        moving[series] = daily[ends - 1, MEASURES.index(measure)].tolist()
+        for n in MOVING_AVERAGE_DAYS:
+            moving[f'{series}_{n}d'] = ((column[ends] - column[ends - n]) / n).tolist()
+    result['moving_averages'] = moving
+    result['computed_at'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+    return result
+
+
+def collection_metrics(filters, token=None, force=False):
+    """
+    Collection metrics of the filters' date range, cached per (range, auth scope) with the
+    range's freshness windows (stale-while-revalidate; force recomputes now).
+    """
+    key = f'disbursal_collection:{filters.date_from.isoformat()}:{filters.date_to.isoformat()}:{auth_scope(token)}'
+    fresh_for, stale_for = range_ttls(filters.date_to, datetime.now(IST).date())
+    value, _, _ = get_or_refresh(
+        key,
+        lambda: fetch_collection_metrics(filters.date_from, filters.date_to, auth_headers(token)),
+        fresh_for=fresh_for,
+        stale_for=stale_for,
+        force=force,
+    )
+    return value
+
+
+def fetch_collection_metrics(date_from, date_to, headers):
+    """Collection metrics for the same date range as the disbursal filters (empty dict on failure)."""
+    collection_metrics = {}
+    try:
+        collection_api_url = 'https://backend.blinkrloan.com/insights/v2/collection_metrics'
+        # Use the SAME date_from and date_to from filters (same as disbursal API)
+        collection_params = {
+            'startDate': date_from.strftime('%Y-%m-%d'),
+            'endDate': date_to.strftime('%Y-%m-%d')
+        }
+        # Same auth headers as the disbursal API (which is working)
+        collection_headers = headers
+        
+        # Reduced timeout (8 seconds instead of 30); the context is built off the request path
+        # by the page cache, so a slow collection API only delays the background refresh
+        try:
+            collection_response = upstream.get(collection_api_url, params=collection_params, headers=collection_headers, timeout=8)
+        except requests.exceptions.Timeout:
+            logger.warning("Collection metrics request timed out after 8 seconds; using empty metrics")
+            collection_metrics = {}
+            collection_response = None
+        
+        if collection_response and collection_response.status_code == 200:
+            try:
+                collection_data = collection_response.json()
+                
+                # Handle different response structures (optimized - minimal logging)
+                if isinstance(collection_data, dict):
+                    # Check for error messages first
+                    if 'error' in collection_data:
+                        collection_metrics = {}
+                    elif 'message' in collection_data:
+                        message = collection_data.get('message', '')
+                        if 'not authorised' in str(message).lower() or 'unauthorized' in str(message).lower() or 'error' in str(message).lower():
+                            logger.warning("Collection metrics API error: %s", message)
+                            collection_metrics = {}
+                    
+                    # Check if data is nested in 'data' key
+                    if 'data' in collection_data and not collection_metrics:
+                        data_value = collection_data['data']
+                        if isinstance(data_value, list) and len(data_value) > 0:
+                            # Aggregate all rows instead of just taking the first
+                            collection_metrics = _aggregate_collection_metrics(data_value, date_from, date_to)
+                        elif isinstance(data_value, dict):
+                            collection_metrics = data_value
+                        else:
+                            collection_metrics = {}
+                    elif 'result' in collection_data and not collection_metrics:
+                        result_value = collection_data['result']
+                        if isinstance(result_value, list) and len(result_value) > 0:
+                            # Aggregate all rows instead of just taking the first
+                            collection_metrics = _aggregate_collection_metrics(result_value, date_from, date_to)
+                        else:
+                            collection_metrics = result_value if isinstance(result_value, dict) else {}
+                    elif 'metrics' in collection_data and not collection_metrics:
+                        metrics_value = collection_data['metrics']
+                        if isinstance(metrics_value, list) and len(metrics_value) > 0:
+                            # Aggregate all rows instead of just taking the first
+                            collection_metrics = _aggregate_collection_metrics(metrics_value, date_from, date_to)
+                        else:
+                            collection_metrics = metrics_value if isinstance(metrics_value, dict) else {}
+                    elif not collection_metrics:
+                        collection_metrics = collection_data
+                elif isinstance(collection_data, list) and len(collection_data) > 0:
+                    # Aggregate all rows instead of just taking the first
+                    if collection_data and len(collection_data) > 0:
+                        collection_metrics = _aggregate_collection_metrics(collection_data, date_from, date_to)
+                else:
+                    collection_metrics = {}
+            except Exception as e:
+                logger.warning("Could not parse the collection metrics response: %s", e)
+                collection_metrics = {}
+        else:
+            if collection_response is not None:
+                logger.warning("Collection metrics API returned status %s", collection_response.status_code)
+            collection_metrics = {}
+    except requests.exceptions.Timeout:
+        logger.warning("Collection metrics request timed out")
+        collection_metrics = {}
+    except requests.exceptions.RequestException as e:
+        logger.warning("Collection metrics request failed: %s", e)
+        collection_metrics = {}
+    except Exception as e:
+        logger.warning("Unexpected error fetching collection metrics: %s", e)
+        collection_metrics = {}
+    
+    # Use collection metrics API values directly: totals are Fresh + Reloan
+    # The API should return Fresh/Reloan amounts directly
+    if collection_metrics:
+        # Get Fresh and Reloan values first
+        fresh_collection_amt = collection_metrics.get('fresh_collection_amount', 0) or 0
+        reloan_collection_amt = collection_metrics.get('reloan_collection_amount', 0) or 0
+        fresh_collection_cnt = collection_metrics.get('fresh_collection_count', 0) or 0
+        reloan_collection_cnt = collection_metrics.get('reloan_collection_count', 0) or 0
+        
+        # Calculate total count as sum of Fresh + Reloan (not from total_collection_count which might include other categories)
+        total_collection_cnt = fresh_collection_cnt + reloan_collection_cnt
+        
+        # Always calculate total amount as sum of Fresh + Reloan (even if one is zero)
+        total_collection_amt = fresh_collection_amt + reloan_collection_amt
+        
+        # Log warning if Fresh/Reloan are zero but total exists
+        if total_collection_amt > 0 and (fresh_collection_amt == 0 and reloan_collection_amt == 0):
+            logger.warning("Collection metrics API returned a total but no Fresh/Reloan breakdown")
+        
+        logger.debug(
+            "Collection metrics: total %.2f (%d), fresh %.2f (%d), reloan %.2f (%d)",
+            total_collection_amt, total_collection_cnt, fresh_collection_amt, fresh_collection_cnt,
+            reloan_collection_amt, reloan_collection_cnt)
+        
+        # Update collection_metrics dict with recalculated values
+        collection_metrics['total_collection_count'] = total_collection_cnt
+        collection_metrics['total_collection_amount'] = total_collection_amt
+        collection_metrics['fresh_collection_count'] = fresh_collection_cnt
+        collection_metrics['reloan_collection_count'] = reloan_collection_cnt
+        collection_metrics['fresh_collection_amount'] = fresh_collection_amt
+        collection_metrics['reloan_collection_amount'] = reloan_collection_amt
+    
+    return collection_metrics
+
+
+def _aggregate_collection_metrics(rows, date_from=None, date_to=None):
+    """Aggregate collection metrics from multiple rows into a single dict
+    Filters by date_of_received if date range is provided
+    """
+    if not rows or len(rows) == 0:
+        return {}
+    
+    # Filter rows by date_of_received if date range is provided
+    filtered_rows = []
+    if date_from and date_to:
+        date_from_date = date_from.date() if isinstance(date_from, datetime) else date_from
+        date_to_date = date_to.date() if isinstance(date_to, datetime) else date_to
+        
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            
+            # Try to find date_of_received field (various name variations)
+            date_received = None
+            date_fields = ['date_of_recived', 'date_of_received', 'dateOfReceived', 'date_of_receive', 'dateOfReceive', 
+                          'received_date', 'receivedDate', 'collection_date', 'collectionDate',
+                          'date_received', 'dateReceived']
+            
+            for field in date_fields:
+                if field in row:
+                    date_received = row[field]
+                    break
+            
+            # If not found, try case-insensitive search
+            if date_received is None:
+                row_keys_lower = {k.lower(): k for k in row.keys()}
+                for field_lower in ['date_of_recived', 'date_of_received', 'dateofreceived', 'date_of_receive', 'dateofreceive',
+                                  'received_date', 'receiveddate', 'collection_date', 'collectiondate',
+                                  'date_received', 'datereceived']:
+                    if field_lower in row_keys_lower:
+                        actual_key = row_keys_lower[field_lower]
+                        date_received = row[actual_key]
+                        break
+            
+            # Parse date if found
+            if date_received:
+                try:
+                    if isinstance(date_received, str):
+                        # Try various date formats
+                        for fmt in ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%d-%m-%Y', '%d/%m/%Y']:
+                            try:
+                                record_date = datetime.strptime(date_received.split('T')[0], fmt).date()
+                                break
+                            except:
+                                continue
+                        else:
+                            # If no format worked, skip this record
+                            logger.debug("Could not parse date_of_received: %s", date_received)
+                            continue
+                    elif isinstance(date_received, datetime):
+                        record_date = date_received.date()
+                    else:
+                        continue
+                    
+                    # Check if date is within range
+                    if date_from_date <= record_date <= date_to_date:
+                        filtered_rows.append(row)
+                except Exception as e:
+                    logger.debug("Could not parse date_of_received %r: %s", date_received, e)
+                    # Include record if date parsing fails (to be safe)
+                    filtered_rows.append(row)
+            else:
+                # If no date_of_received field found, include the record (to be safe)
+                filtered_rows.append(row)
+        
+        logger.debug("Filtered %d of %d collection records by date_of_received", len(filtered_rows), len(rows))
+    else:
+        filtered_rows = rows
+    
+    # Initialize aggregated dict with standard field names
+    aggregated = {
+        'total_collection_amount': 0,
+        'fresh_collection_amount': 0,
+        'reloan_collection_amount': 0,
+        'prepayment_amount': 0,
+        'due_date_amount': 0,
+        'overdue_amount': 0,
+        'total_collection_count': 0,
+        'fresh_collection_count': 0,
+        'reloan_collection_count': 0,
+        'prepayment_count': 0,
+        'due_date_count': 0,
+        'overdue_count': 0
+    }
+    
+    # First, check if rows contain individual records with is_reloan_case field
+    # If so, aggregate by is_reloan_case instead of looking for separate fresh/reloan fields
+    has_is_reloan_case = False
+    for row in filtered_rows:
+        if isinstance(row, dict):
+            # Check for is_reloan_case in various forms
+            if ('is_reloan_case' in row or 
+                'isReloanCase' in row or 
+                'is_reloan' in row or
+                'isReloan' in row):
+                has_is_reloan_case = True
+                break
+    
+    if has_is_reloan_case:
+        # Aggregate collection amounts by is_reloan_case
+        for row in filtered_rows:
+            if not isinstance(row, dict):
+                continue
+            
+            # Get is_reloan_case value (try multiple field name variations)
+            is_reloan = (row.get('is_reloan_case') or 
+                        row.get('isReloanCase') or
+                        row.get('is_reloan') or
+                        row.get('isReloan'))
+            
+            # Handle None, False, or empty string
+            if is_reloan is None:
+                is_reloan = False
+            elif isinstance(is_reloan, str):
+                is_reloan = is_reloan.lower() in ['true', '1', 'yes']
+            elif isinstance(is_reloan, (int, float)):
+                is_reloan = bool(is_reloan)
+            else:
+                is_reloan = bool(is_reloan)
+            
+            
+            # Try to find collection amount field - ONLY use total_collection_amount (user specified requirement)
+            collection_amount = 0
+            
+            # ONLY look for total_collection_amount - do not use repayment_amount or any other field
+            row_keys_lower = {k.lower(): k for k in row.keys()}
+            
+            # Try exact match first
+            if 'total_collection_amount' in row:
+                try:
+                    val = float(row['total_collection_amount'] or 0)
+                    collection_amount = val
+                except (ValueError, TypeError) as e:
+                    logger.debug("Could not parse total_collection_amount: %s", e)
+            
+            # If not found, try case-insensitive search
+            if collection_amount == 0 and 'total_collection_amount' in row_keys_lower:
+                actual_key = row_keys_lower['total_collection_amount']
+                try:
+                    val = float(row[actual_key] or 0)
+                    collection_amount = val
+                except (ValueError, TypeError) as e:
+                    logger.debug("Could not parse total_collection_amount from %r: %s", actual_key, e)
+            
+            # If still not found, log all available fields for debugging
+            
+            # Only categorize if we found total_collection_amount (skip records where it's 0 or missing)
+            if collection_amount > 0:
+                # Categorize by is_reloan_case
+                if is_reloan:
+                    aggregated['reloan_collection_amount'] += collection_amount
+                    aggregated['reloan_collection_count'] += 1
+                else:
+                    aggregated['fresh_collection_amount'] += collection_amount
+                    aggregated['fresh_collection_count'] += 1
+                
+                aggregated['total_collection_amount'] += collection_amount
+                aggregated['total_collection_count'] += 1
+        
+        
+        # Recalculate total_collection_count as sum of Fresh + Reloan (not from counting all records)
+        aggregated['total_collection_count'] = aggregated['fresh_collection_count'] + aggregated['reloan_collection_count']
+        aggregated['total_collection_amount'] = aggregated['fresh_collection_amount'] + aggregated['reloan_collection_amount']
+        
+        # Continue with other field mappings for prepayment, overdue, etc.
+        # But skip fresh/reloan field matching since we already calculated them
+        skip_fresh_reloan_fields = True
+    else:
+        skip_fresh_reloan_fields = False
+    
+    # Field name mappings - map various API field names to our standard names
+    # IMPORTANT: For total_collection_amount, fresh_collection_amount, and reloan_collection_amount,
+    # ONLY use total_collection_amount field (user requirement - do not use repayment_amount or collection_amount)
+    field_mappings = {
+        # Amount fields - ONLY use total_collection_amount variations, NO repayment_amount or collection_amount
+        'total_collection_amount': ['total_collection_amount', 'Total_Collection_Amount', 'TOTAL_COLLECTION_AMOUNT', 'totalCollectionAmount', 'TotalCollectionAmount'],
+        'fresh_collection_amount': ['fresh_collection_amount', 'freshCollectionAmount', 'fresh_amount', 'fresh', 'freshCollection', 'fresh_collection', 'freshCollectionAmt', 'fresh_collection_amt', 'freshAmt', 'fresh_amt'],
+        'reloan_collection_amount': ['reloan_collection_amount', 'reloanCollectionAmount', 'reloan_amount', 'reloan', 'reloanCollection', 'reloan_collection', 'reloanCollectionAmt', 'reloan_collection_amt', 'reloanAmt', 'reloan_amt'],
+        'prepayment_amount': ['prepayment_amount', 'prepaymentAmount', 'prepayment', 'prepaymentAmt', 'prepayment_amt'],
+        'due_date_amount': ['due_date_amount', 'dueDateAmount', 'on_time_collection', 'onTimeCollection', 'on_time_amount', 'onTimeAmount', 'ontime_amount', 'ontimeAmount', 'onTime_amount', 'on_time_collection_amount', 'onTimeCollectionAmount', 'due_date_collection', 'dueDateCollection', 'on_time_amount_collection', 'onTimeAmountCollection'],
+        'overdue_amount': ['overdue_amount', 'overdueAmount', 'overdue_collection', 'overdueCollection', 'overdue_collection_amount', 'overdueCollectionAmount'],
+        # Count fields
+        'total_collection_count': ['total_collection_count', 'totalCollectionCount', 'total_count', 'totalCount', 'total', 'totalCollectionCnt', 'total_collection_cnt'],
+        'fresh_collection_count': ['fresh_collection_count', 'freshCollectionCount', 'fresh_count', 'freshCount', 'fresh', 'freshCollection', 'fresh_collection', 'freshCollectionCnt', 'fresh_collection_cnt', 'freshCnt', 'fresh_cnt'],
+        'reloan_collection_count': ['reloan_collection_count', 'reloanCollectionCount', 'reloan_count', 'reloanCount', 'reloan', 'reloanCollection', 'reloan_collection', 'reloanCollectionCnt', 'reloan_collection_cnt', 'reloanCnt', 'reloan_cnt'],
+        'prepayment_count': ['prepayment_count', 'prepaymentCount', 'prepayment', 'prepaymentCnt', 'prepayment_cnt'],
+        'due_date_count': ['due_date_count', 'dueDateCount', 'on_time_count', 'onTimeCount', 'onTime', 'ontime', 'ontime_count', 'onTime_count', 'on_time_collection_count', 'onTimeCollectionCount', 'due_date_collection_count', 'dueDateCollectionCount'],
+        'overdue_count': ['overdue_count', 'overdueCount', 'overdue', 'overdueCnt', 'overdue_cnt']
+    }
+    
+    for row in filtered_rows:
+        if not isinstance(row, dict):
+            continue
+        
+        # Create case-insensitive lookup
+        row_keys_lower = {k.lower(): k for k in row.keys()}
+        
+        # For each standard field, try to find it in the row using all possible variations
+        # Process overdue fields FIRST to avoid conflicts with on_time fields
+        field_order = ['overdue_amount', 'overdue_count', 'due_date_amount', 'due_date_count', 
+                      'total_collection_amount', 'fresh_collection_amount', 'reloan_collection_amount', 
+                      'prepayment_amount', 'total_collection_count', 'fresh_collection_count', 
+                      'reloan_collection_count', 'prepayment_count']
+        
+        # Process fields in specific order
+        for standard_field in field_order:
+            # Skip fresh/reloan fields if we already calculated them from is_reloan_case
+            if skip_fresh_reloan_fields and ('fresh' in standard_field or 'reloan' in standard_field):
+                continue
+                
+            if standard_field not in field_mappings:
+                continue
+            variations = field_mappings[standard_field]
+            found = False
+            for variation in variations:
+                # For total_collection_amount, fresh_collection_amount, and reloan_collection_amount,
+                # ONLY accept exact matches - do not use repayment_amount or collection_amount
+                if standard_field in ['total_collection_amount', 'fresh_collection_amount', 'reloan_collection_amount']:
+                    # Skip any variation that contains 'repayment' or is not 'total_collection_amount' for total
+                    if standard_field == 'total_collection_amount':
+                        # ONLY accept total_collection_amount variations, reject repayment_amount, collection_amount, etc.
+                        if 'repayment' in variation.lower() or ('collection_amount' in variation.lower() and 'total' not in variation.lower()):
+                            continue
+                    # For fresh/reloan, we still use the variations but skip if it contains repayment
+                    elif 'repayment' in variation.lower():
+                        continue
+                
+                # Try exact match first
+                if variation in row:
+                    value = row[variation]
+                    if value is not None and value != '':
+                        try:
+                            if 'count' in standard_field:
+                                aggregated[standard_field] += int(float(value))
+                            else:
+                                aggregated[standard_field] += float(value)
+                            found = True
+                            break  # Found it, move to next field
+                        except (ValueError, TypeError):
+                            pass
+                # Try case-insensitive match
+                elif variation.lower() in row_keys_lower:
+                    actual_key = row_keys_lower[variation.lower()]
+                    # For total_collection_amount, reject if actual_key contains 'repayment' or is not total_collection_amount
+                    if standard_field == 'total_collection_amount':
+                        if 'repayment' in actual_key.lower() or ('collection_amount' in actual_key.lower() and 'total' not in actual_key.lower()):
+                            continue
+                    # For fresh/reloan, reject if contains repayment
+                    elif standard_field in ['fresh_collection_amount', 'reloan_collection_amount']:
+                        if 'repayment' in actual_key.lower():
+                            continue
+                    
+                    value = row[actual_key]
+                    # For overdue fields, make sure the key doesn't contain on_time/due_date
+                    if 'overdue' in standard_field:
+                        if 'on_time' in actual_key.lower() or 'ontime' in actual_key.lower() or 'due_date' in actual_key.lower() or 'duedate' in actual_key.lower():
+                            continue  # Skip this match, it's not an overdue field
+                    # For due_date fields, make sure the key doesn't contain overdue
+                    elif 'due_date' in standard_field:
+                        if 'overdue' in actual_key.lower():
+                            continue  # Skip this match, it's not an on_time field
+                    
+                    if value is not None and value != '':
+                        try:
+                            if 'count' in standard_field:
+                                aggregated[standard_field] += int(float(value))
+                            else:
+                                aggregated[standard_field] += float(value)
+                            found = True
+                            break  # Found it, move to next field
+                        except (ValueError, TypeError):
+                            pass
+            
+            # If not found with variations, try partial matching for "on_time" or "ontime" in any key
+            # BUT ONLY for due_date fields, and make sure we exclude overdue fields
+            if not found and 'due_date' in standard_field:
+                for key, value in row.items():
+                    key_lower = key.lower()
+                    # Check if key contains "on_time", "ontime", "due_date", or "duedate"
+                    # BUT EXCLUDE any keys that contain "overdue" to avoid mixing them up
+                    if (('on_time' in key_lower or 'ontime' in key_lower or 'due_date' in key_lower or 'duedate' in key_lower) 
+                        and 'overdue' not in key_lower and value is not None and value != ''):
+                        try:
+                            if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower):
+                                aggregated[standard_field] += int(float(value))
+                                found = True
+                                break
+                            elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
+                                aggregated[standard_field] += float(value)
+                                found = True
+                                break
+                        except (ValueError, TypeError):
+                            pass
+            
+            # Also add partial matching for overdue fields, but exclude on_time/due_date fields
+            if not found and 'overdue' in standard_field:
+                for key, value in row.items():
+                    key_lower = key.lower()
+                    # Check if key contains "overdue" but EXCLUDE any keys that contain "on_time", "ontime", "due_date", or "duedate"
+                    if ('overdue' in key_lower 
+                        and 'on_time' not in key_lower and 'ontime' not in key_lower 
+                        and 'due_date' not in key_lower and 'duedate' not in key_lower
+                        and value is not None and value != ''):
+                        try:
+                            if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower):
+                                aggregated[standard_field] += int(float(value))
+                                found = True
+                                break
+                            elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
+                                aggregated[standard_field] += float(value)
+                                found = True
+                                break
+                        except (ValueError, TypeError):
+                            pass
+            
+            # Add partial matching for fresh fields - check any field containing "fresh"
+            if not found and 'fresh' in standard_field:
+                for key, value in row.items():
+                    key_lower = key.lower()
+                    # Check if key contains "fresh" (but not "refresh" or other words containing "fresh")
+                    if ('fresh' in key_lower 
+                        and 'refresh' not in key_lower
+                        and value is not None and value != ''):
+                        try:
+                            if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
+                                aggregated[standard_field] += int(float(value))
+                                found = True
+                                break
+                            elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
+                                aggregated[standard_field] += float(value)
+                                found = True
+                                break
+                        except (ValueError, TypeError):
+                            pass
+            
+            # Add partial matching for reloan fields - check any field containing "reloan"
+            if not found and 'reloan' in standard_field:
+                for key, value in row.items():
+                    key_lower = key.lower()
+                    # Check if key contains "reloan"
+                    if ('reloan' in key_lower 
+                        and value is not None and value != ''):
+                        try:
+                            if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
+                                aggregated[standard_field] += int(float(value))
+                                found = True
+                                break
+                            elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
+                                aggregated[standard_field] += float(value)
+                                found = True
+                                break
+                        except (ValueError, TypeError):
+                            pass
+            
+            # Add partial matching for prepayment fields - check any field containing "prepayment"
+            if not found and 'prepayment' in standard_field:
+                for key, value in row.items():
+                    key_lower = key.lower()
+                    # Check if key contains "prepayment"
+                    if ('prepayment' in key_lower 
+                        and value is not None and value != ''):
+                        try:
+                            if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
+                                aggregated[standard_field] += int(float(value))
+                                found = True
+                                break
+                            elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
+                                aggregated[standard_field] += float(value)
+                                found = True
+                                break
+                        except (ValueError, TypeError):
+                            pass
+    
+    # At the end, recalculate total_collection_count as sum of Fresh + Reloan
+    # This ensures it's always correct regardless of how it was calculated
+    if aggregated['fresh_collection_count'] > 0 or aggregated['reloan_collection_count'] > 0:
+        aggregated['total_collection_count'] = aggregated['fresh_collection_count'] + aggregated['reloan_collection_count']
+        aggregated['total_collection_amount'] = aggregated['fresh_collection_amount'] + aggregated['reloan_collection_amount']
+    
+    return aggregated
@@ -0,0 +1,65 @@
+"""
+Vectorized group-by over dictionary-encoded categorical columns (NumPy).
+
+- encode() turns a column of labels into (categories, codes), categories in first-seen order
+- compact() renumbers a column of global codes (e.g. categories.py vocabulary codes) to the
+  groups present, in first-seen order
+- group_sums() / group_counts() aggregate per group with np.bincount (one C pass per column,
+  in row order, so float sums equal the equivalent Python loop exactly)
+- top_k() selects the k largest groups with np.argpartition and only orders those; ties keep
+  first-seen order, as a stable sort of the groups would
+"""
+import numpy as np
+
+
+def encode(values):
+    """(categories, codes) for a column; falsy values (None, '') get code -1 and no category."""
+    seen = list(dict.fromkeys(values))
+    index = {value: code for code, value in enumerate(seen)}
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.intp, count=len(values))
+    if all(seen):
+        return seen, codes
+    keep = [code for code, value in enumerate(seen) if value]
+    remap = np.full(len(seen), -1, dtype=np.intp)
+    remap[keep] = np.arange(len(keep))
+    return [seen[code] for code in keep], remap[codes]
+
+
+def compact(codes):
+    """(present codes in first-seen order, codes renumbered 0..n-1); -1 stays -1."""
+    codes = np.asarray(codes, dtype=np.intp)
+    valid = codes >= 0
+    present, first, inverse = np.unique(codes[valid], return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty(len(present), dtype=np.intp)
+    rank[order] = np.arange(len(present))
+    local = np.full(len(codes), -1, dtype=np.intp)
+    local[valid] = rank[inverse.reshape(-1)]
+    return present[order], local
+
+
+def group_counts(codes, size, where=None):
+    """Rows per group (optionally only rows where the boolean mask is set)."""
+    mask = codes >= 0 if where is None else (codes >= 0) & where
+    return np.bincount(codes[mask], minlength=size)
+
+
+def group_sums(codes, size, column):
+    """Sum of a numeric column per group."""
+    mask = codes >= 0
+    sums = np.bincount(codes[mask], weights=np.asarray(column, dtype=np.float64)[mask], minlength=size)
+    return sums.astype(np.float64, copy=False)  # bincount of no codes is int
+
+
+def top_k(values, k):
+    """Indices of the k largest values, largest first; equal values keep index order."""
+    values = np.asarray(values)
+    if k <= 0 or not len(values):
+        return np.empty(0, dtype=np.intp)
+    if len(values) > k:
+        kth = values[np.argpartition(-values, k - 1)[k - 1]]
+        candidates = np.flatnonzero(values >= kth)
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order][:k]
@@ -0,0 +1,93 @@
+"""
+Benchmark distinct-loan counting on synthetic loan numbers.
+
+    python manage.py benchmark_distinct                  # 365 days x 1,000 rows
+    python manage.py benchmark_distinct --days 365 --rows-per-day 3000 --alphanumeric
+
+Compares the per-day Python sets of normalized strings Collection Summary used before
+(reference) with distinct.py's sorted int64 DistinctSets and a HyperLogLog: memory held once
+the per-day counts are built, time to build them and merge the days into a range count, and
+the counts themselves.
+"""
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard_app import distinct
+
+
+def synthetic_rows(days, rows_per_day, alphanumeric, seed):
+    """(day, loan_no) pairs; loans recur on several days, as repayments of one loan do."""
+    rng = random.Random(seed)
+    loans = days * rows_per_day // 3
+    day_col, loan_col = [], []
+    for day in range(days):
+        for _ in range(rows_per_day):
+            n = rng.randrange(loans) + 100000
+            day_col.append(day)
+            loan_col.append(f'BLK{n}' if alphanumeric else str(n))
+    return day_col, loan_col
+
+
+def reference(day_col, loan_col, days):
+    daily = defaultdict(set)
+    for day, loan_no in zip(day_col, loan_col):
+        daily[day].add(str(loan_no).strip())
+    counts = [len(daily.get(day, ())) for day in range(days)]
+    return daily, counts, len(set().union(*daily.values()))
+
+
+def compact(day_col, loan_col, days):
+    daily = distinct.DistinctSet.by_day(np.array(day_col, dtype=np.intp), distinct.loan_ids(loan_col), days)
+    merged = distinct.DistinctSet.merge(daily)
+    return daily, [len(day_loans) for day_loans in daily], len(merged)
+
+
+def hyperloglog(day_col, loan_col, days):
+    ids = distinct.loan_ids(loan_col)
+    day_codes = np.array(day_col, dtype=np.intp)
+    daily = [distinct.HyperLogLog(ids[day_codes == day]) for day in range(days)]
+    merged = daily[0]
+    for day_loans in daily[1:]:
+        merged = merged.union(day_loans)
+    return daily, [len(day_loans) for day_loans in daily], len(merged)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sorted int64 / HyperLogLog distinct-loan counting against Python sets of strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--rows-per-day', type=int, default=1000)
+        parser.add_argument('--alphanumeric', action='store_true', help='Non-numeric loan numbers (hashed ids)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        days = options['days']
+        day_col, loan_col = synthetic_rows(days, options['rows_per_day'], options['alphanumeric'], options['seed'])
+        self.stdout.write(f'{len(loan_col):,} rows over {days} days')
+        expected = None
+        for name, func in (('python sets', reference), ('int64 sorted', compact), ('hyperloglog', hyperloglog)):
+            started = time.perf_counter()
+            daily, counts, total = func(day_col, loan_col, days)
+            elapsed = time.perf_counter() - started
+            del daily
+            # Separate run for memory: tracemalloc slows allocations down
+            tracemalloc.start()
+            daily, _, _ = func(day_col, loan_col, days)
+            held, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del daily
+            if expected is None:
+                expected = (counts, total)
+                accuracy = ''
+            elif counts == expected[0] and total == expected[1]:
+                accuracy = 'exact'
+            else:
+                errors = [abs(c - e) / e for c, e in zip(counts, expected[0]) if e]
+                accuracy = f'max daily error {max(errors, default=0):.2%}, range {total:,} vs {expected[1]:,}'
+            self.stdout.write(f'{name:<14}{elapsed * 1000:9.1f} ms {held / 1024 / 1024:9.2f} MiB held   {total:,} loans  {accuracy}')
@@ -0,0 +1,111 @@
+"""
+Benchmark the state/city/source breakdowns of the disbursal engine on synthetic records.
+
+    python manage.py benchmark_groupby                 # 100k rows
+    python manage.py benchmark_groupby --rows 500000 --repeat 3
+
+Compares the per-record dict loop the engine used before (reference) with the vectorized
+group-by (groupby.py) over all three dimensions, checks both give the same top-20 series,
+and prints the timings.
+"""
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard_app import groupby
+from dashboard_app.disbursal import TOP_N, Breakdown
+
+
+def synthetic_columns(rows, seed):
+    """Label and amount columns shaped like the disbursal API (skewed states, many cities)."""
+    rng = random.Random(seed)
+    states = [f'State {i}' for i in range(36)]
+    cities = [f'City {i}' for i in range(1500)]
+    sources = [f'Source {i}' for i in range(40)] + ['']
+    state_weights = [1 / (i + 1) for i in range(len(states))]
+    return {
+        'state': rng.choices(states, weights=state_weights, k=rows),
+        'city': rng.choices(cities, k=rows),
+        'source': rng.choices(sources, k=rows),
+        'sanction': [float(rng.randrange(5000, 100000, 500)) for _ in range(rows)],
+        'disbursal': [float(rng.randrange(4000, 90000, 250)) for _ in range(rows)],
+        'is_reloan': [rng.random() < 0.45 for _ in range(rows)],
+    }
+
+
+DIMENSIONS = ('state', 'city', 'source')
+
+
+def reference_breakdowns(columns):
+    """The pre-vectorization implementation: a dict of dicts updated per record, then a full sort."""
+    results = {}
+    for dimension in DIMENSIONS:
+        groups = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'count': 0, 'fresh_count': 0, 'reloan_count': 0})
+        for label, disbursal_amt, loan_amt, reloan in zip(
+                columns[dimension], columns['disbursal'], columns['sanction'], columns['is_reloan']):
+            if label:
+                group = groups[label]
+                group['disbursal'] += disbursal_amt
+                group['sanction'] += loan_amt
+                group['count'] += 1
+                group['reloan_count' if reloan else 'fresh_count'] += 1
+        ranked = sorted(groups.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:TOP_N]
+        results[dimension] = {
+            'labels': [label for label, _ in ranked],
+            'disbursal': [g['disbursal'] for _, g in ranked],
+            'sanction': [g['sanction'] for _, g in ranked],
+            'counts': [g['count'] for _, g in ranked],
+            'fresh_counts': [g['fresh_count'] for _, g in ranked],
+            'reloan_counts': [g['reloan_count'] for _, g in ranked],
+        }
+    return results
+
+
+def vectorized_breakdowns(columns):
+    """What disbursal.compute() does: numeric columns converted once, one encode per dimension."""
+    disbursal = np.array(columns['disbursal'], dtype=np.float64)
+    sanction = np.array(columns['sanction'], dtype=np.float64)
+    is_reloan = np.array(columns['is_reloan'], dtype=bool)
+    count = np.ones(len(is_reloan))
+    results = {}
+    for dimension in DIMENSIONS:
+        b = Breakdown.top(*groupby.encode(columns[dimension]), disbursal, sanction, count, is_reloan)
+        results[dimension] = {
+            'labels': b.labels, 'disbursal': b.disbursal, 'sanction': b.sanction,
+            'counts': b.counts, 'fresh_counts': b.fresh_counts, 'reloan_counts': b.reloan_counts,
+        }
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized state/city/source group-by against the per-record dict loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per implementation (best is reported)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        columns = synthetic_columns(options['rows'], options['seed'])
+        reference_seconds, expected = self._best(reference_breakdowns, columns, options['repeat'])
+        vectorized_seconds, actual = self._best(vectorized_breakdowns, columns, options['repeat'])
+        self.stdout.write(f"{options['rows']:,} rows, state + city + source, best of {options['repeat']}")
+        self.stdout.write(f'reference   {reference_seconds * 1000:8.1f} ms')
+        self.stdout.write(f'vectorized  {vectorized_seconds * 1000:8.1f} ms   x{reference_seconds / vectorized_seconds:.1f}')
+        for dimension in DIMENSIONS:
+            if actual[dimension] == expected[dimension]:
+                self.stdout.write(self.style.SUCCESS(f'{dimension}: same top-{TOP_N} result'))
+            else:
+                self.stdout.write(self.style.ERROR(f'{dimension}: RESULTS DIFFER'))
+
+    def _best(self, func, columns, repeat):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            result = func(columns)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
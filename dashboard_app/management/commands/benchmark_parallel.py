@@ -0,0 +1,72 @@
+"""
+Benchmark Collection Summary row parsing in-process and over process pools.
+
+    python manage.py benchmark_parallel                      # 400,000 rows, 1/2/4/8 workers
+    python manage.py benchmark_parallel --rows 1000000 --workers 2 4 --chunk-rows 50000
+
+Times columnar.extract() on synthetic collection rows, then parallel.extract_parallel() with
+each worker count (pool start-up excluded: one warm-up run per pool), and checks every
+parallel matrix is identical to the in-process one. Speed-up is bounded by the cores of the
+machine and by pickling the rows to the workers.
+"""
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard_app import columnar, metrics, parallel
+
+
+def synthetic_rows(count, days, seed):
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'loan_no': str(100000 + rng.randrange(count // 3 or 1)),
+            'date_of_received': (start + timedelta(days=rng.randrange(days))).isoformat(),
+            'loan_amount': rng.choice((5000, 10000, 15000, '20,000')),
+            'net_disbursal': rng.randrange(4000, 14000),
+            'repayment_amount': f'₹{rng.randrange(5000, 20000):,}',
+            'received_amount': rng.choice((0, 2500.5, '5000', None)),
+            'pending_collection': rng.choice((0, 1200, 3400.25)),
+            'dpd_bucket': rng.choice(('0-30', '31-60', '61-90', '90+', '')),
+            'is_reloan_case': rng.random() < 0.4,
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark in-process vs process-pool column extraction of Collection Summary rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=400_000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--chunk-rows', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        days = options['days']
+        rows = synthetic_rows(options['rows'], days, options['seed'])
+        date_from = date(2025, 1, 1)
+        context = columnar.DayContext(date_from, date_from + timedelta(days=days - 1), 'date_of_received', (), ())
+        columns = metrics.compile_plan(metrics.COLLECTION_SUMMARY_KPIS, columnar.COLLECTION_COLUMNS).columns
+        self.stdout.write(f'{len(rows):,} rows x {len(columns)} columns, {os.cpu_count()} CPUs')
+
+        started = time.perf_counter()
+        expected = columnar.extract(rows, columns, context)
+        serial = time.perf_counter() - started
+        self.stdout.write(f'{"in-process":<12}{serial * 1000:9.1f} ms')
+
+        for workers in options['workers']:
+            parallel.extract_parallel(rows[:workers], columns, context, workers=workers)  # start the pool
+            started = time.perf_counter()
+            matrix = parallel.extract_parallel(rows, columns, context, workers=workers, chunk_rows=options['chunk_rows'])
+            elapsed = time.perf_counter() - started
+            same = 'identical' if np.array_equal(matrix, expected) else 'MISMATCH'
+            self.stdout.write(f'{f"{workers} workers":<12}{elapsed * 1000:9.1f} ms  x{serial / elapsed:4.2f}  {same}')
+        parallel.shutdown_pools()
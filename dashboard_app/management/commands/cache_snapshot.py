@@ -0,0 +1,31 @@
+"""
+Save or load the dashboard cache snapshot by hand (the cache also does both on its own).
+
+    python manage.py cache_snapshot --save [--path FILE]
+    python manage.py cache_snapshot --load [--path FILE]
+"""
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Save the hot dashboard cache entries to the snapshot file, or load them from it'
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group(required=True)
+        action.add_argument('--save', action='store_true')
+        action.add_argument('--load', action='store_true')
+        parser.add_argument('--path', help='Snapshot file (default: SNAPSHOT_PATH)')
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'snapshot'):
+            raise CommandError('The default cache backend does not support snapshots')
+        path = options['path'] or cache.snapshot_path
+        if not path:
+            raise CommandError('No snapshot path: pass --path or set SNAPSHOT_PATH')
+        if options['save']:
+            count = cache.snapshot(path)
+            self.stdout.write(self.style.SUCCESS(f'Saved {count} entries to {path}'))
+        else:
+            count = cache.restore(path)
+            self.stdout.write(self.style.SUCCESS(f'Loaded {count} entries from {path}'))
@@ -0,0 +1,45 @@
+"""
+Precompute page caches for the standard date presets, for the auth scopes of the live
+sessions (see dashboard_app/warming.py).
+
+    python manage.py warm_caches                  # one pass over DASHBOARD_WARMER['PAGES']
+    python manage.py warm_caches --loop           # every INTERVAL_SECONDS (run as its own process)
+    python manage.py warm_caches --page collection_summary --preset month_to_date
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard_app import warming
+
+
+class Command(BaseCommand):
+    help = 'Warm the dashboard page caches for Today / Yesterday / MTD / Last month / Collection default'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', action='append', dest='pages', help='Only this page (repeatable)')
+        parser.add_argument('--preset', action='append', dest='presets', help='Only this preset (repeatable)')
+        parser.add_argument('--concurrency', type=int, help='Pages warmed in parallel (default: CONCURRENCY)')
+        parser.add_argument('--loop', action='store_true', help='Keep warming every --interval seconds')
+        parser.add_argument('--interval', type=int, help='Seconds between passes (default: INTERVAL_SECONDS)')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or warming.warmer_setting('INTERVAL_SECONDS')
+        while True:
+            started = time.monotonic()
+            report = warming.warm(options['pages'], options['presets'], options['concurrency'])
+            self._print_report(report, time.monotonic() - started)
+            if not options['loop']:
+                return
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+
+    def _print_report(self, report, total_seconds):
+        for row in report:
+            line = (f"{row['page']:<20} {row['preset']:<20} {row['scope']:<22} "
+                    f"{row['date_from']} -> {row['date_to']}  {row['seconds']:6.1f}s")
+            if row['ok']:
+                self.stdout.write(self.style.SUCCESS(f'{line}  ok'))
+            else:
+                self.stdout.write(self.style.ERROR(f"{line}  FAILED: {row['error']}"))
+        warmed = sum(1 for row in report if row['ok'])
+        self.stdout.write(f'Warmed {warmed}/{len(report)} entries in {total_seconds:.1f}s')
@@ -0,0 +1,174 @@
+"""
+Declarative KPI metrics, compiled into one extraction pass plus NumPy reductions.
+
+A Metric names its source field aliases (read like columnar's alias chains), its aggregation
+(sum / count / distinct / mean / max) and its split dimensions; a Ratio derives a percentage
+from two metrics. compile_plan() turns the metrics a page asks for into a Plan: the union of
+the columns they read (parsed once per row by columnar / parallel.extract, together with any
+page-specific columns) and the reductions to run on them. A new KPI card is one more entry
+in REGISTRY, not another loop over the rows.
+
+Results are flat: 'principal_amount', and per split label 'fresh_principal_amount',
+'reloan_principal_amount', as the KPI cards name them.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import columnar, distinct, parallel
+
+
+AGGREGATIONS = ('sum', 'count', 'distinct', 'mean', 'max')
+
+# Split dimension -> (column spec, label of each column value 0, 1, ...)
+SPLITS = {
+    'loan_type': (('is_reloan', 'reloan', ()), ('fresh', 'reloan')),
+}
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    aliases: tuple = ()  # source fields; none for count, or for a column the caller supplies
+    agg: str = 'sum'
+    splits: tuple = ()
+    kind: str = 'first'  # columnar column kind of the aliases
+
+    @property
+    def column(self):
+        return (self.name, self.kind, self.aliases) if self.aliases else None
+
+
+@dataclass(frozen=True)
+class Ratio:
+    """numerator / denominator * scale (0.0 when the denominator is not positive)."""
+    name: str
+    numerator: str
+    denominator: str
+    scale: float = 100.0
+    splits: tuple = ()
+
+
+def _define(*metrics):
+    return {m.name: m for m in metrics}
+
+
+REGISTRY = _define(
+    Metric('total_applications', agg='count', splits=('loan_type',)),
+    Metric('distinct_loans', agg='distinct', splits=('loan_type',)),  # column: int64 loan ids (distinct.loan_ids)
+    Metric('principal_amount', ('loan_amount', 'principal_amount'), splits=('loan_type',)),
+    Metric('net_disbursal', ('net_disbursal', 'net_disbursed', 'netDisbursal', 'netDisbursed'), splits=('loan_type',)),
+    Metric('repayment_amount', ('actual_repayment', 'repayment_amount', 'repaymentAmount', 'actualRepayment'), splits=('loan_type',)),
+    Metric('collected_amount', ('received_amount', 'receivedAmount', 'collected_amount', 'collectedAmount'), splits=('loan_type',)),
+    Metric('pending_collection', ('pending_collection', 'pendingCollection', 'pending_collection_amount'), splits=('loan_type',)),
+    Metric('pending_principal', ('pending_principal', 'pendingPrincipal', 'principal_outstanding', 'principalOutstanding'), splits=('loan_type',)),
+    Ratio('collection_percentage', 'collected_amount', 'repayment_amount', splits=('loan_type',)),
+    Ratio('pending_collection_percentage', 'pending_collection', 'repayment_amount', splits=('loan_type',)),
+    Ratio('pending_principal_percentage', 'pending_principal', 'principal_amount', splits=('loan_type',)),
+)
+
+# Metrics of the Collection Summary KPI cards
+COLLECTION_SUMMARY_KPIS = (
+    'total_applications', 'distinct_loans',
+    'principal_amount', 'net_disbursal', 'repayment_amount', 'collected_amount',
+    'pending_collection', 'pending_principal',
+    'collection_percentage', 'pending_collection_percentage', 'pending_principal_percentage',
+)
+
+
+class Plan:
+    """Compiled metrics: the columns to extract and the reductions to run on them."""
+
+    def __init__(self, metrics, columns, sources):
+        self.metrics = metrics  # dependencies first
+        self.columns = columns
+        self.sources = sources  # metric name -> the column it reads, when shared with another metric
+
+    def extract(self, rows, context=None):
+        """The one parsing pass over the rows (in a process pool when parallel.py is enabled)."""
+        return parallel.extract(rows, self.columns, context)
+
+    def evaluate(self, columns, mask=None, extra=None):
+        """
+        Flat dict of every metric (and split) over the rows selected by mask. extra maps
+        column names to arrays aligned with the rows, for columns not parsed from the rows
+        (e.g. int64 loan ids for distinct counts).
+        """
+        extra = extra or {}
+        mask = np.ones(len(columns), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+
+        def column(name):
+            name = self.sources.get(name, name)
+            return extra[name] if name in extra else columns[name]
+
+        groups = {(): ('', mask)}
+        for dim in {dim for m in self.metrics for dim in m.splits}:
+            (split_column, _, _), labels = SPLITS[dim]
+            codes = np.asarray(column(split_column)).astype(np.intp)
+            for code, label in enumerate(labels):
+                groups[(dim, code)] = (f'{label}_', mask & (codes == code))
+
+        values = {}
+        for m in self.metrics:
+            keys = [()] + [(dim, code) for dim in m.splits for code in range(len(SPLITS[dim][1]))]
+            for key in keys:
+                prefix, rows = groups[key]
+                name = prefix + m.name
+                if isinstance(m, Ratio):
+                    denominator = values[prefix + m.denominator]
+                    values[name] = (values[prefix + m.numerator] / denominator) * m.scale if denominator > 0 else 0.0
+                else:
+                    values[name] = _aggregate(m.agg, None if m.agg == 'count' else column(m.name), rows)
+        return values
+
+
+def _aggregate(agg, values, rows):
+    if agg == 'count':
+        return int(np.count_nonzero(rows))
+    selected = np.asarray(values)[rows]
+    if agg == 'sum':
+        return columnar.ordered_sum(selected)
+    if agg == 'distinct':
+        return len(distinct.counter(selected))
+    if agg == 'mean':
+        return columnar.ordered_sum(selected) / len(selected) if len(selected) else 0.0
+    if agg == 'max':
+        return float(selected.max()) if len(selected) else 0.0
+    raise ValueError(f'Unknown aggregation: {agg}')
+
+
+def compile_plan(names, extra_columns=()):
+    """Plan for the named metrics (Ratio inputs included), extracting extra_columns in the same pass."""
+    metrics = []
+
+    def add(name):
+        m = REGISTRY[name]
+        if isinstance(m, Ratio):
+            add(m.numerator)
+            add(m.denominator)
+        elif m.agg not in AGGREGATIONS:
+            raise ValueError(f'Unknown aggregation for {name}: {m.agg}')
+        if m not in metrics:
+            metrics.append(m)
+
+    for name in names:
+        add(name)
+
+    columns = {}
+    by_fields = {}  # (kind, aliases) -> column name: metrics reading the same fields share a column
+    sources = {}
+    specs = [m.column for m in metrics if isinstance(m, Metric) and m.column]
+    specs += [SPLITS[dim][0] for m in metrics for dim in m.splits]
+    for spec in list(specs) + list(extra_columns):
+        name, kind, aliases = spec
+        if name in columns:
+            if columns[name] != spec:
+                raise ValueError(f'Column {name} is declared twice with different fields')
+            continue
+        shared = by_fields.get((kind, aliases)) if aliases else None
+        if shared is not None:
+            sources[name] = shared
+            continue
+        columns[name] = spec
+        by_fields[(kind, aliases)] = name
+    return Plan(metrics, tuple(columns.values()), sources)
@@ -0,0 +1,116 @@
+"""
+Opt-in process-pool column extraction for very large ranges.
+
+Parsing the upstream rows (columnar.extract) is pure Python, so threads do not help with it.
+extract() runs it in-process unless DASHBOARD_PARALLEL['ENABLED'] is set and there are at
+least MIN_ROWS rows; then the rows are cut into CHUNK_ROWS chunks, WORKERS processes parse
+the chunks, and each worker writes its slice of one float64 matrix in shared memory
+(multiprocessing.shared_memory). Only the rows travel to the workers; the columns are never
+pickled back. Any pool failure falls back to the in-process path.
+
+The pool is created on first use and kept for the life of the process.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from . import columnar
+
+
+PARALLEL_DEFAULTS = {
+    'ENABLED': False,
+    'MIN_ROWS': 200_000,
+    'WORKERS': min(4, os.cpu_count() or 1),
+    'CHUNK_ROWS': 25_000,
+    'START_METHOD': 'spawn',  # the web server is threaded: do not fork it
+}
+
+
+def parallel_setting(name):
+    return getattr(settings, 'DASHBOARD_PARALLEL', {}).get(name, PARALLEL_DEFAULTS[name])
+
+
+_pools = {}
+_pools_guard = threading.Lock()
+
+
+def _pool(workers):
+    with _pools_guard:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(parallel_setting('START_METHOD')),
+            )
+        return pool
+
+
+@atexit.register
+def shutdown_pools():
+    with _pools_guard:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+def _attach(name):
+    """Open the parent's shared memory block; the parent alone unlinks it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Before 3.13 attaching registers the block with the resource tracker, which the
+        # workers share with the parent (one set of names), so the parent's unlink clears it
+        return shared_memory.SharedMemory(name=name)
+
+
+def _extract_chunk(shm_name, shape, start, rows, columns, context):
+    """Worker: parse rows into matrix[start:start + len(rows)] of the shared block."""
+    shm = _attach(shm_name)
+    try:
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        columnar.extract(rows, columns, context, out=matrix[start:start + len(rows)])
+        del matrix
+    finally:
+        shm.close()
+    return len(rows)
+
+
+def extract_parallel(rows, columns, context=None, workers=None, chunk_rows=None):
+    """columnar.extract() over a process pool; returns the (rows x columns) float64 matrix."""
+    workers = workers or parallel_setting('WORKERS')
+    chunk_rows = chunk_rows or parallel_setting('CHUNK_ROWS')
+    shape = (len(rows), len(columns))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+    try:
+        pool = _pool(workers)
+        futures = [
+            pool.submit(_extract_chunk, shm.name, shape, start, rows[start:start + chunk_rows], columns, context)
+            for start in range(0, len(rows), chunk_rows)
+        ]
+        for future in futures:
+            future.result()
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return matrix
+
+
+def extract(rows, columns, context=None):
+    """Columns of rows: in a process pool for large inputs when enabled, else in-process."""
+    if parallel_setting('ENABLED') and len(rows) >= parallel_setting('MIN_ROWS'):
+        started = time.time()
+        try:
+            matrix = extract_parallel(rows, columns, context)
+            print(f"[Parallel] Extracted {len(rows)} rows in {time.time() - started:.2f}s with {parallel_setting('WORKERS')} workers")
+            return columnar.Columns(columns, matrix)
+        except Exception as e:
+            print(f"[Parallel] Process pool extraction failed, parsing in-process: {e}")
+    return columnar.Columns(columns, columnar.extract(rows, columns, context))
@@ -0,0 +1,157 @@
+"""
+Compact binary encoding for cached dashboard values (used by cache_backends.TieredCache).
+
+- Row sets (lists of at least MIN_ROWS dicts with the same keys in the same order, e.g. collection_data_preview,
+  anywhere inside dicts, lists, tuples or dataclasses) are stored column by column: int/float columns as typed arrays, repetitive string columns
+  as a category list plus an array of codes, anything else as a plain list.
+- Typed arrays travel as pickle protocol 5 out-of-band buffers appended to the frame, so
+  they skip the pickle opcode stream and are restored with one memcpy each.
+- Frames of COMPRESS_MIN_BYTES or more (e.g. contexts with big json.dumps chart strings)
+  are zlib-compressed.
+- Row sets come back as plain lists of dicts, with the keys in their original order.
+
+Every value round-trips to an equal value of the same types as with plain pickle.
+"""
+import dataclasses
+import pickle
+import struct
+import zlib
+from array import array
+
+
+MAGIC = b'DZ1'
+RAW = 0
+ZLIB = 1
+COMPRESS_MIN_BYTES = 16 * 1024
+COMPRESS_LEVEL = 1  # fast; cached values are read far more often than written
+MIN_ROWS = 32
+MAX_CATEGORY_RATIO = 0.5  # dictionary-encode a string column when distinct values <= this share of rows
+INT64_MIN = -(2 ** 63)
+INT64_MAX = 2 ** 63 - 1
+
+
+class _Column:
+    """Typed array that pickles as an out-of-band buffer under protocol 5."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __reduce_ex__(self, protocol):
+        if protocol >= 5:
+            return _rebuild_column, (self.values.typecode, pickle.PickleBuffer(self.values))
+        return _rebuild_column, (self.values.typecode, self.values.tobytes())
+
+
+def _rebuild_column(typecode, buffer):
+    values = array(typecode)
+    values.frombytes(buffer)
+    return values
+
+
+def _encode_column(values):
+    """('i'|'f', array) for numeric columns, ('c', categories, codes) for repetitive strings, else ('l', list)."""
+    kinds = {type(v) for v in values}
+    if kinds == {int} and all(INT64_MIN <= v <= INT64_MAX for v in values):
+        return ('i', _Column(array('q', values)))
+    if kinds == {float}:
+        return ('f', _Column(array('d', values)))
+    if kinds <= {str, type(None)}:
+        categories = list(dict.fromkeys(values))
+        if len(categories) <= MAX_CATEGORY_RATIO * len(values):
+            index = {category: code for code, category in enumerate(categories)}
+            typecode = 'H' if len(categories) < 2 ** 16 else 'I'
+            return ('c', categories, _Column(array(typecode, (index[v] for v in values))))
+    return ('l', list(values))
+
+
+def _decode_column(column):
+    kind = column[0]
+    if kind in ('i', 'f'):
+        return column[1].tolist()
+    if kind == 'c':
+        categories = column[1]
+        return [categories[code] for code in column[2]]
+    return column[1]
+
+
+class _RowSet:
+    """A row set encoded by columns; unpickles straight back to a list of dicts."""
+
+    def __init__(self, keys, columns, length):
+        self.keys = keys
+        self.columns = columns
+        self.length = length
+
+    def __reduce__(self):
+        return _rows_from_columns, (self.keys, self.columns, self.length)
+
+
+def _rows_from_columns(keys, columns, length):
+    decoded = [_decode_column(column) for column in columns]
+    if not decoded:
+        return [{} for _ in range(length)]
+    return [dict(zip(keys, values)) for values in zip(*decoded)]
+
+
+def _is_row_set(value):
+    if len(value) < MIN_ROWS or type(value[0]) is not dict:
+        return False
+    keys = list(value[0])
+    # Same keys in the same order, so rebuilt rows keep the key order of the originals
+    return all(type(row) is dict and list(row) == keys for row in value)
+
+
+def _columnar(rows):
+    keys = list(rows[0].keys())
+    columns = [_encode_column([row[key] for row in rows]) for key in keys]
+    return keys, columns, len(rows)
+
+
+def _compact(value):
+    """Swap row sets (at any depth of dicts/lists/tuples/dataclasses) for their columnar form."""
+    if type(value) is dict:
+        return {key: _compact(item) for key, item in value.items()}
+    if type(value) is list:
+        if _is_row_set(value):
+            return _RowSet(*_columnar(value))
+        return [_compact(item) for item in value]
+    if type(value) is tuple:
+        return tuple(_compact(item) for item in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.replace(value, **{
+            f.name: _compact(getattr(value, f.name)) for f in dataclasses.fields(value) if f.init
+        })
+    return value
+
+
+def dumps(value):
+    """Encode a value to a frame: MAGIC, codec byte, then the (optionally compressed) body."""
+    buffers = []
+    main = pickle.dumps(_compact(value), protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    header = struct.pack(f'<II{len(raws)}Q', len(main), len(raws), *(len(raw) for raw in raws))
+    body = b''.join([header, main, *raws])
+    if len(body) >= COMPRESS_MIN_BYTES:
+        return MAGIC + bytes([ZLIB]) + zlib.compress(body, COMPRESS_LEVEL)
+    return MAGIC + bytes([RAW]) + body
+
+
+def loads(frame):
+    """Decode a frame from dumps(); plain pickles (written before this format) still load."""
+    if frame[:len(MAGIC)] != MAGIC:
+        return pickle.loads(frame)
+    codec = frame[len(MAGIC)]
+    body = memoryview(frame)[len(MAGIC) + 1:]
+    if codec == ZLIB:
+        body = memoryview(zlib.decompress(body))
+    main_length, buffer_count = struct.unpack_from('<II', body)
+    offset = 8
+    lengths = struct.unpack_from(f'<{buffer_count}Q', body, offset)
+    offset += 8 * buffer_count
+    main = body[offset:offset + main_length]
+    offset += main_length
+    buffers = []
+    for length in lengths:
+        buffers.append(body[offset:offset + length])
+        offset += length
+    return pickle.loads(main, buffers=buffers)
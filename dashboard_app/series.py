@@ -0,0 +1,133 @@
+"""
+Resolution-aware daily chart series (NumPy).
+
+A daily series dict has 'dates' (ISO days) plus parallel numeric lists, e.g. the Collection
+Summary 'daily' aggregate. resample() keeps it as is up to SERIES['MAX_POINTS'] points;
+longer ranges are either
+- summed into week (Monday) or month buckets, each labelled with its first day in the range,
+  with its last day in 'ends' ('bucket' mode, the default), or
+- reduced to MAX_POINTS of the original days with Largest-Triangle-Three-Buckets on one
+  series, the other series taking the same days ('lttb' mode),
+so the payload and the chart stay the same size however long the range. Series that are not
+additive (distinct loans per day) take exact per-bucket values from the caller, else their
+daily values are summed. slice_days() cuts the full-resolution series for a zoomed window.
+"""
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+
+
+SERIES_DEFAULTS = {
+    'MAX_POINTS': 92,  # ~3 months of days
+    'MODE': 'bucket',  # 'bucket' (week / month sums) or 'lttb'
+}
+RESOLUTIONS = ('day', 'week', 'month')
+
+
+def series_setting(name):
+    return getattr(settings, 'DASHBOARD_SERIES', {}).get(name, SERIES_DEFAULTS[name])
+
+
+def _bucket_of(day, resolution):
+    if resolution == 'week':
+        return day.toordinal() - day.weekday()
+    return day.year * 12 + day.month - 1
+
+
+def bucket_starts(dates, resolution):
+    """Index of the first day of each week / month bucket of consecutive ISO dates."""
+    buckets = [_bucket_of(date.fromisoformat(d), resolution) for d in dates]
+    return [i for i, bucket in enumerate(buckets) if i == 0 or bucket != buckets[i - 1]]
+
+
+def auto_resolution(days, max_points=None):
+    """Finest resolution with at most max_points points for a range of days."""
+    max_points = max_points or series_setting('MAX_POINTS')
+    if days <= max_points:
+        return 'day'
+    if days // 7 + 2 <= max_points:  # a partial week at each end
+        return 'week'
+    return 'month'
+
+
+def _series_names(daily):
+    return [name for name in daily if name != 'dates']
+
+
+def bucketed(daily, resolution, exact=None):
+    """Sum the series of daily per week / month bucket (exact: {series: [value per bucket]})."""
+    dates = daily['dates']
+    if resolution == 'day' or not dates:
+        return dict(daily, resolution='day')
+    starts = bucket_starts(dates, resolution)
+    out = {
+        'resolution': resolution,
+        'dates': [dates[i] for i in starts],
+        'ends': [dates[i - 1] for i in starts[1:]] + [dates[-1]],
+    }
+    for name in _series_names(daily):
+        if exact and name in exact:
+            out[name] = list(exact[name])
+        else:
+            out[name] = np.add.reduceat(np.asarray(daily[name], dtype=np.float64), starts).tolist()
+    return out
+
+
+def lttb_indices(values, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps (first and last always)."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        # Average of the next bucket (the last point for the final bucket)
+        avg_x = (end + next_end - 1) / 2.0
+        avg_y = values[end:next_end].mean()
+        xs = np.arange(start, end)
+        areas = np.abs((a - avg_x) * (values[start:end] - values[a]) - (a - xs) * (avg_y - values[a]))
+        a = start + int(np.argmax(areas))
+        picked.append(a)
+    picked.append(n - 1)
+    return picked
+
+
+def downsampled(daily, primary, max_points):
+    """The days LTTB keeps for the primary series, with every series' value on those days."""
+    keep = lttb_indices(daily[primary], max_points)
+    out = {'resolution': 'lttb', 'dates': [daily['dates'][i] for i in keep]}
+    for name in _series_names(daily):
+        out[name] = [daily[name][i] for i in keep]
+    return out
+
+
+def resample(daily, primary, exact=None, resolution='auto', mode=None, max_points=None):
+    """
+    daily at the requested resolution ('auto', 'day', 'week' or 'month'); 'auto' keeps days up
+    to max_points and otherwise buckets or applies LTTB (mode, SERIES['MODE'] by default).
+    exact: {resolution: {series: [value per bucket]}} for non-additive series.
+    """
+    max_points = max_points or series_setting('MAX_POINTS')
+    days = len(daily.get('dates') or ())
+    if resolution == 'auto':
+        if days <= max_points:
+            resolution = 'day'
+        elif (mode or series_setting('MODE')) == 'lttb':
+            return downsampled(daily, primary, max_points)
+        else:
+            resolution = auto_resolution(days, max_points)
+    return bucketed(daily, resolution, (exact or {}).get(resolution))
+
+
+def slice_days(daily, date_from, date_to):
+    """The days of daily within date_from..date_to (ISO strings), at full resolution."""
+    keep = [i for i, d in enumerate(daily.get('dates') or ()) if date_from <= d <= date_to]
+    out = {'resolution': 'day'}
+    for name in daily:
+        out[name] = [daily[name][i] for i in keep]
+    return out
@@ -0,0 +1,220 @@
+"""
+Mergeable quantile sketches (a merging t-digest, NumPy) for amount / tenure distributions.
+
+A QuantileSketch keeps sorted centroids (mean, weight) plus the exact count, sum, min and
+max. Up to SKETCHES['COMPRESSION'] centroids it holds every value (exact quantiles and
+histograms); beyond that, centroids are merged within unit steps of the t-digest k1 scale
+(compression / 2pi * asin(2q - 1)), which keeps the tails at full detail and the middle
+coarse: about COMPRESSION / 2 centroids whatever the number of values. Sketches merge by
+pooling centroids and compressing once, so per-day sketches combine into any range.
+
+- quantile(q) / summary() give p50 / p90 / p99 by interpolating between centroid centres
+- histogram(edges) gives counts and sums for arbitrary bins off the same curve
+- CellSketches holds one sketch per cell of a disbursal Partial as flat centroid columns,
+  so the state / city filters select cells before the kept centroids become one sketch
+"""
+import numpy as np
+from django.conf import settings
+
+
+SKETCHES_DEFAULTS = {
+    'COMPRESSION': 1000,
+}
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def sketches_setting(name):
+    return getattr(settings, 'DASHBOARD_SKETCHES', {}).get(name, SKETCHES_DEFAULTS[name])
+
+
+def _compress(means, weights, compression):
+    """Sorted, compressed centroids of unsorted (means, weights)."""
+    order = np.argsort(means, kind='stable')
+    means, weights = means[order], weights[order]
+    if len(means) <= compression:
+        return means, weights
+    total = weights.sum()
+    centres = (np.cumsum(weights) - weights / 2) / total
+    # Centroids whose centre falls in the same unit step of k1 merge into one
+    steps = np.floor(compression / (2 * np.pi) * np.arcsin(2 * centres - 1)).astype(np.int64)
+    _, codes = np.unique(steps, return_inverse=True)  # steps rise with the means
+    merged_weights = np.bincount(codes, weights=weights)
+    return np.bincount(codes, weights=means * weights) / merged_weights, merged_weights
+
+
+class QuantileSketch:
+    """Approximate distribution of a stream of values (exact below COMPRESSION values)."""
+
+    def __init__(self, values=(), compression=None):
+        self.compression = compression or sketches_setting('COMPRESSION')
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.add(values)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self._absorb(values, np.ones(len(values)), len(values), float(values.sum()), values.min(), values.max())
+
+    def _absorb(self, means, weights, count, total, low, high):
+        self.means, self.weights = _compress(
+            np.concatenate((self.means, means)), np.concatenate((self.weights, weights)), self.compression)
+        self.count += int(count)
+        self.total += float(total)
+        self.min = min(self.min, float(low))
+        self.max = max(self.max, float(high))
+
+    @classmethod
+    def merge(cls, sketches, compression=None):
+        """One sketch of the union of sketches' values."""
+        sketches = [s for s in sketches if s.count]
+        merged = cls(compression=compression or max((s.compression for s in sketches), default=None))
+        if sketches:
+            merged._absorb(
+                np.concatenate([s.means for s in sketches]),
+                np.concatenate([s.weights for s in sketches]),
+                sum(s.count for s in sketches),
+                sum(s.total for s in sketches),
+                min(s.min for s in sketches),
+                max(s.max for s in sketches),
+            )
+        return merged
+
+    def _knots(self):
+        """(ranks, values): the piecewise-linear quantile curve through the centroid centres."""
+        centres = np.cumsum(self.weights) - self.weights / 2
+        return (
+            np.concatenate(([0.0], centres, [float(self.count)])),
+            np.concatenate(([self.min], self.means, [self.max])),
+        )
+
+    def quantile(self, q):
+        """Value at quantile q (0..1); 0.0 when empty."""
+        if not self.count:
+            return 0.0
+        ranks, values = self._knots()
+        return float(np.interp(q * self.count, ranks, values))
+
+    def histogram(self, edges):
+        """
+        (counts, sums) of the bins (-inf, e0), [e0, e1), ..., [e_last, inf) for ascending edges.
+        Exact while the sketch holds every value; otherwise read off the quantile curve (bin
+        sums scaled so they add up to the exact total).
+        """
+        edges = np.asarray(edges, dtype=np.float64)
+        if not self.count:
+            return [0] * (len(edges) + 1), [0.0] * (len(edges) + 1)
+        if self.weights.max() <= 1:
+            bins = np.searchsorted(edges, self.means, side='right')
+            counts = np.bincount(bins, minlength=len(edges) + 1)
+            sums = np.bincount(bins, weights=self.means, minlength=len(edges) + 1)
+            return counts.tolist(), sums.tolist()
+        ranks, values = self._knots()
+        cuts = np.concatenate(([0.0], np.interp(edges, values, ranks), [float(self.count)]))
+        # Area under the quantile curve up to each cut = sum of the values ranked below it
+        areas = np.concatenate(([0.0], np.cumsum((values[1:] + values[:-1]) / 2 * np.diff(ranks))))
+        at = np.clip(np.searchsorted(ranks, cuts, side='right') - 1, 0, len(ranks) - 2)
+        below = areas[at] + (values[at] + np.interp(cuts, ranks, values)) / 2 * (cuts - ranks[at])
+        sums = np.diff(below) * (self.total / below[-1] if below[-1] else 0.0)
+        return np.rint(np.diff(cuts)).astype(np.int64).tolist(), sums.tolist()
+
+    def summary(self):
+        """count / mean / min / max and the QUANTILES (p50, p90, p99) as a JSON-ready dict."""
+        out = {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0,
+        }
+        for q in QUANTILES:
+            out[f'p{round(q * 100)}'] = self.quantile(q)
+        return out
+
+    @property
+    def nbytes(self):
+        return self.means.nbytes + self.weights.nbytes
+
+
+class CellSketches:
+    """One QuantileSketch per cell code, stored as centroid columns (cell, mean, weight)."""
+
+    def __init__(self, cells, means, weights, counts, totals, mins, maxs):
+        self.cells = cells  # cell code of each centroid
+        self.means = means
+        self.weights = weights
+        self.counts = counts  # per cell code
+        self.totals = totals
+        self.mins = mins
+        self.maxs = maxs
+
+    @classmethod
+    def from_values(cls, codes, size, values, compression=None):
+        """Sketches of values per cell code 0..size-1 (a code of -1 skips the value)."""
+        compression = compression or sketches_setting('COMPRESSION')
+        codes = np.asarray(codes, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        keep = codes >= 0
+        codes, values = codes[keep], values[keep]
+        counts = np.bincount(codes, minlength=size)
+        totals = np.bincount(codes, weights=values, minlength=size).astype(np.float64)
+        mins = np.full(size, np.inf)
+        maxs = np.full(size, -np.inf)
+        np.minimum.at(mins, codes, values)
+        np.maximum.at(maxs, codes, values)
+        order = np.lexsort((values, codes))
+        cells, means, weights = codes[order], values[order], np.ones(len(values))
+        if counts.max(initial=0) > compression:
+            cells, means, weights = _compress_cells(cells, means, weights, compression)
+        return cls(cells, means, weights, counts, totals, mins, maxs)
+
+    @classmethod
+    def merge(cls, parts, size):
+        """Pool [(CellSketches, cell code map)] into size cells (no compression: select() does it)."""
+        counts = np.zeros(size, dtype=np.int64)
+        totals = np.zeros(size)
+        mins = np.full(size, np.inf)
+        maxs = np.full(size, -np.inf)
+        for sketches, code_map in parts:
+            np.add.at(counts, code_map, sketches.counts)
+            np.add.at(totals, code_map, sketches.totals)
+            np.minimum.at(mins, code_map, sketches.mins)
+            np.maximum.at(maxs, code_map, sketches.maxs)
+        return cls(
+            np.concatenate([code_map[s.cells] for s, code_map in parts]) if parts else np.empty(0, dtype=np.intp),
+            np.concatenate([s.means for s, _ in parts]) if parts else np.empty(0),
+            np.concatenate([s.weights for s, _ in parts]) if parts else np.empty(0),
+            counts, totals, mins, maxs,
+        )
+
+    def select(self, keep, compression=None):
+        """One QuantileSketch of the cells in the boolean mask keep."""
+        keep = np.asarray(keep, dtype=bool)
+        sketch = QuantileSketch(compression=compression)
+        if keep.any() and self.counts[keep].sum():
+            rows = keep[self.cells]
+            sketch._absorb(
+                self.means[rows], self.weights[rows], self.counts[keep].sum(), self.totals[keep].sum(),
+                self.mins[keep].min(), self.maxs[keep].max(),
+            )
+        return sketch
+
+    @property
+    def nbytes(self):
+        return self.cells.nbytes + self.means.nbytes + self.weights.nbytes
+
+
+def _compress_cells(cells, means, weights, compression):
+    """Compress the centroids of each cell with more than compression of them."""
+    bounds = np.flatnonzero(np.diff(cells)) + 1
+    out_cells, out_means, out_weights = [], [], []
+    for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(cells)]))):
+        m, w = _compress(means[start:end], weights[start:end], compression)
+        out_cells.append(np.full(len(m), cells[start], dtype=np.intp))
+        out_means.append(m)
+        out_weights.append(w)
+    return np.concatenate(out_cells), np.concatenate(out_means), np.concatenate(out_weights)
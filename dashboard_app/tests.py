@@ -0,0 +1,1212 @@
+"""
+Behaviour tests for the aggregation engines, the delta payload protocol and the upstream client.
+
+Upstream calls are replaced by fake Blinkr backends (requests.get), and the cache by a
+per-process LocMemCache unless the cache backend itself is under test, so nothing leaves the process.
+
+    python manage.py test dashboard_app
+"""
+import io
+import json
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pytz
+import requests
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import cache_backends, columnar, disbursal, distinct, parallel, serialization, sketches, upstream, views, warming
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+IST = pytz.timezone('Asia/Kolkata')
+STATES = ['Delhi', 'Goa', 'Kerala']
+CITIES = ['New Delhi', 'Panaji', 'Kochi']
+
+
+def _response(url, data, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(data).encode('utf-8')
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+
+class FakeBackend:
+    """requests.get stand-in: disbursal records of the requested IST days, and a call log."""
+
+    def __init__(self, records):
+        self.records = list(records)  # (IST day, record)
+        self.calls = []
+
+    def __call__(self, url, params=None, **kwargs):
+        self.calls.append((url, dict(params or {})))
+        if 'collection_metrics' in url:
+            return _response(url, {'data': []})
+        start, end = date.fromisoformat(params['startDate']), date.fromisoformat(params['endDate'])
+        return _response(url, [record for day, record in self.records if day is None or start <= day <= end])
+
+    def disbursal_calls(self):
+        return [(p['startDate'], p['endDate']) for url, p in self.calls if url == disbursal.DISBURSAL_API_URL]
+
+
+def _disbursals(first, last, per_day=12, seed=7):
+    """(IST day, record) pairs for every day of first..last, with the date in all three formats."""
+    rng = random.Random(seed)
+    out = []
+    day = first
+    while day <= last:
+        for i in range(per_day):
+            moment = IST.localize(datetime(day.year, day.month, day.day, rng.randint(0, 23), rng.randint(0, 59)))
+            stamp = [
+                moment.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%S.000Z'),  # UTC, maybe the day before
+                int(moment.timestamp() * 1000),
+                day.isoformat(),
+            ][i % 3]
+            state = rng.randrange(len(STATES))
+            out.append((day, {
+                'disbursal_date': stamp,
+                'state': STATES[state],
+                'city': CITIES[state],
+                'source': rng.choice(['Web', 'App']),
+                'loan_amount': rng.choice([5000, 10000, 15000]),
+                'Disbursal_Amt': rng.choice([4500, 9000, 13500]),
+                'tenure': rng.choice([0, 15, 30]),
+                'is_reloan_case': rng.random() < 0.4,
+            }))
+        day += timedelta(days=1)
+    return out
+
+
+def _expected(pairs, first, last, states=()):
+    """Direct sums over the records of first..last (and states) for checking the engine."""
+    rows = [r for day, r in pairs if first <= day <= last and (not states or r['state'] in states)]
+    return {
+        'loans': len(rows),
+        'loan_amount': float(sum(r['loan_amount'] for r in rows)),
+        'disbursal_amount': float(sum(r['Disbursal_Amt'] for r in rows)),
+        'reloan_loans': sum(1 for r in rows if r['is_reloan_case']),
+        'loan_amounts': [float(r['loan_amount']) for r in rows],
+    }
+
+
+class QuantileSketchTests(SimpleTestCase):
+    def test_exact_while_every_value_is_held(self):
+        values = np.random.default_rng(1).integers(1, 100_000, 800).astype(float)
+        sketch = sketches.QuantileSketch(values, compression=1000)
+        self.assertEqual(sketch.count, 800)
+        self.assertAlmostEqual(sketch.total, values.sum())
+        self.assertEqual((sketch.min, sketch.max), (values.min(), values.max()))
+        edges = [5000, 20000, 50000]
+        bins = np.searchsorted(edges, values, side='right')
+        counts, sums = sketch.histogram(edges)
+        self.assertEqual(counts, np.bincount(bins, minlength=4).tolist())
+        np.testing.assert_allclose(sums, np.bincount(bins, weights=values, minlength=4))
+        ordered = np.sort(values)
+        for q in sketches.QUANTILES:
+            rank = q * len(values)
+            low, high = ordered[max(int(rank) - 2, 0)], ordered[min(int(rank) + 2, len(values) - 1)]
+            self.assertTrue(low <= sketch.quantile(q) <= high)
+
+    def test_merge_is_the_sketch_of_the_union(self):
+        rng = np.random.default_rng(2)
+        a, b = rng.normal(100, 10, 300), rng.normal(200, 10, 400)
+        merged = sketches.QuantileSketch.merge([sketches.QuantileSketch(a), sketches.QuantileSketch(b)])
+        whole = sketches.QuantileSketch(np.concatenate((a, b)))
+        self.assertEqual(merged.count, 700)
+        self.assertAlmostEqual(merged.total, whole.total)
+        self.assertEqual(merged.histogram([120, 180]), whole.histogram([120, 180]))
+        self.assertEqual(merged.summary(), whole.summary())
+
+    def test_compressed_quantiles_stay_close(self):
+        values = np.random.default_rng(3).lognormal(9, 1, 200_000)
+        sketch = sketches.QuantileSketch(compression=500)
+        for chunk in np.array_split(values, 20):  # streamed and merged, like per-day sketches
+            sketch = sketches.QuantileSketch.merge([sketch, sketches.QuantileSketch(chunk, compression=500)])
+        self.assertLessEqual(len(sketch.means), 500)
+        self.assertEqual(sketch.count, len(values))
+        for q in sketches.QUANTILES:
+            self.assertAlmostEqual(sketch.quantile(q) / np.quantile(values, q), 1, delta=0.02)
+
+    def test_empty_sketch(self):
+        sketch = sketches.QuantileSketch()
+        self.assertEqual(sketch.summary(), {'count': 0, 'mean': 0.0, 'min': 0.0, 'max': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0})
+        self.assertEqual(sketch.histogram([1, 2]), ([0, 0, 0], [0.0, 0.0, 0.0]))
+
+    def test_cell_sketches_select_the_kept_cells(self):
+        rng = np.random.default_rng(4)
+        codes = rng.integers(0, 5, 2000)
+        values = rng.uniform(0, 1000, 2000)
+        cells = sketches.CellSketches.from_values(codes, 5, values, compression=200)
+        keep = np.array([True, False, True, False, False])
+        selected = cells.select(keep, compression=200)
+        subset = values[np.isin(codes, [0, 2])]
+        self.assertEqual(selected.count, len(subset))
+        self.assertAlmostEqual(selected.total, subset.sum())
+        self.assertEqual((selected.min, selected.max), (subset.min(), subset.max()))
+        self.assertAlmostEqual(selected.quantile(0.5), np.median(subset), delta=15)
+
+
+class DistinctTests(SimpleTestCase):
+    def test_loan_ids(self):
+        self.assertEqual(distinct.loan_ids(['12', '7']).tolist(), [12, 7])
+        ids = distinct.loan_ids(['007', '7', 'L-7', 'L-7'])
+        self.assertEqual(ids[1], 7)
+        self.assertNotEqual(ids[0], ids[1])  # leading zeros are a different loan number
+        self.assertEqual(ids[2], ids[3])
+        self.assertLess(ids[2], 0)
+
+    def test_per_day_sets_merge_into_the_range(self):
+        rng = random.Random(5)
+        rows = [(rng.randrange(10), f'L{rng.randrange(300)}') for _ in range(2000)]
+        days = distinct.DistinctSet.by_day(
+            np.array([d for d, _ in rows], dtype=np.intp), distinct.loan_ids([n for _, n in rows]), 10)
+        for day, day_set in enumerate(days):
+            self.assertEqual(len(day_set), len({n for d, n in rows if d == day}))
+        self.assertEqual(len(distinct.DistinctSet.merge(days[2:7])), len({n for d, n in rows if 2 <= d < 7}))
+        self.assertEqual(len(days[0].union(days[1])), len({n for d, n in rows if d < 2}))
+
+    def test_hyperloglog_estimates_and_merges(self):
+        a = distinct.HyperLogLog(np.arange(0, 60_000))
+        b = distinct.HyperLogLog(np.arange(30_000, 90_000))
+        self.assertAlmostEqual(len(a) / 60_000, 1, delta=0.03)
+        self.assertAlmostEqual(len(a.union(b)) / 90_000, 1, delta=0.03)
+        with self.assertRaises(ValueError):
+            a.union(distinct.HyperLogLog(precision=10))
+
+    @override_settings(DASHBOARD_DISTINCT={'HLL_ABOVE': 100})
+    def test_counter_switches_to_hyperloglog(self):
+        self.assertIsInstance(distinct.counter(np.arange(50)), distinct.DistinctSet)
+        self.assertIsInstance(distinct.counter(np.arange(500)), distinct.HyperLogLog)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DisbursalEngineTests(SimpleTestCase):
+    FIRST, LAST = date(2025, 2, 1), date(2025, 3, 31)
+
+    def setUp(self):
+        cache.clear()
+        self.pairs = _disbursals(self.FIRST, self.LAST)
+        self.backend = FakeBackend(self.pairs)
+        patcher = mock.patch('requests.get', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def compute(self, first, last, states=()):
+        return disbursal.compute(disbursal.DisbursalFilters(first, last, tuple(states), ()))
+
+    def test_record_day_is_the_ist_day_whatever_the_format(self):
+        self.assertEqual(disbursal._record_day({'disbursal_date': '2025-03-01T20:00:00.000Z'}), date(2025, 3, 2))
+        self.assertEqual(disbursal._record_day({'disbursal_date': '2025-03-01T18:29:59Z'}), date(2025, 3, 1))
+        self.assertEqual(disbursal._record_day({'disbursal_date': '2025-03-01T20:00:00+0000'}), date(2025, 3, 2))
+        self.assertEqual(disbursal._record_day({'disbursal_date': 1740859200000}), date(2025, 3, 2))  # 20:00 UTC
+        self.assertEqual(disbursal._record_day({'disbursal_date': '2025-03-01'}), date(2025, 3, 1))
+        self.assertEqual(disbursal._record_day({'disbursal_date': '2025-03-01 23:00:00'}), date(2025, 3, 1))
+        self.assertIsNone(disbursal._record_day({'state': 'Goa'}))
+
+    def test_fetched_span_is_split_and_cached_per_day(self):
+        result = self.compute(date(2025, 3, 1), date(2025, 3, 5))
+        self.assertEqual(self.backend.disbursal_calls(), [('2025-03-01', '2025-03-05')])
+        self.assertEqual(len(result.daily['dates']), 5)
+        # Overlapping range: only the days without a cached partial are fetched
+        result = self.compute(date(2025, 3, 3), date(2025, 3, 8))
+        self.assertEqual(self.backend.disbursal_calls()[1:], [('2025-03-06', '2025-03-08')])
+        expected = _expected(self.pairs, date(2025, 3, 3), date(2025, 3, 8))
+        self.assertEqual(result.loans.total, expected['loans'])
+        self.assertEqual(sum(result.daily['counts']), expected['loans'])
+
+    def test_kpis_breakdowns_and_distributions_match_the_records(self):
+        result = self.compute(date(2025, 3, 1), date(2025, 3, 10), states=['Delhi', 'Goa'])
+        expected = _expected(self.pairs, date(2025, 3, 1), date(2025, 3, 10), states=['Delhi', 'Goa'])
+        self.assertEqual(result.loans.total, expected['loans'])
+        self.assertEqual(result.loans.reloan, expected['reloan_loans'])
+        self.assertEqual(result.loans.fresh + result.loans.reloan, result.loans.total)
+        self.assertAlmostEqual(result.loan_amount.total, expected['loan_amount'])
+        self.assertAlmostEqual(result.disbursal_amount.total, expected['disbursal_amount'])
+        self.assertEqual(sorted(result.by_state.labels), ['Delhi', 'Goa'])
+        self.assertEqual(sum(result.by_state.counts), expected['loans'])
+        amounts = result.distributions['loan_amount']
+        self.assertEqual(amounts.count, expected['loans'])
+        self.assertAlmostEqual(amounts.total, expected['loan_amount'])
+        self.assertEqual((amounts.min, amounts.max), (min(expected['loan_amounts']), max(expected['loan_amounts'])))
+
+    def test_day_partials_are_cached_without_records(self):
+        self.compute(date(2025, 3, 1), date(2025, 3, 3))
+        partial = cache.get(disbursal._day_key(date(2025, 3, 2), 'service'))
+        self.assertEqual(partial.column('count').sum(), sum(1 for day, _ in self.pairs if day == date(2025, 3, 2)))
+        self.assertFalse(hasattr(partial, 'records'))
+        self.assertFalse(hasattr(self.compute(date(2025, 3, 1), date(2025, 3, 3)), 'records'))
+
+    def test_records_are_read_from_upstream_with_the_filters(self):
+        self.compute(date(2025, 3, 1), date(2025, 3, 10))
+        filters = disbursal.DisbursalFilters(date(2025, 3, 1), date(2025, 3, 10), ('Delhi', 'Goa'), ())
+        records, api_error = disbursal.records(filters)
+        self.assertIsNone(api_error)
+        self.assertEqual(len(records), _expected(self.pairs, date(2025, 3, 1), date(2025, 3, 10), states=['Delhi', 'Goa'])['loans'])
+        self.assertEqual(self.backend.disbursal_calls()[-1], ('2025-03-01', '2025-03-10'))
+
+    def test_merged_partials_equal_one_partial_of_all_records(self):
+        records = [r for _, r in self.pairs[:200]]
+        by_day = disbursal._split_by_day(records, self.FIRST, self.LAST)
+        merged = disbursal.Partial.merge([disbursal.Partial.from_records(d, d, rs) for d, rs in sorted(by_day.items())])
+        whole = disbursal.Partial.from_records(self.FIRST, self.LAST, records)
+        order = sorted(range(len(whole.cells)), key=lambda i: whole.cells[i])
+        merged_order = sorted(range(len(merged.cells)), key=lambda i: merged.cells[i])
+        self.assertEqual([whole.cells[i] for i in order], [merged.cells[i] for i in merged_order])
+        np.testing.assert_allclose(whole.measures[order], merged.measures[merged_order])
+        keep = np.ones(len(whole.cells), dtype=bool)
+        self.assertEqual(
+            whole.sketches['loan_amount'].select(keep).summary(),
+            merged.sketches['loan_amount'].select(np.ones(len(merged.cells), dtype=bool)).summary())
+
+    def test_undated_records_are_not_split(self):
+        records = [r for _, r in self.pairs[:20]] + [{'state': 'Goa', 'loan_amount': 5}]
+        self.assertIsNone(disbursal._split_by_day(records, self.FIRST, self.LAST))
+
+    def test_compare_periods_and_moving_averages(self):
+        first, last = date(2025, 3, 22), date(2025, 3, 28)
+        data = disbursal.compare(disbursal.DisbursalFilters(first, last))
+        self.assertIsNone(data.get('api_error'))
+        # One upstream call covers every window back to the 30-day moving average start
+        self.assertEqual(self.backend.disbursal_calls(), [('2025-02-21', '2025-03-28')])
+        current = _expected(self.pairs, first, last)
+        previous = _expected(self.pairs, date(2025, 3, 15), date(2025, 3, 21))
+        last_month = _expected(self.pairs, date(2025, 2, 22), date(2025, 2, 28))
+        self.assertEqual(data['current']['kpis']['loans'], current['loans'])
+        self.assertAlmostEqual(data['current']['kpis']['loan_amount'], current['loan_amount'])
+        self.assertEqual(data['previous_period']['kpis']['loans'], previous['loans'])
+        self.assertEqual(data['last_month']['date_from'], '2025-02-22')
+        self.assertEqual(data['last_month']['kpis']['loans'], last_month['loans'])
+        self.assertAlmostEqual(
+            data['previous_period']['change_pct']['disbursal_amount'],
+            round((current['disbursal_amount'] - previous['disbursal_amount']) / previous['disbursal_amount'] * 100, 2))
+        moving = data['moving_averages']
+        self.assertEqual(len(moving['dates']), 7)
+        week = _expected(self.pairs, last - timedelta(days=6), last)
+        self.assertAlmostEqual(moving['counts_7d'][-1], week['loans'] / 7)
+
+    def test_compare_month_before_clamps_to_the_month_end(self):
+        self.assertEqual(disbursal._month_before(date(2025, 3, 31)), date(2025, 2, 28))
+        self.assertEqual(disbursal._month_before(date(2025, 1, 15)), date(2024, 12, 15))
+
+    def test_compare_fails_loudly_on_days_it_cannot_place(self):
+        self.backend.records.append((None, {'state': 'Goa', 'loan_amount': 5}))  # no disbursal date
+        data = disbursal.compare(disbursal.DisbursalFilters(date(2025, 3, 22), date(2025, 3, 28)))
+        self.assertIn('no usable disbursal date', data['api_error'])
+
+    def test_collection_metrics_split_by_loan_type_quietly(self):
+        rows = [
+            {'date_of_received': f'2025-03-{day:02d}', 'is_reloan_case': day % 2 == 0, 'total_collection_amount': day * 100.0}
+            for day in range(1, 16)
+        ]
+        self.backend.records = []
+        collection = _response(disbursal.DISBURSAL_API_URL, {'data': rows})
+        filters = disbursal.DisbursalFilters(date(2025, 3, 1), date(2025, 3, 10))
+        output = io.StringIO()
+        with mock.patch.object(disbursal.upstream, 'get', return_value=collection) as get, redirect_stdout(output):
+            metrics = disbursal.collection_metrics(filters, token='analyst-token')
+            self.assertEqual(disbursal.collection_metrics(filters, token='analyst-token'), metrics)  # cached per range and scope
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual((metrics['fresh_collection_count'], metrics['reloan_collection_count']), (5, 5))
+        self.assertEqual(metrics['fresh_collection_amount'], 2500.0)
+        self.assertEqual(metrics['reloan_collection_amount'], 3000.0)
+        self.assertEqual(metrics['total_collection_amount'], 5500.0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CollectionSummaryAggregateTests(SimpleTestCase):
+    ROWS = [
+        {'loan_no': 'L1', 'state': 'Goa', 'city': 'Panaji', 'dpd_bucket': '0-30', 'total_collection_amount': 100, 'is_reloan': 'fresh'},
+        {'loan_no': 'L2', 'state': ' Goa', 'city': 'Panaji', 'dpdBucket': '90+ DPD', 'total_collection_amount': 200, 'is_reloan': 'reloan'},
+        {'id': 7, 'state': 'Delhi', 'city': 'South Delhi', 'dpd_bucket': '90+ dpd', 'total_collection_amount': 400},
+        {'loan_no': 'L4', 'state': 'Delhi', 'city': 'New Delhi', 'dpd_bucket': '31-60', 'total_collection_amount': '1,000', 'is_reloan': 'reloan'},
+        {'state': 'Kerala', 'city': 'Kochi', 'dpd_bucket': '0-30', 'total_collection_amount': 800},  # not counted
+        {'loan_no': 'L6', 'state': 'Kerala', 'dpd_bucket': '', 'total_collection_amount': 1600, 'actual_repayment_bucket': 'late'},
+    ]
+
+    def aggregate(self, **filters):
+        response = _response('https://backend.test/insights/v2/collection_summary', {'data': self.ROWS + ['junk']})
+        with mock.patch('requests.get', return_value=response), redirect_stdout(io.StringIO()):
+            return views._collection_summary_aggregate({
+                'date_from': date(2025, 3, 1), 'date_to': date(2025, 3, 7), 'state_filters': [], 'city_filters': [],
+                'actual_repayment_bucket': '', 'loan_pre_post_ontime_status': '', **filters}, 'analyst-token')
+
+    def test_dpd_buckets_excl_90_and_options_of_the_counted_rows(self):
+        aggregate = self.aggregate()
+        self.assertEqual(aggregate['dpd_bucket_distribution'], [
+            {'dpd_bucket': '0-30', 'count': 1, 'amount': 100.0},
+            {'dpd_bucket': '31-60', 'count': 1, 'amount': 1000.0},
+            {'dpd_bucket': '90+ DPD', 'count': 1, 'amount': 200.0},
+            {'dpd_bucket': '90+ dpd', 'count': 1, 'amount': 400.0},
+        ])
+        details = aggregate['dpd_bucket_rows']
+        self.assertEqual(list(details), ['0-30', '90+ dpd', '31-60'])
+        self.assertEqual((details['90+ dpd']['label'], details['90+ dpd']['total']), ('90+ dpd', 2))
+        self.assertEqual(details['90+ dpd']['rows'], self.ROWS[1:3])
+        kpis = aggregate['kpis']
+        self.assertEqual(kpis['principal_collection_excl_90_dpd'], 1100.0)
+        self.assertEqual((kpis['fresh_principal_collection_excl_90_dpd'], kpis['reloan_principal_collection_excl_90_dpd']), (100.0, 1000.0))
+        self.assertEqual(kpis['total_applications'], 6)
+        options = aggregate['options']
+        self.assertEqual(options['states'], ['Delhi', 'Goa', 'Kerala'])
+        self.assertEqual(options['cities'], ['New Delhi', 'Panaji', 'South Delhi'])
+        self.assertEqual(options['cities_by_state'], {'Delhi': ['New Delhi', 'South Delhi'], 'Goa': ['Panaji']})
+        self.assertEqual(options['actual_repayment_buckets'], ['late'])
+
+    def test_filters_and_charts_share_the_coded_columns(self):
+        aggregate = self.aggregate(state_filters=['Goa', 'Delhi'])
+        self.assertEqual(aggregate['total_rows'], 4)
+        self.assertEqual(aggregate['received_by_state']['labels'], ['Goa', 'Delhi'])
+        self.assertEqual(aggregate['options']['states'], ['Delhi', 'Goa'])
+        self.assertEqual(aggregate['options']['cities_by_state'], {'Delhi': ['New Delhi', 'South Delhi'], 'Goa': ['Panaji']})
+        self.assertEqual(self.aggregate(city_filters=['Kochi'])['dpd_bucket_distribution'], [])
+
+
+class DeltaPayloadTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def delta(self, payload, since=None):
+        request = self.factory.get('/api/disbursal-data/', {'since': since} if since else {})
+        return views._delta_payload(request, payload, 'test_delta')
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_versions_changed_keys_and_series_patches(self):
+        cache.clear()
+        base = {'total_records': 10, 'state_values': [1.0, 2.0, 3.0], 'state_labels': ['a', 'b', 'c'], 'last_updated': 't1'}
+        first = self.delta(base)
+        self.assertFalse(first['delta'])
+        self.assertEqual(first['total_records'], 10)
+
+        # Same data (only the volatile timestamp moved): same version, nothing to send
+        same = self.delta(dict(base, last_updated='t2'), since=first['version'])
+        self.assertEqual(same['version'], first['version'])
+        self.assertEqual((same['delta'], same['changed'], same['patches']), (True, {}, {}))
+        self.assertEqual(same['last_updated'], 't2')
+
+        # Changed scalar and one changed point of a same-length series
+        update = dict(base, total_records=11, state_values=[1.0, 2.5, 3.0], last_updated='t3')
+        patch = self.delta(update, since=first['version'])
+        self.assertNotEqual(patch['version'], first['version'])
+        self.assertEqual(patch['base_version'], first['version'])
+        self.assertEqual(patch['changed'], {'total_records': 11})
+        self.assertEqual(patch['patches'], {'state_values': [[1, 2.5]]})
+
+        # A series that changed length is resent whole
+        longer = dict(base, state_values=[1.0, 2.0, 3.0, 4.0], state_labels=['a', 'b', 'c', 'd'])
+        resent = self.delta(longer, since=first['version'])
+        self.assertEqual(resent['changed'], {'state_values': [1.0, 2.0, 3.0, 4.0], 'state_labels': ['a', 'b', 'c', 'd']})
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_keys_dropped_from_the_payload_are_reported_removed(self):
+        cache.clear()
+        base = {'total_records': 10, 'state_labels': ['a'], 'state_values': [1.0], 'last_updated': 't1'}
+        first = self.delta(base)
+        narrower = {'total_records': 10, 'last_updated': 't2'}
+        patch = self.delta(narrower, since=first['version'])
+        self.assertEqual((patch['changed'], patch['patches']), ({}, {}))
+        self.assertEqual(patch['removed'], ['state_labels', 'state_values'])
+        self.assertEqual(self.delta(narrower, since=patch['version'])['removed'], [])
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_unknown_base_version_gets_the_full_payload(self):
+        cache.clear()
+        full = self.delta({'total_records': 1, 'last_updated': 't'}, since='0123456789abcdef')
+        self.assertEqual((full['delta'], full['total_records']), (False, 1))
+
+    def test_version_ignores_key_order_and_volatile_keys(self):
+        self.assertEqual(
+            views._payload_version({'a': 1, 'b': [1, 2], 'last_updated': 'x'}),
+            views._payload_version({'b': [1, 2], 'a': 1, 'last_updated': 'y'}))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DisbursalDataApiTests(TestCase):
+    """The auto-refresh endpoint end to end: sections, ?since deltas and refreshes."""
+
+    def setUp(self):
+        cache.clear()
+        # Ends today: closed days are served from the per-day cache, today is refetched
+        self.today = datetime.now(IST).date()
+        self.first = self.today - timedelta(days=6)
+        self.params = {'date_from': self.first.isoformat(), 'date_to': self.today.isoformat(), 'sections': 'kpis,daily'}
+        self.pairs = _disbursals(self.first, self.today, seed=11)
+        self.backend = FakeBackend(self.pairs)
+        patcher = mock.patch('requests.get', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(User.objects.create_user('analyst', is_staff=True))
+
+    def get(self, **params):
+        response = self.client.get('/api/disbursal-data/', {**self.params, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sections_only_and_no_collection_call(self):
+        data = self.get()
+        self.assertEqual(data['sections'], ['daily', 'kpis'])
+        self.assertEqual(data['total_records'], len(self.pairs))
+        self.assertEqual(len(data['daily']['dates']), 7)
+        self.assertNotIn('state_labels', data)
+        self.assertFalse(any('collection_metrics' in url for url, _ in self.backend.calls))
+
+    def test_records_endpoint_reads_the_range_from_upstream(self):
+        self.get()
+        response = self.client.get('/api/disbursal-records/', {**self.params, 'state': 'Goa'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], sum(1 for _, r in self.pairs if r['state'] == 'Goa'))
+        self.assertEqual(self.backend.disbursal_calls()[-1], (self.first.isoformat(), self.today.isoformat()))
+
+    def test_since_protocol_over_a_refresh(self):
+        first = self.get()
+        self.assertFalse(first['delta'])
+        unchanged = self.get(since=first['version'])
+        self.assertEqual((unchanged['delta'], unchanged['changed'], unchanged['patches']), (True, {}, {}))
+        self.assertEqual(len(self.backend.disbursal_calls()), 1)  # served from the cached result
+
+        # One more disbursal today, picked up by ?refresh
+        extra = dict(self.pairs[0][1], disbursal_date=self.today.isoformat(), loan_amount=10000)
+        self.backend.records.append((self.today, extra))
+        refreshed = self.get(since=first['version'], refresh='1')
+        self.assertTrue(refreshed['delta'])
+        self.assertEqual(refreshed['changed']['total_records'], len(self.pairs) + 1)
+        self.assertEqual(refreshed['changed']['daily']['counts'][-1], first['daily']['counts'][-1] + 1)
+        self.assertEqual(refreshed['changed']['daily']['counts'][:-1], first['daily']['counts'][:-1])
+        self.assertEqual(self.backend.disbursal_calls()[1:], [(self.today.isoformat(), self.today.isoformat())])
+        self.assertNotIn('sections', refreshed['changed'])
+
+        # The client now holds the refreshed version: nothing more to send
+        latest = self.get(since=refreshed['version'])
+        self.assertEqual((latest['changed'], latest['patches']), ({}, {}))
+
+
+HEDGED_URL = 'https://backend.test/insights/v2/hedged'
+HEDGING = {
+    'HEDGING': {'ENDPOINTS': ['/insights/v2/hedged'], 'MIN_SAMPLES': 1, 'MIN_DELAY_SECONDS': 0.05, 'MAX_RATIO': 1},
+    'BULKHEADS': {'DEFAULT': {'MAX_CONCURRENT': 4, 'QUEUE_TIMEOUT_SECONDS': 1}},
+}
+
+
+class ScriptedBackend:
+    """requests.get stand-in answering the n-th call with attempts[n]: (delay, status or exception)."""
+
+    def __init__(self, *attempts):
+        self.attempts = list(attempts)
+        self.lock = threading.Lock()
+
+    def __call__(self, url, **kwargs):
+        with self.lock:
+            delay, outcome = self.attempts.pop(0)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _response(url, {'status': outcome}, status=outcome)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_UPSTREAM=HEDGING)
+class HedgingTests(SimpleTestCase):
+    """A hedge goes out once the first attempt is slower than the endpoint's p95 (0.05s here)."""
+
+    def setUp(self):
+        cache.clear()
+        upstream._hedge_executor = None
+        for registry in (upstream._breakers, upstream._stats, upstream._bulkheads):
+            registry.pop(upstream.endpoint_name(HEDGED_URL), None)
+        upstream.get_stats(HEDGED_URL).record_latency(0.01)
+        self.addCleanup(setattr, upstream, '_hedge_executor', None)
+
+    def get(self, *attempts):
+        with mock.patch('requests.get', ScriptedBackend(*attempts)):
+            return upstream.get(HEDGED_URL, timeout=5)
+
+    def wait_for_idle(self):
+        bulkhead = upstream.get_bulkhead(HEDGED_URL)
+        for _ in range(100):
+            if bulkhead.snapshot()['in_flight'] == 0:
+                return
+            time.sleep(0.01)
+        self.fail('bulkhead slot leaked')
+
+    def test_pool_has_a_thread_per_bulkhead_slot(self):
+        self.assertEqual(upstream._executor()._max_workers, 4)
+
+    def test_fast_5xx_hedge_does_not_beat_a_slower_2xx(self):
+        self.assertEqual(self.get((0.3, 200), (0, 503)).status_code, 200)
+        self.wait_for_idle()
+        self.assertEqual(upstream.get_breaker(HEDGED_URL).snapshot()['recent_failures'], 0)
+
+    def test_hedge_2xx_wins_over_a_5xx_primary(self):
+        self.assertEqual(self.get((0.2, 503), (0, 200)).status_code, 200)
+        self.wait_for_idle()
+
+    def test_5xx_is_returned_when_both_attempts_fail(self):
+        self.assertEqual(self.get((0.2, 503), (0, requests.ConnectionError('reset'))).status_code, 503)
+        self.wait_for_idle()
+        self.assertEqual(upstream.get_breaker(HEDGED_URL).snapshot()['recent_failures'], 1)
+
+    def test_error_is_raised_when_both_attempts_raise(self):
+        with self.assertRaises(requests.ConnectionError):
+            self.get((0.2, requests.ConnectionError('first')), (0, requests.ConnectionError('second')))
+        self.wait_for_idle()
+
+    def test_fast_primary_is_not_hedged(self):
+        backend = ScriptedBackend((0, 200), (0, 500))
+        with mock.patch('requests.get', backend):
+            self.assertEqual(upstream.get(HEDGED_URL, timeout=5).status_code, 200)
+        self.assertEqual(len(backend.attempts), 1)
+        self.assertEqual(upstream.get_stats(HEDGED_URL).snapshot()['recent_hedges'], 0)
+
+
+GUARDED_URL = 'https://backend.test/insights/v2/guarded'
+
+
+class UpstreamTestCase(SimpleTestCase):
+    """Fresh breaker, stats and bulkhead for GUARDED_URL, and requests.get answering self.statuses."""
+
+    def setUp(self):
+        cache.clear()
+        for registry in (upstream._breakers, upstream._stats, upstream._bulkheads):
+            registry.pop(upstream.endpoint_name(GUARDED_URL), None)
+        self.breaker = upstream.get_breaker(GUARDED_URL)
+        self.backend = mock.Mock(side_effect=lambda url, **kwargs: _response(url, {'status': self.statuses[0]}, self.statuses.pop(0)))
+        patcher = mock.patch('requests.get', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        quiet = redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def get(self, *statuses, **kwargs):
+        self.statuses = list(statuses)
+        return upstream.get(GUARDED_URL, params={'q': 1}, timeout=kwargs.pop('timeout', 5), **kwargs)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_UPSTREAM={'BREAKER': {'FAILURE_THRESHOLD': 2, 'OPEN_SECONDS': 30}})
+class CircuitBreakerTests(UpstreamTestCase):
+    def trip(self):
+        self.get(503)
+        self.assertEqual(self.breaker.state, upstream.CircuitBreaker.CLOSED)
+        self.get(503)
+        self.assertEqual(self.breaker.state, upstream.CircuitBreaker.OPEN)
+
+    def test_open_circuit_replays_the_last_good_response(self):
+        self.get(200)
+        self.trip()
+        calls = self.backend.call_count
+        response = self.get()
+        self.assertEqual(self.backend.call_count, calls)
+        self.assertEqual((response.status_code, response.json()), (200, {'status': 200}))
+        self.assertEqual(response.headers['X-Dashboard-Served-From'], 'last-good')
+
+    def test_open_circuit_without_a_last_good_response_fails_fast(self):
+        self.trip()
+        with self.assertRaises(upstream.CircuitOpenError):
+            self.get()
+        self.assertEqual(self.backend.call_count, 2)
+
+    def test_half_open_lets_one_probe_through_and_closes_on_success(self):
+        self.trip()
+        self.breaker.opened_at -= 31
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, upstream.CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request())  # the probe is still in flight
+        self.breaker.release_probe()
+        self.assertEqual(self.get(200).status_code, 200)
+        self.assertEqual(self.breaker.snapshot()['state'], upstream.CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.snapshot()['recent_failures'], 0)
+
+    def test_failed_probe_reopens(self):
+        self.trip()
+        self.breaker.opened_at -= 31
+        self.assertEqual(self.get(500).status_code, 500)
+        self.assertEqual(self.breaker.state, upstream.CircuitBreaker.OPEN)
+        with self.assertRaises(upstream.CircuitOpenError):
+            self.get()
+
+    def test_errors_count_and_old_failures_expire(self):
+        self.backend.side_effect = requests.ConnectionError('reset')
+        with self.assertRaises(requests.ConnectionError):
+            self.get()
+        self.breaker.failures[0] -= 61  # outside WINDOW_SECONDS
+        with self.assertRaises(requests.ConnectionError):
+            self.get()
+        self.assertEqual(self.breaker.snapshot()['state'], upstream.CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.snapshot()['recent_failures'], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_UPSTREAM={'DEADLINES': {'slow_report': 2}})
+class DeadlineTests(UpstreamTestCase):
+    def test_calls_are_clamped_to_the_time_left(self):
+        with upstream.deadline(2):
+            self.get(200, timeout=30)
+            self.get(200, timeout=(5, 30))
+        self.get(200, timeout=30)
+        first, second, unbounded = (call.kwargs['timeout'] for call in self.backend.call_args_list)
+        self.assertLessEqual(first, 2)
+        self.assertTrue(all(t <= 2 for t in second))
+        self.assertEqual(unbounded, 30)
+
+    def test_spent_budget_serves_last_good_or_raises(self):
+        self.get(200)
+        with upstream.deadline(0.1):
+            self.assertEqual(self.get().headers['X-Dashboard-Served-From'], 'last-good')
+            with self.assertRaises(upstream.DeadlineExceeded):
+                upstream.get(GUARDED_URL, params={'other': 1}, timeout=5)
+        self.assertEqual(self.backend.call_count, 1)
+
+    def test_budget_timeouts_are_not_breaker_failures(self):
+        self.backend.side_effect = requests.Timeout('read timed out')
+        with upstream.deadline(1), self.assertRaises(requests.Timeout):
+            self.get(timeout=30)
+        self.assertEqual(self.breaker.snapshot()['recent_failures'], 0)
+        with self.assertRaises(requests.Timeout):
+            self.get(timeout=30)
+        self.assertEqual(self.breaker.snapshot()['recent_failures'], 1)
+
+    def test_nested_budgets_only_shrink(self):
+        with upstream.deadline(1) as outer:
+            with upstream.deadline(10) as inner:
+                self.assertIs(inner, outer)
+            with upstream.deadline(0.5) as inner:
+                self.assertLessEqual(inner.remaining(), 0.5)
+            self.assertIs(upstream.current_deadline(), outer)
+        self.assertIsNone(upstream.current_deadline())
+
+    def test_view_budget_comes_from_the_settings(self):
+        @upstream.request_deadline
+        def slow_report(request):
+            return upstream.current_deadline().seconds
+
+        @upstream.request_deadline
+        def other_report(request):
+            return upstream.current_deadline().seconds
+
+        self.assertEqual((slow_report(None), other_report(None)), (2, upstream.DEADLINE_DEFAULTS['DEFAULT']))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_UPSTREAM={
+    'BULKHEADS': {'DEFAULT': {'MAX_CONCURRENT': 1, 'QUEUE_TIMEOUT_SECONDS': 0.05}}})
+class BulkheadTests(UpstreamTestCase):
+    def hold_slot(self):
+        """Start a call that keeps the endpoint's only slot until the returned event is set."""
+        release, entered = threading.Event(), threading.Event()
+
+        def slow(url, **kwargs):
+            entered.set()
+            release.wait(5)
+            return _response(url, {'status': 200})
+
+        self.backend.side_effect = slow
+        thread = threading.Thread(target=self.get)
+        thread.start()
+        entered.wait(5)
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        return release
+
+    def test_calls_past_the_limit_are_rejected_after_the_queue_timeout(self):
+        self.hold_slot()
+        started = time.monotonic()
+        with self.assertRaises(upstream.BulkheadFullError):
+            upstream.get(GUARDED_URL, params={'other': 1}, timeout=5)
+        self.assertLess(time.monotonic() - started, 1)
+        snapshot = upstream.get_bulkhead(GUARDED_URL).snapshot()
+        self.assertEqual((snapshot['in_flight'], snapshot['rejected']), (1, 1))
+        self.assertEqual(self.breaker.snapshot()['recent_failures'], 0)
+
+    def test_rejected_calls_serve_the_last_good_response(self):
+        self.backend.side_effect = lambda url, **kwargs: _response(url, {'status': 200})
+        self.get()
+        self.hold_slot()
+        self.assertEqual(self.get().headers['X-Dashboard-Served-From'], 'last-good')
+
+    def test_waiting_callers_get_the_slot_when_it_frees(self):
+        release = self.hold_slot()
+        threading.Timer(0.01, release.set).start()
+        bulkhead = upstream.get_bulkhead(GUARDED_URL)
+        self.assertTrue(bulkhead.acquire(timeout=2))
+        bulkhead.release()
+        self.assertEqual(bulkhead.snapshot()['rejected'], 0)
+
+    def test_slots_are_released_when_calls_fail(self):
+        self.backend.side_effect = requests.ConnectionError('reset')
+        for _ in range(3):
+            with self.assertRaises(requests.ConnectionError):
+                self.get()
+        self.assertEqual(upstream.get_bulkhead(GUARDED_URL).snapshot()['in_flight'], 0)
+
+
+@dataclass
+class _CachedAggregate:
+    rows: list
+    totals: dict
+
+
+class SerializationTests(SimpleTestCase):
+    def rows(self, n=100):
+        return [
+            {'loan_no': f'L{i}', 'amount': i * 1.5, 'dpd': i % 7, 'state': STATES[i % 3], 'city': None if i % 5 else 'Goa',
+             'flags': [i % 2 == 0], 'paid': i % 2 == 0}
+            for i in range(n)
+        ]
+
+    def round_trip(self, value):
+        return serialization.loads(serialization.dumps(value))
+
+    def test_row_sets_come_back_as_equal_lists_of_dicts(self):
+        value = {'data': self.rows(), 'nested': [(1, self.rows(40))], 'aggregate': _CachedAggregate(self.rows(), {'n': 3})}
+        decoded = self.round_trip(value)
+        self.assertEqual(decoded, value)
+        self.assertIs(type(decoded['data']), list)
+        self.assertIs(type(decoded['nested'][0][1]), list)
+        self.assertIs(type(decoded['aggregate'].rows), list)
+        self.assertEqual(json.dumps(decoded['data']), json.dumps(value['data']))
+        self.assertEqual([type(v) for v in decoded['data'][1].values()], [type(v) for v in value['data'][1].values()])
+        decoded['data'].append({'loan_no': 'extra'})  # an ordinary, mutable list
+
+    def test_key_order_is_kept(self):
+        rows = self.rows()
+        self.assertEqual(list(self.round_trip(rows)[0]), list(rows[0]))
+        # Same keys, different order in one row: not a column set, every row keeps its own order
+        rows[5] = dict(reversed(list(rows[5].items())))
+        decoded = self.round_trip(rows)
+        self.assertEqual(decoded, rows)
+        self.assertEqual(list(decoded[5]), list(rows[5]))
+        self.assertEqual(list(decoded[6]), list(rows[6]))
+
+    def test_row_sets_are_stored_by_column(self):
+        rows = self.rows(2000)
+        self.assertLess(len(serialization.dumps(rows)), len(pickle.dumps(rows, protocol=5)) / 2)
+
+    def test_small_and_mixed_values_round_trip(self):
+        for value in (self.rows(5), [{'a': 1}] * 40 + [{'b': 1}], [], {'x': (1, 2.5, 'y', None)}, [2 ** 70] * 40,
+                      [{'n': 2 ** 70 if i == 3 else i} for i in range(40)], 'plain', None):
+            self.assertEqual(self.round_trip(value), value)
+
+    def test_large_frames_are_compressed_and_plain_pickles_still_load(self):
+        chart = {'chart_json': json.dumps(list(range(20000)))}
+        frame = serialization.dumps(chart)
+        self.assertEqual(frame[len(serialization.MAGIC)], serialization.ZLIB)
+        self.assertEqual(serialization.loads(frame), chart)
+        self.assertEqual(serialization.loads(pickle.dumps(self.rows())), self.rows())
+
+
+def tiered_cache(directory, **options):
+    """CACHES setting for a TieredCache in directory (L1 is per LOCATION, so a fresh one per test)."""
+    return {'default': {
+        'BACKEND': 'dashboard_app.cache_backends.TieredCache',
+        'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        'OPTIONS': options,
+    }}
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    """Runs each test against its own TieredCache in a temporary directory."""
+    cache_options = {}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        overridden = override_settings(CACHES=tiered_cache(self.directory, **self.cache_options))
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+
+class CacheInvalidationTests(TieredCacheTestCase):
+    def test_disbursal_flush_covers_every_disbursal_namespace(self):
+        for key in ('disbursal:2025-03-01:2025-03-07:service', 'disbursal_day:2025-03-02:service',
+                    'disbursal_collection:2025-03-01:2025-03-07:service', 'disbursal_collection:2025-04-01:2025-04-07:service'):
+            cache.set(key, {'cached': key})
+        deleted = views._invalidate_cached('disbursal_summary', date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(deleted, 3)
+        self.assertEqual([e['key'] for e in cache.entries('disbursal')], ['disbursal_collection:2025-04-01:2025-04-07:service'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_SWR={'CLOSED_RANGE_FRESH_SECONDS': 0, 'CLOSED_RANGE_STALE_SECONDS': 60})
+class CachedPageValueTests(SimpleTestCase):
+    """Stale-while-revalidate page values: one computation per key, from plain query values."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        patcher = mock.patch.dict(views.PAGE_SECTIONS['gst_summary'], compute=self.compute)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def compute(self, query, token):
+        self.release.wait(5)
+        self.calls.append((query, token))
+        return {'computed': len(self.calls)}
+
+    def request(self):
+        request = RequestFactory().get('/gst-summary/', {'date_from': '2025-03-07', 'date_to': '2025-03-01'})
+        request.session = {'blinkr_token': 'analyst-token'}
+        return request
+
+    def wait_for(self, computed):
+        for _ in range(200):
+            entry = cache.get(views._page_context_key(self.request(), 'gst_summary'))
+            if entry and entry['value']['computed'] == computed:
+                return
+            time.sleep(0.01)
+        self.fail(f'no background refresh to {computed}')
+
+    def test_compute_gets_the_resolved_query_not_the_request(self):
+        value, age, stale = views._cached_page_value(self.request(), 'gst_summary')
+        self.assertEqual((value, age, stale), ({'computed': 1}, 0.0, False))
+        self.assertEqual(self.calls, [(views.PageQuery(date(2025, 3, 1), date(2025, 3, 7), {}), 'analyst-token')])
+
+    def test_background_refresh_outlives_the_request(self):
+        views._cached_page_value(self.request(), 'gst_summary')
+        self.release.clear()
+        request = self.request()
+        value, _, stale = views._cached_page_value(request, 'gst_summary')
+        self.assertEqual((value, stale), ({'computed': 1}, True))
+        request.GET = request.session = None  # the response has gone out
+        self.release.set()
+        self.wait_for(2)
+        self.assertEqual(self.calls[1], self.calls[0])
+
+    def test_one_background_refresh_per_stale_key(self):
+        views._cached_page_value(self.request(), 'gst_summary')
+        self.release.clear()
+        for _ in range(3):
+            self.assertTrue(views._cached_page_value(self.request(), 'gst_summary')[2])
+        self.release.set()
+        self.wait_for(2)
+        time.sleep(0.05)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_concurrent_misses_compute_once(self):
+        self.release.clear()
+        values = []
+        threads = [threading.Thread(target=lambda: values.append(views._cached_page_value(self.request(), 'gst_summary')[0]))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(values, [{'computed': 1}] * 4)
+        self.assertEqual(len(self.calls), 1)
+
+
+class TieredCacheTests(TieredCacheTestCase):
+    cache_options = {'L1_MAX_BYTES': 4096, 'NAMESPACE_TTLS': {'short': 5}}
+
+    def test_values_round_trip_through_both_tiers(self):
+        value = {'rows': [{'state': 'KA', 'amount': 1.5}] * 3, 'total': 3}
+        cache.set('page_context:a', value)
+        self.assertEqual(cache.get('page_context:a'), value)
+        cache.l1.clear()  # another worker: only the shared L2 has it
+        self.assertEqual(cache.get('page_context:a'), value)
+        self.assertEqual(cache.get('page_context:missing', 'default'), 'default')
+        stats = cache.stats()['page_context']
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses'], stats['sets']), (1, 1, 1, 1))
+        self.assertTrue(cache.delete('page_context:a'))
+        self.assertIsNone(cache.get('page_context:a'))
+
+    def test_l1_evicts_least_recently_used_by_bytes(self):
+        blob = os.urandom(1500)  # incompressible: ~1.5 KB encoded each
+        for name in 'ab':
+            cache.set(f'page_context:{name}', blob)
+        cache.get('page_context:a')  # a is now more recent than b
+        cache.set('page_context:c', blob)
+        self.assertLessEqual(cache.l1.bytes, 4096)
+        held = {key.rsplit(':', 1)[-1] for key in cache.l1._data}
+        self.assertEqual(held, {'a', 'c'})
+        self.assertEqual(cache.stats()['page_context']['evictions'], 1)
+        self.assertEqual(cache.get('page_context:b'), blob)  # still in L2
+
+    def test_oversized_values_skip_l1(self):
+        blob = os.urandom(8192)
+        cache.set('page_context:big', blob)
+        self.assertEqual(len(cache.l1), 0)
+        self.assertEqual(cache.get('page_context:big'), blob)
+
+    def test_namespace_ttl_caps_timeouts(self):
+        now = time.time()
+        cache.set('short:a', 1, timeout=3600)
+        cache.set('short:b', 1)
+        cache.set('other:c', 1, timeout=3600)
+        expires = {e['key']: e['expires_in'] for e in cache.entries()}
+        self.assertAlmostEqual(expires['short:a'], 5, delta=1)
+        self.assertAlmostEqual(expires['short:b'], 5, delta=1)
+        self.assertAlmostEqual(expires['other:c'], 3600, delta=1)
+        with mock.patch('time.time', return_value=now + 10):
+            self.assertIsNone(cache.get('short:a'))
+            self.assertEqual(cache.get('other:c'), 1)
+
+    def test_add_only_stores_missing_or_expired_keys(self):
+        self.assertTrue(cache.add('lock:a', 'first', timeout=1))
+        self.assertFalse(cache.add('lock:a', 'second', timeout=1))
+        self.assertEqual(cache.get('lock:a'), 'first')
+        cache.l1.clear()
+        with mock.patch('time.time', return_value=time.time() + 2):
+            self.assertTrue(cache.add('lock:a', 'third'))
+            self.assertEqual(cache.get('lock:a'), 'third')
+
+    def test_add_has_one_winner_across_threads(self):
+        results = []
+
+        def contend(n):
+            results.append(cache.add('lock:refresh', n, timeout=60))
+
+        threads = [threading.Thread(target=contend, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+    def test_l2_culls_the_oldest_entries_past_its_size(self):
+        with override_settings(CACHES=tiered_cache(self.directory, L2_MAX_BYTES=5000)), \
+                mock.patch('dashboard_app.cache_backends.L2_CULL_EVERY', 1), redirect_stdout(io.StringIO()):
+            for n in range(6):
+                cache.set(f'page_context:{n}', os.urandom(1500))
+            kept = sorted(e['key'] for e in cache.entries('page_context'))
+            self.assertEqual(kept, ['page_context:3', 'page_context:4', 'page_context:5'])
+            self.assertEqual(cache.stats()['page_context']['l2_evictions'], 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class WarmerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        patcher = mock.patch.dict(views.PAGE_SECTIONS['gst_summary'], compute=self.compute)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.today = datetime.now(IST).date()
+
+    def compute(self, query, token):
+        self.calls.append((query.date_from, query.date_to, token))
+        return {'date_to': query.date_to.isoformat()}
+
+    def warm(self, *presets):
+        return warming.warm(pages=['gst_summary'], presets=presets, tokens=['analyst-token'])
+
+    def user_read(self, **params):
+        request = RequestFactory().get(reverse('gst_summary'), params)
+        request.session = {'blinkr_token': 'analyst-token'}
+        return views._cached_page_value(request, 'gst_summary')
+
+    def test_preset_ranges(self):
+        ranges = warming.preset_ranges(date(2024, 3, 15))
+        self.assertEqual(ranges['today'], (date(2024, 3, 15), date(2024, 3, 15)))
+        self.assertEqual(ranges['yesterday'], (date(2024, 3, 14), date(2024, 3, 14)))
+        self.assertEqual(ranges['month_to_date'], (date(2024, 3, 1), date(2024, 3, 15)))
+        self.assertEqual(ranges['last_month'], (date(2024, 2, 1), date(2024, 2, 29)))
+
+    def test_warmed_entries_are_what_users_read(self):
+        report = self.warm('today', 'yesterday')
+        self.assertEqual([(row['preset'], row['ok']) for row in report], [('today', True), ('yesterday', True)])
+        yesterday = (self.today - timedelta(days=1)).isoformat()
+        self.assertEqual(self.user_read()[0], {'date_to': self.today.isoformat()})
+        self.assertEqual(self.user_read(date_from=yesterday, date_to=yesterday)[0], {'date_to': yesterday})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_open_ranges_are_recomputed_and_closed_ranges_kept(self):
+        self.warm('today', 'yesterday')
+        self.warm('today', 'yesterday')
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(sorted(self.calls), [(yesterday, yesterday, 'analyst-token')] + [(self.today, self.today, 'analyst-token')] * 2)
+
+    def test_failures_are_reported_not_raised(self):
+        self.calls = None  # compute() now raises
+        [row] = self.warm('today')
+        self.assertFalse(row['ok'])
+        self.assertIn('append', row['error'])
+
+    def test_session_tokens_one_per_scope_most_recent_first(self):
+        for n, token in enumerate(['a-token', 'b-token', 'a-token', None]):
+            session = SessionStore()
+            session['blinkr_token'] = token
+            session.set_expiry(3600 + n * 60)
+            session.save()
+        self.assertEqual(warming.session_tokens(), ['a-token', 'b-token'])
+        self.assertEqual(warming.session_tokens(limit=1), ['a-token'])
+
+
+class CacheSnapshotTests(TieredCacheTestCase):
+    def other_cache(self, name, **options):
+        """A TieredCache on its own L2 file, like the next deploy's."""
+        return cache_backends.TieredCache(os.path.join(self.directory, name), {'OPTIONS': options})
+
+    def test_live_entries_survive_into_an_empty_cache(self):
+        cache.set('page_context:a', {'rows': [1, 2, 3]}, timeout=3600)
+        cache.set('page_context:a:refreshing', 1, timeout=3600)
+        cache.set('page_context:ending', 1, timeout=10)  # expires before it is worth keeping
+        cache.set('upstream:last_good:x', b'body', timeout=None)
+        path = os.path.join(self.directory, 'snapshot.sqlite3')
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(cache.snapshot(path), 2)
+        restarted = self.other_cache('restarted.sqlite3')
+        self.assertEqual(restarted.restore(path), 2)
+        self.assertEqual(restarted.get('page_context:a'), {'rows': [1, 2, 3]})
+        self.assertEqual(restarted.get('upstream:last_good:x'), b'body')
+        self.assertIsNone(restarted.get('page_context:a:refreshing'))
+
+    def test_restore_keeps_newer_entries(self):
+        cache.set('page_context:a', 'old', timeout=3600)
+        path = os.path.join(self.directory, 'snapshot.sqlite3')
+        with redirect_stdout(io.StringIO()):
+            cache.snapshot(path)
+        restarted = self.other_cache('restarted.sqlite3')
+        restarted.set('page_context:a', 'new', timeout=3600)
+        self.assertEqual(restarted.restore(path), 0)
+        self.assertEqual(restarted.get('page_context:a'), 'new')
+
+    def test_priority_namespaces_first_within_the_byte_budget(self):
+        for n in range(3):
+            cache.set(f'page_context:{n}', os.urandom(1000), timeout=3600 + n)
+        cache.set('collection_summary:agg', os.urandom(1000), timeout=60 * 5)
+        path = os.path.join(self.directory, 'snapshot.sqlite3')
+        cache.snapshot_namespaces = ['collection_summary']
+        cache.snapshot_max_bytes = 2500
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(cache.snapshot(path), 2)
+        restarted = self.other_cache('restarted.sqlite3')
+        restarted.restore(path)
+        self.assertEqual(sorted(e['key'] for e in restarted.entries()), ['collection_summary:agg', 'page_context:2'])
+
+    @mock.patch('atexit.register')
+    def test_a_starting_process_loads_the_snapshot(self, register):
+        cache.set('page_context:a', 'warm', timeout=3600)
+        path = os.path.join(self.directory, 'snapshot.sqlite3')
+        with redirect_stdout(io.StringIO()):
+            cache.snapshot(path)
+            restarted = self.other_cache('restarted.sqlite3', SNAPSHOT_PATH=path, SNAPSHOT_INTERVAL=10 ** 6)
+            self.assertEqual(restarted.get('page_context:a'), 'warm')
+        register.assert_called_once()
+
+
+class CachePanelTests(TieredCacheTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user('analyst'))
+        self.assertEqual(self.client.get(reverse('cache_admin')).status_code, 302)
+
+    def test_panel_lists_namespace_usage(self):
+        cache.set('collection_summary:agg:2025-03-01:2025-03-07:x', {'total': 1})
+        cache.get('collection_summary:agg:2025-03-01:2025-03-07:x')
+        response = self.client.get(reverse('cache_admin'))
+        self.assertEqual(response.status_code, 200)
+        [row] = [row for row in response.context['namespaces'] if row['name'] == 'collection_summary']
+        self.assertEqual((row['sets'], row['l1_hits'], row['l2_entries']), (1, 1, 1))
+        self.assertEqual(response.context['hot_keys'][0]['key'], 'collection_summary:agg:2025-03-01:2025-03-07:x')
+
+    def test_invalidation_by_dataset_and_overlapping_range(self):
+        for key in ('collection_summary:agg:2025-03-01:2025-03-07:x', 'collection_summary:agg:2025-04-01:2025-04-07:x',
+                    'page_context:gst_summary:2025-03-01:2025-03-07:x'):
+            cache.set(key, 1)
+        with redirect_stdout(io.StringIO()):
+            response = self.client.post(reverse('cache_admin'), {
+                'dataset': 'collection_summary', 'date_from': '2025-03-05', 'date_to': '2025-03-20'})
+        self.assertRedirects(response, reverse('cache_admin'), fetch_redirect_response=False)
+        self.assertEqual(sorted(e['key'] for e in cache.entries()),
+                         ['collection_summary:agg:2025-04-01:2025-04-07:x', 'page_context:gst_summary:2025-03-01:2025-03-07:x'])
+
+    def test_unknown_dataset_deletes_nothing(self):
+        cache.set('upstream:last_good:x', 1)
+        self.client.post(reverse('cache_admin'), {'dataset': 'everything'})
+        self.assertEqual(len(cache.entries()), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_SWR={'USER_REFRESH_LIMIT': 2, 'USER_REFRESH_WINDOW': 300})
+class RefreshLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def forced(self, user, param='refresh'):
+        request = RequestFactory().get('/gst-summary/', {param: '1'})
+        request.user = user
+        return views._force_refresh(request)
+
+    def test_users_get_a_refresh_budget_per_window(self):
+        analyst = User.objects.create_user('analyst')
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual([self.forced(analyst), self.forced(analyst, 'nocache'), self.forced(analyst)], [True, True, False])
+            self.assertTrue(self.forced(User.objects.create_user('other')))
+            with mock.patch('time.time', return_value=time.time() + 300):
+                self.assertTrue(self.forced(analyst))
+
+    def test_staff_and_the_warmer_are_not_limited(self):
+        staff = User.objects.create_user('admin', is_staff=True)
+        self.assertTrue(all(self.forced(staff) for _ in range(5)))
+        self.assertTrue(all(self.forced(None) for _ in range(5)))
+
+    def test_decided_once_per_request(self):
+        analyst = User.objects.create_user('analyst')
+        request = RequestFactory().get('/gst-summary/', {'refresh': '1'})
+        request.user = analyst
+        self.assertTrue(all(views._force_refresh(request) for _ in range(5)))
+        self.assertTrue(self.forced(analyst))
+
+
+class ParallelExtractionTests(SimpleTestCase):
+    """The process-pool path must produce exactly the in-process matrix."""
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.rows = [
+            {
+                'actual_repayment': f'₹{rng.randint(0, 50000):,}' if n % 3 else rng.random() * 1000,
+                'pending_collection': rng.choice([None, '', '1,250.50', 400]),
+                'total_collection_amount': rng.choice([None, 0, '900', 12.5]),
+                'loan_amount': 5000,
+                'is_reloan': rng.choice(['reloan', 'fresh', True, 0]),
+                'repayment_date': f'2025-03-{rng.randint(1, 9):02d}',
+            }
+            for n in range(1000)
+        ]
+        self.context = columnar.DayContext(date(2025, 3, 1), date(2025, 3, 7), 'repayment_date', (), ())
+        self.addCleanup(parallel.shutdown_pools)
+
+    def test_chunks_written_by_workers_equal_the_in_process_matrix(self):
+        expected = columnar.extract(self.rows, columnar.COLLECTION_COLUMNS, self.context)
+        matrix = parallel.extract_parallel(self.rows, columnar.COLLECTION_COLUMNS, self.context, workers=2, chunk_rows=300)
+        np.testing.assert_array_equal(matrix, expected)
+        self.assertEqual(parallel.extract_parallel([], columnar.COLLECTION_COLUMNS, self.context, workers=2).shape, (0, 6))
+
+    @override_settings(DASHBOARD_PARALLEL={'ENABLED': True, 'MIN_ROWS': 500})
+    def test_pool_is_only_used_past_min_rows(self):
+        with mock.patch.object(parallel, 'extract_parallel', wraps=parallel.extract_parallel) as pooled, \
+                redirect_stdout(io.StringIO()):
+            parallel.extract(self.rows[:499], columnar.COLLECTION_COLUMNS, self.context)
+            self.assertEqual(pooled.call_count, 0)
+            columns = parallel.extract(self.rows, columnar.COLLECTION_COLUMNS, self.context)
+            self.assertEqual(pooled.call_count, 1)
+        expected = columnar.extract(self.rows, columnar.COLLECTION_COLUMNS, self.context)
+        np.testing.assert_array_equal(columns['chart_day'], expected[:, -1])
+
+    @override_settings(DASHBOARD_PARALLEL={'ENABLED': True, 'MIN_ROWS': 1})
+    def test_pool_failures_fall_back_to_in_process(self):
+        out = io.StringIO()
+        with mock.patch.object(parallel, '_pool', side_effect=OSError('no processes')), redirect_stdout(out):
+            columns = parallel.extract(self.rows, columnar.COLLECTION_COLUMNS, self.context)
+        np.testing.assert_array_equal(columns.matrix, columnar.extract(self.rows, columnar.COLLECTION_COLUMNS, self.context))
+        self.assertIn('parsing in-process', out.getvalue())
@@ -0,0 +1,590 @@
+"""
+HTTP client for the Blinkr backend (backend.blinkrloan.com) with per-endpoint circuit breakers.
+
+upstream.get() is a drop-in for requests.get(). Each endpoint (URL path) has a breaker:
+after FAILURE_THRESHOLD timeouts / connection errors / 5xx responses within WINDOW_SECONDS
+it opens, and for OPEN_SECONDS calls are answered immediately from the last good response
+for the same request (or fail fast with CircuitOpenError). After that a single half-open
+probe is let through; its outcome closes or re-opens the breaker.
+Breaker state is per process.
+
+Views decorated with @request_deadline get a per-request time budget: every upstream call
+made while handling the request uses min(its own timeout, time left). Once the budget is
+spent, calls return the last good response or raise DeadlineExceeded (a Timeout), so the
+views degrade exactly as they do on a slow backend - but within a bounded page latency.
+
+Endpoints listed in HEDGING['ENDPOINTS'] are hedged: if the first attempt has not answered
+after the endpoint's observed p95 latency, an identical second GET is sent and whichever
+answers first without a 5xx wins. Hedges are capped at MAX_RATIO of the endpoint's recent calls.
+
+Each endpoint also has a bulkhead: at most MAX_CONCURRENT calls in flight per process, and a
+call waits at most QUEUE_TIMEOUT_SECONDS for a slot before it is rejected (last good response
+or BulkheadFullError), so one slow report cannot tie up every server thread.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+
+BREAKER_DEFAULTS = {
+    'FAILURE_THRESHOLD': 5,
+    'WINDOW_SECONDS': 60,
+    'OPEN_SECONDS': 30,
+    'LAST_GOOD_SECONDS': 3600,  # how long a good response can stand in while the circuit is open
+}
+
+
+HEDGING_DEFAULTS = {
+    'ENDPOINTS': [],  # URL paths to hedge; only idempotent GETs belong here
+    'PERCENTILE': 95,  # hedge once the first attempt is slower than this percentile
+    'MIN_SAMPLES': 20,  # latencies needed before the percentile is trusted
+    'MIN_DELAY_SECONDS': 0.5,
+    'MAX_RATIO': 0.1,  # at most this fraction of an endpoint's calls (per WINDOW_SECONDS) is hedged
+    'WINDOW_SECONDS': 300,
+}
+LATENCY_SAMPLES = 200  # per endpoint
+
+BULKHEAD_DEFAULTS = {
+    'MAX_CONCURRENT': 8,
+    'QUEUE_TIMEOUT_SECONDS': 5,
+}
+
+DEADLINE_DEFAULTS = {
+    'DEFAULT': 25,  # seconds per request, across all its upstream calls
+}
+MIN_CALL_SECONDS = 0.5  # not worth starting a call with less budget than this
+
+
+def breaker_setting(name):
+    return getattr(settings, 'DASHBOARD_UPSTREAM', {}).get('BREAKER', {}).get(name, BREAKER_DEFAULTS[name])
+
+
+def hedging_setting(name):
+    return getattr(settings, 'DASHBOARD_UPSTREAM', {}).get('HEDGING', {}).get(name, HEDGING_DEFAULTS[name])
+
+
+def bulkhead_setting(endpoint, name):
+    """BULKHEADS[endpoint][name], else BULKHEADS['DEFAULT'][name]."""
+    bulkheads = getattr(settings, 'DASHBOARD_UPSTREAM', {}).get('BULKHEADS', {})
+    for scope in (bulkheads.get(endpoint, {}), bulkheads.get('DEFAULT', {}), BULKHEAD_DEFAULTS):
+        if name in scope:
+            return scope[name]
+
+
+def deadline_seconds(view_name):
+    """Budget for a view: DEADLINES[view_name], else DEADLINES['DEFAULT']."""
+    deadlines = {**DEADLINE_DEFAULTS, **getattr(settings, 'DASHBOARD_UPSTREAM', {}).get('DEADLINES', {})}
+    return deadlines.get(view_name, deadlines['DEFAULT'])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an endpoint whose circuit is open (and nothing cached to serve)."""
+
+
+class BulkheadFullError(requests.exceptions.ConnectionError):
+    """Raised when no concurrency slot for the endpoint frees up within its queue timeout."""
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised instead of calling upstream when the request's time budget is spent."""
+
+
+# --- Request deadlines ---
+_local = threading.local()
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Run a block under a time budget (nested budgets can only shrink the outer one)."""
+    previous = current_deadline()
+    budget = Deadline(seconds)
+    if previous is not None and previous.remaining() < budget.remaining():
+        budget = previous
+    _local.deadline = budget
+    try:
+        yield budget
+    finally:
+        _local.deadline = previous
+
+
+def request_deadline(view_func):
+    """View decorator: bound all upstream calls of the request by the view's deadline."""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        with deadline(deadline_seconds(view_func.__name__)):
+            return view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+def _budgeted_timeout(timeout):
+    """
+    Clamp a requests timeout (number or (connect, read) tuple) to the time left.
+    Returns (timeout, capped) - capped is True when the deadline, not the call site, decided it.
+    """
+    budget = current_deadline()
+    if budget is None:
+        return timeout, False
+    remaining = budget.remaining()
+    if remaining < MIN_CALL_SECONDS:
+        raise DeadlineExceeded(f'Request deadline of {budget.seconds}s reached')
+    if timeout is None:
+        return remaining, True
+    if isinstance(timeout, tuple):
+        return tuple(min(t, remaining) if t is not None else remaining for t in timeout), max(t or 0 for t in timeout) > remaining
+    return min(timeout, remaining), timeout > remaining
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name):
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = deque()
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """True if a real call may go out now (closed, or the single half-open probe)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= breaker_setting('OPEN_SECONDS'):
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                print(f"[Upstream] {self.name}: half-open, probing")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"[Upstream] {self.name}: circuit closed")
+            self.state = self.CLOSED
+            self.failures.clear()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """Let another half-open probe through when this one ended without a verdict."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            now = time.time()
+            self.failures.append(now)
+            window = breaker_setting('WINDOW_SECONDS')
+            while self.failures and now - self.failures[0] > window:
+                self.failures.popleft()
+            if self.state == self.HALF_OPEN or len(self.failures) >= breaker_setting('FAILURE_THRESHOLD'):
+                if self.state != self.OPEN:
+                    print(f"[Upstream] {self.name}: circuit OPEN after {len(self.failures)} failures")
+                self.state = self.OPEN
+                self.opened_at = now
+                self.probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'recent_failures': len(self.failures), 'opened_at': self.opened_at}
+
+
+class EndpointStats:
+    """Recent latencies and hedge counts of one endpoint."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.calls = deque()
+        self.hedges = deque()
+        self._lock = threading.Lock()
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, pct):
+        """Latency percentile over the recent samples, or None until MIN_SAMPLES are in."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < hedging_setting('MIN_SAMPLES'):
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def _trim(self, now):
+        window = hedging_setting('WINDOW_SECONDS')
+        for events in (self.calls, self.hedges):
+            while events and now - events[0] > window:
+                events.popleft()
+
+    def record_call(self):
+        with self._lock:
+            now = time.time()
+            self.calls.append(now)
+            self._trim(now)
+
+    def try_acquire_hedge(self):
+        """Count a hedge if it keeps hedges within MAX_RATIO of recent calls."""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            if len(self.hedges) + 1 > hedging_setting('MAX_RATIO') * max(len(self.calls), 1):
+                return False
+            self.hedges.append(now)
+            return True
+
+    def snapshot(self):
+        p95 = self.percentile(95)
+        with self._lock:
+            return {'samples': len(self.latencies), 'p95': p95,
+                    'recent_calls': len(self.calls), 'recent_hedges': len(self.hedges)}
+
+
+class Bulkhead:
+    """Per-endpoint concurrency limit with a bounded wait for a slot."""
+
+    def __init__(self, name):
+        self.name = name
+        self.max_concurrent = bulkhead_setting(name, 'MAX_CONCURRENT')
+        self.queue_timeout = bulkhead_setting(name, 'QUEUE_TIMEOUT_SECONDS')
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting up to timeout (default QUEUE_TIMEOUT_SECONDS). False if rejected."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        ok = self._slots.acquire(timeout=max(timeout, 0))
+        waited = time.monotonic() - started
+        with self._lock:
+            self.waiting -= 1
+            if ok:
+                self.in_flight += 1
+                self.acquired += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            else:
+                self.rejected += 1
+        if ok and waited >= 1:
+            print(f"[Upstream] {self.name}: waited {waited:.1f}s for a bulkhead slot")
+        return ok
+
+    def try_acquire(self):
+        """Take a slot only if one is free right now (used for hedge attempts)."""
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.in_flight += 1
+            self.acquired += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'acquired': self.acquired,
+                'rejected': self.rejected,
+                'avg_wait': self.wait_total / self.acquired if self.acquired else 0.0,
+                'max_wait': self.wait_max,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_stats = {}
+_bulkheads = {}
+_hedge_executor = None
+
+
+def endpoint_name(url):
+    """Breakers are keyed by URL path, e.g. /insights/v2/collection_summary."""
+    return urlsplit(url).path or url
+
+
+def get_breaker(url):
+    name = endpoint_name(url)
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def get_stats(url):
+    name = endpoint_name(url)
+    with _breakers_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = EndpointStats(name)
+        return stats
+
+
+def endpoint_stats():
+    """{endpoint: {'samples', 'p95', 'recent_calls', 'recent_hedges'}} for every endpoint seen so far."""
+    with _breakers_lock:
+        stats = list(_stats.values())
+    return {s.name: s.snapshot() for s in stats}
+
+
+def get_bulkhead(url):
+    name = endpoint_name(url)
+    with _breakers_lock:
+        bulkhead = _bulkheads.get(name)
+        if bulkhead is None:
+            bulkhead = _bulkheads[name] = Bulkhead(name)
+        return bulkhead
+
+
+def bulkhead_states():
+    """{endpoint: {'max_concurrent', 'in_flight', 'waiting', 'acquired', 'rejected', 'avg_wait', 'max_wait'}}."""
+    with _breakers_lock:
+        bulkheads = list(_bulkheads.values())
+    return {b.name: b.snapshot() for b in bulkheads}
+
+
+def breaker_states():
+    """{endpoint: {'state', 'recent_failures', 'opened_at'}} for every endpoint seen so far."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def _last_good_key(url, params, headers):
+    """Same endpoint + params + credentials => same stored response."""
+    auth = (headers or {}).get('Authorization', '')
+    raw = json.dumps([url, params, hashlib.sha1(auth.encode('utf-8')).hexdigest()], sort_keys=True, default=str)
+    return 'upstream:last_good:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _remember(key, response):
+    try:
+        cache.set(key, {
+            'status_code': response.status_code,
+            'content': response.content,
+            'headers': dict(response.headers),
+            'url': response.url,
+            'encoding': response.encoding,
+            'stored_at': time.time(),
+        }, timeout=breaker_setting('LAST_GOOD_SECONDS'))
+    except Exception as e:
+        print(f"[Upstream] Could not store last good response: {e}")
+
+
+def _replay(stored):
+    """Rebuild a requests.Response from a stored last good response."""
+    response = requests.Response()
+    response.status_code = stored['status_code']
+    response._content = stored['content']
+    response.headers.update(stored['headers'])
+    response.url = stored['url']
+    response.encoding = stored['encoding']
+    response.headers['X-Dashboard-Served-From'] = 'last-good'
+    response.headers['X-Dashboard-Age'] = str(int(time.time() - stored['stored_at']))
+    return response
+
+
+def _is_failure_status(status_code):
+    return status_code >= 500
+
+
+def _executor():
+    """
+    Thread pool of the hedged attempts. Every attempt holds a bulkhead slot of a hedged endpoint
+    before it is submitted, so one worker per slot means an attempt never queues for a thread
+    (time the attempt timeout and the request deadline would not see).
+    """
+    global _hedge_executor
+    with _breakers_lock:
+        if _hedge_executor is None:
+            workers = sum(bulkhead_setting(endpoint, 'MAX_CONCURRENT') for endpoint in hedging_setting('ENDPOINTS'))
+            _hedge_executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='upstream-hedge')
+        return _hedge_executor
+
+
+def _discard(future):
+    """Release the connection of an attempt that lost the race (a failed attempt has none)."""
+    def close(f):
+        if f.cancelled() or f.exception() is not None:
+            return
+        try:
+            f.result().close()
+        except Exception:
+            pass
+    future.add_done_callback(close)
+
+
+def _get_in_slot(bulkhead, url, **request_kwargs):
+    """requests.get() for an attempt holding a bulkhead slot; the slot is released when it ends."""
+    try:
+        return requests.get(url, **request_kwargs)
+    finally:
+        bulkhead.release()
+
+
+def _hedged_get(stats, bulkhead, url, **request_kwargs):
+    """
+    requests.get() that sends a second identical request once the first is slower than the
+    endpoint's percentile latency. The first response without a 5xx wins; a 5xx (or an error)
+    is only returned when the other attempt fails too. The losing attempt is cancelled if it
+    has not started, otherwise its response is dropped when it arrives.
+    Called holding one bulkhead slot (released by the primary attempt); a hedge only goes out
+    if a second slot is free. Each attempt releases its slot when it ends, or here when it is
+    cancelled before it starts.
+    """
+    delay = stats.percentile(hedging_setting('PERCENTILE'))
+    if delay is None:
+        return _get_in_slot(bulkhead, url, **request_kwargs)
+
+    pool = _executor()
+    primary = pool.submit(_get_in_slot, bulkhead, url, **request_kwargs)
+    done, _ = wait([primary], timeout=max(delay, hedging_setting('MIN_DELAY_SECONDS')))
+    if done or not bulkhead.try_acquire():
+        return primary.result()
+    if not stats.try_acquire_hedge():
+        bulkhead.release()
+        return primary.result()
+
+    print(f"[Upstream] {stats.name}: no answer after {delay:.2f}s, sending hedge request")
+    try:
+        hedge = pool.submit(_get_in_slot, bulkhead, url, **request_kwargs)
+    except Exception:
+        bulkhead.release()
+        return primary.result()
+    attempts = (primary, hedge)
+    pending = set(attempts)
+    failed = None  # a finished attempt that raised or answered 5xx
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and not _is_failure_status(future.result().status_code):
+                for other in attempts:
+                    if other is future:
+                        continue
+                    if other.cancel():
+                        bulkhead.release()  # _get_in_slot never ran, so its slot is still held
+                    else:
+                        _discard(other)
+                return future.result()
+            if failed is None or (failed.exception() is not None and future.exception() is None):
+                failed = future
+            else:
+                _discard(future)
+    # Both attempts failed: the 5xx response if there is one (the caller reads its body), else the error
+    return failed.result()
+
+
+def _last_good_or_raise(key, endpoint, reason, error):
+    stored = cache.get(key)
+    if stored is not None:
+        print(f"[Upstream] {endpoint}: {reason}, serving last good response")
+        return _replay(stored)
+    raise error
+
+
+def get(url, params=None, headers=None, timeout=None, **kwargs):
+    """
+    Drop-in for requests.get() against the Blinkr backend, guarded by the endpoint's breaker
+    and bulkhead and bounded by the request deadline. Raises requests exceptions like
+    requests.get(); CircuitOpenError and BulkheadFullError are ConnectionErrors,
+    DeadlineExceeded is a Timeout.
+    """
+    breaker = get_breaker(url)
+    key = _last_good_key(url, params, headers)
+
+    try:
+        _budgeted_timeout(timeout)
+    except DeadlineExceeded as e:
+        return _last_good_or_raise(key, breaker.name, 'deadline reached', e)
+
+    if not breaker.allow_request():
+        return _last_good_or_raise(key, breaker.name, 'circuit open', CircuitOpenError(
+            f'Upstream endpoint {breaker.name} is unavailable (circuit open)'))
+
+    bulkhead = get_bulkhead(url)
+    queue_timeout = bulkhead.queue_timeout
+    budget = current_deadline()
+    if budget is not None:
+        queue_timeout = min(queue_timeout, budget.remaining())
+    if not bulkhead.acquire(queue_timeout):
+        breaker.release_probe()
+        return _last_good_or_raise(key, breaker.name, 'bulkhead full', BulkheadFullError(
+            f'Upstream endpoint {breaker.name} is at its concurrency limit'))
+
+    try:
+        # Re-read the budget: waiting for the slot may have used some of it
+        timeout, capped = _budgeted_timeout(timeout)
+    except DeadlineExceeded as e:
+        bulkhead.release()
+        breaker.release_probe()
+        return _last_good_or_raise(key, breaker.name, 'deadline reached', e)
+
+    stats = get_stats(url)
+    stats.record_call()
+    started = time.monotonic()
+    try:
+        if breaker.name in hedging_setting('ENDPOINTS'):
+            response = _hedged_get(stats, bulkhead, url, params=params, headers=headers, timeout=timeout, **kwargs)
+        else:
+            response = _get_in_slot(bulkhead, url, params=params, headers=headers, timeout=timeout, **kwargs)
+    except requests.exceptions.Timeout as e:
+        if not capped:
+            breaker.record_failure()
+            raise
+        # Our budget ran out, not the endpoint's own timeout: not evidence of an outage
+        breaker.release_probe()
+        return _last_good_or_raise(key, breaker.name, 'deadline reached mid-call', e)
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+
+    if _is_failure_status(response.status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+        stats.record_latency(time.monotonic() - started)
+        if response.status_code == 200:
+            _remember(key, response)
+    return response
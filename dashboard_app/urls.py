@@ -11,6 +11,7 @@ urlpatterns = [
     path('disbursal-summary/', views.disbursal_summary, name='disbursal_summary'),
     path('api/disbursal-data/', views.disbursal_data_api, name='disbursal_data_api'),  # API endpoint for AJAX refresh
     path('api/disbursal-records/', views.disbursal_records_api, name='disbursal_records_api'),  # API endpoint for records table
+    path('api/compare/', views.compare_api, name='compare_api'),  # Period-over-period KPIs and moving averages
     path('api/prepayment-records/', views.prepayment_records_api, name='prepayment_records_api'),  # API endpoint for prepayment records table
     path('api/on-time-records/', views.on_time_records_api, name='on_time_records_api'),  # API endpoint for on_time records table
     path('api/overdue-records/', views.overdue_records_api, name='overdue_records_api'),  # API endpoint for overdue records table
@@ -24,6 +25,9 @@ urlpatterns = [
     path('sales-performance/', views.sale_performance, name='sale_performance'),
     path('aum-report/', views.aum_report, name='aum_report'),
     path('api/aum-report/', views.api_aum_report, name='api_aum_report'),
+    path('api/page-sections/<str:page>/<str:section>/', views.page_section_api, name='page_section_api'),  # Deferred sections of shell-first pages
+    path('api/series/<str:page>/', views.series_api, name='series_api'),  # Daily chart series by resolution / zoom window
     path('gst-summary/', views.gst_summary, name='gst_summary'),
+    path('cache-admin/', views.cache_admin, name='cache_admin'),  # Staff-only cache stats and invalidation
 ]
 
@@ -2,25 +2,33 @@
 Dashboard views for Edge Analytics Dashboard
 """
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.conf import settings
-from django.utils import timezone
 from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_http_methods
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
+from django.core.cache import cache
 from datetime import datetime, timedelta, date
+import hashlib
 import json
+import numpy as np
 import requests
 from collections import defaultdict
+from dataclasses import dataclass
 import pytz
 import os
 import re
+import time
 from urllib.parse import urlencode
 
+from . import categories, columnar, disbursal, distinct, groupby, metrics, series, sketches, upstream
+from .caching import auth_scope, get_or_refresh, range_ttls, swr_setting, swr_stats
 from .decorators import require_page_access
-from .models import get_first_allowed_url
+from .models import get_first_allowed_url, user_can_access_page
 
 
 @require_http_methods(["GET", "POST"])
@@ -325,2059 +333,362 @@ def leads_summary(request):
     return render(request, 'dashboard/pages/leads_summary.html', context)
 
 
-@login_required
-@never_cache
-@require_page_access
-def disbursal_summary(request):
-    """
-    Disbursal Summary page view - Fetches data from API and filters by disbursal_date
-    """
-    # Get filter parameters from request
-    date_from_str = request.GET.get('date_from', '')
-    date_to_str = request.GET.get('date_to', '')
-    state_filters = request.GET.getlist('state')  # Get multiple states
-    city_filters = request.GET.getlist('city')    # Get multiple cities
-    
-    # Filter out empty strings
-    state_filters = [s for s in state_filters if s]
-    city_filters = [c for c in city_filters if c]
-    
-    # Set up timezone (IST - Asia/Kolkata)
+# --- Shell-first rendering for heavy pages ---
+# The page response only carries layout, filters and skeletons; KPI, chart and table
+# sections are fetched in parallel from page_section_api (see PAGE_SECTIONS).
+# ?full=1 keeps the old single blocking render.
+def _render_shell_first(request, page, template_name, **shell_context):
+    """Render a page shell with deferred sections, or the full page when ?full=1."""
+    if request.GET.get('full'):
+        return render(request, template_name, _cached_page_context(request, page))
     ist = pytz.timezone('Asia/Kolkata')
-    utc = pytz.UTC
-    
-    # Parse date filters (user input is in IST)
-    date_from = None
-    date_to = None
-    
-    if date_from_str:
-        try:
-            # Parse as date in IST
-            date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    
-    if date_to_str:
-        try:
-            # Parse as date in IST
-            date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    
-    # Set default dates if not provided (today only in IST)
-    now_ist = datetime.now(ist)
-    today_date = now_ist.date()
-    if not date_from:
-        date_from = today_date
-    if not date_to:
-        date_to = today_date
-    
-    # Build API URL with startDate and endDate parameters
-    api_url = 'https://backend.blinkrloan.com/insights/v2/disbursal'
-    # Format dates as YYYY-MM-DD for API
-    params = {
-        'startDate': date_from.strftime('%Y-%m-%d'),
-        'endDate': date_to.strftime('%Y-%m-%d')
-    }
-    
-    # Fetch data from API
-    try:
-        # Add headers for authentication
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        
-        # Use blinkr_token from session (SAME TOKEN AS LOGIN)
-        token = request.session.get('blinkr_token')
-        if token:
-            headers['Authorization'] = f'Bearer {token}'
-            print(f"Using blinkr_token from session for disbursal API request")
-        else:
-            # Fallback to API key from settings/environment
-            api_key = os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
-            if api_key:
-                headers['Authorization'] = f'Bearer {api_key}'
-                print(f"Using API key from settings for API request")
-            else:
-                print("WARNING: No authentication token found in session or settings")
-        
-        # Debug: Print request details
-        print(f"Disbursal API URL: {api_url}")
-        print(f"Disbursal API Params: {params}")
-        print(f"Disbursal API Headers: {headers}")
-        
-        response = requests.get(api_url, params=params, headers=headers, timeout=30)
-        # Check response status
-        print(f"Disbursal API Response Status: {response.status_code}")
-        
-        # Handle non-200 status codes
-        if response.status_code != 200:
-            print(f"API Error Status: {response.status_code}")
-            print(f"API Error Response: {response.text[:500]}")
-            try:
-                error_data = response.json()
-                error_message = error_data.get('message') or error_data.get('error') or f'API returned status {response.status_code}'
-                print(f"API Error Message: {error_message}")
-            except:
-                print(f"API Error Text: {response.text[:500]}")
-            records = []
-            all_cities_for_dropdown = set()
-            cities_by_state = defaultdict(set)
-        else:
-            try:
-                api_data = response.json()
-            except:
-                print(f"ERROR: Invalid JSON response: {response.text[:500]}")
-                records = []
-                all_cities_for_dropdown = set()
-                cities_by_state = defaultdict(set)
-            else:
-                # Debug: Print API response structure
-                print(f"Disbursal API Response Type: {type(api_data)}")
-                print(f"Disbursal API Response Keys: {list(api_data.keys()) if isinstance(api_data, dict) else 'Not a dict'}")
-                print(f"Disbursal API Response Sample: {str(api_data)[:500]}")
-                
-                # Check for authorization error
-                if isinstance(api_data, dict) and (api_data.get('message') == 'not authorised' or 'unauthorized' in str(api_data.get('message', '')).lower()):
-                    print("ERROR: API returned 'not authorised' - authentication required")
-                    print("Token in session:", 'blinkr_token' in request.session)
-                    records = []
-                # Extract result array - v2 API might have different structure
-                # Try different possible keys
-                elif isinstance(api_data, list):
-                    records = api_data
-                    print(f"API returned list with {len(records)} records")
-                elif isinstance(api_data, dict):
-                    # Check for error messages
-                    if 'message' in api_data or 'error' in api_data:
-                        error_msg = api_data.get('message', api_data.get('error', 'Unknown error'))
-                        print(f"API Error in response: {error_msg}")
-                        records = []
-                    else:
-                        # Try to extract data from various possible keys
-                        records = api_data.get('result', api_data.get('data', api_data.get('records', api_data.get('disbursals', api_data.get('items', [])))))
-                        print(f"Extracted {len(records)} records from API response")
-                else:
-                    print(f"WARNING: Unexpected API response type: {type(api_data)}")
-                    records = []
-                
-                print(f"Final records count: {len(records)}")
-                if records and len(records) > 0:
-                    print(f"First record keys: {records[0].keys() if isinstance(records[0], dict) else 'Not a dict'}")
-                    print(f"First record sample: {str(records[0])[:200] if isinstance(records[0], dict) else 'Not a dict'}")
-                else:
-                    print(f"WARNING: No records found in API response!")
-                
-                # Ensure records is a list
-                if not isinstance(records, list):
-                    print(f"WARNING: Records is not a list, type: {type(records)}")
-                    records = []
-        
-        # Get all cities for dropdown (before applying state/city filters)
-        # This is used to populate the city dropdown based on selected state
-        all_cities_for_dropdown = set()
-        cities_by_state = defaultdict(set)
-        for record in records:
-            if isinstance(record, dict):
-                state = record.get('state', '').strip()
-                city = record.get('city', '').strip()
-                if state and city:
-                    all_cities_for_dropdown.add(city)
-                    cities_by_state[state].add(city)
-        
-        # Apply state and city filters (multiple selections)
-        if state_filters:
-            records = [r for r in records if isinstance(r, dict) and r.get('state', '').strip() in state_filters]
-        if city_filters:
-            records = [r for r in records if isinstance(r, dict) and r.get('city', '').strip() in city_filters]
-        
-        print(f"Final records count after filtering: {len(records)}")
-        
-    except requests.RequestException as e:
-        # Handle API errors gracefully
-        records = []
-        all_cities_for_dropdown = set()
-        cities_by_state = defaultdict(set)
-        print(f"API Request Error: {e}")
-        print(f"API URL: {api_url}")
-        print(f"API Params: {params}")
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response Status: {e.response.status_code}")
-            print(f"Response Text: {e.response.text[:500]}")
-    except (KeyError, ValueError, TypeError) as e:
-        # Handle data parsing errors
-        records = []
-        all_cities_for_dropdown = set()
-        cities_by_state = defaultdict(set)
-        print(f"Data Parsing Error: {e}")
-        print(f"API Response: {api_data if 'api_data' in locals() else 'Not available'}")
-    
-    # Initialize KPI counters
-    total_records = len(records)
-    fresh_count = 0
-    reloan_count = 0
-    
-    total_loan_amount = 0
-    fresh_loan_amount = 0
-    reloan_loan_amount = 0
-    
-    total_disbursal_amount = 0
-    fresh_disbursal_amount = 0
-    reloan_disbursal_amount = 0
-    
-    processing_fee = 0
-    fresh_processing_fee = 0
-    reloan_processing_fee = 0
-    
-    interest_amount = 0
-    fresh_interest_amount = 0
-    reloan_interest_amount = 0
-    
-    repayment_amount = 0
-    fresh_repayment_amount = 0
-    reloan_repayment_amount = 0
-    
-    # Tenure tracking for average calculation
-    total_tenure = 0
-    tenure_count = 0
-    fresh_tenure_sum = 0
-    fresh_tenure_count = 0
-    reloan_tenure_sum = 0
-    reloan_tenure_count = 0
-    
-    # Aggregate data by state, city, and source
-    # Using dictionaries to store multiple values per state/city/source (including count)
-    state_data = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'net_disbursal': 0, 'count': 0})
-    city_data = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'net_disbursal': 0, 'count': 0})
-    source_data = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'net_disbursal': 0, 'count': 0, 'fresh_count': 0, 'reloan_count': 0})
-    
-    # Get unique states for filter dropdowns
-    all_states = set()
-    for record in records:
-        state = record.get('state', '').strip()
-        if state:
-            all_states.add(state)
-    
-    # Process each record for KPIs and charts
-    for record in records:
-        # Check if reloan case
-        is_reloan = record.get('is_reloan_case', False)
-        
-        # Count records
-        if is_reloan:
-            reloan_count += 1
-        else:
-            fresh_count += 1
-        
-        # Extract amounts (handle None values)
-        loan_amt = float(record.get('loan_amount', 0) or 0)  # Sanction amount
-        disbursal_amt = float(record.get('Disbursal_Amt', 0) or 0)  # Net disbursal amount
-        proc_fee = float(record.get('processing_fee', 0) or 0)
-        int_amt = float(record.get('interest_amount', 0) or 0)
-        repay_amt = float(record.get('repayment_amount', 0) or 0)
-        tenure_days = float(record.get('tenure', 0) or 0)  # Tenure in days
-        
-        # Calculate net disbursal (Disbursal_Amt is already net, but keeping for clarity)
-        net_disbursal_amt = disbursal_amt
-        
-        # Aggregate tenure
-        if tenure_days > 0:
-            total_tenure += tenure_days
-            tenure_count += 1
-            if is_reloan:
-                reloan_tenure_sum += tenure_days
-                reloan_tenure_count += 1
-            else:
-                fresh_tenure_sum += tenure_days
-                fresh_tenure_count += 1
-        
-        # Aggregate totals
-        total_loan_amount += loan_amt
-        total_disbursal_amount += disbursal_amt
-        processing_fee += proc_fee
-        interest_amount += int_amt
-        repayment_amount += repay_amt
-        
-        # Aggregate by fresh/reloan
-        if is_reloan:
-            reloan_loan_amount += loan_amt
-            reloan_disbursal_amount += disbursal_amt
-            reloan_processing_fee += proc_fee
-            reloan_interest_amount += int_amt
-            reloan_repayment_amount += repay_amt
-        else:
-            fresh_loan_amount += loan_amt
-            fresh_disbursal_amount += disbursal_amt
-            fresh_processing_fee += proc_fee
-            fresh_interest_amount += int_amt
-            fresh_repayment_amount += repay_amt
-        
-        # Aggregate by state, city, and source for charts
-        state = record.get('state', '').strip()
-        city = record.get('city', '').strip()
-        source = record.get('source', record.get('Source', '')).strip()  # Try both lowercase and capitalized
-        
-        # State chart: Aggregate sanction, disbursal, net disbursal amounts, and count
-        if state:
-            state_data[state]['disbursal'] += disbursal_amt
-            state_data[state]['sanction'] += loan_amt
-            state_data[state]['net_disbursal'] += net_disbursal_amt
-            state_data[state]['count'] += 1
-        
-        # City chart: Aggregate sanction, disbursal, net disbursal amounts, and count
-        if city:
-            city_data[city]['disbursal'] += disbursal_amt
-            city_data[city]['sanction'] += loan_amt
-            city_data[city]['net_disbursal'] += net_disbursal_amt
-            city_data[city]['count'] += 1
-        
-        # Source chart: Aggregate sanction, disbursal, net disbursal amounts, count, fresh/reloan
-        if source:
-            source_data[source]['disbursal'] += disbursal_amt
-            source_data[source]['sanction'] += loan_amt
-            source_data[source]['net_disbursal'] += net_disbursal_amt
-            source_data[source]['count'] += 1
-            if is_reloan:
-                source_data[source]['reloan_count'] += 1
-            else:
-                source_data[source]['fresh_count'] += 1
-    
-    # Sort state, city, and source data by disbursal amount (descending) and take top 20
-    sorted_states = sorted(state_data.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:20]
-    sorted_cities = sorted(city_data.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:20]
-    sorted_sources = sorted(source_data.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:20]
-    source_counts = [item[1]['count'] for item in sorted_sources]
-    source_count = sum(source_counts)  # Total records with a lead source (for Source card)
-    
-    # Prepare chart data - use disbursal amount for chart size, but include all data for tooltips
-    state_labels = [item[0] for item in sorted_states]
-    state_values = [item[1]['disbursal'] for item in sorted_states]
-    state_sanction = [item[1]['sanction'] for item in sorted_states]
-    state_net_disbursal = [item[1]['net_disbursal'] for item in sorted_states]
-    state_counts = [item[1]['count'] for item in sorted_states]
-    
-    city_labels = [item[0] for item in sorted_cities]
-    city_values = [item[1]['disbursal'] for item in sorted_cities]
-    city_sanction = [item[1]['sanction'] for item in sorted_cities]
-    city_net_disbursal = [item[1]['net_disbursal'] for item in sorted_cities]
-    city_counts = [item[1]['count'] for item in sorted_cities]
-    
-    source_labels = [item[0] for item in sorted_sources]
-    source_values = [item[1]['disbursal'] for item in sorted_sources]
-    source_sanction = [item[1]['sanction'] for item in sorted_sources]
-    source_net_disbursal = [item[1]['net_disbursal'] for item in sorted_sources]
-    source_fresh_counts = [item[1]['fresh_count'] for item in sorted_sources]
-    source_reloan_counts = [item[1]['reloan_count'] for item in sorted_sources]
-    
-    # Filter cities dropdown: show only cities from selected states
-    if state_filters:
-        filtered_cities_set = set()
-        for state in state_filters:
-            if state in cities_by_state:
-                filtered_cities_set.update(cities_by_state[state])
-        filtered_cities_for_dropdown = sorted(filtered_cities_set)
-    else:
-        filtered_cities_for_dropdown = sorted(all_cities_for_dropdown)
-    
-    # Fetch Collection Metrics from API - USING SAME DATE RANGE AS DISBURSAL FILTERS
-    collection_metrics = {}
-    
-    # Helper function to aggregate multiple rows of collection metrics
-    def aggregate_collection_metrics(rows, date_from=None, date_to=None):
-        """Aggregate collection metrics from multiple rows into a single dict
-        Filters by date_of_received if date range is provided
-        """
-        if not rows or len(rows) == 0:
-            return {}
-        
-        # Filter rows by date_of_received if date range is provided
-        filtered_rows = []
-        if date_from and date_to:
-            print(f"[Collection Metrics] Filtering collection records by date_of_received: {date_from} to {date_to}")
-            date_from_date = date_from.date() if isinstance(date_from, datetime) else date_from
-            date_to_date = date_to.date() if isinstance(date_to, datetime) else date_to
-            
-            for row in rows:
-                if not isinstance(row, dict):
-                    continue
-                
-                # Try to find date_of_received field (various name variations)
-                date_received = None
-                date_fields = ['date_of_recived', 'date_of_received', 'dateOfReceived', 'date_of_receive', 'dateOfReceive', 
-                              'received_date', 'receivedDate', 'collection_date', 'collectionDate',
-                              'date_received', 'dateReceived']
-                
-                for field in date_fields:
-                    if field in row:
-                        date_received = row[field]
-                        break
-                
-                # If not found, try case-insensitive search
-                if date_received is None:
-                    row_keys_lower = {k.lower(): k for k in row.keys()}
-                    for field_lower in ['date_of_recived', 'date_of_received', 'dateofreceived', 'date_of_receive', 'dateofreceive',
-                                      'received_date', 'receiveddate', 'collection_date', 'collectiondate',
-                                      'date_received', 'datereceived']:
-                        if field_lower in row_keys_lower:
-                            actual_key = row_keys_lower[field_lower]
-                            date_received = row[actual_key]
-                            break
-                
-                # Parse date if found
-                if date_received:
-                    try:
-                        if isinstance(date_received, str):
-                            # Try various date formats
-                            for fmt in ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%d-%m-%Y', '%d/%m/%Y']:
-                                try:
-                                    record_date = datetime.strptime(date_received.split('T')[0], fmt).date()
-                                    break
-                                except:
-                                    continue
-                            else:
-                                # If no format worked, skip this record
-                                print(f"[Collection Metrics] Could not parse date_of_received: {date_received}")
-                                continue
-                        elif isinstance(date_received, datetime):
-                            record_date = date_received.date()
-                        else:
-                            continue
-                        
-                        # Check if date is within range
-                        if date_from_date <= record_date <= date_to_date:
-                            filtered_rows.append(row)
-                    except Exception as e:
-                        print(f"[Collection Metrics] Error parsing date_of_received '{date_received}': {e}")
-                        # Include record if date parsing fails (to be safe)
-                        filtered_rows.append(row)
-                else:
-                    # If no date_of_received field found, include the record (to be safe)
-                    filtered_rows.append(row)
-            
-            print(f"[Collection Metrics] Filtered {len(filtered_rows)} records out of {len(rows)} by date_of_received")
-        else:
-            filtered_rows = rows
-            print(f"[Collection Metrics] No date filtering applied (date_from or date_to not provided)")
-        
-        # Initialize aggregated dict with standard field names
-        aggregated = {
-            'total_collection_amount': 0,
-            'fresh_collection_amount': 0,
-            'reloan_collection_amount': 0,
-            'prepayment_amount': 0,
-            'due_date_amount': 0,
-            'overdue_amount': 0,
-            'total_collection_count': 0,
-            'fresh_collection_count': 0,
-            'reloan_collection_count': 0,
-            'prepayment_count': 0,
-            'due_date_count': 0,
-            'overdue_count': 0
-        }
-        
-        # First, check if rows contain individual records with is_reloan_case field
-        # If so, aggregate by is_reloan_case instead of looking for separate fresh/reloan fields
-        has_is_reloan_case = False
-        for row in filtered_rows:
-            if isinstance(row, dict):
-                # Check for is_reloan_case in various forms
-                if ('is_reloan_case' in row or 
-                    'isReloanCase' in row or 
-                    'is_reloan' in row or
-                    'isReloan' in row):
-                    has_is_reloan_case = True
-                    break
-        
-        if has_is_reloan_case:
-            print(f"[Collection Metrics] Found is_reloan_case field in records, aggregating by loan type...")
-            # Debug: Print first record to see all available fields
-            if filtered_rows and len(filtered_rows) > 0 and isinstance(filtered_rows[0], dict):
-                sample = filtered_rows[0]
-                print(f"[Collection Metrics] ===== SAMPLE RECORD FOR COLLECTION AMOUNT DEBUG =====")
-                print(f"[Collection Metrics] Sample record fields: {list(sample.keys())}")
-                # Show all amount-related fields
-                amount_fields = {k: v for k, v in sample.items() if 'amount' in k.lower() or 'amt' in k.lower()}
-                print(f"[Collection Metrics] All amount-related fields in sample record:")
-                for k, v in sorted(amount_fields.items()):
-                    print(f"[Collection Metrics]   '{k}': {v} (type: {type(v).__name__})")
-                print(f"[Collection Metrics] ======================================================")
-            # Aggregate collection amounts by is_reloan_case
-            for row in filtered_rows:
-                if not isinstance(row, dict):
-                    continue
-                
-                # Get is_reloan_case value (try multiple field name variations)
-                is_reloan = (row.get('is_reloan_case') or 
-                            row.get('isReloanCase') or
-                            row.get('is_reloan') or
-                            row.get('isReloan'))
-                
-                # Handle None, False, or empty string
-                if is_reloan is None:
-                    is_reloan = False
-                elif isinstance(is_reloan, str):
-                    is_reloan = is_reloan.lower() in ['true', '1', 'yes']
-                elif isinstance(is_reloan, (int, float)):
-                    is_reloan = bool(is_reloan)
-                else:
-                    is_reloan = bool(is_reloan)
-                
-                print(f"[Collection Metrics] Record is_reloan_case value: {is_reloan} (type: {type(is_reloan).__name__})")
-                
-                # Try to find collection amount field - ONLY use total_collection_amount (user specified requirement)
-                collection_amount = 0
-                
-                # ONLY look for total_collection_amount - do not use repayment_amount or any other field
-                row_keys_lower = {k.lower(): k for k in row.keys()}
-                
-                # Try exact match first
-                if 'total_collection_amount' in row:
-                    try:
-                        val = float(row['total_collection_amount'] or 0)
-                        collection_amount = val
-                        print(f"[Collection Metrics] Found total_collection_amount (exact): {collection_amount}")
-                    except (ValueError, TypeError) as e:
-                        print(f"[Collection Metrics] Error parsing total_collection_amount: {e}")
-                
-                # If not found, try case-insensitive search
-                if collection_amount == 0 and 'total_collection_amount' in row_keys_lower:
-                    actual_key = row_keys_lower['total_collection_amount']
-                    try:
-                        val = float(row[actual_key] or 0)
-                        collection_amount = val
-                        print(f"[Collection Metrics] Found total_collection_amount (case-insensitive, key='{actual_key}'): {collection_amount}")
-                    except (ValueError, TypeError) as e:
-                        print(f"[Collection Metrics] Error parsing total_collection_amount from '{actual_key}': {e}")
-                
-                # If still not found, log all available fields for debugging
-                if collection_amount == 0:
-                    print(f"[Collection Metrics] ERROR: total_collection_amount not found in record!")
-                    print(f"[Collection Metrics] Available keys: {list(row.keys())}")
-                    # Show all amount-related fields
-                    amount_fields = {k: row[k] for k in row.keys() if 'amount' in k.lower() or 'amt' in k.lower()}
-                    if amount_fields:
-                        print(f"[Collection Metrics] All amount-related fields in this record:")
-                        for af, af_val in sorted(amount_fields.items()):
-                            print(f"[Collection Metrics]   '{af}': {af_val} (type: {type(af_val).__name__})")
-                    print(f"[Collection Metrics] This record will be skipped (collection_amount = 0)")
-                
-                # Only categorize if we found total_collection_amount (skip records where it's 0 or missing)
-                if collection_amount > 0:
-                    # Categorize by is_reloan_case
-                    if is_reloan:
-                        aggregated['reloan_collection_amount'] += collection_amount
-                        aggregated['reloan_collection_count'] += 1
-                        print(f"[Collection Metrics] Added to Reloan: {collection_amount} (total now: {aggregated['reloan_collection_amount']})")
-                    else:
-                        aggregated['fresh_collection_amount'] += collection_amount
-                        aggregated['fresh_collection_count'] += 1
-                        print(f"[Collection Metrics] Added to Fresh: {collection_amount} (total now: {aggregated['fresh_collection_amount']})")
-                    
-                    aggregated['total_collection_amount'] += collection_amount
-                    aggregated['total_collection_count'] += 1
-                else:
-                    print(f"[Collection Metrics] Skipping record - total_collection_amount is 0 or not found")
-            
-            print(f"[Collection Metrics] Aggregated by is_reloan_case - Fresh: ₹{aggregated['fresh_collection_amount']:.2f} ({aggregated['fresh_collection_count']} records), Reloan: ₹{aggregated['reloan_collection_amount']:.2f} ({aggregated['reloan_collection_count']} records)")
-            
-            # Recalculate total_collection_count as sum of Fresh + Reloan (not from counting all records)
-            aggregated['total_collection_count'] = aggregated['fresh_collection_count'] + aggregated['reloan_collection_count']
-            aggregated['total_collection_amount'] = aggregated['fresh_collection_amount'] + aggregated['reloan_collection_amount']
-            print(f"[Collection Metrics] Recalculated total_collection_count: {aggregated['total_collection_count']} (Fresh {aggregated['fresh_collection_count']} + Reloan {aggregated['reloan_collection_count']})")
-            
-            # Continue with other field mappings for prepayment, overdue, etc.
-            # But skip fresh/reloan field matching since we already calculated them
-            skip_fresh_reloan_fields = True
-        else:
-            skip_fresh_reloan_fields = False
-            print(f"[Collection Metrics] No is_reloan_case field found, using field name matching instead...")
-        
-        # Field name mappings - map various API field names to our standard names
-        # IMPORTANT: For total_collection_amount, fresh_collection_amount, and reloan_collection_amount,
-        # ONLY use total_collection_amount field (user requirement - do not use repayment_amount or collection_amount)
-        field_mappings = {
-            # Amount fields - ONLY use total_collection_amount variations, NO repayment_amount or collection_amount
-            'total_collection_amount': ['total_collection_amount', 'Total_Collection_Amount', 'TOTAL_COLLECTION_AMOUNT', 'totalCollectionAmount', 'TotalCollectionAmount'],
-            'fresh_collection_amount': ['fresh_collection_amount', 'freshCollectionAmount', 'fresh_amount', 'fresh', 'freshCollection', 'fresh_collection', 'freshCollectionAmt', 'fresh_collection_amt', 'freshAmt', 'fresh_amt'],
-            'reloan_collection_amount': ['reloan_collection_amount', 'reloanCollectionAmount', 'reloan_amount', 'reloan', 'reloanCollection', 'reloan_collection', 'reloanCollectionAmt', 'reloan_collection_amt', 'reloanAmt', 'reloan_amt'],
-            'prepayment_amount': ['prepayment_amount', 'prepaymentAmount', 'prepayment', 'prepaymentAmt', 'prepayment_amt'],
-            'due_date_amount': ['due_date_amount', 'dueDateAmount', 'on_time_collection', 'onTimeCollection', 'on_time_amount', 'onTimeAmount', 'ontime_amount', 'ontimeAmount', 'onTime_amount', 'on_time_collection_amount', 'onTimeCollectionAmount', 'due_date_collection', 'dueDateCollection', 'on_time_amount_collection', 'onTimeAmountCollection'],
-            'overdue_amount': ['overdue_amount', 'overdueAmount', 'overdue_collection', 'overdueCollection', 'overdue_collection_amount', 'overdueCollectionAmount'],
-            # Count fields
-            'total_collection_count': ['total_collection_count', 'totalCollectionCount', 'total_count', 'totalCount', 'total', 'totalCollectionCnt', 'total_collection_cnt'],
-            'fresh_collection_count': ['fresh_collection_count', 'freshCollectionCount', 'fresh_count', 'freshCount', 'fresh', 'freshCollection', 'fresh_collection', 'freshCollectionCnt', 'fresh_collection_cnt', 'freshCnt', 'fresh_cnt'],
-            'reloan_collection_count': ['reloan_collection_count', 'reloanCollectionCount', 'reloan_count', 'reloanCount', 'reloan', 'reloanCollection', 'reloan_collection', 'reloanCollectionCnt', 'reloan_collection_cnt', 'reloanCnt', 'reloan_cnt'],
-            'prepayment_count': ['prepayment_count', 'prepaymentCount', 'prepayment', 'prepaymentCnt', 'prepayment_cnt'],
-            'due_date_count': ['due_date_count', 'dueDateCount', 'on_time_count', 'onTimeCount', 'onTime', 'ontime', 'ontime_count', 'onTime_count', 'on_time_collection_count', 'onTimeCollectionCount', 'due_date_collection_count', 'dueDateCollectionCount'],
-            'overdue_count': ['overdue_count', 'overdueCount', 'overdue', 'overdueCnt', 'overdue_cnt']
-        }
-        
-        for row in filtered_rows:
-            if not isinstance(row, dict):
-                continue
-            
-            # Create case-insensitive lookup
-            row_keys_lower = {k.lower(): k for k in row.keys()}
-            
-            # For each standard field, try to find it in the row using all possible variations
-            # Process overdue fields FIRST to avoid conflicts with on_time fields
-            field_order = ['overdue_amount', 'overdue_count', 'due_date_amount', 'due_date_count', 
-                          'total_collection_amount', 'fresh_collection_amount', 'reloan_collection_amount', 
-                          'prepayment_amount', 'total_collection_count', 'fresh_collection_count', 
-                          'reloan_collection_count', 'prepayment_count']
-            
-            # Process fields in specific order
-            for standard_field in field_order:
-                # Skip fresh/reloan fields if we already calculated them from is_reloan_case
-                if skip_fresh_reloan_fields and ('fresh' in standard_field or 'reloan' in standard_field):
-                    continue
-                    
-                if standard_field not in field_mappings:
-                    continue
-                variations = field_mappings[standard_field]
-                found = False
-                for variation in variations:
-                    # For total_collection_amount, fresh_collection_amount, and reloan_collection_amount,
-                    # ONLY accept exact matches - do not use repayment_amount or collection_amount
-                    if standard_field in ['total_collection_amount', 'fresh_collection_amount', 'reloan_collection_amount']:
-                        # Skip any variation that contains 'repayment' or is not 'total_collection_amount' for total
-                        if standard_field == 'total_collection_amount':
-                            # ONLY accept total_collection_amount variations, reject repayment_amount, collection_amount, etc.
-                            if 'repayment' in variation.lower() or ('collection_amount' in variation.lower() and 'total' not in variation.lower()):
-                                continue
-                        # For fresh/reloan, we still use the variations but skip if it contains repayment
-                        elif 'repayment' in variation.lower():
-                            continue
-                    
-                    # Try exact match first
-                    if variation in row:
-                        value = row[variation]
-                        if value is not None and value != '':
-                            try:
-                                if 'count' in standard_field:
-                                    aggregated[standard_field] += int(float(value))
-                                else:
-                                    aggregated[standard_field] += float(value)
-                                found = True
-                                print(f"[Collection Metrics] Found {standard_field} in '{variation}': {value}")
-                                break  # Found it, move to next field
-                            except (ValueError, TypeError):
-                                pass
-                    # Try case-insensitive match
-                    elif variation.lower() in row_keys_lower:
-                        actual_key = row_keys_lower[variation.lower()]
-                        # For total_collection_amount, reject if actual_key contains 'repayment' or is not total_collection_amount
-                        if standard_field == 'total_collection_amount':
-                            if 'repayment' in actual_key.lower() or ('collection_amount' in actual_key.lower() and 'total' not in actual_key.lower()):
-                                print(f"[Collection Metrics] Rejecting '{actual_key}' for total_collection_amount - contains repayment or is not total_collection_amount")
-                                continue
-                        # For fresh/reloan, reject if contains repayment
-                        elif standard_field in ['fresh_collection_amount', 'reloan_collection_amount']:
-                            if 'repayment' in actual_key.lower():
-                                print(f"[Collection Metrics] Rejecting '{actual_key}' for {standard_field} - contains repayment")
-                                continue
-                        
-                        value = row[actual_key]
-                        # For overdue fields, make sure the key doesn't contain on_time/due_date
-                        if 'overdue' in standard_field:
-                            if 'on_time' in actual_key.lower() or 'ontime' in actual_key.lower() or 'due_date' in actual_key.lower() or 'duedate' in actual_key.lower():
-                                continue  # Skip this match, it's not an overdue field
-                        # For due_date fields, make sure the key doesn't contain overdue
-                        elif 'due_date' in standard_field:
-                            if 'overdue' in actual_key.lower():
-                                continue  # Skip this match, it's not an on_time field
-                        
-                        if value is not None and value != '':
-                            try:
-                                if 'count' in standard_field:
-                                    aggregated[standard_field] += int(float(value))
-                                else:
-                                    aggregated[standard_field] += float(value)
-                                found = True
-                                print(f"[Collection Metrics] Found {standard_field} in '{actual_key}' (case-insensitive): {value}")
-                                break  # Found it, move to next field
-                            except (ValueError, TypeError):
-                                pass
-                
-                # If not found with variations, try partial matching for "on_time" or "ontime" in any key
-                # BUT ONLY for due_date fields, and make sure we exclude overdue fields
-                if not found and 'due_date' in standard_field:
-                    for key, value in row.items():
-                        key_lower = key.lower()
-                        # Check if key contains "on_time", "ontime", "due_date", or "duedate"
-                        # BUT EXCLUDE any keys that contain "overdue" to avoid mixing them up
-                        if (('on_time' in key_lower or 'ontime' in key_lower or 'due_date' in key_lower or 'duedate' in key_lower) 
-                            and 'overdue' not in key_lower and value is not None and value != ''):
-                            try:
-                                if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower):
-                                    aggregated[standard_field] += int(float(value))
-                                    found = True
-                                    break
-                                elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                    aggregated[standard_field] += float(value)
-                                    found = True
-                                    break
-                            except (ValueError, TypeError):
-                                pass
-                
-                # Add partial matching for fresh fields - check any field containing "fresh"
-                if not found and 'fresh' in standard_field:
-                    for key, value in row.items():
-                        key_lower = key.lower()
-                        # Check if key contains "fresh" (but not "refresh" or other words containing "fresh")
-                        if ('fresh' in key_lower 
-                            and 'refresh' not in key_lower
-                            and value is not None and value != ''):
-                            try:
-                                if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
-                                    aggregated[standard_field] += int(float(value))
-                                    found = True
-                                    print(f"[Collection Metrics] Found fresh field via partial match: '{key}' = {value}")
-                                    break
-                                elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                    aggregated[standard_field] += float(value)
-                                    found = True
-                                    print(f"[Collection Metrics] Found fresh field via partial match: '{key}' = {value}")
-                                    break
-                            except (ValueError, TypeError):
-                                pass
-                
-                # Add partial matching for reloan fields - check any field containing "reloan"
-                if not found and 'reloan' in standard_field:
-                    for key, value in row.items():
-                        key_lower = key.lower()
-                        # Check if key contains "reloan"
-                        if ('reloan' in key_lower 
-                            and value is not None and value != ''):
-                            try:
-                                if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
-                                    aggregated[standard_field] += int(float(value))
-                                    found = True
-                                    print(f"[Collection Metrics] Found reloan field via partial match: '{key}' = {value}")
-                                    break
-                                elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                    aggregated[standard_field] += float(value)
-                                    found = True
-                                    print(f"[Collection Metrics] Found reloan field via partial match: '{key}' = {value}")
-                                    break
-                            except (ValueError, TypeError):
-                                pass
-        
-        # At the end, recalculate total_collection_count as sum of Fresh + Reloan
-        # This ensures it's always correct regardless of how it was calculated
-        if aggregated['fresh_collection_count'] > 0 or aggregated['reloan_collection_count'] > 0:
-            aggregated['total_collection_count'] = aggregated['fresh_collection_count'] + aggregated['reloan_collection_count']
-            aggregated['total_collection_amount'] = aggregated['fresh_collection_amount'] + aggregated['reloan_collection_amount']
-            print(f"[Collection Metrics] Final recalculation - total_collection_count: {aggregated['total_collection_count']} (Fresh {aggregated['fresh_collection_count']} + Reloan {aggregated['reloan_collection_count']})")
-        
-        return aggregated
-    
-    try:
-        collection_api_url = 'https://backend.blinkrloan.com/insights/v2/collection_metrics'
-        # Use the SAME date_from and date_to from filters (same as disbursal API)
-        collection_params = {
-            'startDate': date_from.strftime('%Y-%m-%d'),
-            'endDate': date_to.strftime('%Y-%m-%d')
-        }
-        collection_headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        
-        # Use EXACT SAME token method as disbursal API (which is working)
-        token = request.session.get('blinkr_token')
-        if token:
-            collection_headers['Authorization'] = f'Bearer {token}'
-        else:
-            # Fallback to API key from settings/environment (same as disbursal)
-            api_key = os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
-            if api_key:
-                collection_headers['Authorization'] = f'Bearer {api_key}'
-        
-        # Reduced timeout for faster page load (5 seconds instead of 30)
-        # If it times out, we'll use empty collection_metrics and let JavaScript handle it
-        try:
-            collection_response = requests.get(collection_api_url, params=collection_params, headers=collection_headers, timeout=5)
-        except requests.exceptions.Timeout:
-            print(f"[Collection Metrics] API request timed out after 5 seconds - using empty metrics")
-            collection_metrics = {}
-            collection_response = None
-        
-        if collection_response and collection_response.status_code == 200:
-            try:
-                collection_data = collection_response.json()
-                
-                # Handle different response structures (optimized - minimal logging)
-                if isinstance(collection_data, dict):
-                    # Check for error messages first
-                    if 'error' in collection_data:
-                        collection_metrics = {}
-                    elif 'message' in collection_data:
-                        message = collection_data.get('message', '')
-                        if 'not authorised' in str(message).lower() or 'unauthorized' in str(message).lower() or 'error' in str(message).lower():
-                            print(f"[Collection Metrics] API Error: {message}")
-                            collection_metrics = {}
-                    
-                    # Check if data is nested in 'data' key
-                    if 'data' in collection_data and not collection_metrics:
-                        data_value = collection_data['data']
-                        if isinstance(data_value, list) and len(data_value) > 0:
-                            # Aggregate all rows instead of just taking the first
-                            print(f"[Collection Metrics] Found {len(data_value)} rows in 'data', aggregating all...")
-                            collection_metrics = aggregate_collection_metrics(data_value, date_from, date_to)
-                        elif isinstance(data_value, dict):
-                            collection_metrics = data_value
-                        else:
-                            collection_metrics = {}
-                    elif 'result' in collection_data and not collection_metrics:
-                        result_value = collection_data['result']
-                        if isinstance(result_value, list) and len(result_value) > 0:
-                            # Aggregate all rows instead of just taking the first
-                            print(f"[Collection Metrics] Found {len(result_value)} rows in 'result', aggregating all...")
-                            collection_metrics = aggregate_collection_metrics(result_value, date_from, date_to)
-                        else:
-                            collection_metrics = result_value if isinstance(result_value, dict) else {}
-                    elif 'metrics' in collection_data and not collection_metrics:
-                        metrics_value = collection_data['metrics']
-                        if isinstance(metrics_value, list) and len(metrics_value) > 0:
-                            # Aggregate all rows instead of just taking the first
-                            print(f"[Collection Metrics] Found {len(metrics_value)} rows in 'metrics', aggregating all...")
-                            collection_metrics = aggregate_collection_metrics(metrics_value)
-                        else:
-                            collection_metrics = metrics_value if isinstance(metrics_value, dict) else {}
-                    elif not collection_metrics:
-                        collection_metrics = collection_data
-                        print(f"[Collection Metrics] Using collection_data directly as metrics: {list(collection_metrics.keys()) if isinstance(collection_metrics, dict) else 'Not a dict'}")
-                elif isinstance(collection_data, list) and len(collection_data) > 0:
-                    # Aggregate all rows instead of just taking the first
-                    print(f"[Collection Metrics] Found {len(collection_data)} rows in list, aggregating all...")
-                    # Debug: Print sample row to see what fields are actually in the API response
-                    if collection_data and len(collection_data) > 0:
-                        print(f"[Collection Metrics] Sample row keys: {list(collection_data[0].keys()) if isinstance(collection_data[0], dict) else 'Not a dict'}")
-                        print(f"[Collection Metrics] Sample row (first 1000 chars): {str(collection_data[0])[:1000] if isinstance(collection_data[0], dict) else collection_data[0]}")
-                        collection_metrics = aggregate_collection_metrics(collection_data, date_from, date_to)
-                    # Debug: Print what fields were found
-                    if collection_metrics:
-                        print(f"[Collection Metrics] Aggregated metrics keys: {list(collection_metrics.keys())}")
-                        print(f"[Collection Metrics] Fresh amount: {collection_metrics.get('fresh_collection_amount', 0)}, Fresh count: {collection_metrics.get('fresh_collection_count', 0)}")
-                        print(f"[Collection Metrics] Reloan amount: {collection_metrics.get('reloan_collection_amount', 0)}, Reloan count: {collection_metrics.get('reloan_collection_count', 0)}")
-                        print(f"[Collection Metrics] Total amount: {collection_metrics.get('total_collection_amount', 0)}, Total count: {collection_metrics.get('total_collection_count', 0)}")
-                else:
-                    collection_metrics = {}
-            except Exception as e:
-                print(f"[Collection Metrics] Error parsing JSON: {e}")
-                collection_metrics = {}
-        else:
-            print(f"[Collection Metrics] API Error: {collection_response.status_code}")
-            collection_metrics = {}
-    except requests.exceptions.Timeout:
-        print(f"[Collection Metrics] API request timed out")
-        collection_metrics = {}
-    except requests.exceptions.RequestException as e:
-        print(f"[Collection Metrics] API request failed: {e}")
-        collection_metrics = {}
-    except Exception as e:
-        print(f"[Collection Metrics] Unexpected error: {e}")
-        collection_metrics = {}
-    
-        # Use collection metrics API values directly - don't override with calculations
-        # The API should return Fresh/Reloan amounts directly
-        if collection_metrics:
-            # Get Fresh and Reloan values first
-            fresh_collection_amt = collection_metrics.get('fresh_collection_amount', 0) or 0
-            reloan_collection_amt = collection_metrics.get('reloan_collection_amount', 0) or 0
-            fresh_collection_cnt = collection_metrics.get('fresh_collection_count', 0) or 0
-            reloan_collection_cnt = collection_metrics.get('reloan_collection_count', 0) or 0
-            
-            # Calculate total count as sum of Fresh + Reloan (not from total_collection_count which might include other categories)
-            total_collection_cnt = fresh_collection_cnt + reloan_collection_cnt
-            
-            # Always calculate total amount as sum of Fresh + Reloan (even if one is zero)
-            total_collection_amt = fresh_collection_amt + reloan_collection_amt
-            print(f"[Collection Metrics] Calculated total amount from Fresh ({fresh_collection_amt:.2f}) + Reloan ({reloan_collection_amt:.2f}) = ₹{total_collection_amt:.2f}")
-            
-            print(f"[Collection Metrics] API Response Values:")
-            print(f"[Collection Metrics]   Total: ₹{total_collection_amt:.2f} ({total_collection_cnt} count = Fresh {fresh_collection_cnt} + Reloan {reloan_collection_cnt})")
-            print(f"[Collection Metrics]   Fresh: ₹{fresh_collection_amt:.2f} ({fresh_collection_cnt} count)")
-            print(f"[Collection Metrics]   Reloan: ₹{reloan_collection_amt:.2f} ({reloan_collection_cnt} count)")
-            print(f"[Collection Metrics] All collection_metrics keys: {list(collection_metrics.keys())}")
-            
-            # Log warning if Fresh/Reloan are zero but total exists
-            if total_collection_amt > 0 and (fresh_collection_amt == 0 and reloan_collection_amt == 0):
-                print(f"[Collection Metrics] WARNING: Fresh/Reloan amounts are zero in API response but total exists.")
-                print(f"[Collection Metrics] The collection metrics API should return Fresh/Reloan breakdown.")
-            
-            print(f"[Collection Metrics] Final values being used - Total: ₹{total_collection_amt:.2f} ({total_collection_cnt} count), Fresh: ₹{fresh_collection_amt:.2f} ({fresh_collection_cnt} count), Reloan: ₹{reloan_collection_amt:.2f} ({reloan_collection_cnt} count)")
-            
-            # Update collection_metrics dict with recalculated values
-            collection_metrics['total_collection_count'] = total_collection_cnt
-            collection_metrics['total_collection_amount'] = total_collection_amt
-            collection_metrics['fresh_collection_count'] = fresh_collection_cnt
-            collection_metrics['reloan_collection_count'] = reloan_collection_cnt
-            collection_metrics['fresh_collection_amount'] = fresh_collection_amt
-            collection_metrics['reloan_collection_amount'] = reloan_collection_amt
-    
     context = {
-        # KPI Metrics - Total Records
-        'total_records': total_records,
-        'fresh_count': fresh_count,
-        'reloan_count': reloan_count,
-        'source_count': source_count,
-        'source_name_counts': list(zip(source_labels, source_counts)),  # For Source card: [(name, count), ...]
-        
-        # KPI Metrics - Loan Amounts
-        'total_loan_amount': total_loan_amount,
-        'fresh_loan_amount': fresh_loan_amount,
-        'reloan_loan_amount': reloan_loan_amount,
-        
-        # KPI Metrics - Disbursal Amounts
-        'total_disbursal_amount': total_disbursal_amount,
-        'fresh_disbursal_amount': fresh_disbursal_amount,
-        'reloan_disbursal_amount': reloan_disbursal_amount,
-        
-        # KPI Metrics - Processing Fee
-        'processing_fee': processing_fee,
-        'fresh_processing_fee': fresh_processing_fee,
-        'reloan_processing_fee': reloan_processing_fee,
-        
-        # KPI Metrics - Interest Amount
-        'interest_amount': interest_amount,
-        'fresh_interest_amount': fresh_interest_amount,
-        'reloan_interest_amount': reloan_interest_amount,
-        
-        # KPI Metrics - Repayment Amount
-        'repayment_amount': repayment_amount,
-        'fresh_repayment_amount': fresh_repayment_amount,
-        'reloan_repayment_amount': reloan_repayment_amount,
-        
-        # KPI Metrics - Average Tenure
-        'average_tenure': round(total_tenure / tenure_count, 1) if tenure_count > 0 else 0,
-        'fresh_average_tenure': round(fresh_tenure_sum / fresh_tenure_count, 1) if fresh_tenure_count > 0 else 0,
-        'reloan_average_tenure': round(reloan_tenure_sum / reloan_tenure_count, 1) if reloan_tenure_count > 0 else 0,
-        
-        # Chart Data - State Distribution
-        'state_labels': json.dumps(state_labels),
-        'state_values': json.dumps(state_values),
-        'state_sanction': json.dumps(state_sanction),
-        'state_net_disbursal': json.dumps(state_net_disbursal),
-        'state_counts': json.dumps(state_counts),
-        
-        # Chart Data - City Distribution
-        'city_labels': json.dumps(city_labels),
-        'city_values': json.dumps(city_values),
-        'city_sanction': json.dumps(city_sanction),
-        'city_net_disbursal': json.dumps(city_net_disbursal),
-        'city_counts': json.dumps(city_counts),
-        
-        # Chart Data - Lead Source Distribution
-        'source_labels': json.dumps(source_labels),
-        'source_values': json.dumps(source_values),
-        'source_sanction': json.dumps(source_sanction),
-        'source_net_disbursal': json.dumps(source_net_disbursal),
-        'source_counts': json.dumps(source_counts),
-        'source_fresh_counts': json.dumps(source_fresh_counts),
-        'source_reloan_counts': json.dumps(source_reloan_counts),
-        
+        'deferred_sections': True,
+        'deferred_page': page,
+        'today_date': datetime.now(ist).date().strftime('%Y-%m-%d'),
+    }
+    context.update(shell_context)
+    return render(request, template_name, context)
+
+
+def _disbursal_cache_key(request):
+    """Same range, state/city selections and auth scope => same cached result."""
+    f = disbursal.DisbursalFilters.from_request(request)
+    return 'disbursal:%s:%s:%s:%s:%s' % (
+        f.date_from.isoformat(),
+        f.date_to.isoformat(),
+        '|'.join(f.states),
+        '|'.join(f.cities),
+        _auth_scope(request),
+    )
+
+
+def _disbursal_collection_metrics(request):
+    """Collection metrics of the request's range (cached apart from the disbursal result)."""
+    return disbursal.collection_metrics(
+        disbursal.DisbursalFilters.from_request(request), request.session.get('blinkr_token'),
+        force=_force_refresh(request))
+
+
+def _disbursal_kpis(result):
+    """KPI card values (names shared by the page context and /api/disbursal-data/)."""
+    return {
+        # Total Records
+        'total_records': result.loans.total,
+        'fresh_count': result.loans.fresh,
+        'reloan_count': result.loans.reloan,
+        # Loan Amounts
+        'total_loan_amount': result.loan_amount.total,
+        'fresh_loan_amount': result.loan_amount.fresh,
+        'reloan_loan_amount': result.loan_amount.reloan,
+        # Disbursal Amounts
+        'total_disbursal_amount': result.disbursal_amount.total,
+        'fresh_disbursal_amount': result.disbursal_amount.fresh,
+        'reloan_disbursal_amount': result.disbursal_amount.reloan,
+        # Processing Fee
+        'processing_fee': result.processing_fee.total,
+        'fresh_processing_fee': result.processing_fee.fresh,
+        'reloan_processing_fee': result.processing_fee.reloan,
+        # Interest Amount
+        'interest_amount': result.interest_amount.total,
+        'fresh_interest_amount': result.interest_amount.fresh,
+        'reloan_interest_amount': result.interest_amount.reloan,
+        # Repayment Amount
+        'repayment_amount': result.repayment_amount.total,
+        'fresh_repayment_amount': result.repayment_amount.fresh,
+        'reloan_repayment_amount': result.repayment_amount.reloan,
+        # Average Tenure
+        'average_tenure': result.average_tenure.total,
+        'fresh_average_tenure': result.average_tenure.fresh,
+        'reloan_average_tenure': result.average_tenure.reloan,
+    }
+
+
+def _disbursal_chart_series(result):
+    """Chart series by state, city and lead source (as lists)."""
+    series = {}
+    for prefix, breakdown in (('state', result.by_state), ('city', result.by_city), ('source', result.by_source)):
+        series.update({
+            f'{prefix}_labels': breakdown.labels,
+            f'{prefix}_values': breakdown.disbursal,
+            f'{prefix}_sanction': breakdown.sanction,
+            f'{prefix}_net_disbursal': breakdown.net_disbursal,
+            f'{prefix}_counts': breakdown.counts,
+        })
+    series['source_fresh_counts'] = result.by_source.fresh_counts
+    series['source_reloan_counts'] = result.by_source.reloan_counts
+    return series
+
+
+def _present_disbursal_summary(request, result):
+    """Disbursal Summary template context from the shared disbursal result."""
+    collection_metrics = _disbursal_collection_metrics(request)
+    return {
+        **_disbursal_kpis(result),
+        'source_count': result.source_count,
+        'source_name_counts': list(zip(result.by_source.labels, result.by_source.counts)),  # For Source card: [(name, count), ...]
+
+        # Chart Data - JSON strings for the template
+        **{key: json.dumps(values) for key, values in _disbursal_chart_series(result).items()},
+
         # Filter Options
-        'states': sorted(all_states),
-        'cities': filtered_cities_for_dropdown,
-        
-        # Cities by state mapping for dynamic filtering (convert sets to lists for JSON)
-        'cities_by_state_json': json.dumps({state: sorted(cities) for state, cities in cities_by_state.items()}),
-        
+        'states': result.states,
+        'cities': result.cities,
+
+        # Cities by state mapping for dynamic filtering
+        'cities_by_state_json': json.dumps(result.cities_by_state),
+
         # Last Updated
-        'last_updated': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
-        
+        'last_updated': result.computed_at,
+
         # Today's date for default date range
-        'today_date': today_date.strftime('%Y-%m-%d'),
-        
+        'today_date': datetime.now(pytz.timezone('Asia/Kolkata')).date().strftime('%Y-%m-%d'),
+
         # Collection Metrics - Convert to JSON string for template
         'collection_metrics': collection_metrics,
-        # Include debug info if empty
         'collection_metrics_json': json.dumps(collection_metrics) if collection_metrics else '{}',
-        'collection_metrics_debug': 'EMPTY' if not collection_metrics or len(collection_metrics) == 0 else 'HAS_DATA',
+        'collection_metrics_debug': 'EMPTY' if not collection_metrics else 'HAS_DATA',
+
+        'api_error': result.api_error,
     }
-    
-    # Debug: Print collection_metrics before rendering
-    print(f"=== COLLECTION METRICS DEBUG ===")
-    print(f"Collection Metrics in context: {collection_metrics}")
-    print(f"Collection Metrics type: {type(collection_metrics)}")
-    if isinstance(collection_metrics, dict):
-        print(f"Collection Metrics keys: {list(collection_metrics.keys())}")
-        for key, value in collection_metrics.items():
-            print(f"  {key}: {value} (type: {type(value)})")
-    print(f"Collection Metrics JSON: {json.dumps(collection_metrics) if collection_metrics else '{}'}")
-    print(f"================================")
-    
-    return render(request, 'dashboard/pages/disbursal_summary.html', context)
 
 
 @login_required
 @never_cache
-def disbursal_data_api(request):
+@require_page_access
+@upstream.request_deadline
+def disbursal_summary(request):
     """
-    API endpoint that returns JSON data for disbursal summary
-    Used for AJAX refresh without page reload
+    Disbursal Summary page view (shell first; sections load via page_section_api)
     """
-    from django.http import JsonResponse
-    
-    # Get filter parameters from request
-    date_from_str = request.GET.get('date_from', '')
-    date_to_str = request.GET.get('date_to', '')
-    state_filters = request.GET.getlist('state')
-    city_filters = request.GET.getlist('city')
-    
-    # Filter out empty strings
-    state_filters = [s for s in state_filters if s]
-    city_filters = [c for c in city_filters if c]
-    
-    # Set up timezone (IST - Asia/Kolkata)
-    ist = pytz.timezone('Asia/Kolkata')
-    
-    # Parse date filters
-    date_from = None
-    date_to = None
-    
-    if date_from_str:
+    return _render_shell_first(request, 'disbursal_summary', 'dashboard/pages/disbursal_summary.html')
+
+
+# --- Versioned delta payloads for the auto-refresh endpoint ---
+# Each full payload is stored under a content hash (its "version"). The client sends
+# ?since=<version> on the next refresh and only receives the keys that changed, with
+# same-length chart series sent as [[index, value], ...] patches instead of whole arrays.
+DELTA_SNAPSHOT_TTL = 600  # seconds; a snapshot only needs to outlive a few refresh cycles
+DELTA_VOLATILE_KEYS = ('last_updated',)
+
+
+def _payload_version(payload):
+    """Stable short hash of a payload, ignoring keys that change on every response."""
+    stable = {k: v for k, v in payload.items() if k not in DELTA_VOLATILE_KEYS}
+    encoded = json.dumps(stable, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def _series_patch(old_series, new_series):
+    """Return [[index, value], ...] for changed points, or None if the series must be resent."""
+    if not isinstance(old_series, list) or len(old_series) != len(new_series):
+        return None
+    return [[i, new] for i, (old, new) in enumerate(zip(old_series, new_series)) if old != new]
+
+
+def _delta_payload(request, payload, namespace):
+    """
+    Wrap a JSON payload in a versioned envelope.
+    Without ?since (or when the base snapshot expired) the full payload is returned with
+    'delta': False; otherwise only changed keys ('changed'), series patches ('patches') and
+    the keys the payload no longer has ('removed').
+    """
+    version = _payload_version(payload)
+    try:
+        cache.set(f'{namespace}:snapshot:{version}', payload, timeout=DELTA_SNAPSHOT_TTL)
+    except Exception:
+        pass
+
+    since = (request.GET.get('since') or '').strip()
+    previous = None
+    if since and since != version:
         try:
-            date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    
-    if date_to_str:
+            previous = cache.get(f'{namespace}:snapshot:{since}')
+        except Exception:
+            previous = None
+
+    if since != version and previous is None:
+        return {**payload, 'version': version, 'delta': False}
+
+    changed = {}
+    patches = {}
+    removed = []
+    if previous is not None:
+        removed = sorted(previous.keys() - payload.keys() - set(DELTA_VOLATILE_KEYS))
+        for key, value in payload.items():
+            if key in DELTA_VOLATILE_KEYS or (key in previous and previous[key] == value):
+                continue
+            if isinstance(value, list):
+                patch = _series_patch(previous.get(key), value)
+                if patch is not None:
+                    patches[key] = patch
+                    continue
+            changed[key] = value
+
+    return {
+        'version': version,
+        'base_version': since,
+        'delta': True,
+        'changed': changed,
+        'patches': patches,
+        'removed': removed,
+        'last_updated': payload.get('last_updated'),
+    }
+
+
+# Sections the disbursal data API can return (?sections=kpis,state,city,source,collection,daily,distributions)
+DISBURSAL_DATA_SECTIONS = ('kpis', 'state', 'city', 'source', 'collection', 'daily', 'distributions')
+
+
+def _requested_sections(request, available):
+    """Parse ?sections=a,b (repeatable). Missing, empty or unknown-only values mean all sections."""
+    raw = ','.join(request.GET.getlist('sections'))
+    requested = {part.strip().lower() for part in raw.split(',') if part.strip()}
+    requested &= set(available)
+    return requested or set(available)
+
+
+def _requested_bins(request):
+    """Histogram edges from ?bins=loan_amount:5000,10000,20000 (repeatable; invalid entries are skipped)."""
+    bins = {}
+    for raw in request.GET.getlist('bins'):
+        name, _, edges = raw.partition(':')
         try:
-            date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
+            bins[name.strip()] = sorted({float(edge) for edge in edges.split(',') if edge.strip()})
         except ValueError:
-            pass
-    
-    # Set default dates if not provided (today only in IST)
-    now_ist = datetime.now(ist)
-    if not date_from:
-        date_from = now_ist.date()
-    if not date_to:
-        date_to = now_ist.date()
-    
-    # Build API URL with startDate and endDate parameters
-    api_url = 'https://backend.blinkrloan.com/insights/v2/disbursal'
-    params = {
-        'startDate': date_from.strftime('%Y-%m-%d'),
-        'endDate': date_to.strftime('%Y-%m-%d')
+            continue
+    return bins
+
+
+def _disbursal_distributions(result, bins=None):
+    """p50 / p90 / p99 (and histograms for the requested bins) of the disbursal quantile sketches."""
+    distributions = {}
+    for name, sketch in (result.distributions or {}).items():
+        distributions[name] = sketch.summary()
+        if bins and bins.get(name):
+            counts, sums = sketch.histogram(bins[name])
+            distributions[name]['histogram'] = {'edges': bins[name], 'counts': counts, 'sums': sums}
+    return distributions
+
+
+def _disbursal_data_sections(request, result, sections):
+    """section -> payload of /api/disbursal-data/ for the requested sections only."""
+    series = _disbursal_chart_series(result)
+    builders = {
+        'kpis': lambda: _disbursal_kpis(result),
+        'state': lambda: {key: series[key] for key in ('state_labels', 'state_values', 'state_sanction', 'state_counts')},
+        'city': lambda: {key: series[key] for key in ('city_labels', 'city_values', 'city_sanction', 'city_counts')},
+        'source': lambda: {
+            'source_count': result.source_count,
+            **{key: series[key] for key in (
+                'source_labels', 'source_values', 'source_sanction', 'source_counts',
+                'source_fresh_counts', 'source_reloan_counts',
+            )},
+        },
+        # Its own upstream call (cached separately): only made when the section is requested
+        'collection': lambda: {'collection_metrics': _disbursal_collection_metrics(request)},
+        'daily': lambda: {'daily': result.daily or {}},
+        'distributions': lambda: {'distributions': _disbursal_distributions(result, _requested_bins(request))},
     }
-    
-    # Fetch data from API
+    return {section: builders[section]() for section in DISBURSAL_DATA_SECTIONS if section in sections}
+
+
+def _cached_disbursal_result(request):
+    """
+    (result, None) from the cached disbursal computation shared with the Disbursal Summary
+    page, or (None, JsonResponse) with the error.
+    """
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        
-        # Use token from session
-        token = request.session.get('blinkr_token')
-        if token:
-            headers['Authorization'] = f'Bearer {token}'
-        else:
-            api_key = os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
-            if api_key:
-                headers['Authorization'] = f'Bearer {api_key}'
-        
-        response = requests.get(api_url, params=params, headers=headers, timeout=30)
-        
-        if response.status_code != 200:
-            return JsonResponse({'error': f'API returned status {response.status_code}'}, status=500)
-        
-        try:
-            api_data = response.json()
-        except:
-            return JsonResponse({'error': 'Invalid JSON response from API'}, status=500)
-        
-        # Extract records
-        if isinstance(api_data, list):
-            records = api_data
-        elif isinstance(api_data, dict):
-            if 'message' in api_data or 'error' in api_data:
-                return JsonResponse({'error': api_data.get('message', api_data.get('error', 'Unknown error'))}, status=400)
-            records = api_data.get('result', api_data.get('data', api_data.get('records', api_data.get('disbursals', api_data.get('items', [])))))
-        else:
-            records = []
-        
-        if not isinstance(records, list):
-            records = []
-        
-        # Apply state and city filters
-        if state_filters:
-            records = [r for r in records if isinstance(r, dict) and r.get('state', '').strip() in state_filters]
-        if city_filters:
-            records = [r for r in records if isinstance(r, dict) and r.get('city', '').strip() in city_filters]
-        
-        # Process data (same logic as disbursal_summary view)
-        total_records = len(records)
-        fresh_count = 0
-        reloan_count = 0
-        
-        total_loan_amount = 0
-        fresh_loan_amount = 0
-        reloan_loan_amount = 0
-        
-        total_disbursal_amount = 0
-        fresh_disbursal_amount = 0
-        reloan_disbursal_amount = 0
-        
-        processing_fee = 0
-        fresh_processing_fee = 0
-        reloan_processing_fee = 0
-        
-        interest_amount = 0
-        fresh_interest_amount = 0
-        reloan_interest_amount = 0
-        
-        repayment_amount = 0
-        fresh_repayment_amount = 0
-        reloan_repayment_amount = 0
-        
-        total_tenure = 0
-        tenure_count = 0
-        fresh_tenure_sum = 0
-        fresh_tenure_count = 0
-        reloan_tenure_sum = 0
-        reloan_tenure_count = 0
-        
-        state_data = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'net_disbursal': 0, 'count': 0})
-        city_data = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'net_disbursal': 0, 'count': 0})
-        source_data = defaultdict(lambda: {'disbursal': 0, 'sanction': 0, 'net_disbursal': 0, 'count': 0, 'fresh_count': 0, 'reloan_count': 0})
-        
-        for record in records:
-            is_reloan = record.get('is_reloan_case', False)
-            
-            if is_reloan:
-                reloan_count += 1
-            else:
-                fresh_count += 1
-            
-            loan_amt = float(record.get('loan_amount', 0) or 0)
-            disbursal_amt = float(record.get('Disbursal_Amt', 0) or 0)
-            proc_fee = float(record.get('processing_fee', 0) or 0)
-            int_amt = float(record.get('interest_amount', 0) or 0)
-            repay_amt = float(record.get('repayment_amount', 0) or 0)
-            tenure_days = float(record.get('tenure', 0) or 0)
-            
-            if tenure_days > 0:
-                total_tenure += tenure_days
-                tenure_count += 1
-                if is_reloan:
-                    reloan_tenure_sum += tenure_days
-                    reloan_tenure_count += 1
-                else:
-                    fresh_tenure_sum += tenure_days
-                    fresh_tenure_count += 1
-            
-            total_loan_amount += loan_amt
-            total_disbursal_amount += disbursal_amt
-            processing_fee += proc_fee
-            interest_amount += int_amt
-            repayment_amount += repay_amt
-            
-            if is_reloan:
-                reloan_loan_amount += loan_amt
-                reloan_disbursal_amount += disbursal_amt
-                reloan_processing_fee += proc_fee
-                reloan_interest_amount += int_amt
-                reloan_repayment_amount += repay_amt
-            else:
-                fresh_loan_amount += loan_amt
-                fresh_disbursal_amount += disbursal_amt
-                fresh_processing_fee += proc_fee
-                fresh_interest_amount += int_amt
-                fresh_repayment_amount += repay_amt
-            
-            state = record.get('state', '').strip()
-            city = record.get('city', '').strip()
-            source = record.get('source', record.get('Source', '')).strip()  # Try both lowercase and capitalized
-            
-            if state:
-                state_data[state]['disbursal'] += disbursal_amt
-                state_data[state]['sanction'] += loan_amt
-                state_data[state]['net_disbursal'] += disbursal_amt
-                state_data[state]['count'] += 1
-            
-            if city:
-                city_data[city]['disbursal'] += disbursal_amt
-                city_data[city]['sanction'] += loan_amt
-                city_data[city]['net_disbursal'] += disbursal_amt
-                city_data[city]['count'] += 1
-            
-            if source:
-                source_data[source]['disbursal'] += disbursal_amt
-                source_data[source]['sanction'] += loan_amt
-                source_data[source]['net_disbursal'] += disbursal_amt
-                source_data[source]['count'] += 1
-                if is_reloan:
-                    source_data[source]['reloan_count'] += 1
-                else:
-                    source_data[source]['fresh_count'] += 1
-        
-        # Sort and prepare chart data
-        sorted_states = sorted(state_data.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:20]
-        sorted_cities = sorted(city_data.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:20]
-        sorted_sources = sorted(source_data.items(), key=lambda x: x[1]['disbursal'], reverse=True)[:20]
-        source_counts = [item[1]['count'] for item in sorted_sources]
-        source_count = sum(source_counts)  # Total records with a lead source (for Source card)
-        
-        state_labels = [item[0] for item in sorted_states]
-        state_values = [item[1]['disbursal'] for item in sorted_states]
-        state_sanction = [item[1]['sanction'] for item in sorted_states]
-        state_counts = [item[1]['count'] for item in sorted_states]
-        
-        city_labels = [item[0] for item in sorted_cities]
-        city_values = [item[1]['disbursal'] for item in sorted_cities]
-        city_sanction = [item[1]['sanction'] for item in sorted_cities]
-        city_counts = [item[1]['count'] for item in sorted_cities]
-        
-        source_labels = [item[0] for item in sorted_sources]
-        source_values = [item[1]['disbursal'] for item in sorted_sources]
-        source_sanction = [item[1]['sanction'] for item in sorted_sources]
-        source_counts = [item[1]['count'] for item in sorted_sources]
-        source_fresh_counts = [item[1]['fresh_count'] for item in sorted_sources]
-        source_reloan_counts = [item[1]['reloan_count'] for item in sorted_sources]
-        
-        # Fetch Collection Metrics from API - USING SAME DATE RANGE AS DISBURSAL FILTERS
-        # OPTIMIZATION: Skip collection metrics on initial page load to speed up page rendering (10-12 sec delay)
-        # The data will be loaded via AJAX after page loads for better user experience
-        print(f"[Collection Metrics] ⚡ OPTIMIZATION: Skipping collection metrics on initial page load for faster rendering")
-        print(f"[Collection Metrics] Data will be loaded via AJAX endpoint after page loads")
-        collection_metrics = {}
-        
-        # Skip the entire API call to speed up page load
-        # Collection metrics will be fetched via /api/disbursal-data/ endpoint which is called by JavaScript
-        
-        # Helper function to aggregate multiple rows of collection metrics
-        def aggregate_collection_metrics(rows, date_from=None, date_to=None):
-            """Aggregate collection metrics from multiple rows into a single dict
-            Filters by date_of_received if date range is provided
-            """
-            if not rows or len(rows) == 0:
-                return {}
-            
-            # Filter rows by date_of_received if date range is provided
-            filtered_rows = []
-            if date_from and date_to:
-                print(f"[API Endpoint] Filtering collection records by date_of_received: {date_from} to {date_to}")
-                date_from_date = date_from.date() if isinstance(date_from, datetime) else date_from
-                date_to_date = date_to.date() if isinstance(date_to, datetime) else date_to
-                
-                for row in rows:
-                    if not isinstance(row, dict):
-                        continue
-                    
-                    # Try to find date_of_received field (various name variations)
-                    date_received = None
-                    date_fields = ['date_of_recived', 'date_of_received', 'dateOfReceived', 'date_of_receive', 'dateOfReceive', 
-                                  'received_date', 'receivedDate', 'collection_date', 'collectionDate',
-                                  'date_received', 'dateReceived']
-                    
-                    for field in date_fields:
-                        if field in row:
-                            date_received = row[field]
-                            break
-                    
-                    # If not found, try case-insensitive search
-                    if date_received is None:
-                        row_keys_lower = {k.lower(): k for k in row.keys()}
-                        for field_lower in ['date_of_recived', 'date_of_received', 'dateofreceived', 'date_of_receive', 'dateofreceive',
-                                          'received_date', 'receiveddate', 'collection_date', 'collectiondate',
-                                          'date_received', 'datereceived']:
-                            if field_lower in row_keys_lower:
-                                actual_key = row_keys_lower[field_lower]
-                                date_received = row[actual_key]
-                                break
-                    
-                    # Parse date if found
-                    if date_received:
-                        try:
-                            if isinstance(date_received, str):
-                                # Try various date formats
-                                for fmt in ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%d-%m-%Y', '%d/%m/%Y']:
-                                    try:
-                                        record_date = datetime.strptime(date_received.split('T')[0], fmt).date()
-                                        break
-                                    except:
-                                        continue
-                                else:
-                                    # If no format worked, skip this record
-                                    print(f"[API Endpoint] Could not parse date_of_received: {date_received}")
-                                    continue
-                            elif isinstance(date_received, datetime):
-                                record_date = date_received.date()
-                            else:
-                                continue
-                            
-                            # Check if date is within range
-                            if date_from_date <= record_date <= date_to_date:
-                                filtered_rows.append(row)
-                            else:
-                                print(f"[API Endpoint] Record date {record_date} is outside range {date_from_date} to {date_to_date}")
-                        except Exception as e:
-                            print(f"[API Endpoint] Error parsing date_of_received '{date_received}': {e}")
-                            # Include record if date parsing fails (to be safe)
-                            filtered_rows.append(row)
-                    else:
-                        # If no date_of_received field found, include the record (to be safe)
-                        print(f"[API Endpoint] No date_of_received field found in record, including it anyway")
-                        filtered_rows.append(row)
-                
-                print(f"[API Endpoint] Filtered {len(filtered_rows)} records out of {len(rows)} by date_of_received")
-            else:
-                filtered_rows = rows
-                print(f"[API Endpoint] No date filtering applied (date_from or date_to not provided)")
-            
-            # Initialize aggregated dict with standard field names
-            aggregated = {
-                'total_collection_amount': 0,
-                'fresh_collection_amount': 0,
-                'reloan_collection_amount': 0,
-                'prepayment_amount': 0,
-                'due_date_amount': 0,
-                'overdue_amount': 0,
-                'total_collection_count': 0,
-                'fresh_collection_count': 0,
-                'reloan_collection_count': 0,
-                'prepayment_count': 0,
-                'due_date_count': 0,
-                'overdue_count': 0
-            }
-            
-            # First, check if rows contain individual records with is_reloan_case field
-            # If so, aggregate by is_reloan_case instead of looking for separate fresh/reloan fields
-            has_is_reloan_case = False
-            for row in filtered_rows:
-                if isinstance(row, dict):
-                    # Check for is_reloan_case in various forms
-                    if ('is_reloan_case' in row or 
-                        'isReloanCase' in row or 
-                        'is_reloan' in row or
-                        'isReloan' in row):
-                        has_is_reloan_case = True
-                        break
-            
-            if has_is_reloan_case:
-                print(f"[API Endpoint] Found is_reloan_case field in collection records, aggregating by loan type...")
-                # Debug: Print first 3 records to see all available fields
-                for i, sample_row in enumerate(filtered_rows[:3]):
-                    if isinstance(sample_row, dict):
-                        print(f"[API Endpoint] ===== Record #{i+1} (Sample - After Date Filter) =====")
-                        print(f"[API Endpoint] All keys: {list(sample_row.keys())}")
-                        print(f"[API Endpoint] All key-value pairs:")
-                        for k, v in sample_row.items():
-                            print(f"[API Endpoint]   '{k}': {v} (type: {type(v).__name__})")
-                        print(f"[API Endpoint] ===== End Record #{i+1} =====")
-                # Aggregate collection amounts by is_reloan_case
-                for row in filtered_rows:
-                    if not isinstance(row, dict):
-                        continue
-                    
-                    # Get is_reloan_case value (try multiple field name variations)
-                    is_reloan = (row.get('is_reloan_case') or 
-                                row.get('isReloanCase') or
-                                row.get('is_reloan') or
-                                row.get('isReloan'))
-                    
-                    # Handle None, False, or empty string
-                    if is_reloan is None:
-                        is_reloan = False
-                    elif isinstance(is_reloan, str):
-                        is_reloan = is_reloan.lower() in ['true', '1', 'yes']
-                    elif isinstance(is_reloan, (int, float)):
-                        is_reloan = bool(is_reloan)
-                    else:
-                        is_reloan = bool(is_reloan)
-                    
-                    # Try to find collection amount field - prioritize collection-specific fields
-                    # Avoid generic "amount" fields which might be loan_amount or disbursal_amount
-                    collection_amount = 0
-                    
-                    # First, try collection-specific field names (most specific)
-                    # DO NOT include generic 'amount' - it might be loan_amount or disbursal_amount
-                    # ONLY use total_collection_amount - do not use repayment_amount or any other field
-                    # Try exact match first
-                    if 'total_collection_amount' in row:
-                        try:
-                            val = float(row['total_collection_amount'] or 0)
-                            collection_amount = val
-                            print(f"[API Endpoint] Found total_collection_amount (exact): {collection_amount}")
-                        except (ValueError, TypeError) as e:
-                            print(f"[API Endpoint] Error parsing total_collection_amount: {e}")
-                    
-                    # If not found, try case-insensitive search
-                    if collection_amount == 0:
-                        row_keys_lower = {k.lower(): k for k in row.keys()}
-                        if 'total_collection_amount' in row_keys_lower:
-                            actual_key = row_keys_lower['total_collection_amount']
-                            try:
-                                val = float(row[actual_key] or 0)
-                                collection_amount = val
-                                print(f"[API Endpoint] Found total_collection_amount (case-insensitive, key='{actual_key}'): {collection_amount}")
-                            except (ValueError, TypeError) as e:
-                                print(f"[API Endpoint] Error parsing total_collection_amount from '{actual_key}': {e}")
-                    
-                    # ONLY use total_collection_amount - do not use repayment_amount or any other field
-                    # If not found, try case-insensitive search for total_collection_amount
-                    if collection_amount == 0:
-                        row_keys_lower = {k.lower(): k for k in row.keys()}
-                        if 'total_collection_amount' in row_keys_lower:
-                            actual_key = row_keys_lower['total_collection_amount']
-                            try:
-                                val = float(row[actual_key] or 0)
-                                collection_amount = val
-                                print(f"[API Endpoint] Found total_collection_amount (case-insensitive, key='{actual_key}'): {collection_amount}")
-                            except (ValueError, TypeError) as e:
-                                print(f"[API Endpoint] Error parsing total_collection_amount from '{actual_key}': {e}")
-                    
-                    # If still not found, log all available fields for debugging
-                    if collection_amount == 0:
-                        record_num = aggregated['total_collection_count'] + 1
-                        if record_num <= 3:  # Only log for first 3 records to avoid spam
-                            print(f"[API Endpoint] ERROR: total_collection_amount not found in record #{record_num}!")
-                            print(f"[API Endpoint] Available keys: {list(row.keys())}")
-                            # Show all amount-related fields
-                            amount_fields = {k: row[k] for k in row.keys() if 'amount' in k.lower() or 'amt' in k.lower()}
-                            if amount_fields:
-                                print(f"[API Endpoint] All amount-related fields in record #{record_num}:")
-                                for af, af_val in sorted(amount_fields.items()):
-                                    print(f"[API Endpoint]   '{af}': {af_val} (type: {type(af_val).__name__})")
-                            print(f"[API Endpoint] This record will be skipped (collection_amount = 0)")
-                    else:
-                        record_num = aggregated['total_collection_count'] + 1
-                        print(f"[API Endpoint] ✓ Found total_collection_amount: ₹{collection_amount:.2f} for record #{record_num} (is_reloan={is_reloan})")
-                    
-                    # Only categorize if we found total_collection_amount (skip records where it's 0 or missing)
-                    if collection_amount > 0:
-                        # Categorize by is_reloan_case
-                        if is_reloan:
-                            aggregated['reloan_collection_amount'] += collection_amount
-                            aggregated['reloan_collection_count'] += 1
-                            print(f"[API Endpoint] Added to Reloan: {collection_amount} (total now: {aggregated['reloan_collection_amount']})")
-                        else:
-                            aggregated['fresh_collection_amount'] += collection_amount
-                            aggregated['fresh_collection_count'] += 1
-                            print(f"[API Endpoint] Added to Fresh: {collection_amount} (total now: {aggregated['fresh_collection_amount']})")
-                        
-                        aggregated['total_collection_amount'] += collection_amount
-                        aggregated['total_collection_count'] += 1
-                    else:
-                        print(f"[API Endpoint] Skipping record - total_collection_amount is 0 or not found")
-                
-                print(f"[API Endpoint] Aggregated by is_reloan_case - Fresh: ₹{aggregated['fresh_collection_amount']:.2f} ({aggregated['fresh_collection_count']} records), Reloan: ₹{aggregated['reloan_collection_amount']:.2f} ({aggregated['reloan_collection_count']} records)")
-                
-                # Recalculate total_collection_count as sum of Fresh + Reloan (not from counting all records)
-                aggregated['total_collection_count'] = aggregated['fresh_collection_count'] + aggregated['reloan_collection_count']
-                aggregated['total_collection_amount'] = aggregated['fresh_collection_amount'] + aggregated['reloan_collection_amount']
-                print(f"[API Endpoint] Recalculated total_collection_count: {aggregated['total_collection_count']} (Fresh {aggregated['fresh_collection_count']} + Reloan {aggregated['reloan_collection_count']})")
-                
-                # Continue with other field mappings for prepayment, overdue, etc.
-                # But skip fresh/reloan field matching since we already calculated them
-                skip_fresh_reloan_fields = True
-            else:
-                skip_fresh_reloan_fields = False
-                print(f"[API Endpoint] No is_reloan_case field found, using field name matching instead...")
-            
-            # Field name mappings - map various API field names to our standard names
-            # IMPORTANT: For total_collection_amount, fresh_collection_amount, and reloan_collection_amount,
-            # ONLY use total_collection_amount field (user requirement - do not use repayment_amount or collection_amount)
-            field_mappings = {
-                # Amount fields - ONLY use total_collection_amount variations, NO repayment_amount or collection_amount
-                'total_collection_amount': ['total_collection_amount', 'Total_Collection_Amount', 'TOTAL_COLLECTION_AMOUNT', 'totalCollectionAmount', 'TotalCollectionAmount'],
-                'fresh_collection_amount': ['fresh_collection_amount', 'freshCollectionAmount', 'fresh_amount', 'fresh', 'freshCollection', 'fresh_collection', 'freshCollectionAmt', 'fresh_collection_amt', 'freshAmt', 'fresh_amt'],
-                'reloan_collection_amount': ['reloan_collection_amount', 'reloanCollectionAmount', 'reloan_amount', 'reloan', 'reloanCollection', 'reloan_collection', 'reloanCollectionAmt', 'reloan_collection_amt', 'reloanAmt', 'reloan_amt'],
-                'prepayment_amount': ['prepayment_amount', 'prepaymentAmount', 'prepayment', 'prepaymentAmt', 'prepayment_amt'],
-                'due_date_amount': ['due_date_amount', 'dueDateAmount', 'on_time_collection', 'onTimeCollection', 'on_time_amount', 'onTimeAmount', 'ontime_amount', 'ontimeAmount', 'onTime_amount', 'on_time_collection_amount', 'onTimeCollectionAmount', 'due_date_collection', 'dueDateCollection', 'on_time_amount_collection', 'onTimeAmountCollection'],
-                'overdue_amount': ['overdue_amount', 'overdueAmount', 'overdue_collection', 'overdueCollection', 'overdue_collection_amount', 'overdueCollectionAmount'],
-                # Count fields
-                'total_collection_count': ['total_collection_count', 'totalCollectionCount', 'total_count', 'totalCount', 'total', 'totalCollectionCnt', 'total_collection_cnt'],
-                'fresh_collection_count': ['fresh_collection_count', 'freshCollectionCount', 'fresh_count', 'freshCount', 'fresh', 'freshCollection', 'fresh_collection', 'freshCollectionCnt', 'fresh_collection_cnt', 'freshCnt', 'fresh_cnt'],
-                'reloan_collection_count': ['reloan_collection_count', 'reloanCollectionCount', 'reloan_count', 'reloanCount', 'reloan', 'reloanCollection', 'reloan_collection', 'reloanCollectionCnt', 'reloan_collection_cnt', 'reloanCnt', 'reloan_cnt'],
-                'prepayment_count': ['prepayment_count', 'prepaymentCount', 'prepayment', 'prepaymentCnt', 'prepayment_cnt'],
-                'due_date_count': ['due_date_count', 'dueDateCount', 'on_time_count', 'onTimeCount', 'onTime', 'ontime', 'ontime_count', 'onTime_count', 'on_time_collection_count', 'onTimeCollectionCount', 'due_date_collection_count', 'dueDateCollectionCount'],
-                'overdue_count': ['overdue_count', 'overdueCount', 'overdue', 'overdueCnt', 'overdue_cnt']
-            }
-            
-            for row in filtered_rows:
-                if not isinstance(row, dict):
-                    continue
-                
-                # Create case-insensitive lookup
-                row_keys_lower = {k.lower(): k for k in row.keys()}
-                
-                # For each standard field, try to find it in the row using all possible variations
-                # Process overdue fields FIRST to avoid conflicts with on_time fields
-                field_order = ['overdue_amount', 'overdue_count', 'due_date_amount', 'due_date_count', 
-                              'total_collection_amount', 'fresh_collection_amount', 'reloan_collection_amount', 
-                              'prepayment_amount', 'total_collection_count', 'fresh_collection_count', 
-                              'reloan_collection_count', 'prepayment_count']
-                
-                # Process fields in specific order
-                for standard_field in field_order:
-                    # Skip fresh/reloan fields if we already calculated them from is_reloan_case
-                    if skip_fresh_reloan_fields and ('fresh' in standard_field or 'reloan' in standard_field):
-                        continue
-                        
-                    if standard_field not in field_mappings:
-                        continue
-                    variations = field_mappings[standard_field]
-                    found = False
-                    for variation in variations:
-                        # For total_collection_amount, fresh_collection_amount, and reloan_collection_amount,
-                        # ONLY accept exact matches - do not use repayment_amount or collection_amount
-                        if standard_field in ['total_collection_amount', 'fresh_collection_amount', 'reloan_collection_amount']:
-                            # Skip any variation that contains 'repayment' or is not 'total_collection_amount' for total
-                            if standard_field == 'total_collection_amount':
-                                # ONLY accept total_collection_amount variations, reject repayment_amount, collection_amount, etc.
-                                if 'repayment' in variation.lower() or ('collection_amount' in variation.lower() and 'total' not in variation.lower()):
-                                    continue
-                            # For fresh/reloan, we still use the variations but skip if it contains repayment
-                            elif 'repayment' in variation.lower():
-                                continue
-                        
-                        # Try exact match first
-                        if variation in row:
-                            value = row[variation]
-                            if value is not None and value != '':
-                                try:
-                                    if 'count' in standard_field:
-                                        aggregated[standard_field] += int(float(value))
-                                    else:
-                                        aggregated[standard_field] += float(value)
-                                    found = True
-                                    print(f"[API Endpoint] Found {standard_field} in '{variation}': {value}")
-                                    break  # Found it, move to next field
-                                except (ValueError, TypeError):
-                                    pass
-                        # Try case-insensitive match
-                        elif variation.lower() in row_keys_lower:
-                            actual_key = row_keys_lower[variation.lower()]
-                            # For total_collection_amount, reject if actual_key contains 'repayment' or is not total_collection_amount
-                            if standard_field == 'total_collection_amount':
-                                if 'repayment' in actual_key.lower() or ('collection_amount' in actual_key.lower() and 'total' not in actual_key.lower()):
-                                    print(f"[API Endpoint] Rejecting '{actual_key}' for total_collection_amount - contains repayment or is not total_collection_amount")
-                                    continue
-                            # For fresh/reloan, reject if contains repayment
-                            elif standard_field in ['fresh_collection_amount', 'reloan_collection_amount']:
-                                if 'repayment' in actual_key.lower():
-                                    print(f"[API Endpoint] Rejecting '{actual_key}' for {standard_field} - contains repayment")
-                                    continue
-                            
-                            value = row[actual_key]
-                            # For overdue fields, make sure the key doesn't contain on_time/due_date
-                            if 'overdue' in standard_field:
-                                if 'on_time' in actual_key.lower() or 'ontime' in actual_key.lower() or 'due_date' in actual_key.lower() or 'duedate' in actual_key.lower():
-                                    continue  # Skip this match, it's not an overdue field
-                            # For due_date fields, make sure the key doesn't contain overdue
-                            elif 'due_date' in standard_field:
-                                if 'overdue' in actual_key.lower():
-                                    continue  # Skip this match, it's not an on_time field
-                            
-                            if value is not None and value != '':
-                                try:
-                                    if 'count' in standard_field:
-                                        aggregated[standard_field] += int(float(value))
-                                    else:
-                                        aggregated[standard_field] += float(value)
-                                    found = True
-                                    break  # Found it, move to next field
-                                except (ValueError, TypeError):
-                                    pass
-                    
-                    # If not found with variations, try partial matching for "on_time" or "ontime" in any key
-                    # BUT ONLY for due_date fields, and make sure we exclude overdue fields
-                    if not found and 'due_date' in standard_field:
-                        for key, value in row.items():
-                            key_lower = key.lower()
-                            # Check if key contains "on_time", "ontime", "due_date", or "duedate"
-                            # BUT EXCLUDE any keys that contain "overdue" to avoid mixing them up
-                            if (('on_time' in key_lower or 'ontime' in key_lower or 'due_date' in key_lower or 'duedate' in key_lower) 
-                                and 'overdue' not in key_lower and value is not None and value != ''):
-                                try:
-                                    if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower):
-                                        aggregated[standard_field] += int(float(value))
-                                        found = True
-                                        break
-                                    elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                        aggregated[standard_field] += float(value)
-                                        found = True
-                                        break
-                                except (ValueError, TypeError):
-                                    pass
-                    
-                    # Also add partial matching for overdue fields, but exclude on_time/due_date fields
-                    if not found and 'overdue' in standard_field:
-                        for key, value in row.items():
-                            key_lower = key.lower()
-                            # Check if key contains "overdue" but EXCLUDE any keys that contain "on_time", "ontime", "due_date", or "duedate"
-                            if ('overdue' in key_lower 
-                                and 'on_time' not in key_lower and 'ontime' not in key_lower 
-                                and 'due_date' not in key_lower and 'duedate' not in key_lower
-                                and value is not None and value != ''):
-                                try:
-                                    if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower):
-                                        aggregated[standard_field] += int(float(value))
-                                        found = True
-                                        break
-                                    elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                        aggregated[standard_field] += float(value)
-                                        found = True
-                                        break
-                                except (ValueError, TypeError):
-                                    pass
-                    
-                    # Add partial matching for fresh fields - check any field containing "fresh"
-                    if not found and 'fresh' in standard_field:
-                        for key, value in row.items():
-                            key_lower = key.lower()
-                            # Check if key contains "fresh" (but not "refresh" or other words containing "fresh")
-                            if ('fresh' in key_lower 
-                                and 'refresh' not in key_lower
-                                and value is not None and value != ''):
-                                try:
-                                    if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
-                                        aggregated[standard_field] += int(float(value))
-                                        found = True
-                                        print(f"[Collection Metrics] Found fresh field via partial match: '{key}' = {value}")
-                                        break
-                                    elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                        aggregated[standard_field] += float(value)
-                                        found = True
-                                        print(f"[Collection Metrics] Found fresh field via partial match: '{key}' = {value}")
-                                        break
-                                except (ValueError, TypeError):
-                                    pass
-                    
-                    # Add partial matching for reloan fields - check any field containing "reloan"
-                    if not found and 'reloan' in standard_field:
-                        for key, value in row.items():
-                            key_lower = key.lower()
-                            # Check if key contains "reloan"
-                            if ('reloan' in key_lower 
-                                and value is not None and value != ''):
-                                try:
-                                    if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
-                                        aggregated[standard_field] += int(float(value))
-                                        found = True
-                                        print(f"[Collection Metrics] Found reloan field via partial match: '{key}' = {value}")
-                                        break
-                                    elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                        aggregated[standard_field] += float(value)
-                                        found = True
-                                        print(f"[Collection Metrics] Found reloan field via partial match: '{key}' = {value}")
-                                        break
-                                except (ValueError, TypeError):
-                                    pass
-                    
-                    # Add partial matching for prepayment fields - check any field containing "prepayment"
-                    if not found and 'prepayment' in standard_field:
-                        for key, value in row.items():
-                            key_lower = key.lower()
-                            # Check if key contains "prepayment"
-                            if ('prepayment' in key_lower 
-                                and value is not None and value != ''):
-                                try:
-                                    if 'count' in standard_field and ('count' in key_lower or 'number' in key_lower or 'cnt' in key_lower):
-                                        aggregated[standard_field] += int(float(value))
-                                        found = True
-                                        print(f"[Collection Metrics] Found prepayment field via partial match: '{key}' = {value}")
-                                        break
-                                    elif 'amount' in standard_field and ('amount' in key_lower or 'amt' in key_lower or 'value' in key_lower):
-                                        aggregated[standard_field] += float(value)
-                                        found = True
-                                        print(f"[Collection Metrics] Found prepayment field via partial match: '{key}' = {value}")
-                                        break
-                                except (ValueError, TypeError):
-                                    pass
-            
-            # At the end, recalculate total_collection_count as sum of Fresh + Reloan
-            # This ensures it's always correct regardless of how it was calculated
-            if aggregated['fresh_collection_count'] > 0 or aggregated['reloan_collection_count'] > 0:
-                aggregated['total_collection_count'] = aggregated['fresh_collection_count'] + aggregated['reloan_collection_count']
-                aggregated['total_collection_amount'] = aggregated['fresh_collection_amount'] + aggregated['reloan_collection_amount']
-                print(f"[API Endpoint] Final recalculation - total_collection_count: {aggregated['total_collection_count']} (Fresh {aggregated['fresh_collection_count']} + Reloan {aggregated['reloan_collection_count']})")
-            
-            return aggregated
-        try:
-            collection_api_url = 'https://backend.blinkrloan.com/insights/v2/collection_metrics'
-            # Use the SAME date_from and date_to from filters (same as disbursal API)
-            collection_params = {
-                'startDate': date_from.strftime('%Y-%m-%d'),
-                'endDate': date_to.strftime('%Y-%m-%d')
-            }
-            print(f"[API Endpoint] Collection Metrics API will use date range: {collection_params['startDate']} to {collection_params['endDate']}")
-            
-            collection_headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
-            
-            # Use EXACT SAME token method as disbursal API (which is working)
-            token = request.session.get('blinkr_token')
-            if token:
-                collection_headers['Authorization'] = f'Bearer {token}'
-                print(f"[API Endpoint] Using blinkr_token from session for collection metrics API (SAME AS DISBURSAL)")
-            else:
-                # Fallback to API key from settings/environment (same as disbursal)
-                api_key = os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
-                if api_key:
-                    collection_headers['Authorization'] = f'Bearer {api_key}'
-                    print(f"[API Endpoint] Using API key from settings for collection metrics API")
-                else:
-                    print(f"[API Endpoint] WARNING: No authentication token found in session or settings")
-            
-            print(f"[API Endpoint] Collection Metrics API URL: {collection_api_url}")
-            print(f"[API Endpoint] Collection Metrics API Params: {collection_params}")
-            print(f"[API Endpoint] Collection Metrics API Headers: {dict(collection_headers)}")
-            
-            # Reduced timeout for faster response (8 seconds)
-            collection_response = requests.get(collection_api_url, params=collection_params, headers=collection_headers, timeout=8)
-            print(f"[API Endpoint] Collection Metrics API Response Status: {collection_response.status_code}")
-            print(f"[API Endpoint] Collection Metrics API Response URL: {collection_response.url}")
-            
-            if collection_response and collection_response.status_code == 200:
-                try:
-                    collection_data = collection_response.json()
-                    print(f"[API Endpoint] Collection Metrics API Response Type: {type(collection_data)}")
-                    print(f"[API Endpoint] Collection Metrics API Response (first 2000 chars): {str(collection_data)[:2000]}")
-                    
-                    # Handle different response structures
-                    if isinstance(collection_data, dict):
-                        # Check for error messages FIRST (but only if it's actually an error)
-                        if 'error' in collection_data:
-                            error_msg = collection_data.get('error')
-                            print(f"[API Endpoint] Collection Metrics API Error: {error_msg}")
-                            collection_metrics = {}  # Set to empty if error
-                        elif 'message' in collection_data:
-                            message = collection_data.get('message', '')
-                            # Only treat as error if message contains error keywords
-                            if 'not authorised' in str(message).lower() or 'unauthorized' in str(message).lower() or 'error' in str(message).lower():
-                                print(f"[API Endpoint] Collection Metrics API Error Message: {message}")
-                                if 'not authorised' in str(message).lower() or 'unauthorized' in str(message).lower():
-                                    print(f"[API Endpoint] AUTHENTICATION FAILED - Token may be invalid or expired")
-                                    print(f"[API Endpoint] Token being used: {token[:30] if token else 'None'}...")
-                                collection_metrics = {}  # Set to empty if error
-                            else:
-                                # Message is not an error (e.g., "Data fetched successfully!"), continue processing
-                                print(f"[API Endpoint] Collection Metrics API Message (not an error): {message}")
-                                # Don't set collection_metrics to {} here, continue to check for 'data' key
-                        
-                        # Check if data is nested in 'data' key (API returns: {"success": true, "data": [...]})
-                        if 'data' in collection_data and not collection_metrics:
-                            data_value = collection_data['data']
-                            print(f"[API Endpoint] Collection Metrics found 'data' key, type: {type(data_value)}")
-                            # Check if data is an array (API structure: {"data": [{...}]})
-                            if isinstance(data_value, list) and len(data_value) > 0:
-                                # Aggregate all rows instead of just taking the first
-                                print(f"[API Endpoint] Collection Metrics found {len(data_value)} rows, aggregating all...")
-                                # Debug: Print sample row
-                                if data_value and len(data_value) > 0:
-                                    print(f"[API Endpoint] Sample row keys: {list(data_value[0].keys()) if isinstance(data_value[0], dict) else 'Not a dict'}")
-                                    print(f"[API Endpoint] Sample row (first 500 chars): {str(data_value[0])[:500] if isinstance(data_value[0], dict) else data_value[0]}")
-                                collection_metrics = aggregate_collection_metrics(data_value, date_from, date_to)
-                                print(f"[API Endpoint] Collection Metrics aggregated from all rows: {collection_metrics}")
-                                # Debug: Print Fresh and Reloan values
-                                if collection_metrics:
-                                    print(f"[API Endpoint] Fresh amount: {collection_metrics.get('fresh_collection_amount', 0)}, Fresh count: {collection_metrics.get('fresh_collection_count', 0)}")
-                                    print(f"[API Endpoint] Reloan amount: {collection_metrics.get('reloan_collection_amount', 0)}, Reloan count: {collection_metrics.get('reloan_collection_count', 0)}")
-                            elif isinstance(data_value, dict):
-                                # Data is already a dict
-                                collection_metrics = data_value
-                                print(f"[API Endpoint] Collection Metrics found in 'data' key (dict): {collection_metrics}")
-                            else:
-                                print(f"[API Endpoint] Collection Metrics 'data' key has unexpected type: {type(data_value)}")
-                                collection_metrics = {}
-                        elif 'result' in collection_data and not collection_metrics:
-                            result_value = collection_data['result']
-                            if isinstance(result_value, list) and len(result_value) > 0:
-                                # Aggregate all rows instead of just taking the first
-                                print(f"[API Endpoint] Collection Metrics found {len(result_value)} rows in 'result', aggregating all...")
-                                # Debug: Print sample row
-                                if result_value and len(result_value) > 0:
-                                    print(f"[API Endpoint] Sample row keys: {list(result_value[0].keys()) if isinstance(result_value[0], dict) else 'Not a dict'}")
-                                collection_metrics = aggregate_collection_metrics(result_value, date_from, date_to)
-                                print(f"[API Endpoint] Collection Metrics aggregated from 'result': {collection_metrics}")
-                                # Debug: Print Fresh and Reloan values
-                                if collection_metrics:
-                                    print(f"[API Endpoint] Fresh amount: {collection_metrics.get('fresh_collection_amount', 0)}, Fresh count: {collection_metrics.get('fresh_collection_count', 0)}")
-                                    print(f"[API Endpoint] Reloan amount: {collection_metrics.get('reloan_collection_amount', 0)}, Reloan count: {collection_metrics.get('reloan_collection_count', 0)}")
-                            else:
-                                collection_metrics = result_value if isinstance(result_value, dict) else {}
-                                print(f"[API Endpoint] Collection Metrics found in 'result' key: {collection_metrics}")
-                        elif 'metrics' in collection_data and not collection_metrics:
-                            metrics_value = collection_data['metrics']
-                            if isinstance(metrics_value, list) and len(metrics_value) > 0:
-                                # Aggregate all rows instead of just taking the first
-                                print(f"[API Endpoint] Collection Metrics found {len(metrics_value)} rows in 'metrics', aggregating all...")
-                                collection_metrics = aggregate_collection_metrics(metrics_value, date_from, date_to)
-                                print(f"[API Endpoint] Collection Metrics aggregated from 'metrics': {collection_metrics}")
-                            else:
-                                collection_metrics = metrics_value if isinstance(metrics_value, dict) else {}
-                                print(f"[API Endpoint] Collection Metrics found in 'metrics' key: {collection_metrics}")
-                        else:
-                            # Use the full response as metrics
-                            collection_metrics = collection_data
-                            print(f"[API Endpoint] Collection Metrics using full response: {collection_metrics}")
-                            print(f"[API Endpoint] Collection Metrics Keys: {list(collection_metrics.keys()) if isinstance(collection_metrics, dict) else 'N/A'}")
-                            # Print all key-value pairs
-                            if isinstance(collection_metrics, dict) and collection_metrics:
-                                for k, v in collection_metrics.items():
-                                    print(f"[API Endpoint]   '{k}': {v} (type: {type(v).__name__})")
-                    elif isinstance(collection_data, list) and len(collection_data) > 0:
-                        # Aggregate all rows instead of just taking the first
-                        print(f"[API Endpoint] Collection Metrics found {len(collection_data)} rows in list, aggregating all...")
-                        # Debug: Print sample row to see what fields are actually in the API response
-                        if collection_data and len(collection_data) > 0:
-                            print(f"[API Endpoint] Sample row keys: {list(collection_data[0].keys()) if isinstance(collection_data[0], dict) else 'Not a dict'}")
-                            print(f"[API Endpoint] Sample row (first 500 chars): {str(collection_data[0])[:500] if isinstance(collection_data[0], dict) else collection_data[0]}")
-                        collection_metrics = aggregate_collection_metrics(collection_data, date_from, date_to)
-                        print(f"[API Endpoint] Collection Metrics aggregated from all rows: {collection_metrics}")
-                        # Debug: Print what fields were found for Fresh and Reloan
-                        if collection_metrics:
-                            print(f"[API Endpoint] Fresh amount: {collection_metrics.get('fresh_collection_amount', 0)}, Fresh count: {collection_metrics.get('fresh_collection_count', 0)}")
-                            print(f"[API Endpoint] Reloan amount: {collection_metrics.get('reloan_collection_amount', 0)}, Reloan count: {collection_metrics.get('reloan_collection_count', 0)}")
-                except Exception as e:
-                    print(f"[API Endpoint] Error parsing collection metrics JSON: {e}")
-                    print(f"[API Endpoint] Response text: {collection_response.text[:500]}")
-                    collection_metrics = {}
-            else:
-                print(f"[API Endpoint] Collection Metrics API Error Status: {collection_response.status_code}")
-                print(f"[API Endpoint] Collection Metrics API Error Response: {collection_response.text[:500]}")
-                collection_metrics = {}
-        except Exception as e:
-            print(f"[API Endpoint] Exception while fetching collection metrics: {e}")
-            import traceback
-            print(f"[API Endpoint] Traceback: {traceback.format_exc()}")
-            collection_metrics = {}
-        
-        # The collection metrics API should return Fresh/Reloan amounts directly
-        # Use the API response values as-is - don't override with calculations
-        if collection_metrics:
-            fresh_collection_amt = collection_metrics.get('fresh_collection_amount', 0) or 0
-            reloan_collection_amt = collection_metrics.get('reloan_collection_amount', 0) or 0
-            fresh_collection_cnt = collection_metrics.get('fresh_collection_count', 0) or 0
-            reloan_collection_cnt = collection_metrics.get('reloan_collection_count', 0) or 0
-            
-            # Calculate total count as sum of Fresh + Reloan (not from total_collection_count which might include other categories)
-            total_collection_cnt = fresh_collection_cnt + reloan_collection_cnt
-            
-            # Always calculate total amount as sum of Fresh + Reloan (even if one is zero)
-            total_collection_amt = fresh_collection_amt + reloan_collection_amt
-            print(f"[API Endpoint] Calculated total amount from Fresh ({fresh_collection_amt:.2f}) + Reloan ({reloan_collection_amt:.2f}) = ₹{total_collection_amt:.2f}")
-            
-            print(f"[API Endpoint] Collection Metrics API Response - Total: ₹{total_collection_amt:.2f} ({total_collection_cnt} = Fresh {fresh_collection_cnt} + Reloan {reloan_collection_cnt}), Fresh: ₹{fresh_collection_amt:.2f} ({fresh_collection_cnt}), Reloan: ₹{reloan_collection_amt:.2f} ({reloan_collection_cnt})")
-            
-            # If Fresh/Reloan amounts are zero but we have total, log a warning
-            if total_collection_amt > 0 and (fresh_collection_amt == 0 and reloan_collection_amt == 0):
-                print(f"[API Endpoint] WARNING: Fresh/Reloan amounts are zero in API response.")
-                print(f"[API Endpoint] Available keys in collection_metrics: {list(collection_metrics.keys())}")
-            
-            # Update collection_metrics dict with recalculated values
-            collection_metrics['total_collection_count'] = total_collection_cnt
-            collection_metrics['total_collection_amount'] = total_collection_amt
-            collection_metrics['fresh_collection_count'] = fresh_collection_cnt
-            collection_metrics['reloan_collection_count'] = reloan_collection_cnt
-            collection_metrics['fresh_collection_amount'] = fresh_collection_amt
-            collection_metrics['reloan_collection_amount'] = reloan_collection_amt
-            
-            print(f"[API Endpoint] Updated collection_metrics dict:")
-            print(f"[API Endpoint]   total_collection_amount: {collection_metrics.get('total_collection_amount')}")
-            print(f"[API Endpoint]   fresh_collection_amount: {collection_metrics.get('fresh_collection_amount')}")
-            print(f"[API Endpoint]   reloan_collection_amount: {collection_metrics.get('reloan_collection_amount')}")
-            print(f"[API Endpoint]   prepayment_amount: {collection_metrics.get('prepayment_amount')}")
-            print(f"[API Endpoint]   prepayment_count: {collection_metrics.get('prepayment_count')}")
-            print(f"[API Endpoint]   due_date_amount: {collection_metrics.get('due_date_amount')}")
-            print(f"[API Endpoint]   overdue_amount: {collection_metrics.get('overdue_amount')}")
-        
-        # Debug: Print collection metrics before returning
-        print(f"[API Endpoint] ===== COLLECTION METRICS RESULT =====")
-        print(f"[API Endpoint] Collection Metrics being sent to frontend: {collection_metrics}")
-        print(f"[API Endpoint] Collection Metrics type: {type(collection_metrics)}")
-        if isinstance(collection_metrics, dict):
-            print(f"[API Endpoint] Collection Metrics keys: {list(collection_metrics.keys())}")
-            if collection_metrics:
-                for k, v in collection_metrics.items():
-                    print(f"[API Endpoint]   {k}: {v}")
-            else:
-                print(f"[API Endpoint] Collection Metrics dict is EMPTY!")
-        else:
-            print(f"[API Endpoint] Collection Metrics is not a dict!")
-        print(f"[API Endpoint] ======================================")
-        
-        # Return JSON response
-        response_data = {
-            'total_records': total_records,
-            'fresh_count': fresh_count,
-            'reloan_count': reloan_count,
-            'source_count': source_count,
-            'total_loan_amount': total_loan_amount,
-            'fresh_loan_amount': fresh_loan_amount,
-            'reloan_loan_amount': reloan_loan_amount,
-            'total_disbursal_amount': total_disbursal_amount,
-            'fresh_disbursal_amount': fresh_disbursal_amount,
-            'reloan_disbursal_amount': reloan_disbursal_amount,
-            'processing_fee': processing_fee,
-            'fresh_processing_fee': fresh_processing_fee,
-            'reloan_processing_fee': reloan_processing_fee,
-            'interest_amount': interest_amount,
-            'fresh_interest_amount': fresh_interest_amount,
-            'reloan_interest_amount': reloan_interest_amount,
-            'repayment_amount': repayment_amount,
-            'fresh_repayment_amount': fresh_repayment_amount,
-            'reloan_repayment_amount': reloan_repayment_amount,
-            'average_tenure': round(total_tenure / tenure_count, 1) if tenure_count > 0 else 0,
-            'fresh_average_tenure': round(fresh_tenure_sum / fresh_tenure_count, 1) if fresh_tenure_count > 0 else 0,
-            'reloan_average_tenure': round(reloan_tenure_sum / reloan_tenure_count, 1) if reloan_tenure_count > 0 else 0,
-            'state_labels': state_labels,
-            'state_values': state_values,
-            'state_sanction': state_sanction,
-            'state_counts': state_counts,
-            'city_labels': city_labels,
-            'city_values': city_values,
-            'city_sanction': city_sanction,
-            'city_counts': city_counts,
-            'source_labels': source_labels,
-            'source_values': source_values,
-            'source_sanction': source_sanction,
-            'source_counts': source_counts,
-            'source_fresh_counts': source_fresh_counts,
-            'source_reloan_counts': source_reloan_counts,
-            'collection_metrics': collection_metrics,
-            'last_updated': timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        print(f"Full API Response being sent (collection_metrics part): {response_data.get('collection_metrics')}")
-        
-        return JsonResponse(response_data)
-        
+        result, _, _ = _cached_page_value(request, 'disbursal_summary')
     except requests.RequestException as e:
-        return JsonResponse({'error': f'API request failed: {str(e)}'}, status=500)
+        return None, JsonResponse({'error': f'API request failed: {str(e)}'}, status=500)
     except Exception as e:
-        return JsonResponse({'error': f'An error occurred: {str(e)}'}, status=500)
+        return None, JsonResponse({'error': f'An error occurred: {str(e)}'}, status=500)
+    if result.api_error:
+        return None, JsonResponse({'error': result.api_error}, status=500)
+    return result, None
 
 
 @login_required
 @never_cache
-def disbursal_records_api(request):
+@upstream.request_deadline
+def disbursal_data_api(request):
     """
-    API endpoint that returns raw records data for the records table modal
+    API endpoint that returns JSON data for disbursal summary
+    Used for AJAX refresh without page reload. Served from the same cached disbursal result
+    as the Disbursal Summary page (same filters => same cache entry), so a refresh is a cache read.
+    ?bins=loan_amount:5000,10000 adds histograms to the distributions section (from the sketches).
     """
-    # Get filter parameters from request
-    date_from_str = request.GET.get('date_from', '')
-    date_to_str = request.GET.get('date_to', '')
-    state_filters = request.GET.getlist('state')
-    city_filters = request.GET.getlist('city')
-    
-    # Filter out empty strings
-    state_filters = [s for s in state_filters if s]
-    city_filters = [c for c in city_filters if c]
-    
-    # Set up timezone (IST - Asia/Kolkata)
-    ist = pytz.timezone('Asia/Kolkata')
-    
-    # Parse date filters
-    date_from = None
-    date_to = None
-    
-    if date_from_str:
-        try:
-            date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    
-    if date_to_str:
-        try:
-            date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    
-    # Set default dates if not provided (today only in IST)
-    now_ist = datetime.now(ist)
-    if not date_from:
-        date_from = now_ist.date()
-    if not date_to:
-        date_to = now_ist.date()
-    
-    # Build API URL with startDate and endDate parameters
-    api_url = 'https://backend.blinkrloan.com/insights/v2/disbursal'
-    params = {
-        'startDate': date_from.strftime('%Y-%m-%d'),
-        'endDate': date_to.strftime('%Y-%m-%d')
+    # Only send what the caller will render (hidden/collapsed widgets are not requested)
+    sections = _requested_sections(request, DISBURSAL_DATA_SECTIONS)
+    result, error_response = _cached_disbursal_result(request)
+    if error_response:
+        return error_response
+
+    response_data = {
+        'sections': sorted(sections),
+        'last_updated': result.computed_at,
     }
-    
-    # Fetch data from API
+    for payload in _disbursal_data_sections(request, result, sections).values():
+        response_data.update(payload)
+
+    return JsonResponse(_delta_payload(request, response_data, 'disbursal_data'))
+
+
+@login_required
+@never_cache
+@upstream.request_deadline
+def disbursal_records_api(request):
+    """
+    API endpoint that returns raw records data for the records table modal (and its Excel export).
+    The records are read from upstream on demand: the cached disbursal result only holds aggregates.
+    """
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        
-        # Use token from session
-        token = request.session.get('blinkr_token')
-        if token:
-            headers['Authorization'] = f'Bearer {token}'
-        else:
-            api_key = os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
-            if api_key:
-                headers['Authorization'] = f'Bearer {api_key}'
-        
-        response = requests.get(api_url, params=params, headers=headers, timeout=30)
-        
-        if response.status_code != 200:
-            return JsonResponse({'error': f'API returned status {response.status_code}'}, status=500)
-        
-        try:
-            api_data = response.json()
-        except:
-            return JsonResponse({'error': 'Invalid JSON response from API'}, status=500)
-        
-        # Extract records
-        if isinstance(api_data, list):
-            records = api_data
-        elif isinstance(api_data, dict):
-            if 'message' in api_data or 'error' in api_data:
-                return JsonResponse({'error': api_data.get('message', api_data.get('error', 'Unknown error'))}, status=400)
-            records = api_data.get('result', api_data.get('data', api_data.get('records', api_data.get('disbursals', api_data.get('items', [])))))
-        else:
-            records = []
-        
-        if not isinstance(records, list):
-            records = []
-        
-        # Apply state and city filters
-        if state_filters:
-            records = [r for r in records if isinstance(r, dict) and r.get('state', '').strip() in state_filters]
-        if city_filters:
-            records = [r for r in records if isinstance(r, dict) and r.get('city', '').strip() in city_filters]
-        
-        # Return raw records data
-        return JsonResponse({
-            'records': records,
-            'count': len(records)
-        })
-        
-    except requests.RequestException as e:
-        return JsonResponse({'error': f'API request failed: {str(e)}'}, status=500)
+        records, api_error = disbursal.records(disbursal.DisbursalFilters.from_request(request), request.session.get('blinkr_token'))
     except Exception as e:
         return JsonResponse({'error': f'An error occurred: {str(e)}'}, status=500)
+    if api_error:
+        return JsonResponse({'error': api_error}, status=500)
+    return JsonResponse({
+        'records': records,
+        'count': len(records)
+    })
 
 
 @login_required
 @never_cache
-@require_page_access
-def collection_without_fraud(request):
+@upstream.request_deadline
+def compare_api(request):
     """
-    Collection Summary page view.
-    IMPORTANT: This page uses ONLY insights/v2/collection_summary (no other APIs).
+    API endpoint for period-over-period comparison of the disbursal filters: KPIs of the range,
+    the previous equal-length period and the same dates last month, plus 7 / 30-day moving
+    averages of the daily series. Built from the cached per-day disbursal partials
+    (disbursal.compare), so only days not seen before are fetched.
     """
+    try:
+        data = disbursal.compare(disbursal.DisbursalFilters.from_request(request), request.session.get('blinkr_token'))
+    except requests.RequestException as e:
+        return JsonResponse({'error': f'API request failed: {str(e)}'}, status=500)
+    except Exception as e:
+        return JsonResponse({'error': f'An error occurred: {str(e)}'}, status=500)
+    if data.get('api_error'):
+        return JsonResponse({'error': data['api_error']}, status=500)
+    data['last_updated'] = data.pop('computed_at')
+    return JsonResponse(data)
+
+
+# Collection Summary default range starts here (to today)
+COLLECTION_DEFAULT_START_DATE = date(2025, 6, 1)
+
+
+def _collection_summary_filters(request):
+    """Parse and normalise the Collection Summary filters from the query string."""
     # --- Parse filters ---
     ist = pytz.timezone('Asia/Kolkata')
     today_date = datetime.now(ist).date()
 
     # Default range: from 1st June 2025 to today
-    default_start_date = date(2025, 6, 1)
+    default_start_date = COLLECTION_DEFAULT_START_DATE
     default_end_date = today_date
 
     date_from_str = request.GET.get('date_from') or ''
@@ -2401,21 +712,52 @@ def collection_without_fraud(request):
     loan_pre_post_ontime_status = (request.GET.get('loan_pre_post_ontime_status') or '').strip()
     date_type = (request.GET.get('date_type') or 'repayment').strip().lower()  # Default to 'repayment'
 
-    # --- Cache: same filters => reuse context (5 min) to avoid slow API + processing on every tab switch ---
-    from django.core.cache import cache
-    cache_key = 'collection_summary:%s:%s:%s:%s:%s:%s:%s' % (
-        date_from.isoformat(),
-        date_to.isoformat(),
-        '|'.join(sorted(state_filters)),
-        '|'.join(sorted(city_filters)),
-        actual_repayment_bucket,
-        loan_pre_post_ontime_status,
-        date_type,
+    return {
+        'today_date': today_date,
+        'date_from': date_from,
+        'date_to': date_to,
+        'state_filters': state_filters,
+        'city_filters': city_filters,
+        'actual_repayment_bucket': actual_repayment_bucket,
+        'loan_pre_post_ontime_status': loan_pre_post_ontime_status,
+        'date_type': date_type,
+    }
+
+
+def _collection_summary_cache_key(request):
+    """Same filters and auth scope => same cached aggregate, whatever the order/format of the query string."""
+    f = _collection_summary_filters(request)
+    return 'collection_summary:agg:%s:%s:%s:%s:%s:%s:%s:%s' % (
+        f['date_from'].isoformat(),
+        f['date_to'].isoformat(),
+        '|'.join(sorted(f['state_filters'])),
+        '|'.join(sorted(f['city_filters'])),
+        f['actual_repayment_bucket'],
+        f['loan_pre_post_ontime_status'],
+        f['date_type'],
+        _auth_scope(request),
     )
-    if not request.GET.get('refresh') and not request.GET.get('nocache'):
-        cached_context = cache.get(cache_key)
-        if cached_context is not None:
-            return render(request, 'dashboard/pages/collection_summary.html', cached_context)
+
+
+# Collection Summary: rows kept per DPD bucket for the bucket details modal / export
+DPD_BUCKET_DETAILS_LIMIT = 1000
+COLLECTION_PREVIEW_LIMIT = 200
+# KPI card metrics and the page's chart / DPD columns, extracted in one pass per request
+COLLECTION_KPI_PLAN = metrics.compile_plan(metrics.COLLECTION_SUMMARY_KPIS, columnar.COLLECTION_COLUMNS)
+
+
+def _collection_summary_aggregate(filters, token):
+    """
+    Compute the canonical Collection Summary aggregate for the filters (from
+    _collection_summary_filters()): plain numbers, lists and dicts (no JSON strings or
+    template-only values). This is what gets cached; _present_collection_summary() and
+    dpd_bucket_details_api() present it.
+    IMPORTANT: This page uses ONLY insights/v2/collection_summary (no other APIs).
+    """
+    date_from, date_to = filters['date_from'], filters['date_to']
+    state_filters, city_filters = filters['state_filters'], filters['city_filters']
+    actual_repayment_bucket = filters['actual_repayment_bucket']
+    loan_pre_post_ontime_status = filters['loan_pre_post_ontime_status']
 
     # --- Fetch ONLY collection_summary API ---
     api_url = 'https://backend.blinkrloan.com/insights/v2/collection_summary'
@@ -2435,7 +777,6 @@ def collection_without_fraud(request):
         params.append(('loan_pre_post_ontime_status', loan_pre_post_ontime_status))
 
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    token = request.session.get('blinkr_token')
     if token:
         headers['Authorization'] = f'Bearer {token}'
     else:
@@ -2446,7 +787,7 @@ def collection_without_fraud(request):
     rows = []
     api_error = None
     try:
-        resp = requests.get(api_url, params=params, headers=headers, timeout=30)
+        resp = upstream.get(api_url, params=params, headers=headers, timeout=30)
         if resp.status_code != 200:
             api_error = f"collection_summary API returned {resp.status_code}"
         else:
@@ -2480,57 +821,30 @@ def collection_without_fraud(request):
         api_error = f"collection_summary unexpected error: {e}"
         rows = []
 
-    # --- Server-side filtering (still ONLY from this API response) ---
+    # --- Server-side filtering (still ONLY from this API response), on interned codes ---
+    # The categorical columns are coded once, here, and reused for the dropdown options,
+    # the DPD distribution and the state / city charts below
     def _norm(x):
         return str(x).strip()
 
-    if state_filters:
-        state_set = set(state_filters)
-        rows = [r for r in rows if isinstance(r, dict) and _norm(r.get('state', '')) in state_set]
-    if city_filters:
-        city_set = set(city_filters)
-        rows = [r for r in rows if isinstance(r, dict) and _norm(r.get('city', '')) in city_set]
-    if actual_repayment_bucket:
-        rows = [r for r in rows if isinstance(r, dict) and _norm(r.get('actual_repayment_bucket', '')) == actual_repayment_bucket]
-    if loan_pre_post_ontime_status:
-        rows = [r for r in rows if isinstance(r, dict) and _norm(r.get('loan_pre_post_ontime_status', '')) == loan_pre_post_ontime_status]
+    chart_rows = [r for r in rows if isinstance(r, dict)]
+    column_filters = [
+        (categories.STATES, 'state', state_filters),
+        (categories.CITIES, 'city', city_filters),
+        (categories.REPAYMENT_BUCKETS, 'actual_repayment_bucket', [actual_repayment_bucket] if actual_repayment_bucket else []),
+        (categories.ONTIME_STATUSES, 'loan_pre_post_ontime_status', [loan_pre_post_ontime_status] if loan_pre_post_ontime_status else []),
+    ]
+    codes = {field: vocabulary.codes([r.get(field) for r in chart_rows]) for vocabulary, field, _ in column_filters}
+    if any(selected for _, _, selected in column_filters):
+        keep = np.ones(len(chart_rows), dtype=bool)
+        for vocabulary, field, selected in column_filters:
+            if selected:
+                keep &= vocabulary.isin(codes[field], selected)
+        rows = chart_rows = [r for r, kept in zip(chart_rows, keep) if kept]
+        codes = {field: column[keep] for field, column in codes.items()}
+    codes['dpd_bucket'] = categories.DPD_BUCKETS.codes([r.get('dpd_bucket') or r.get('dpdBucket') for r in chart_rows])
 
     # --- Date filtering by date_type (Repayment Date or Disbursal Date) ---
-    def parse_date_any(value):
-        """Parse various date formats from API response."""
-        if value is None:
-            return None
-        if isinstance(value, datetime):
-            return value.date()
-        if isinstance(value, date):
-            return value
-        s = str(value).strip()
-        if not s:
-            return None
-        # Try various date formats
-        formats = [
-            '%Y-%m-%d',
-            '%Y-%m-%dT%H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S.%f',
-            '%d-%m-%Y',
-            '%d/%m/%Y',
-            '%Y/%m/%d',
-        ]
-        for fmt in formats:
-            try:
-                return datetime.strptime(s.split('T')[0], fmt).date()
-            except (ValueError, AttributeError):
-                continue
-        # Try epoch timestamp (seconds or milliseconds)
-        try:
-            ts = float(s)
-            if ts > 1e12:  # milliseconds
-                ts = ts / 1000
-            return datetime.fromtimestamp(ts).date()
-        except (ValueError, OSError, OverflowError):
-            pass
-        return None
-
     # Date filtering: API is already called with startDate/endDate, so it returns rows for that range.
     # We do NOT re-apply client-side date filtering, so the dashboard count matches the API (e.g. 4395).
     # Optional: we could still filter by date_type field for charts; for KPI totals we use all API rows.
@@ -2538,32 +852,9 @@ def collection_without_fraud(request):
     print(f"[Collection Summary] Using all {rows_after_date_filter} rows from API (date range {date_from} to {date_to} already applied by API)")
 
     # --- Aggregations / dropdown options ---
-    def to_float(v):
-        if v is None:
-            return 0.0
-        if isinstance(v, (int, float)):
-            try:
-                return float(v)
-            except Exception:
-                return 0.0
-        s = str(v).strip()
-        if s == '':
-            return 0.0
-        # Normalize common formatting: currency symbol, commas, spaces
-        s = s.replace('₹', '').replace(',', '').strip()
-        # Try direct float first
-        try:
-            return float(s)
-        except (ValueError, TypeError):
-            pass
-        # Fallback: extract first numeric token (handles "₹12,345.00", "12,345 INR", etc.)
-        try:
-            m = re.search(r'-?\d+(?:\.\d+)?', s)
-            if m:
-                return float(m.group(0))
-        except Exception:
-            pass
-        return 0.0
+    # Row parsing helpers are module-level in columnar.py (parallel.py runs them in worker processes)
+    to_float = columnar.to_float
+    parse_date_any = columnar.parse_date_any
 
     def get_pending_collection_value(r):
         if not isinstance(r, dict):
@@ -2574,134 +865,12 @@ def collection_without_fraud(request):
             r.get('pendingCollectionAmt') or r.get('pending_collection_amt')
         )
 
-    def parse_date_any(v):
-        """Return date object or None."""
-        if v is None:
-            return None
-        # Epoch timestamps (seconds or milliseconds)
-        if isinstance(v, (int, float)):
-            try:
-                ts = float(v)
-                # Heuristic: milliseconds are usually >= 1e12 for current-era timestamps
-                if ts >= 1e12:
-                    ts = ts / 1000.0
-                dt = datetime.fromtimestamp(ts, tz=pytz.UTC).astimezone(ist)
-                return dt.date()
-            except Exception:
-                return None
-        if hasattr(v, 'date'):
-            try:
-                return v.date()
-            except Exception:
-                pass
-        s = str(v).strip()
-        if not s:
-            return None
-        # Numeric string epoch timestamp
-        if s.isdigit():
-            try:
-                ts = float(s)
-                if ts >= 1e12:
-                    ts = ts / 1000.0
-                dt = datetime.fromtimestamp(ts, tz=pytz.UTC).astimezone(ist)
-                return dt.date()
-            except Exception:
-                pass
-        # ISO-ish: 2025-12-01T00:00:00.000Z -> 2025-12-01
-        if len(s) >= 10 and s[4] == '-' and s[7] == '-':
-            try:
-                return datetime.strptime(s[:10], '%Y-%m-%d').date()
-            except ValueError:
-                pass
-        # Fallback formats
-        for fmt in ('%d-%m-%Y', '%Y/%m/%d', '%d/%m/%Y'):
-            try:
-                return datetime.strptime(s[:10], fmt).date()
-            except ValueError:
-                continue
-        return None
-
-    # KPI sums
-    loan_nos = set()
-    principal_amount = 0.0
-    net_disbursal = 0.0
-    repayment_amount = 0.0
-    collected_amount = 0.0
-    pending_collection = 0.0
-    pending_principal = 0.0
-    principal_collection_excl_90 = 0.0
-
-    # KPI Fresh/Reloan splits (same idea as Disbursal Summary cards)
-    fresh_loan_nos = set()
-    reloan_loan_nos = set()
-    fresh_principal_amount = 0.0
-    reloan_principal_amount = 0.0
-    fresh_net_disbursal = 0.0
-    reloan_net_disbursal = 0.0
-    fresh_repayment_amount = 0.0
-    reloan_repayment_amount = 0.0
-    fresh_collected_amount = 0.0
-    reloan_collected_amount = 0.0
-    fresh_pending_collection = 0.0
-    reloan_pending_collection = 0.0
-    fresh_pending_principal = 0.0
-    reloan_pending_principal = 0.0
-    fresh_principal_collection_excl_90_dpd = 0.0
-    reloan_principal_collection_excl_90_dpd = 0.0
-
-    def as_bool(v):
-        if isinstance(v, bool):
-            return v
-        if isinstance(v, (int, float)):
-            return float(v) != 0.0
-        s = str(v).strip().lower()
-        if s in ('true', '1', 'yes', 'y', 'reloan', 're-loan'):
-            return True
-        if s in ('false', '0', 'no', 'n', 'fresh', 'new'):
-            return False
-        return False
-
-    def is_reloan_row(r):
-        if not isinstance(r, dict):
-            return False
-        # direct keys
-        for k in ('is_reloan_case', 'isReloanCase', 'is_reloan', 'isReloan', 'reloan_case', 'reloanCase'):
-            if k in r:
-                return as_bool(r.get(k))
-        # case-insensitive keys
-        lower_map = {str(k).lower(): k for k in r.keys()}
-        for lk in ('is_reloan_case', 'isreloancase', 'is_reloan', 'isreloan'):
-            if lk in lower_map:
-                return as_bool(r.get(lower_map[lk]))
-        # loan type strings
-        for k in ('loan_type', 'loanType', 'type'):
-            if k in r and r.get(k) is not None:
-                s = str(r.get(k)).strip().lower()
-                if 'reloan' in s:
-                    return True
-                if 'fresh' in s or 'new' in s:
-                    return False
-        return False
-
-    # Dropdown options
-    states = set()
-    cities = set()
-    actual_repayment_buckets = set()
-    loan_pre_post_ontime_statuses = set()
-    cities_by_state = defaultdict(set)
-
-    # DPD distribution
-    dpd_buckets = defaultdict(lambda: {'count': 0, 'amount': 0.0})
-
     # Amount Received Over Time (daily)
     # NOTE:
     # - For single-day ranges we may need to bucket rows even if row-level date is missing.
     # - For multi-day ranges we MUST NOT bucket unknown/out-of-range rows into date_from,
     #   otherwise tooltips become incorrect. Instead we auto-detect the best date field and
     #   only aggregate rows into days we can confidently parse.
-    is_single_day = (date_from == date_to)
-    daily = defaultdict(lambda: {'repayment': 0.0, 'net_disbursal': 0.0, 'collected': 0.0, 'principal': 0.0})
-    daily_loan_nos = defaultdict(set)
 
     # Candidate date keys (from sample rows)
     candidate_date_keys = []
@@ -2767,281 +936,154 @@ def collection_without_fraud(request):
     except Exception:
         best_date_key = None
 
-    def extract_chart_date(row_dict):
-        """Return the best in-range date for chart bucketing, or None."""
-        # 1) Use the detected best key (if any)
-        if best_date_key and best_date_key in row_dict:
-            d0 = parse_date_any(row_dict.get(best_date_key))
-            if d0:
-                return d0
-
-        # 2) Try priority keys
-        for k in priority_date_keys:
-            if k in row_dict:
-                d0 = parse_date_any(row_dict.get(k))
-                if d0:
-                    return d0
-
-        # 3) Try any remaining candidates
-        for k in candidate_date_keys:
-            if k in row_dict:
-                try:
-                    d0 = parse_date_any(row_dict.get(k))
-                    if d0:
-                        return d0
-                except Exception:
-                    continue
-        return None
-
-    # Determine which amount field to use for DPD bucket "Amount"
-    # Prefer total_collection_amount, otherwise received_amount, otherwise loan_amount.
-    def pick_amount_for_dpd(r):
-        for key in ('total_collection_amount', 'received_amount', 'loan_amount'):
-            if key in r and r.get(key) not in (None, ''):
-                return to_float(r.get(key))
-        return 0.0
-
-    rows_processed = 0
-    rows_with_loan_no_count = 0
-    rows_without_loan_no_count = 0
-    # Row counts for Total Applications (match API count; API returns rows for date range)
-    fresh_row_count = 0
-    reloan_row_count = 0
-    
-    for r in rows:
-        if not isinstance(r, dict):
-            continue
-        
-        rows_processed += 1
+    # Numeric columns of every dict row in one parsing pass (in a process pool for very large
+    # ranges, see parallel.py): KPI metric fields, chart variants, DPD amount, reloan flag, chart day
+    day_context = columnar.DayContext(
+        date_from, date_to, best_date_key, tuple(priority_date_keys), tuple(candidate_date_keys))
+    row_columns = COLLECTION_KPI_PLAN.extract(chart_rows, day_context)
+    reloan_col = row_columns['is_reloan'].astype(bool)
+    chart_day_col = row_columns['chart_day'].astype(np.intp)
+
+    # Counted rows: rows with a loan_no, else a row id; rows without either are skipped to
+    # avoid double counting. Loan keys (normalized loan_no, or _row_<id>) feed distinct.py
+    def _loan_key(r):
         loan_no = r.get('loan_no') or r.get('loanNo') or r.get('loan_number') or r.get('loanNumber') or r.get('loan_id') or r.get('loanId')
-        
-        # If no loan_no, try to use id as fallback for counting
-        row_id = None
-        if not loan_no:
-            row_id = r.get('id') or r.get('_id') or r.get('record_id')
-        
-        if loan_no:
-            loan_nos.add(_norm(loan_no))
-            rows_with_loan_no_count += 1
-        elif row_id:
-            rows_without_loan_no_count += 1
-            # Use a prefixed identifier to avoid conflicts with actual loan_nos
-            loan_nos.add(f'_row_{_norm(str(row_id))}')
-        else:
-            rows_without_loan_no_count += 1
-            # Last resort: use row index (but this might cause duplicates if same row appears twice)
-            # Actually, let's skip rows without any identifier to avoid double counting
-            continue
-        
-        reloan_flag = is_reloan_row(r)
-        if reloan_flag:
-            reloan_row_count += 1
-        else:
-            fresh_row_count += 1
         if loan_no:
-            (reloan_loan_nos if reloan_flag else fresh_loan_nos).add(_norm(loan_no))
-        elif row_id:
-            # Also add to fresh/reloan sets using row_id
-            (reloan_loan_nos if reloan_flag else fresh_loan_nos).add(f'_row_{_norm(str(row_id))}')
-
-        principal_v = to_float(r.get('loan_amount') or r.get('principal_amount'))
-        net_v = to_float(r.get('net_disbursal') or r.get('net_disbursed') or r.get('netDisbursal') or r.get('netDisbursed'))
-        repay_v = to_float(r.get('actual_repayment') or r.get('repayment_amount') or r.get('repaymentAmount') or r.get('actualRepayment'))
-        collected_v = to_float(r.get('received_amount') or r.get('receivedAmount') or r.get('collected_amount') or r.get('collectedAmount'))
-        pending_coll_v = to_float(r.get('pending_collection') or r.get('pendingCollection') or r.get('pending_collection_amount'))
-        pending_prin_v = to_float(r.get('pending_principal') or r.get('pendingPrincipal') or r.get('principal_outstanding') or r.get('principalOutstanding'))
-
-        principal_amount += principal_v
-        net_disbursal += net_v
-        repayment_amount += repay_v
-        collected_amount += collected_v
-        pending_collection += pending_coll_v
-        pending_principal += pending_prin_v
-
-        if reloan_flag:
-            reloan_principal_amount += principal_v
-            reloan_net_disbursal += net_v
-            reloan_repayment_amount += repay_v
-            reloan_collected_amount += collected_v
-            reloan_pending_collection += pending_coll_v
-            reloan_pending_principal += pending_prin_v
-        else:
-            fresh_principal_amount += principal_v
-            fresh_net_disbursal += net_v
-            fresh_repayment_amount += repay_v
-            fresh_collected_amount += collected_v
-            fresh_pending_collection += pending_coll_v
-            fresh_pending_principal += pending_prin_v
-
-        st = r.get('state')
-        ct = r.get('city')
-        arb = r.get('actual_repayment_bucket')
-        lps = r.get('loan_pre_post_ontime_status')
-        if st:
-            states.add(_norm(st))
-        if ct:
-            cities.add(_norm(ct))
-        if st and ct:
-            cities_by_state[_norm(st)].add(_norm(ct))
-        if arb:
-            actual_repayment_buckets.add(_norm(arb))
-        if lps:
-            loan_pre_post_ontime_statuses.add(_norm(lps))
-
-        dpd_bucket = r.get('dpd_bucket') or r.get('dpdBucket')
-        if dpd_bucket is not None and str(dpd_bucket).strip() != '':
-            bucket = _norm(dpd_bucket)
-            dpd_buckets[bucket]['count'] += 1
-            dpd_buckets[bucket]['amount'] += pick_amount_for_dpd(r)
-
-            # Principal Collection Excl. 90+ DPD (best-effort)
-            b_lower = bucket.lower()
-            is_90_plus = ('90' in b_lower and '+' in b_lower) or b_lower.strip() in ('90+', '90+dpd', '90+ dpd')
-            if not is_90_plus:
-                excl_v = to_float(r.get('total_collection_amount') or r.get('received_amount') or r.get('collection_amount'))
-                principal_collection_excl_90 += excl_v
-                if reloan_flag:
-                    reloan_principal_collection_excl_90_dpd += excl_v
-                else:
-                    fresh_principal_collection_excl_90_dpd += excl_v
-
-        # daily time series
-        d = extract_chart_date(r)
-
-        # For multi-day ranges: only bucket rows with a reliable in-range date.
-        # For single-day: bucket unknown/missing dates into the selected day (so totals match).
-        if d is None:
-            if is_single_day:
-                d = date_from
-            else:
-                continue
-        if d < date_from or d > date_to:
-            if is_single_day:
-                d = date_from
-            else:
-                continue
+            return _norm(loan_no)
+        row_id = r.get('id') or r.get('_id') or r.get('record_id')
+        # Prefixed to avoid conflicts with actual loan_nos
+        return f'_row_{_norm(str(row_id))}' if row_id else None
+
+    row_loan_keys = [_loan_key(r) for r in chart_rows]
+    counted = np.fromiter((key is not None for key in row_loan_keys), dtype=bool, count=len(row_loan_keys))
+    loan_keys = [key for key in row_loan_keys if key is not None]
+    rows_processed = len(chart_rows)
+
+    # KPI cards: the registry metrics over the counted rows (see metrics.py)
+    loan_id_col = np.zeros(len(chart_rows), dtype=np.int64)
+    loan_id_col[counted] = distinct.loan_ids(loan_keys)
+    kpi_values = COLLECTION_KPI_PLAN.evaluate(row_columns, mask=counted, extra={'distinct_loans': loan_id_col})
+
+    # DPD distribution of the counted rows with a bucket: counts / amounts per bucket value
+    dpd_present, dpd_codes = groupby.compact(np.where(counted, codes['dpd_bucket'], -1))
+    dpd_labels = categories.DPD_BUCKETS.decode(dpd_present)
+    dpd_counts = groupby.group_counts(dpd_codes, len(dpd_labels)).tolist()
+    dpd_amounts = groupby.group_sums(dpd_codes, len(dpd_labels), row_columns['dpd_amount']).tolist()
+    dpd_bucket_distribution = [
+        {'dpd_bucket': dpd_labels[i], 'count': dpd_counts[i], 'amount': dpd_amounts[i]}
+        for i in sorted(range(len(dpd_labels)), key=dpd_labels.__getitem__)
+    ]
 
-        ds = d.strftime('%Y-%m-%d')
-        daily[ds]['repayment'] += to_float(r.get('actual_repayment') or r.get('repayment_amount') or r.get('repaymentAmount'))
-        daily[ds]['net_disbursal'] += to_float(r.get('net_disbursal') or r.get('net_disbursed') or r.get('netDisbursal') or r.get('netDisbursed'))
-        # Keep chart "Collected" consistent with KPI "Collected Amount"
-        daily[ds]['collected'] += to_float(r.get('received_amount') or r.get('receivedAmount') or r.get('collected_amount') or r.get('collectedAmount'))
-        # Principal amount for tooltip (keep consistent with KPI Principal Amount)
-        daily[ds]['principal'] += to_float(r.get('loan_amount') or r.get('principal_amount'))
+    # The matching rows for the bucket details modal, per case-insensitive bucket (labelled
+    # with the bucket value of its last row)
+    dpd_groups, dpd_group_of_bucket = groupby.encode([label.lower() for label in dpd_labels])
+    dpd_group_col = np.append(dpd_group_of_bucket, -1)[dpd_codes]  # no bucket -> -1
+    dpd_bucket_rows = {}
+    for group, key in enumerate(dpd_groups):
+        members = np.flatnonzero(dpd_group_col == group)
+        dpd_bucket_rows[key] = {
+            'label': dpd_labels[dpd_codes[members[-1]]],
+            'total': len(members),
+            'rows': [chart_rows[i] for i in members[:DPD_BUCKET_DETAILS_LIMIT].tolist()],
+        }
 
-        ln = r.get('loan_no') or r.get('loanNo') or r.get('loan_number')
-        if ln:
-            daily_loan_nos[ds].add(_norm(ln))
+    # Principal Collection Excl. 90+ DPD (best-effort), with its Fresh/Reloan splits
+    def _is_90_plus(bucket):
+        b_lower = bucket.lower()
+        return ('90' in b_lower and '+' in b_lower) or b_lower.strip() in ('90+', '90+dpd', '90+ dpd')
+
+    excl_90_buckets = np.array([not _is_90_plus(label) for label in dpd_labels] + [False], dtype=bool)
+    excl_90_rows = excl_90_buckets[dpd_codes]  # no bucket -> False
+    excl_90_col = row_columns['excl_90_collection']
+    principal_collection_excl_90 = columnar.ordered_sum(excl_90_col[excl_90_rows])
+    fresh_principal_collection_excl_90_dpd = columnar.ordered_sum(excl_90_col[excl_90_rows & ~reloan_col])
+    reloan_principal_collection_excl_90_dpd = columnar.ordered_sum(excl_90_col[excl_90_rows & reloan_col])
+
+    # Daily time series: counted rows with a chart day, summed per day offset
+    charted = counted & (chart_day_col >= 0)
+    range_days = (date_to - date_from).days + 1
+    daily = {
+        name: groupby.group_sums(chart_day_col[charted], range_days, row_columns[column][charted]).tolist()
+        for name, column in (
+            ('repayment', 'chart_repayment'),
+            ('net_disbursal', 'net_disbursal'),
+            # Keep chart "Collected" consistent with KPI "Collected Amount"
+            ('collected', 'collected_amount'),
+            # Principal amount for tooltip (keep consistent with KPI Principal Amount)
+            ('principal', 'principal_amount'),
+        )
+    }
+    # (day, normalized loan_no) of the charted rows with a loan_no, for the distinct loans per day
+    charted_index = np.flatnonzero(charted)
+    charted_loan_nos = [
+        chart_rows[i].get('loan_no') or chart_rows[i].get('loanNo') or chart_rows[i].get('loan_number')
+        for i in charted_index.tolist()
+    ]
+    with_loan_no = np.fromiter(map(bool, charted_loan_nos), dtype=bool, count=len(charted_loan_nos))
+    daily_loan_days = chart_day_col[charted_index[with_loan_no]]
+    daily_loan_keys = [_norm(ln) for ln in charted_loan_nos if ln]
+
+    # Dropdown options: the values of the counted rows
+    def _options(vocabulary, field):
+        column = codes[field][counted]
+        return set(vocabulary.decode(np.unique(column[column >= 0])))
+
+    states = _options(categories.STATES, 'state')
+    cities = _options(categories.CITIES, 'city')
+    actual_repayment_buckets = _options(categories.REPAYMENT_BUCKETS, 'actual_repayment_bucket')
+    loan_pre_post_ontime_statuses = _options(categories.ONTIME_STATUSES, 'loan_pre_post_ontime_status')
+    cities_by_state = defaultdict(set)
+    state_option_codes, city_option_codes = codes['state'][counted], codes['city'][counted]
+    with_both = (state_option_codes >= 0) & (city_option_codes >= 0)
+    pairs = np.unique(state_option_codes[with_both] * len(categories.CITIES) + city_option_codes[with_both])
+    for state_code, city_code in zip(*np.divmod(pairs, len(categories.CITIES))):
+        cities_by_state[categories.STATES.values[state_code]].add(categories.CITIES.values[city_code])
 
     # Total Applications = row count (matches API; API already returns rows for the selected date range)
-    total_applications = rows_processed
-    fresh_total_applications = fresh_row_count
-    reloan_total_applications = reloan_row_count
+    # The fresh / reloan splits only cover the counted rows
+    kpi_values['total_applications'] = rows_processed
     
     print(f"[Collection Summary] ========== TOTAL APPLICATIONS COUNT ==========")
-    print(f"[Collection Summary] Total Applications (row count, matches API): {total_applications}")
-    print(f"[Collection Summary] Fresh: {fresh_total_applications}, Reloan: {reloan_total_applications}, Sum: {fresh_total_applications + reloan_total_applications}")
+    print(f"[Collection Summary] Total Applications (row count, matches API): {kpi_values['total_applications']}")
+    print(f"[Collection Summary] Fresh: {kpi_values['fresh_total_applications']}, Reloan: {kpi_values['reloan_total_applications']}, Sum: {kpi_values['fresh_total_applications'] + kpi_values['reloan_total_applications']}")
+    print(f"[Collection Summary] Distinct loans: {kpi_values['distinct_loans']} (fresh {kpi_values['fresh_distinct_loans']}, reloan {kpi_values['reloan_distinct_loans']})")
     
     print(f"[Collection Summary] ========== END COUNT ==========")
 
-    # Calculate Collection % (Collected Amount / Repayment Amount * 100)
-    collection_percentage = 0.0
-    if repayment_amount > 0:
-        collection_percentage = (collected_amount / repayment_amount) * 100
-    
-    # Calculate Fresh and Reloan Collection %
-    fresh_collection_percentage = 0.0
-    if fresh_repayment_amount > 0:
-        fresh_collection_percentage = (fresh_collected_amount / fresh_repayment_amount) * 100
-    
-    reloan_collection_percentage = 0.0
-    if reloan_repayment_amount > 0:
-        reloan_collection_percentage = (reloan_collected_amount / reloan_repayment_amount) * 100
-
-    # Pending Collection % = Pending Collection / Repayment Amount * 100
-    pending_collection_percentage = 0.0
-    if repayment_amount > 0:
-        pending_collection_percentage = (pending_collection / repayment_amount) * 100
-    fresh_pending_collection_percentage = 0.0
-    if fresh_repayment_amount > 0:
-        fresh_pending_collection_percentage = (fresh_pending_collection / fresh_repayment_amount) * 100
-    reloan_pending_collection_percentage = 0.0
-    if reloan_repayment_amount > 0:
-        reloan_pending_collection_percentage = (reloan_pending_collection / reloan_repayment_amount) * 100
-
-    # Principal Outstanding % = Principal Outstanding / Principal Amount * 100
-    pending_principal_percentage = 0.0
-    if principal_amount > 0:
-        pending_principal_percentage = (pending_principal / principal_amount) * 100
-    fresh_pending_principal_percentage = 0.0
-    if fresh_principal_amount > 0:
-        fresh_pending_principal_percentage = (fresh_pending_principal / fresh_principal_amount) * 100
-    reloan_pending_principal_percentage = 0.0
-    if reloan_principal_amount > 0:
-        reloan_pending_principal_percentage = (reloan_pending_principal / reloan_principal_amount) * 100
-
-    dpd_bucket_distribution = [
-        {'dpd_bucket': b, 'count': v['count'], 'amount': v['amount']}
-        for b, v in sorted(dpd_buckets.items(), key=lambda kv: kv[0])
-    ]
+    # State and city charts: one pass builds the columns, then a group-by on the interned codes
+    # (normalization runs once per distinct label, not per row)
+    received_col = row_columns['collected_amount']
+    # Pending amount: use pending_collection fields (consistent with KPI Pending Collection)
+    pending_col = row_columns['chart_pending']
 
     # Received Amount by State (bar chart) - from same filtered collection_summary rows only
-    received_by_state = defaultdict(float)
-    pending_by_state = defaultdict(float)
-    for r in rows:
-        if not isinstance(r, dict):
-            continue
-        st = r.get('state')
-        if not st:
-            continue
-        st_norm = _norm(st)
-        received_by_state[st_norm] += to_float(
-            r.get('received_amount') or r.get('receivedAmount') or
-            r.get('collected_amount') or r.get('collectedAmount')
-        )
-        # Pending amount: use pending_collection fields (consistent with KPI Pending Collection)
-        pending_by_state[st_norm] += get_pending_collection_value(r)
-
-    received_state_sorted = sorted(received_by_state.items(), key=lambda kv: kv[1], reverse=True)
+    state_present, state_codes = groupby.compact(codes['state'])
+    state_labels = categories.STATES.decode(state_present)
+    received_by_state = groupby.group_sums(state_codes, len(state_labels), received_col)
+    pending_by_state = groupby.group_sums(state_codes, len(state_labels), pending_col)
+    state_order = groupby.top_k(received_by_state, len(state_labels))
     top_n = 15
-    top_states = received_state_sorted[:top_n]
-    other_sum = sum(v for _, v in received_state_sorted[top_n:])
-    other_pending_sum = sum(pending_by_state.get(k, 0.0) for k, _ in received_state_sorted[top_n:])
+    top_states = state_order[:top_n]
+    other_sum = sum(received_by_state[state_order[top_n:]].tolist())
+    other_pending_sum = sum(pending_by_state[state_order[top_n:]].tolist())
+    received_state_labels = [state_labels[i] for i in top_states]
+    received_state_values = received_by_state[top_states].tolist()
+    pending_state_values = pending_by_state[top_states].tolist()
     if other_sum > 0:
-        top_states.append(('Others', other_sum))
-    received_state_labels = [k for k, _ in top_states]
-    received_state_values = [v for _, v in top_states]
-    pending_state_values = [
-        other_pending_sum if k == 'Others' else pending_by_state.get(k, 0.0)
-        for k in received_state_labels
-    ]
+        received_state_labels.append('Others')
+        received_state_values.append(other_sum)
+        pending_state_values.append(other_pending_sum)
 
     # Top Cities – Collection Rate (%) (horizontal bar)
     # Only include cities with at least MIN_LOANS_PER_CITY loans for meaningful analysis
     # Group all Delhi regions (South Delhi, East Delhi, North Delhi, West Delhi, Central Delhi, South East Delhi, etc.) as "Delhi"
-    def _city_key_for_chart(city_str):
-        n = _norm(city_str)
-        if not n:
-            return n
-        if 'delhi' in n.lower():
-            return 'Delhi'
-        return n
-
+    # (the CITIES vocabulary's canonical codes, see categories.fold_delhi)
     MIN_LOANS_PER_CITY = 10
-    city_stats = defaultdict(lambda: {'collected': 0.0, 'pending': 0.0, 'loan_count': 0})
-    for r in rows:
-        if not isinstance(r, dict):
-            continue
-        city = r.get('city')
-        if not city:
-            continue
-        city_key = _city_key_for_chart(city)
-        city_stats[city_key]['collected'] += to_float(
-            r.get('received_amount') or r.get('receivedAmount') or
-            r.get('collected_amount') or r.get('collectedAmount')
-        )
-        city_stats[city_key]['pending'] += get_pending_collection_value(r)
-        city_stats[city_key]['loan_count'] += 1
+    city_present, city_codes = groupby.compact(categories.CITIES.canonical(codes['city']))
+    city_labels = categories.CITIES.decode(city_present)
+    city_collected = groupby.group_sums(city_codes, len(city_labels), received_col)
+    city_pending = groupby.group_sums(city_codes, len(city_labels), pending_col)
+    city_loan_counts = groupby.group_counts(city_codes, len(city_labels))
 
     def rate_color(pct):
         # Match screenshot-like bands
@@ -3053,31 +1095,23 @@ def collection_without_fraud(request):
             return '#f97316'  # orange
         return '#ef4444'      # red
 
-    city_rates = []
-    for city, agg in city_stats.items():
-        if agg['loan_count'] < MIN_LOANS_PER_CITY:
-            continue
-        denom = (agg['collected'] + agg['pending'])
-        pct = (agg['collected'] / denom * 100.0) if denom > 0 else 0.0
-        city_rates.append({
-            'city': city,
+    eligible = np.flatnonzero(city_loan_counts >= MIN_LOANS_PER_CITY)
+    denom = city_collected[eligible] + city_pending[eligible]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        city_pct = np.where(denom > 0, city_collected[eligible] / denom * 100.0, 0.0)
+    top_city_rates = []
+    for i in groupby.top_k(city_pct, 10):
+        city = eligible[i]
+        pct = float(city_pct[i])
+        top_city_rates.append({
+            'city': city_labels[city],
             'pct': pct,
-            'collected': agg['collected'],
-            'pending': agg['pending'],
-            'loan_count': agg['loan_count'],
+            'collected': float(city_collected[city]),
+            'pending': float(city_pending[city]),
+            'loan_count': int(city_loan_counts[city]),
             'color': rate_color(pct),
         })
 
-    city_rates.sort(key=lambda x: x['pct'], reverse=True)
-    top_city_rates = city_rates[:10]
-
-    top_city_rate_labels = [x['city'] for x in top_city_rates]
-    top_city_rate_values = [round(x['pct'], 2) for x in top_city_rates]
-    top_city_rate_colors = [x['color'] for x in top_city_rates]
-    top_city_rate_collected = [x['collected'] for x in top_city_rates]
-    top_city_rate_pending = [x['pending'] for x in top_city_rates]
-    top_city_rate_loan_count = [x['loan_count'] for x in top_city_rates]
-
     # Pending Cases by Amount Bucket (mixed chart)
     # Buckets based on pending amount (pending_collection) in INR
     pending_bucket_labels = ['<5k', '5-10k', '10-20k', '20-30k', '30-40k', '40-50k', '50-60k', '60-70k', '70-80k', '80-90k', '90+k']
@@ -3098,244 +1132,191 @@ def collection_without_fraud(request):
         if prev is None or pv > prev:
             loan_pending[key] = pv
 
-    pending_bucket_amounts = [0.0 for _ in pending_bucket_labels]
-    pending_bucket_case_sets = [set() for _ in pending_bucket_labels]
-
-    def bucket_index(amount):
-        # amount is > 0
-        for i in range(len(pending_bucket_bounds) - 1):
-            lo = pending_bucket_bounds[i]
-            hi = pending_bucket_bounds[i + 1]
-            if lo <= amount < hi:
-                return i
-        return len(pending_bucket_labels) - 1  # 90k+
-
-    for loan_key, amount in loan_pending.items():
-        bi = bucket_index(amount)
-        pending_bucket_case_sets[bi].add(loan_key)
-        pending_bucket_amounts[bi] += amount
-
-    pending_bucket_counts = [len(s) for s in pending_bucket_case_sets]
+    # Cases and amounts per bucket (exact: every per-loan amount is in memory; the last bucket is 90k+)
+    pending_values = np.fromiter(loan_pending.values(), dtype=np.float64, count=len(loan_pending))
+    pending_bucket_index = np.searchsorted(pending_bucket_bounds[1:], pending_values, side='right')
+    pending_bucket_counts = np.bincount(pending_bucket_index, minlength=len(pending_bucket_labels)).tolist()
+    pending_bucket_amounts = np.bincount(
+        pending_bucket_index, weights=pending_values, minlength=len(pending_bucket_labels)).tolist()
+    # p50 / p90 / p99 pending amount
+    pending_sketch = sketches.QuantileSketch(pending_values)
 
     # build full date range for chart (fill gaps with zeros)
     chart_dates = []
-    chart_repayment = []
-    chart_net_disbursal = []
-    chart_collected = []
-    chart_principal = []
-    chart_counts = []
+    # Distinct loans per day (mergeable: the union of the days is the range's distinct loans)
+    daily_loans = distinct.DistinctSet.by_day(
+        np.array(daily_loan_days, dtype=np.intp), distinct.loan_ids(daily_loan_keys), range_days)
+    chart_counts = [len(day_loans) for day_loans in daily_loans]
+    chart_repayment = daily['repayment']
+    chart_net_disbursal = daily['net_disbursal']
+    chart_collected = daily['collected']
+    chart_principal = daily['principal']
     cur = date_from
     while cur <= date_to:
-        ds = cur.strftime('%Y-%m-%d')
-        chart_dates.append(ds)
-        chart_repayment.append(daily[ds]['repayment'] if ds in daily else 0.0)
-        chart_net_disbursal.append(daily[ds]['net_disbursal'] if ds in daily else 0.0)
-        chart_collected.append(daily[ds]['collected'] if ds in daily else 0.0)
-        chart_principal.append(daily[ds]['principal'] if ds in daily else 0.0)
-        chart_counts.append(len(daily_loan_nos.get(ds, set())))
+        chart_dates.append(cur.strftime('%Y-%m-%d'))
         cur += timedelta(days=1)
-
-    amount_received_over_time = json.dumps({
-        'dates': chart_dates,
-        'repayment_amounts': chart_repayment,
-        'net_disbursal_amounts': chart_net_disbursal,
-        'collected_amounts': chart_collected,
-        'principal_amounts': chart_principal,
-        'counts': chart_counts,
-    })
+    # Distinct loans per week / month of the range, for the bucketed chart (counts do not add up)
+    bucket_counts = {}
+    for resolution in ('week', 'month'):
+        bounds = series.bucket_starts(chart_dates, resolution) + [len(chart_dates)]
+        bucket_counts[resolution] = {
+            'counts': [len(distinct.DistinctSet.merge(daily_loans[a:b])) for a, b in zip(bounds, bounds[1:])],
+        }
 
     # Data table preview (avoid rendering thousands of rows by default)
     total_rows = len(rows)
-    preview_limit = 200
-    rows_preview = rows[:preview_limit] if isinstance(rows, list) else []
+    rows_preview = rows[:COLLECTION_PREVIEW_LIMIT] if isinstance(rows, list) else []
 
-    context = {
+    return {
         'api_error': api_error,
-        'today_date': today_date.strftime('%Y-%m-%d'),
         'date_from': date_from.strftime('%Y-%m-%d'),
         'date_to': date_to.strftime('%Y-%m-%d'),
-        'states': sorted(states),
-        'cities': sorted(cities),
-        'cities_by_state_json': json.dumps({k: sorted(list(v)) for k, v in sorted(cities_by_state.items(), key=lambda kv: kv[0])}),
-        'actual_repayment_buckets': sorted(actual_repayment_buckets),
-        'loan_pre_post_ontime_statuses': sorted(loan_pre_post_ontime_statuses),
-        'selected_states': state_filters,
-        'selected_cities': city_filters,
-        'selected_actual_repayment_bucket': actual_repayment_bucket,
-        'selected_loan_pre_post_ontime_status': loan_pre_post_ontime_status,
-        'date_type': date_type,
+        'options': {
+            'states': sorted(states),
+            'cities': sorted(cities),
+            'cities_by_state': {k: sorted(v) for k, v in sorted(cities_by_state.items(), key=lambda kv: kv[0])},
+            'actual_repayment_buckets': sorted(actual_repayment_buckets),
+            'loan_pre_post_ontime_statuses': sorted(loan_pre_post_ontime_statuses),
+        },
+        'kpis': {
+            **kpi_values,
+            'principal_collection_excl_90_dpd': principal_collection_excl_90,
+            'fresh_principal_collection_excl_90_dpd': fresh_principal_collection_excl_90_dpd,
+            'reloan_principal_collection_excl_90_dpd': reloan_principal_collection_excl_90_dpd,
+        },
+        'dpd_bucket_distribution': dpd_bucket_distribution,
+        'dpd_bucket_rows': dpd_bucket_rows,
+        'daily': {
+            'dates': chart_dates,
+            'repayment_amounts': chart_repayment,
+            'net_disbursal_amounts': chart_net_disbursal,
+            'collected_amounts': chart_collected,
+            'principal_amounts': chart_principal,
+            'counts': chart_counts,
+        },
+        'daily_bucket_values': bucket_counts,
+        'received_by_state': {
+            'labels': received_state_labels,
+            'received': received_state_values,
+            'pending': pending_state_values,
+        },
+        'top_city_rates': top_city_rates,
+        'top_city_min_loans': MIN_LOANS_PER_CITY,
+        'pending_buckets': {
+            'labels': pending_bucket_labels,
+            'counts': pending_bucket_counts,
+            'amounts': pending_bucket_amounts,
+            'quantiles': pending_sketch.summary(),
+        },
+        'total_rows': total_rows,
+        'preview_rows': rows_preview,
+    }
+
 
-        # KPIs
-        'total_applications': total_applications,
-        'principal_amount': principal_amount,
-        'net_disbursal': net_disbursal,
-        'repayment_amount': repayment_amount,
-        'collected_amount': collected_amount,
-        'collection_percentage': collection_percentage,
-        'pending_collection': pending_collection,
-        'pending_collection_percentage': pending_collection_percentage,
-        'pending_principal': pending_principal,
-        'pending_principal_percentage': pending_principal_percentage,
-        'principal_collection_excl_90_dpd': principal_collection_excl_90,
-
-        # KPI splits
-        'fresh_total_applications': fresh_total_applications,
-        'reloan_total_applications': reloan_total_applications,
-        'fresh_principal_amount': fresh_principal_amount,
-        'reloan_principal_amount': reloan_principal_amount,
-        'fresh_net_disbursal': fresh_net_disbursal,
-        'reloan_net_disbursal': reloan_net_disbursal,
-        'fresh_repayment_amount': fresh_repayment_amount,
-        'reloan_repayment_amount': reloan_repayment_amount,
-        'fresh_collected_amount': fresh_collected_amount,
-        'fresh_collection_percentage': fresh_collection_percentage,
-        'reloan_collected_amount': reloan_collected_amount,
-        'reloan_collection_percentage': reloan_collection_percentage,
-        'fresh_pending_collection': fresh_pending_collection,
-        'fresh_pending_collection_percentage': fresh_pending_collection_percentage,
-        'reloan_pending_collection': reloan_pending_collection,
-        'reloan_pending_collection_percentage': reloan_pending_collection_percentage,
-        'fresh_pending_principal': fresh_pending_principal,
-        'fresh_pending_principal_percentage': fresh_pending_principal_percentage,
-        'reloan_pending_principal': reloan_pending_principal,
-        'reloan_pending_principal_percentage': reloan_pending_principal_percentage,
-        'fresh_principal_collection_excl_90_dpd': fresh_principal_collection_excl_90_dpd,
-        'reloan_principal_collection_excl_90_dpd': reloan_principal_collection_excl_90_dpd,
+def _present_collection_summary(request, aggregate):
+    """Template context for the Collection Summary page from a cached aggregate."""
+    filters = _collection_summary_filters(request)
+    options = aggregate['options']
+    top_city_rates = aggregate['top_city_rates']
+    received_by_state = aggregate['received_by_state']
+    pending_buckets = aggregate['pending_buckets']
+    return {
+        'api_error': aggregate['api_error'],
+        'today_date': filters['today_date'].strftime('%Y-%m-%d'),
+        'date_from': aggregate['date_from'],
+        'date_to': aggregate['date_to'],
+        'states': options['states'],
+        'cities': options['cities'],
+        'cities_by_state_json': json.dumps(options['cities_by_state']),
+        'actual_repayment_buckets': options['actual_repayment_buckets'],
+        'loan_pre_post_ontime_statuses': options['loan_pre_post_ontime_statuses'],
+        'selected_states': filters['state_filters'],
+        'selected_cities': filters['city_filters'],
+        'selected_actual_repayment_bucket': filters['actual_repayment_bucket'],
+        'selected_loan_pre_post_ontime_status': filters['loan_pre_post_ontime_status'],
+        'date_type': filters['date_type'],
+
+        # KPIs (incl. fresh/reloan splits)
+        **aggregate['kpis'],
 
         # Tables / chart
-        'dpd_bucket_distribution': dpd_bucket_distribution,
-        'amount_received_over_time': amount_received_over_time,
-        'received_state_labels': json.dumps(received_state_labels),
-        'received_state_values': json.dumps(received_state_values),
-        'pending_state_values': json.dumps(pending_state_values),
-        'top_city_rate_labels': json.dumps(top_city_rate_labels),
-        'top_city_rate_values': json.dumps(top_city_rate_values),
-        'top_city_rate_colors': json.dumps(top_city_rate_colors),
-        'top_city_rate_collected': json.dumps(top_city_rate_collected),
-        'top_city_rate_pending': json.dumps(top_city_rate_pending),
-        'top_city_rate_loan_count': json.dumps(top_city_rate_loan_count),
-        'top_city_min_loans': MIN_LOANS_PER_CITY,
-        'pending_bucket_labels': json.dumps(pending_bucket_labels),
-        'pending_bucket_counts': json.dumps(pending_bucket_counts),
-        'pending_bucket_amounts': json.dumps(pending_bucket_amounts),
+        'dpd_bucket_distribution': aggregate['dpd_bucket_distribution'],
+        # Bucketed (or LTTB-reduced) for long ranges; /api/series/collection_summary/ serves zooms
+        'amount_received_over_time': json.dumps(series.resample(*_collection_series(aggregate))),
+        'received_state_labels': json.dumps(received_by_state['labels']),
+        'received_state_values': json.dumps(received_by_state['received']),
+        'pending_state_values': json.dumps(received_by_state['pending']),
+        'top_city_rate_labels': json.dumps([x['city'] for x in top_city_rates]),
+        'top_city_rate_values': json.dumps([round(x['pct'], 2) for x in top_city_rates]),
+        'top_city_rate_colors': json.dumps([x['color'] for x in top_city_rates]),
+        'top_city_rate_collected': json.dumps([x['collected'] for x in top_city_rates]),
+        'top_city_rate_pending': json.dumps([x['pending'] for x in top_city_rates]),
+        'top_city_rate_loan_count': json.dumps([x['loan_count'] for x in top_city_rates]),
+        'top_city_min_loans': aggregate['top_city_min_loans'],
+        'pending_bucket_labels': json.dumps(pending_buckets['labels']),
+        'pending_bucket_counts': json.dumps(pending_buckets['counts']),
+        'pending_bucket_amounts': json.dumps(pending_buckets['amounts']),
+        'pending_quantiles': pending_buckets.get('quantiles'),
         # Backward-compatible (if referenced elsewhere)
-        'received_state_data': json.dumps({'labels': received_state_labels, 'values': received_state_values}),
-        'collection_data_total': total_rows,
-        'collection_data_preview': rows_preview,
-        'collection_data_preview_limit': preview_limit,
+        'received_state_data': json.dumps({'labels': received_by_state['labels'], 'values': received_by_state['received']}),
+        'collection_data_total': aggregate['total_rows'],
+        'collection_data_preview': aggregate['preview_rows'],
+        'collection_data_preview_limit': COLLECTION_PREVIEW_LIMIT,
     }
 
-    # Cache context for 5 minutes so repeat loads with same filters are fast (only on success)
-    if api_error is None:
-        try:
-            cache.set(cache_key, context, timeout=300)
-        except Exception:
-            pass
 
-    return render(request, 'dashboard/pages/collection_summary.html', context)
+def _collection_summary_context(request):
+    """Build the Collection Summary context (uncached)."""
+    aggregate = _collection_summary_aggregate(_collection_summary_filters(request), request.session.get('blinkr_token'))
+    return _present_collection_summary(request, aggregate)
+
+
+@login_required
+@never_cache
+@require_page_access
+@upstream.request_deadline
+def collection_without_fraud(request):
+    """
+    Collection Summary page view (shell first; sections load via page_section_api)
+    """
+    return _render_shell_first(request, 'collection_summary', 'dashboard/pages/collection_summary.html',
+                               date_from=COLLECTION_DEFAULT_START_DATE.strftime('%Y-%m-%d'))
 
 
 @login_required
 @never_cache
+@upstream.request_deadline
 def dpd_bucket_details_api(request):
     """
     API endpoint to fetch detailed records for a specific DPD bucket.
-    Returns filtered collection data matching the DPD bucket.
+    Served from the same cached Collection Summary aggregate as the page, so the records
+    match the page's DPD table for the same filters.
     """
     dpd_bucket = request.GET.get('dpd_bucket', '').strip()
     if not dpd_bucket:
         return JsonResponse({'error': 'dpd_bucket parameter is required'}, status=400)
-    
-    # Get the same filters as the main collection summary view
-    ist = pytz.timezone('Asia/Kolkata')
-    today_date = datetime.now(ist).date()
-    
-    date_from_str = request.GET.get('date_from') or ''
-    date_to_str = request.GET.get('date_to') or ''
-    
-    try:
-        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date() if date_from_str else today_date
-    except ValueError:
-        date_from = today_date
-    try:
-        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date() if date_to_str else today_date
-    except ValueError:
-        date_to = today_date
-    
-    state_filters = [s.strip() for s in request.GET.getlist('state') if str(s).strip()]
-    city_filters = [c.strip() for c in request.GET.getlist('city') if str(c).strip()]
-    actual_repayment_bucket = (request.GET.get('actual_repayment_bucket') or '').strip()
-    loan_pre_post_ontime_status = (request.GET.get('loan_pre_post_ontime_status') or '').strip()
-    
-    # Fetch collection data with same filters
-    api_url = 'https://backend.blinkrloan.com/insights/v2/collection_summary'
-    params = [
-        ('startDate', date_from.strftime('%Y-%m-%d')),
-        ('endDate', date_to.strftime('%Y-%m-%d')),
-    ]
-    for s in state_filters:
-        params.append(('state', s))
-    for c in city_filters:
-        params.append(('city', c))
-    if actual_repayment_bucket:
-        params.append(('actual_repayment_bucket', actual_repayment_bucket))
-    if loan_pre_post_ontime_status:
-        params.append(('loan_pre_post_ontime_status', loan_pre_post_ontime_status))
-    
-    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    token = request.session.get('blinkr_token')
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
-    else:
-        api_key = os.environ.get('BLINKR_API_KEY') or getattr(settings, 'BLINKR_API_KEY', None)
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-    
+
     try:
-        resp = requests.get(api_url, params=params, headers=headers, timeout=30)
-        resp.raise_for_status()
-        api_data = resp.json()
-        
-        # Extract rows from API response
-        rows = []
-        for key in ('data', 'result', 'collection_summary', 'items', 'records'):
-            if key in api_data and isinstance(api_data[key], list):
-                rows = api_data[key]
-                break
-        
-        if not rows and isinstance(api_data, list):
-            rows = api_data
-        
-        # Normalize DPD bucket for comparison
-        def _norm(s):
-            return str(s).strip().lower() if s else ''
-        
-        dpd_bucket_norm = _norm(dpd_bucket)
-        
-        # Filter rows by DPD bucket
-        filtered_rows = []
-        for r in rows:
-            if not isinstance(r, dict):
-                continue
-            row_dpd = r.get('dpd_bucket') or r.get('dpdBucket')
-            if row_dpd and _norm(row_dpd) == dpd_bucket_norm:
-                filtered_rows.append(r)
-        
-        # Return filtered data
-        return JsonResponse({
-            'success': True,
-            'dpd_bucket': dpd_bucket,
-            'count': len(filtered_rows),
-            'data': filtered_rows[:1000],  # Limit to 1000 records for performance
-            'total': len(filtered_rows),
-        })
-        
-    except requests.exceptions.RequestException as e:
-        return JsonResponse({'error': f'API request failed: {str(e)}'}, status=500)
+        aggregate, _, _ = _cached_page_value(request, 'collection_summary')
+        if aggregate.get('api_error'):
+            return JsonResponse({'error': f"API request failed: {aggregate['api_error']}"}, status=500)
+        return JsonResponse(_present_dpd_bucket_details(aggregate, dpd_bucket))
     except Exception as e:
         return JsonResponse({'error': f'Unexpected error: {str(e)}'}, status=500)
 
 
+def _present_dpd_bucket_details(aggregate, dpd_bucket):
+    """JSON payload of the bucket details modal (and its CSV export) from the aggregate."""
+    details = aggregate['dpd_bucket_rows'].get(dpd_bucket.strip().lower()) or {'total': 0, 'rows': []}
+    return {
+        'success': True,
+        'dpd_bucket': dpd_bucket,
+        'count': details['total'],
+        'data': list(details['rows']),  # first DPD_BUCKET_DETAILS_LIMIT records
+        'total': details['total'],
+    }
+
+
 @login_required
 @never_cache
 def collection_with_fraud(request):
@@ -3351,36 +1332,13 @@ def loan_count_wise(request):
     return render(request, 'dashboard/pages/loan_count_wise.html')
 
 
-@login_required
-@never_cache
-@require_page_access
-def gst_summary(request):
+def _gst_summary_context(query, token):
     """
-    GST Summary page view.
+    Build the GST Summary context for a PageQuery.
     Uses insights/v2/getGSTdata API with startDate and endDate.
     """
-    # --- Parse filters ---
-    ist = pytz.timezone('Asia/Kolkata')
-    today_date = datetime.now(ist).date()
-
-    # Default range: today to today
-    default_start_date = today_date
-    default_end_date = today_date
-
-    date_from_str = request.GET.get('date_from') or ''
-    date_to_str = request.GET.get('date_to') or ''
-
-    try:
-        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date() if date_from_str else default_start_date
-    except ValueError:
-        date_from = default_start_date
-    try:
-        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date() if date_to_str else default_end_date
-    except ValueError:
-        date_to = default_end_date
-
-    if date_from > date_to:
-        date_from, date_to = date_to, date_from
+    today_date = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    date_from, date_to = query.date_from, query.date_to
 
     # --- Fetch GST data from API ---
     api_url = 'https://backend.blinkrloan.com/insights/v2/getGSTdata'
@@ -3390,7 +1348,6 @@ def gst_summary(request):
     ]
 
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    token = request.session.get('blinkr_token')
     if token:
         headers['Authorization'] = f'Bearer {token}'
     else:
@@ -3401,7 +1358,7 @@ def gst_summary(request):
     gst_data = []
     api_error = None
     try:
-        resp = requests.get(api_url, params=params, headers=headers, timeout=30)
+        resp = upstream.get(api_url, params=params, headers=headers, timeout=30)
         resp.raise_for_status()
         api_response = resp.json()
         
@@ -3472,7 +1429,18 @@ def gst_summary(request):
         'gst_data_json': json.dumps(gst_data) if isinstance(gst_data, list) else '[]',
     }
 
-    return render(request, 'dashboard/pages/gst_summary.html', context)
+    return context
+
+
+@login_required
+@never_cache
+@require_page_access
+@upstream.request_deadline
+def gst_summary(request):
+    """
+    GST Summary page view (context served from the page cache)
+    """
+    return render(request, 'dashboard/pages/gst_summary.html', _cached_page_context(request, 'gst_summary'))
 
 
 @login_required
@@ -3491,31 +1459,13 @@ def credit_person_wise(request):
     return render(request, 'dashboard/pages/credit_person_wise.html')
 
 
-@login_required
-@never_cache
-@require_page_access
-def sale_performance(request):
+def _sale_performance_context(query, token):
     """
-    Sales Performance page view.
+    Build the Sales Performance context for a PageQuery.
     Uses insights/v2/sales-daily-performance API with startDate and endDate.
     """
-    ist = pytz.timezone('Asia/Kolkata')
-    today_date = datetime.now(ist).date()
-
-    date_from_str = request.GET.get('date_from') or ''
-    date_to_str = request.GET.get('date_to') or ''
-
-    try:
-        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date() if date_from_str else today_date
-    except ValueError:
-        date_from = today_date
-    try:
-        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date() if date_to_str else today_date
-    except ValueError:
-        date_to = today_date
-
-    if date_from > date_to:
-        date_from, date_to = date_to, date_from
+    today_date = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    date_from, date_to = query.date_from, query.date_to
 
     api_url = 'https://backend.blinkrloan.com/insights/v2/sales-daily-performance'
     params = [
@@ -3523,7 +1473,6 @@ def sale_performance(request):
         ('endDate', date_to.strftime('%Y-%m-%d')),
     ]
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    token = request.session.get('blinkr_token')
     if token:
         headers['Authorization'] = f'Bearer {token}'
     else:
@@ -3534,7 +1483,7 @@ def sale_performance(request):
     data = None
     api_error = None
     try:
-        resp = requests.get(api_url, params=params, headers=headers, timeout=30)
+        resp = upstream.get(api_url, params=params, headers=headers, timeout=30)
         if resp.status_code != 200:
             api_error = f"API returned {resp.status_code}: {resp.text[:200]}"
         else:
@@ -3633,8 +1582,19 @@ def sale_performance(request):
         'harshit_team_data': harshit_team_data,
         'ravi_team_data': ravi_team_data,
     }
-    response = render(request, 'dashboard/pages/sale_performance.html', context)
-    # Ensure Sales Performance page is never cached so filter apply always shows fresh data
+    return context
+
+
+@login_required
+@never_cache
+@require_page_access
+@upstream.request_deadline
+def sale_performance(request):
+    """
+    Sales Performance page view (context served from the page cache)
+    """
+    response = render(request, 'dashboard/pages/sale_performance.html', _cached_page_context(request, 'sale_performance'))
+    # Ensure Sales Performance page is never cached by the browser so filter apply always shows fresh data
     response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
     response['Pragma'] = 'no-cache'
     response['Expires'] = '0'
@@ -3643,6 +1603,7 @@ def sale_performance(request):
 
 @login_required
 @never_cache
+@upstream.request_deadline
 def api_aum_report(request):
     """
     API endpoint for AUM Report data using aum_static_data and aum_dpd_report APIs.
@@ -3675,11 +1636,11 @@ def api_aum_report(request):
         }
         
         # Fetch data from both APIs with authentication
-        static_response = requests.get(aum_static_url, headers=headers, timeout=30)
+        static_response = upstream.get(aum_static_url, headers=headers, timeout=30)
         static_response.raise_for_status()
         static_data = static_response.json()
         
-        dpd_response = requests.get(aum_dpd_url, headers=headers, timeout=30)
+        dpd_response = upstream.get(aum_dpd_url, headers=headers, timeout=30)
         dpd_response.raise_for_status()
         dpd_data = dpd_response.json()
         
@@ -3714,36 +1675,16 @@ def api_aum_report(request):
         return JsonResponse({'error': f'Failed to process data: {str(e)}'}, status=500)
 
 
-@login_required
-@never_cache
-@require_page_access
-def aum_report(request):
+def _aum_report_context(query, token):
     """
-    AUM Report page view.
+    Build the AUM Report context for a PageQuery.
     Uses BOTH api/collection/aum_static_data AND api/collection/aum_dpd_report APIs.
     Merges data by matching months and maps fields according to documentation.
     """
-    # --- Parse filters ---
-    ist = pytz.timezone('Asia/Kolkata')
-    today_date = datetime.now(ist).date()
-
-    date_from_str = request.GET.get('date_from') or ''
-    date_to_str = request.GET.get('date_to') or ''
-
-    try:
-        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date() if date_from_str else today_date
-    except ValueError:
-        date_from = today_date
-    try:
-        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date() if date_to_str else today_date
-    except ValueError:
-        date_to = today_date
-
-    if date_from > date_to:
-        date_from, date_to = date_to, date_from
-
-    state_filters = [s.strip() for s in request.GET.getlist('state') if str(s).strip()]
-    city_filters = [c.strip() for c in request.GET.getlist('city') if str(c).strip()]
+    today_date = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    date_from, date_to = query.date_from, query.date_to
+    state_filters = list(query.filters['state'])
+    city_filters = list(query.filters['city'])
 
     # --- Fetch from BOTH APIs ---
     static_api_url = 'https://backend.blinkrloan.com/api/collection/aum_static_data'
@@ -3760,7 +1701,6 @@ def aum_report(request):
         params.append(('city', c))
 
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    token = request.session.get('blinkr_token')
     if token:
         headers['Authorization'] = f'Bearer {token}'
     else:
@@ -3775,7 +1715,7 @@ def aum_report(request):
     # Fetch static data
     try:
         print(f"[AUM Report] Fetching static data from: {static_api_url}")
-        resp = requests.get(static_api_url, params=params, headers=headers, timeout=30)
+        resp = upstream.get(static_api_url, params=params, headers=headers, timeout=30)
         print(f"[AUM Report] Static data response status: {resp.status_code}")
         
         if resp.status_code != 200:
@@ -3802,7 +1742,7 @@ def aum_report(request):
     # Fetch DPD data
     try:
         print(f"[AUM Report] Fetching DPD data from: {dpd_api_url}")
-        resp = requests.get(dpd_api_url, params=params, headers=headers, timeout=30)
+        resp = upstream.get(dpd_api_url, params=params, headers=headers, timeout=30)
         print(f"[AUM Report] DPD data response status: {resp.status_code}")
         
         if resp.status_code != 200:
@@ -3876,18 +1816,15 @@ def aum_report(request):
     
     print(f"[AUM Report] Merged {len(merged_by_month)} months from both APIs")
     
-    # --- Server-side filtering ---
-    def _norm(x):
-        return str(x).strip()
-
+    # --- Server-side filtering (interned state / city codes) ---
     if state_filters:
-        state_set = set(state_filters)
-        merged_by_month = {k: v for k, v in merged_by_month.items() 
-                          if isinstance(v, dict) and _norm(v.get('state', '')) in state_set}
+        state_codes = set(categories.STATES.find(state_filters))
+        merged_by_month = {k: v for k, v in merged_by_month.items()
+                          if isinstance(v, dict) and categories.STATES.code(v.get('state')) in state_codes}
     if city_filters:
-        city_set = set(city_filters)
-        merged_by_month = {k: v for k, v in merged_by_month.items() 
-                          if isinstance(v, dict) and _norm(v.get('city', '')) in city_set}
+        city_codes = set(categories.CITIES.find(city_filters))
+        merged_by_month = {k: v for k, v in merged_by_month.items()
+                          if isinstance(v, dict) and categories.CITIES.code(v.get('city')) in city_codes}
 
     # --- Extract dropdown options from merged data ---
     states = set()
@@ -3900,11 +1837,11 @@ def aum_report(request):
         st = row.get('state')
         ct = row.get('city')
         if st:
-            states.add(_norm(st))
+            states.add(categories.STATES.value(st))
         if ct:
-            cities.add(_norm(ct))
+            cities.add(categories.CITIES.value(ct))
         if st and ct:
-            cities_by_state[_norm(st)].add(_norm(ct))
+            cities_by_state[categories.STATES.value(st)].add(categories.CITIES.value(ct))
 
     # --- Process merged data into monthly format using field mappings from documentation ---
     def to_float(v):
@@ -4137,11 +2074,380 @@ def aum_report(request):
         'total_loan_book_aum': total_loan_book_aum,
     }
 
-    return render(request, 'dashboard/pages/aum_report.html', context)
+    return context
+
+
+@login_required
+@never_cache
+@require_page_access
+@upstream.request_deadline
+def aum_report(request):
+    """
+    AUM Report page view (shell first; sections load via page_section_api)
+    """
+    return _render_shell_first(request, 'aum_report', 'dashboard/pages/aum_report.html')
+
+
+def _section_chart_data(context):
+    """Disbursal chart series from a page context (stored there as JSON strings)."""
+    keys = (
+        'state_labels', 'state_values', 'state_sanction', 'state_counts',
+        'city_labels', 'city_values', 'city_sanction', 'city_counts',
+        'source_labels', 'source_values', 'source_sanction', 'source_counts',
+        'source_fresh_counts', 'source_reloan_counts',
+    )
+    return {key: json.loads(context.get(key) or '[]') for key in keys}
+
+
+def _section_filter_data(context):
+    """Filter options that depend on the fetched data (states/cities and select options)."""
+    return {
+        'cities_by_state': json.loads(context.get('cities_by_state_json') or '{}'),
+        'options': {
+            'actual_repayment_bucket': context.get('actual_repayment_buckets') or [],
+            'loan_pre_post_ontime_status': context.get('loan_pre_post_ontime_statuses') or [],
+        },
+    }
+
+
+# page -> what is cached ('compute'(query, token): the context, or an aggregate plus a
+# 'present'er that turns it into the context), the query filters it depends on besides the
+# date range (or a custom 'query' builder and cache key builder), and its sections:
+# section -> (partial template or None, data builder or None)
+PAGE_SECTIONS = {
+    'disbursal_summary': {
+        'query': disbursal.DisbursalFilters.from_request,
+        'compute': disbursal.compute,
+        'present': _present_disbursal_summary,
+        'cache_key': _disbursal_cache_key,
+        'sections': {
+            'kpis': ('dashboard/partials/_disbursal_kpi_cards_premium.html', None),
+            'charts': (None, _section_chart_data),
+            'filters': ('dashboard/partials/_filter_state_options.html', _section_filter_data),
+        },
+    },
+    'collection_summary': {
+        'query': _collection_summary_filters,
+        'compute': _collection_summary_aggregate,
+        'present': _present_collection_summary,
+        'cache_key': _collection_summary_cache_key,
+        'sections': {
+            'kpis': ('dashboard/partials/_collection_kpi_cards.html', None),
+            'content': ('dashboard/partials/_collection_content.html', None),
+            'filters': ('dashboard/partials/_filter_state_options.html', _section_filter_data),
+        },
+    },
+    'aum_report': {
+        'compute': _aum_report_context,
+        'filters': ('state', 'city'),
+        'sections': {
+            'table': ('dashboard/partials/_aum_report_content.html', None),
+        },
+    },
+    # Rendered in one go (no deferred sections), but cached and warmed like the others
+    'gst_summary': {
+        'compute': _gst_summary_context,
+        'filters': (),
+        'sections': {},
+    },
+    'sale_performance': {
+        'compute': _sale_performance_context,
+        'filters': (),
+        'sections': {},
+    },
+}
+
+
+def _request_date_range(request):
+    """(date_from, date_to) of a page request; pages default to today (IST)."""
+    today_date = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    bounds = []
+    for name in ('date_from', 'date_to'):
+        try:
+            bounds.append(datetime.strptime(request.GET.get(name) or '', '%Y-%m-%d').date())
+        except ValueError:
+            bounds.append(today_date)
+    return tuple(sorted(bounds))
+
+
+@dataclass(frozen=True)
+class PageQuery:
+    """The inputs of a page computation besides the token: resolved dates and the page's filters."""
+    date_from: date
+    date_to: date
+    filters: dict  # filter name -> tuple of non-empty values, in query string order
+
+
+def _page_query(request, page):
+    """PageQuery for a page without its own 'query' builder."""
+    date_from, date_to = _request_date_range(request)
+    filters = {
+        name: tuple(v.strip() for v in request.GET.getlist(name) if v.strip())
+        for name in PAGE_SECTIONS[page]['filters']
+    }
+    return PageQuery(date_from, date_to, filters)
+
+
+def _auth_scope(request):
+    """Whose data a cached value is: the session's upstream token (hashed), or the service API key."""
+    return auth_scope(request.session.get('blinkr_token'))
+
+
+def _page_context_key(request, page):
+    """
+    Cache key for a page context, from normalized filters: the resolved date range (readable,
+    for targeted invalidation) + a digest of the page's other filters (empty values dropped,
+    order and duplicates ignored) and the auth scope. Parameters the page does not use
+    (?sections, ?since, ?refresh, ...) do not split entries, so the page render and its
+    AJAX refreshes share one entry.
+    """
+    filters = {name: sorted({v for v in request.GET.getlist(name) if v}) for name in PAGE_SECTIONS[page]['filters']}
+    digest = hashlib.sha1(json.dumps([filters, _auth_scope(request)], sort_keys=True).encode('utf-8')).hexdigest()[:20]
+    date_from, date_to = _request_date_range(request)
+    return f'page_context:{page}:{date_from.isoformat()}:{date_to.isoformat()}:{digest}'
+
+
+def _refresh_allowed(request):
+    """
+    Rate-limit user-supplied ?refresh / ?nocache: at most USER_REFRESH_LIMIT forced
+    recomputes per user per USER_REFRESH_WINDOW seconds. Staff and the cache warmer
+    (no user) are not limited; throttled requests are served from the cache.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or user.is_staff:
+        return True
+    window = swr_setting('USER_REFRESH_WINDOW')
+    key = f'refresh_budget:{user.pk}:{int(time.time() // window)}'
+    cache.add(key, 0, timeout=window)
+    try:
+        used = cache.incr(key)
+    except ValueError:
+        return True
+    if used > swr_setting('USER_REFRESH_LIMIT'):
+        print(f"[Cache] Refresh limit reached for user {user.pk}; serving cached data")
+        return False
+    return True
+
+
+def _force_refresh(request):
+    """?refresh / ?nocache within the refresh budget, decided once per request (all its cached values)."""
+    if not hasattr(request, '_dashboard_force_refresh'):
+        request._dashboard_force_refresh = (
+            bool(request.GET.get('refresh') or request.GET.get('nocache')) and _refresh_allowed(request))
+    return request._dashboard_force_refresh
+
+
+def _api_error_of(value):
+    """api_error of a cached page value (a context/aggregate dict or a result object)."""
+    return value.get('api_error') if isinstance(value, dict) else getattr(value, 'api_error', None)
+
+
+def _cached_page_value(request, page):
+    """
+    The page's cached value through the stale-while-revalidate cache (see
+    caching.get_or_refresh), as (value, age_seconds, is_stale). Ranges that include today
+    get short freshness windows, closed ranges long ones (caching.range_ttls).
+    ?refresh / ?nocache recompute synchronously. Values with an api_error are not cached.
+    The compute gets the query and token resolved here, never the request: a stale value is
+    recomputed in the background after the response, and must not read a finished request.
+    """
+    spec = PAGE_SECTIONS[page]
+    key = spec['cache_key'](request) if 'cache_key' in spec else _page_context_key(request, page)
+    force = _force_refresh(request)
+    fresh_for, stale_for = range_ttls(_request_date_range(request)[1], datetime.now(pytz.timezone('Asia/Kolkata')).date())
+    compute = spec['compute']
+    query = spec['query'](request) if 'query' in spec else _page_query(request, page)
+    token = request.session.get('blinkr_token')
+    return get_or_refresh(
+        key,
+        lambda: compute(query, token),
+        fresh_for=fresh_for,
+        stale_for=stale_for,
+        force=force,
+        should_cache=lambda value: not _api_error_of(value),
+    )
+
+
+def _cached_page_context(request, page):
+    """
+    Page context from the cached value (presented, for pages that cache an aggregate).
+    The returned context is marked with cache_age_seconds and cache_stale.
+    """
+    spec = PAGE_SECTIONS[page]
+    value, age, stale = _cached_page_value(request, page)
+    context = spec['present'](request, value) if 'present' in spec else dict(value)
+    context['cache_age_seconds'] = int(age)
+    context['cache_stale'] = stale
+    return context
+
+
+@login_required
+@never_cache
+@upstream.request_deadline
+def page_section_api(request, page, section):
+    """
+    API endpoint for one deferred section of a shell-first page.
+    Returns {'section', 'html'?, 'data'?, 'cache_age', 'stale'}. All sections of one page load
+    share a single cached context build, so parallel section requests hit the upstream APIs once.
+    """
+    spec = PAGE_SECTIONS.get(page)
+    if not spec or section not in spec['sections']:
+        return JsonResponse({'error': f'Unknown section: {page}/{section}'}, status=404)
+    if not user_can_access_page(request.user, page):
+        return JsonResponse({'error': 'You do not have access to this page'}, status=403)
+
+    try:
+        context = _cached_page_context(request, page)
+        template_name, build_data = spec['sections'][section]
+        payload = {'section': section, 'cache_age': context['cache_age_seconds'], 'stale': context['cache_stale']}
+        if template_name:
+            payload['html'] = render_to_string(template_name, context, request=request)
+        if build_data:
+            payload['data'] = build_data(context)
+        return JsonResponse(payload)
+    except Exception as e:
+        print(f"[Page Sections] Error rendering {page}/{section}: {e}")
+        return JsonResponse({'error': f'An error occurred: {str(e)}'}, status=500)
+
+
+def _collection_series(aggregate):
+    return aggregate['daily'], 'repayment_amounts', aggregate.get('daily_bucket_values')
+
+
+def _disbursal_series(result):
+    return result.daily or {'dates': []}, 'disbursal', None
+
+
+# Daily chart series of a page's cached value: (daily series, LTTB primary series, exact bucket values)
+SERIES_PAGES = {
+    'collection_summary': _collection_series,
+    'disbursal_summary': _disbursal_series,
+}
+
+
+@login_required
+@never_cache
+@upstream.request_deadline
+def series_api(request, page):
+    """
+    API endpoint for a page's daily chart series, from the same cached value as the page.
+    ?resolution=auto|day|week|month (auto: as the page renders it), ?mode=bucket|lttb, or
+    ?zoom_from=&zoom_to= (YYYY-MM-DD) for the full-resolution days of a zoomed window.
+    """
+    if page not in SERIES_PAGES:
+        return JsonResponse({'error': f'Unknown series: {page}'}, status=404)
+    if not user_can_access_page(request.user, page):
+        return JsonResponse({'error': 'You do not have access to this page'}, status=403)
+    resolution = request.GET.get('resolution') or 'auto'
+    if resolution != 'auto' and resolution not in series.RESOLUTIONS:
+        return JsonResponse({'error': f'Unknown resolution: {resolution}'}, status=400)
+
+    try:
+        value, age, stale = _cached_page_value(request, page)
+        if _api_error_of(value):
+            return JsonResponse({'error': _api_error_of(value)}, status=500)
+        daily, primary, exact = SERIES_PAGES[page](value)
+        zoom_from, zoom_to = request.GET.get('zoom_from'), request.GET.get('zoom_to')
+        if zoom_from or zoom_to:
+            data = series.slice_days(daily, zoom_from or '', zoom_to or '9999-12-31')
+        else:
+            data = series.resample(daily, primary, exact, resolution=resolution, mode=request.GET.get('mode'))
+        return JsonResponse({'page': page, 'series': data, 'cache_age': int(age), 'stale': stale})
+    except Exception as e:
+        print(f"[Series] Error building {page} series: {e}")
+        return JsonResponse({'error': f'An error occurred: {str(e)}'}, status=500)
+
+
+# --- Cache panel (staff only) ---
+# dataset -> raw cache key prefix(es); date-ranged keys look like <prefix><date_from>:<date_to>:...
+# (or <prefix><day>:... for per-day entries)
+CACHE_DATASETS = {
+    'collection_summary': 'collection_summary:agg:',
+    'disbursal_summary': ('disbursal:', 'disbursal_day:', 'disbursal_collection:'),
+    'aum_report': 'page_context:aum_report:',
+    'gst_summary': 'page_context:gst_summary:',
+    'sale_performance': 'page_context:sale_performance:',
+    'disbursal_data': 'disbursal_data:',
+    'upstream': 'upstream:',
+}
+
+
+def _cached_key_range(key, prefix):
+    """(date_from, date_to) encoded in a cache key after its dataset prefix, or None."""
+    parts = key[len(prefix):].split(':')
+    try:
+        date_from = date.fromisoformat(parts[0])
+    except ValueError:
+        return None
+    try:
+        return date_from, date.fromisoformat(parts[1])
+    except (IndexError, ValueError):
+        return date_from, date_from  # per-day entry
+
+
+def _invalidate_cached(dataset, date_from=None, date_to=None):
+    """
+    Delete a dataset's cache entries; with a date range, only entries whose range overlaps it
+    (entries without a date range are always included). Returns the number deleted.
+    """
+    prefixes = CACHE_DATASETS[dataset]
+    deleted = 0
+    for prefix in (prefixes,) if isinstance(prefixes, str) else prefixes:
+        for entry in cache.entries(prefix):
+            key_range = _cached_key_range(entry['key'], prefix)
+            if date_from and date_to and key_range and (key_range[1] < date_from or key_range[0] > date_to):
+                continue
+            deleted += bool(cache.delete(entry['key']))
+    print(f"[Cache] Invalidated {deleted} {dataset} entries ({date_from} - {date_to})")
+    return deleted
+
+
+@staff_member_required
+@never_cache
+def cache_admin(request):
+    """
+    Staff-only cache panel: per-namespace counters and byte usage, hot keys with age/size,
+    and targeted invalidation by dataset and date range.
+    """
+    if not hasattr(cache, 'entries'):
+        return JsonResponse({'error': 'The configured cache backend has no statistics'}, status=501)
+
+    if request.method == 'POST':
+        dataset = request.POST.get('dataset', '')
+        if dataset not in CACHE_DATASETS:
+            messages.error(request, f'Unknown dataset: {dataset}')
+            return redirect('cache_admin')
+        try:
+            date_from = date.fromisoformat(request.POST['date_from']) if request.POST.get('date_from') else None
+            date_to = date.fromisoformat(request.POST['date_to']) if request.POST.get('date_to') else date_from
+        except ValueError:
+            messages.error(request, 'Dates must be YYYY-MM-DD')
+            return redirect('cache_admin')
+        if date_from and date_to and date_from > date_to:
+            date_from, date_to = date_to, date_from
+        deleted = _invalidate_cached(dataset, date_from, date_to)
+        messages.success(request, f'Invalidated {deleted} {dataset} entries')
+        return redirect('cache_admin')
+
+    swr = swr_stats()
+    namespaces = []
+    for namespace, row in cache.stats().items():
+        namespaces.append({'name': namespace, **row, **{f'swr_{k}': v for k, v in swr.get(namespace, {}).items()}})
+    context = {
+        'namespaces': namespaces,
+        'hot_keys': cache.entries(limit=50),
+        'datasets': list(CACHE_DATASETS),
+        'breakers': upstream.breaker_states(),
+        'bulkheads': upstream.bulkhead_states(),
+        'refresh_limit': swr_setting('USER_REFRESH_LIMIT'),
+        'refresh_window': swr_setting('USER_REFRESH_WINDOW'),
+    }
+    return render(request, 'dashboard/pages/cache_admin.html', context)
 
 
 @login_required
 @never_cache
+@upstream.request_deadline
 def prepayment_records_api(request):
     """
     API endpoint that returns prepayment records from collection API
@@ -4219,7 +2525,7 @@ def prepayment_records_api(request):
             print(f"[Prepayment Records] Date range: {date_from} to {date_to}")
             print(f"[Prepayment Records] Params: {collection_params}")
             print(f"[Prepayment Records] Full URL: {collection_api_url}?startDate={collection_params['startDate']}&endDate={collection_params['endDate']}")
-            collection_response = requests.get(collection_api_url, params=collection_params, headers=headers, timeout=10)
+            collection_response = upstream.get(collection_api_url, params=collection_params, headers=headers, timeout=10)
             print(f"[Prepayment Records] Response status: {collection_response.status_code}")
             
             if collection_response and collection_response.status_code == 200:
@@ -4551,6 +2857,7 @@ def prepayment_records_api(request):
 
 @login_required
 @never_cache
+@upstream.request_deadline
 def on_time_records_api(request):
     """
     API endpoint that returns on_time records from collection_metrics API
@@ -4625,7 +2932,7 @@ def on_time_records_api(request):
         try:
             print(f"[On Time Records] Fetching from collection_metrics API: {collection_api_url}")
             print(f"[On Time Records] Date range: {date_from} to {date_to}")
-            collection_response = requests.get(collection_api_url, params=collection_params, headers=headers, timeout=10)
+            collection_response = upstream.get(collection_api_url, params=collection_params, headers=headers, timeout=10)
             print(f"[On Time Records] Response status: {collection_response.status_code}")
             
             if collection_response and collection_response.status_code == 200:
@@ -4803,6 +3110,7 @@ def on_time_records_api(request):
 
 @login_required
 @never_cache
+@upstream.request_deadline
 def overdue_records_api(request):
     """
     API endpoint that returns overdue records from collection_metrics API
@@ -4877,7 +3185,7 @@ def overdue_records_api(request):
         try:
             print(f"[Overdue Records] Fetching from collection_metrics API: {collection_api_url}")
             print(f"[Overdue Records] Date range: {date_from} to {date_to}")
-            collection_response = requests.get(collection_api_url, params=collection_params, headers=headers, timeout=10)
+            collection_response = upstream.get(collection_api_url, params=collection_params, headers=headers, timeout=10)
             print(f"[Overdue Records] Response status: {collection_response.status_code}")
             
             if collection_response and collection_response.status_code == 200:
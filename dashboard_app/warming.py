@@ -0,0 +1,139 @@
+"""
+Cache warmer for the standard date presets (run by `manage.py warm_caches`).
+
+Each (page, preset) whose range includes today is recomputed into the page cache with
+?refresh, the same way a user's "refresh" would, so the first visitors of the day get cache
+hits instead of cold backend calls. Closed ranges (yesterday, last month) stay fresh for
+hours, so they are only computed when missing and refreshed in the background when stale.
+
+Cached data is keyed by auth scope (the hashed upstream token of the session), so entries
+are warmed per scope users actually read: the blinkr_tokens of the live sessions, most
+recently logged in first, at most MAX_SCOPES of them.
+Pages, presets, cadence and concurrency come from settings.DASHBOARD_WARMER.
+"""
+import time
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytz
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from . import views
+from .caching import auth_scope
+
+
+STANDARD_PRESETS = ['today', 'yesterday', 'month_to_date', 'last_month']
+
+WARMER_DEFAULTS = {
+    'INTERVAL_SECONDS': 240,  # keep below DASHBOARD_SWR FRESH_SECONDS so warmed pages stay fresh
+    'CONCURRENCY': 2,
+    'MAX_SCOPES': 5,  # logged-in auth scopes warmed per pass
+    'PAGES': {
+        'disbursal_summary': STANDARD_PRESETS,
+        'collection_summary': STANDARD_PRESETS + ['collection_default'],
+        'gst_summary': STANDARD_PRESETS,
+        'sale_performance': STANDARD_PRESETS,
+        'aum_report': STANDARD_PRESETS,
+    },
+}
+
+
+def warmer_setting(name):
+    return getattr(settings, 'DASHBOARD_WARMER', {}).get(name, WARMER_DEFAULTS[name])
+
+
+def preset_ranges(today):
+    """preset -> (date_from, date_to) relative to today (IST)."""
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+    return {
+        'today': (today, today),
+        'yesterday': (today - timedelta(days=1), today - timedelta(days=1)),
+        'month_to_date': (today.replace(day=1), today),
+        'last_month': (last_month_end.replace(day=1),
+                       last_month_end.replace(day=monthrange(last_month_end.year, last_month_end.month)[1])),
+        'collection_default': (views.COLLECTION_DEFAULT_START_DATE, today),
+    }
+
+
+def _preset_params(page, preset, date_from, date_to):
+    """
+    Query string a user would have for the preset. The pages' own defaults (Today, or
+    2025-06-01 -> today on Collection Summary) are warmed as the parameterless URL.
+    """
+    if (page == 'collection_summary' and preset == 'collection_default') or \
+            (page != 'collection_summary' and preset == 'today'):
+        return {}
+    return {'date_from': date_from.strftime('%Y-%m-%d'), 'date_to': date_to.strftime('%Y-%m-%d')}
+
+
+def session_tokens(limit=None):
+    """
+    Upstream tokens of the live sessions, one per auth scope, most recently logged in first
+    (at most limit, default MAX_SCOPES). Needs database-backed sessions (the default).
+    """
+    limit = limit or warmer_setting('MAX_SCOPES')
+    tokens = {}
+    sessions = Session.objects.filter(expire_date__gt=timezone.now()).order_by('-expire_date')
+    for session in sessions.iterator():
+        token = session.get_decoded().get('blinkr_token')
+        if token:
+            tokens.setdefault(auth_scope(token), token)
+            if len(tokens) >= limit:
+                break
+    return list(tokens.values())
+
+
+def warm_page(page, preset, date_from, date_to, token=None):
+    """Recompute one page cache entry for the auth scope of token. Returns a report row."""
+    params = _preset_params(page, preset, date_from, date_to)
+    if date_to >= datetime.now(pytz.timezone('Asia/Kolkata')).date():
+        params['refresh'] = '1'
+    request = RequestFactory().get(reverse(page), params)
+    # The session a user with this token would have (no token: the service BLINKR_API_KEY)
+    request.session = {'blinkr_token': token} if token else {}
+    started = time.monotonic()
+    try:
+        # Presented like a page load, so values cached apart from the page value (the
+        # disbursal collection metrics) are warmed too
+        error = views._cached_page_context(request, page).get('api_error')
+    except Exception as e:
+        error = str(e)
+    finally:
+        close_old_connections()
+    return {
+        'page': page,
+        'preset': preset,
+        'scope': auth_scope(token),
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'seconds': time.monotonic() - started,
+        'ok': not error,
+        'error': error,
+    }
+
+
+def warm(pages=None, presets=None, concurrency=None, tokens=None):
+    """
+    Warm every configured (page, preset) for each token (default: session_tokens()), at most
+    `concurrency` at a time. Returns the report rows.
+    """
+    today = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    ranges = preset_ranges(today)
+    tokens = session_tokens() if tokens is None else tokens
+    if not tokens:
+        print("[Warmer] No logged-in sessions: nothing to warm")
+    jobs = [
+        (page, preset) + ranges[preset] + (token,)
+        for token in tokens
+        for page, page_presets in warmer_setting('PAGES').items() if not pages or page in pages
+        for preset in page_presets if not presets or preset in presets
+    ]
+    with ThreadPoolExecutor(max_workers=concurrency or warmer_setting('CONCURRENCY'),
+                            thread_name_prefix='cache-warmer') as pool:
+        return list(pool.map(lambda job: warm_page(*job), jobs))
@@ -14,6 +14,8 @@
         countdownSeconds: 10,
         isPaused: false,
         charts: {},
+        dataVersion: null, // version of the last payload received from /api/disbursal-data/
+        lastData: null,    // merged payload; delta responses are applied on top of it
 
         /**
          * Only Disbursal Summary supports the global auto-refresh endpoint (/api/disbursal-data/).
@@ -42,6 +44,9 @@
             this.setupHTMX();
             this.updateLastUpdated();
             
+            // Shell-first pages: load KPI/chart/table sections in parallel
+            this.loadDeferredSections();
+            
             // Only Disbursal Summary should auto-refresh via /api/disbursal-data/
             if (this.supportsDisbursalAutoRefresh() && this.refreshInterval > 0 && !this.isPaused) {
                 console.log('⚡ Loading dashboard metrics in background...');
@@ -255,6 +260,12 @@
                     }
                 }
             });
+            // Only ask the server to compute widgets that are actually on screen
+            apiUrl.searchParams.append('sections', this.visibleSections().join(','));
+            // Ask only for what changed since the payload we already hold
+            if (this.dataVersion && this.lastData) {
+                apiUrl.searchParams.append('since', this.dataVersion);
+            }
             
             // Get token from localStorage
             const token = localStorage.getItem('blinkr_token');
@@ -275,7 +286,13 @@
                 }
                 return response.json();
             })
-            .then(data => {
+            .then(payload => {
+                const data = this.applyDataPatch(payload);
+                if (!data) {
+                    // Nothing changed since the last refresh
+                    this.updateLastUpdated();
+                    return;
+                }
                 console.log('=== FULL API RESPONSE ===');
                 console.log('Data refreshed successfully', data);
                 console.log('All keys in response:', Object.keys(data));
@@ -298,6 +315,23 @@
             });
         },
 
+        /**
+         * Sections of /api/disbursal-data/ backing widgets that are currently visible.
+         * Collapsed or hidden widgets (offsetParent === null) are not requested.
+         */
+        visibleSections: function() {
+            const isVisible = (selector) => Array.from(document.querySelectorAll(selector))
+                .some(el => el.offsetParent !== null);
+            const sections = [];
+            if (isVisible('[data-kpi]:not([data-kpi^="collection_"]):not([data-kpi="source_count"])')) sections.push('kpis');
+            if (isVisible('#stateChart')) sections.push('state');
+            if (isVisible('#cityChart')) sections.push('city');
+            if (isVisible('#sourceChart, [data-kpi="source_count"]')) sections.push('source');
+            if (isVisible('[data-kpi^="collection_"]')) sections.push('collection');
+            // Nothing visible (e.g. background tab layout quirks): fall back to KPIs only
+            return sections.length ? sections : ['kpis'];
+        },
+
         /**
          * Handle refresh errors safely (NO full page reload).
          * Reload fallback caused infinite reload loops when the API endpoint failed.
@@ -312,6 +346,52 @@
             this.updateCountdownDisplay();
         },
         
+        /**
+         * Merge a (possibly delta) API response into lastData.
+         * Returns the keys to re-render (all keys for a full payload), or null if nothing changed.
+         * Keys listed in 'removed' are dropped from lastData.
+         * Chart groups (state_*, city_*, source_*) are returned whole so labels and values stay aligned.
+         */
+        applyDataPatch: function(payload) {
+            if (!payload || !payload.delta || !this.lastData || payload.base_version !== this.dataVersion) {
+                const { version, delta, ...full } = payload || {};
+                this.lastData = full;
+                this.dataVersion = version || null;
+                return full;
+            }
+
+            const merged = this.lastData;
+            const touched = [];
+            Object.keys(payload.changed || {}).forEach(key => {
+                merged[key] = payload.changed[key];
+                touched.push(key);
+            });
+            Object.keys(payload.patches || {}).forEach(key => {
+                const series = Array.isArray(merged[key]) ? merged[key].slice() : [];
+                payload.patches[key].forEach(([index, value]) => { series[index] = value; });
+                merged[key] = series;
+                touched.push(key);
+            });
+            const removed = payload.removed || [];
+            removed.forEach(key => { delete merged[key]; });
+            if (payload.last_updated) merged.last_updated = payload.last_updated;
+            this.dataVersion = payload.version;
+
+            if (touched.length === 0 && removed.length === 0) return null;
+
+            const view = {};
+            const groups = ['state_', 'city_', 'source_'];
+            touched.forEach(key => { view[key] = merged[key]; });
+            groups.forEach(prefix => {
+                if (touched.concat(removed).some(key => key.startsWith(prefix))) {
+                    Object.keys(merged).forEach(key => {
+                        if (key.startsWith(prefix)) view[key] = merged[key];
+                    });
+                }
+            });
+            return view;
+        },
+
         /**
          * Update dashboard data with new API response
          */
@@ -907,6 +987,117 @@
             }
         },
         
+        /**
+         * Shell-first pages render placeholders marked with data-deferred-section / data-deferred-page.
+         * Each one is fetched in parallel from /api/page-sections/<page>/<section>/ with the current
+         * filters and rendered as soon as its response arrives.
+         */
+        loadDeferredSections: function(root) {
+            const placeholders = Array.from((root || document).querySelectorAll('[data-deferred-section][data-deferred-page]'));
+            if (placeholders.length === 0) return Promise.resolve();
+            
+            const query = window.location.search;
+            return Promise.all(placeholders.map(el => {
+                const page = el.dataset.deferredPage;
+                const section = el.dataset.deferredSection;
+                const url = `/api/page-sections/${encodeURIComponent(page)}/${encodeURIComponent(section)}/${query}`;
+                return fetch(url, {
+                    headers: { 'X-Requested-With': 'XMLHttpRequest' },
+                    credentials: 'same-origin'
+                })
+                .then(response => response.json().then(payload => {
+                    if (!response.ok || payload.error) {
+                        throw new Error(payload.error || `HTTP error! status: ${response.status}`);
+                    }
+                    return payload;
+                }))
+                .then(payload => this.applySection(el, page, section, payload))
+                .catch(error => this.handleSectionError(el, section, error));
+            }));
+        },
+        
+        /**
+         * Swap a deferred placeholder for its section HTML and/or apply its data.
+         */
+        applySection: function(el, page, section, payload) {
+            if (typeof payload.html === 'string') {
+                this.replaceWithHTML(el, payload.html);
+            } else {
+                el.removeAttribute('data-deferred-section');
+                el.classList.remove('animate-pulse');
+            }
+            if (payload.data) {
+                this.applySectionData(section, payload.data);
+            }
+            if (typeof payload.cache_age === 'number') {
+                this.markDataAge(payload.cache_age, payload.stale);
+            }
+            document.dispatchEvent(new CustomEvent('dashboard:section-loaded', { detail: { page: page, section: section } }));
+        },
+        
+        /**
+         * Replace an element with server-rendered HTML. Scripts inserted via innerHTML do not run,
+         * so they are recreated to let section charts initialise.
+         */
+        replaceWithHTML: function(el, html) {
+            const template = document.createElement('template');
+            template.innerHTML = html;
+            const nodes = Array.from(template.content.children);
+            el.replaceWith(template.content);
+            nodes.forEach(node => {
+                const scripts = node.tagName === 'SCRIPT' ? [node] : Array.from(node.querySelectorAll('script'));
+                scripts.forEach(oldScript => {
+                    const script = document.createElement('script');
+                    Array.from(oldScript.attributes).forEach(attr => script.setAttribute(attr.name, attr.value));
+                    script.textContent = oldScript.textContent;
+                    oldScript.replaceWith(script);
+                });
+            });
+        },
+        
+        /**
+         * Apply the data part of a section response
+         */
+        applySectionData: function(section, data) {
+            if (section === 'charts') {
+                this.updateCharts(data);
+            } else if (section === 'filters') {
+                window.citiesByState = data.cities_by_state || {};
+                const options = data.options || {};
+                Object.keys(options).forEach(name => {
+                    const select = document.getElementById(name);
+                    if (!select) return;
+                    const existing = new Set(Array.from(select.options).map(option => option.value));
+                    options[name].forEach(value => {
+                        if (!existing.has(value)) select.add(new Option(value, value));
+                    });
+                });
+                // Re-apply selections from the URL now that the options exist
+                if (typeof initializeFiltersFromURL === 'function') {
+                    initializeFiltersFromURL();
+                }
+            } else {
+                this.updateKPICards(data);
+            }
+        },
+        
+        /**
+         * A failed section must not take the page down: show an inline message with a full-render link.
+         */
+        handleSectionError: function(el, section, error) {
+            console.error(`Error loading section "${section}":`, error);
+            el.removeAttribute('data-deferred-section');
+            el.classList.remove('animate-pulse');
+            if (el.hasAttribute('aria-busy')) {
+                const fullUrl = new URL(window.location.href);
+                fullUrl.searchParams.set('full', '1');
+                el.removeAttribute('aria-busy');
+                el.innerHTML = `<div class="bg-red-50 dark:bg-red-900/20 border border-red-200 dark:border-red-800 rounded-xl p-4 text-sm text-red-700 dark:text-red-200">
+                    Could not load this section. <a class="underline font-medium" href="${fullUrl.toString()}">Reload the full page</a>
+                </div>`;
+            }
+        },
+        
         /**
          * Show refresh indicator
          */
@@ -937,6 +1128,23 @@
             lastUpdatedEl.textContent = timeString;
         },
         
+        /**
+         * Show when cached section data was computed; stale data is being refreshed server-side
+         */
+        markDataAge: function(ageSeconds, stale) {
+            const lastUpdatedEl = document.getElementById('last-updated-time');
+            if (!lastUpdatedEl) return;
+            
+            const computedAt = new Date(Date.now() - ageSeconds * 1000);
+            const timeString = computedAt.toLocaleTimeString('en-US', {
+                hour: '2-digit',
+                minute: '2-digit',
+                second: '2-digit'
+            });
+            lastUpdatedEl.textContent = stale ? `${timeString} (refreshing)` : timeString;
+            lastUpdatedEl.title = stale ? `Cached ${Math.round(ageSeconds / 60)} min ago; a fresh copy is being prepared` : '';
+        },
+        
         /**
          * Setup mobile sidebar toggle
          */
@@ -988,6 +1196,9 @@
                 if (typeof updateActiveFilters === 'function') {
                     updateActiveFilters();
                 }
+                
+                // Swapped-in page shells need their sections loaded
+                this.loadDeferredSections();
             });
             
             // Show loading state during HTMX requests